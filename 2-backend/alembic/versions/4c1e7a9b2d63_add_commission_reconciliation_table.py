@@ -0,0 +1,51 @@
+"""Add commission reconciliation table
+
+Revision ID: 4c1e7a9b2d63
+Revises: 92b3ce1f7da6
+Create Date: 2026-10-19 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1e7a9b2d63'
+down_revision = '92b3ce1f7da6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('commission_reconciliation',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('account_name', sa.String(), nullable=True),
+    sa.Column('k_rep', sa.String(), nullable=True),
+    sa.Column('period', sa.Integer(), nullable=True),
+    sa.Column('scheduled_amount', sa.Float(), nullable=True),
+    sa.Column('received_amount', sa.Float(), nullable=True),
+    sa.Column('variance', sa.Float(), nullable=True),
+    sa.Column('payment_count', sa.Integer(), nullable=True),
+    sa.Column('duplicate_count', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('reconciled_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_commission_reconciliation_id'), 'commission_reconciliation', ['id'], unique=False)
+    op.create_index(op.f('ix_commission_reconciliation_account_name'), 'commission_reconciliation', ['account_name'], unique=False)
+    op.create_index(op.f('ix_commission_reconciliation_k_rep'), 'commission_reconciliation', ['k_rep'], unique=False)
+    op.create_index(op.f('ix_commission_reconciliation_period'), 'commission_reconciliation', ['period'], unique=False)
+    op.create_index(op.f('ix_commission_reconciliation_status'), 'commission_reconciliation', ['status'], unique=False)
+    op.create_index('idx_reconciliation_key', 'commission_reconciliation', ['account_name', 'k_rep', 'period'], unique=True)
+    op.create_index('idx_reconciliation_period_status', 'commission_reconciliation', ['period', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_reconciliation_period_status', table_name='commission_reconciliation')
+    op.drop_index('idx_reconciliation_key', table_name='commission_reconciliation')
+    op.drop_index(op.f('ix_commission_reconciliation_status'), table_name='commission_reconciliation')
+    op.drop_index(op.f('ix_commission_reconciliation_period'), table_name='commission_reconciliation')
+    op.drop_index(op.f('ix_commission_reconciliation_k_rep'), table_name='commission_reconciliation')
+    op.drop_index(op.f('ix_commission_reconciliation_account_name'), table_name='commission_reconciliation')
+    op.drop_index(op.f('ix_commission_reconciliation_id'), table_name='commission_reconciliation')
+    op.drop_table('commission_reconciliation')
@@ -0,0 +1,45 @@
+"""Add payment_year/payment_month columns to commissions
+
+Revision ID: 8f3d2b6e1a47
+Revises: 4c1e7a9b2d63
+Create Date: 2026-10-19 10:04:17.552931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3d2b6e1a47'
+down_revision = '4c1e7a9b2d63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('commissions', sa.Column('payment_year', sa.Integer(), nullable=True))
+    op.add_column('commissions', sa.Column('payment_month', sa.Integer(), nullable=True))
+
+    # Backfill from the existing payment dates (tables created by the initial
+    # migration predate actual_payment_date and have nothing to backfill)
+    bind = op.get_bind()
+    columns = {column['name'] for column in sa.inspect(bind).get_columns('commissions')}
+    if 'actual_payment_date' in columns:
+        if bind.dialect.name == 'sqlite':
+            year, month = "strftime('%Y', actual_payment_date)", "strftime('%m', actual_payment_date)"
+        else:
+            year, month = "EXTRACT(YEAR FROM actual_payment_date)", "EXTRACT(MONTH FROM actual_payment_date)"
+        op.execute(f"""
+            UPDATE commissions
+            SET payment_year = CAST({year} AS INTEGER),
+                payment_month = CAST({month} AS INTEGER)
+            WHERE actual_payment_date IS NOT NULL
+        """)
+
+    op.create_index('idx_commissions_type_payment_period', 'commissions', ['commission_type', 'payment_year', 'payment_month'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_commissions_type_payment_period', table_name='commissions')
+    op.drop_column('commissions', 'payment_month')
+    op.drop_column('commissions', 'payment_year')
@@ -0,0 +1,43 @@
+"""Add market_cube table
+
+Revision ID: a8f1d5c3e927
+Revises: e7c4b2a9d518
+Create Date: 2026-10-19 16:41:12.730158
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8f1d5c3e927'
+down_revision = 'e7c4b2a9d518'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('market_cube',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation_id', sa.Integer(), nullable=True),
+    sa.Column('fact', sa.String(), nullable=True),
+    sa.Column('zone', sa.String(), nullable=True),
+    sa.Column('rep', sa.String(), nullable=True),
+    sa.Column('load_profile', sa.String(), nullable=True),
+    sa.Column('management_company', sa.String(), nullable=True),
+    sa.Column('month', sa.String(), nullable=True),
+    sa.Column('record_count', sa.Integer(), nullable=True),
+    sa.Column('kwh_sum', sa.Float(), nullable=True),
+    sa.Column('bill_sum', sa.Float(), nullable=True),
+    sa.Column('rate_sum', sa.Float(), nullable=True),
+    sa.Column('rate_min', sa.Float(), nullable=True),
+    sa.Column('rate_max', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['generation_id'], ['analytics_generations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_market_cube_id'), 'market_cube', ['id'], unique=False)
+    op.create_index(op.f('ix_market_cube_generation_id'), 'market_cube', ['generation_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table('market_cube')
@@ -0,0 +1,198 @@
+"""Add analytics generation and result tables
+
+Revision ID: b5e2c8d4f019
+Revises: 8f3d2b6e1a47
+Create Date: 2026-10-19 11:26:08.604417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e2c8d4f019'
+down_revision = '8f3d2b6e1a47'
+branch_labels = None
+depends_on = None
+
+
+def _metadata_columns():
+    return [
+        sa.Column('analysis_date', sa.DateTime(), nullable=True),
+        sa.Column('model_version', sa.String(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    op.create_table('analytics_generations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('model_version', sa.String(), nullable=True),
+    sa.Column('analysis_date', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('usage_count', sa.Integer(), nullable=True),
+    sa.Column('pricing_count', sa.Integer(), nullable=True),
+    sa.Column('commission_count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('activated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_analytics_generations_id'), 'analytics_generations', ['id'], unique=False)
+    op.create_index(op.f('ix_analytics_generations_analysis_date'), 'analytics_generations', ['analysis_date'], unique=False)
+    op.create_index(op.f('ix_analytics_generations_status'), 'analytics_generations', ['status'], unique=False)
+
+    op.create_table('usage_analytics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation_id', sa.Integer(), nullable=True),
+    sa.Column('account_name', sa.String(), nullable=True),
+    sa.Column('esiid_id', sa.String(), nullable=True),
+    sa.Column('zone', sa.String(), nullable=True),
+    sa.Column('rep', sa.String(), nullable=True),
+    sa.Column('load_profile', sa.String(), nullable=True),
+    sa.Column('esiid_count', sa.Integer(), nullable=True),
+    sa.Column('current_usage_kwh', sa.Float(), nullable=True),
+    sa.Column('avg_usage_kwh', sa.Float(), nullable=True),
+    sa.Column('predicted_usage_kwh', sa.Float(), nullable=True),
+    sa.Column('usage_trend', sa.String(), nullable=True),
+    sa.Column('seasonal_factor', sa.Float(), nullable=True),
+    sa.Column('usage_pattern', sa.String(), nullable=True),
+    sa.Column('efficiency_score', sa.Float(), nullable=True),
+    sa.Column('cost_optimization_potential', sa.Float(), nullable=True),
+    sa.Column('anomaly_score', sa.Float(), nullable=True),
+    sa.Column('cost_per_kwh', sa.Float(), nullable=True),
+    sa.Column('total_monthly_bill', sa.Float(), nullable=True),
+    sa.Column('forecast_period', sa.String(), nullable=True),
+    sa.Column('forecast_confidence', sa.Float(), nullable=True),
+    sa.Column('forecast_data', sa.JSON(), nullable=True),
+    sa.Column('data_quality_score', sa.Float(), nullable=True),
+    *_metadata_columns(),
+    sa.ForeignKeyConstraint(['generation_id'], ['analytics_generations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_usage_analytics_id'), 'usage_analytics', ['id'], unique=False)
+    op.create_index(op.f('ix_usage_analytics_generation_id'), 'usage_analytics', ['generation_id'], unique=False)
+    op.create_index(op.f('ix_usage_analytics_account_name'), 'usage_analytics', ['account_name'], unique=False)
+    op.create_index(op.f('ix_usage_analytics_esiid_id'), 'usage_analytics', ['esiid_id'], unique=False)
+    op.create_index(op.f('ix_usage_analytics_zone'), 'usage_analytics', ['zone'], unique=False)
+    op.create_index(op.f('ix_usage_analytics_rep'), 'usage_analytics', ['rep'], unique=False)
+    op.create_index(op.f('ix_usage_analytics_load_profile'), 'usage_analytics', ['load_profile'], unique=False)
+    op.create_index(op.f('ix_usage_analytics_analysis_date'), 'usage_analytics', ['analysis_date'], unique=False)
+    op.create_index('idx_usage_analytics_generation_account', 'usage_analytics', ['generation_id', 'account_name'], unique=False)
+    op.create_index('idx_usage_analytics_generation_pattern', 'usage_analytics', ['generation_id', 'usage_pattern'], unique=False)
+    op.create_index('idx_usage_analytics_generation_usage', 'usage_analytics', ['generation_id', 'current_usage_kwh'], unique=False)
+
+    op.create_table('pricing_analytics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation_id', sa.Integer(), nullable=True),
+    sa.Column('zone', sa.String(), nullable=True),
+    sa.Column('rep', sa.String(), nullable=True),
+    sa.Column('load_profile', sa.String(), nullable=True),
+    sa.Column('current_rate', sa.Float(), nullable=True),
+    sa.Column('avg_rate', sa.Float(), nullable=True),
+    sa.Column('predicted_rate', sa.Float(), nullable=True),
+    sa.Column('rate_trend', sa.String(), nullable=True),
+    sa.Column('market_position', sa.String(), nullable=True),
+    sa.Column('price_volatility', sa.Float(), nullable=True),
+    sa.Column('seasonal_adjustment', sa.Float(), nullable=True),
+    sa.Column('percentile_rank', sa.Float(), nullable=True),
+    sa.Column('data_points', sa.Integer(), nullable=True),
+    sa.Column('best_contract_term', sa.Integer(), nullable=True),
+    sa.Column('optimal_switch_timing', sa.String(), nullable=True),
+    sa.Column('potential_savings', sa.Float(), nullable=True),
+    sa.Column('forecast_period', sa.String(), nullable=True),
+    sa.Column('forecast_confidence', sa.Float(), nullable=True),
+    sa.Column('price_forecast', sa.JSON(), nullable=True),
+    sa.Column('data_quality_score', sa.Float(), nullable=True),
+    *_metadata_columns(),
+    sa.ForeignKeyConstraint(['generation_id'], ['analytics_generations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pricing_analytics_id'), 'pricing_analytics', ['id'], unique=False)
+    op.create_index(op.f('ix_pricing_analytics_generation_id'), 'pricing_analytics', ['generation_id'], unique=False)
+    op.create_index(op.f('ix_pricing_analytics_zone'), 'pricing_analytics', ['zone'], unique=False)
+    op.create_index(op.f('ix_pricing_analytics_rep'), 'pricing_analytics', ['rep'], unique=False)
+    op.create_index(op.f('ix_pricing_analytics_load_profile'), 'pricing_analytics', ['load_profile'], unique=False)
+    op.create_index(op.f('ix_pricing_analytics_analysis_date'), 'pricing_analytics', ['analysis_date'], unique=False)
+    op.create_index('idx_pricing_analytics_generation_zone_rep', 'pricing_analytics', ['generation_id', 'zone', 'rep'], unique=False)
+    op.create_index('idx_pricing_analytics_generation_position', 'pricing_analytics', ['generation_id', 'market_position'], unique=False)
+
+    op.create_table('commission_analytics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation_id', sa.Integer(), nullable=True),
+    sa.Column('rep', sa.String(), nullable=True),
+    sa.Column('account_name', sa.String(), nullable=True),
+    sa.Column('commission_type', sa.String(), nullable=True),
+    sa.Column('current_monthly_commission', sa.Float(), nullable=True),
+    sa.Column('predicted_monthly_commission', sa.Float(), nullable=True),
+    sa.Column('commission_trend', sa.String(), nullable=True),
+    sa.Column('total_commission', sa.Float(), nullable=True),
+    sa.Column('commission_count', sa.Integer(), nullable=True),
+    sa.Column('monthly_performance', sa.JSON(), nullable=True),
+    sa.Column('conversion_rate', sa.Float(), nullable=True),
+    sa.Column('average_commission_value', sa.Float(), nullable=True),
+    sa.Column('commission_growth_rate', sa.Float(), nullable=True),
+    sa.Column('high_value_opportunities', sa.JSON(), nullable=True),
+    sa.Column('optimal_sales_timing', sa.JSON(), nullable=True),
+    sa.Column('market_share_potential', sa.Float(), nullable=True),
+    sa.Column('forecast_period', sa.String(), nullable=True),
+    sa.Column('forecast_confidence', sa.Float(), nullable=True),
+    sa.Column('commission_forecast', sa.JSON(), nullable=True),
+    sa.Column('data_quality_score', sa.Float(), nullable=True),
+    *_metadata_columns(),
+    sa.ForeignKeyConstraint(['generation_id'], ['analytics_generations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_commission_analytics_id'), 'commission_analytics', ['id'], unique=False)
+    op.create_index(op.f('ix_commission_analytics_generation_id'), 'commission_analytics', ['generation_id'], unique=False)
+    op.create_index(op.f('ix_commission_analytics_rep'), 'commission_analytics', ['rep'], unique=False)
+    op.create_index(op.f('ix_commission_analytics_account_name'), 'commission_analytics', ['account_name'], unique=False)
+    op.create_index(op.f('ix_commission_analytics_commission_type'), 'commission_analytics', ['commission_type'], unique=False)
+    op.create_index(op.f('ix_commission_analytics_analysis_date'), 'commission_analytics', ['analysis_date'], unique=False)
+    op.create_index('idx_commission_analytics_generation_rep', 'commission_analytics', ['generation_id', 'rep'], unique=False)
+
+    op.create_table('market_intelligence',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation_id', sa.Integer(), nullable=True),
+    sa.Column('market_segment', sa.String(), nullable=True),
+    sa.Column('geographic_zone', sa.String(), nullable=True),
+    sa.Column('time_period', sa.String(), nullable=True),
+    sa.Column('market_overview', sa.JSON(), nullable=True),
+    sa.Column('zone_analysis', sa.JSON(), nullable=True),
+    sa.Column('total_market_size', sa.Float(), nullable=True),
+    sa.Column('market_growth_rate', sa.Float(), nullable=True),
+    sa.Column('competitive_intensity', sa.Float(), nullable=True),
+    sa.Column('average_market_rate', sa.Float(), nullable=True),
+    sa.Column('rate_volatility', sa.Float(), nullable=True),
+    sa.Column('pricing_trends', sa.JSON(), nullable=True),
+    sa.Column('market_leaders', sa.JSON(), nullable=True),
+    sa.Column('competitive_positioning', sa.JSON(), nullable=True),
+    sa.Column('market_opportunities', sa.JSON(), nullable=True),
+    sa.Column('market_forecast', sa.JSON(), nullable=True),
+    sa.Column('demand_forecast', sa.JSON(), nullable=True),
+    sa.Column('price_forecast', sa.JSON(), nullable=True),
+    sa.Column('analysis_date', sa.DateTime(), nullable=True),
+    sa.Column('model_version', sa.String(), nullable=True),
+    sa.Column('data_sources', sa.JSON(), nullable=True),
+    sa.Column('confidence_level', sa.Float(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['generation_id'], ['analytics_generations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_market_intelligence_id'), 'market_intelligence', ['id'], unique=False)
+    op.create_index(op.f('ix_market_intelligence_generation_id'), 'market_intelligence', ['generation_id'], unique=False)
+    op.create_index(op.f('ix_market_intelligence_market_segment'), 'market_intelligence', ['market_segment'], unique=False)
+    op.create_index(op.f('ix_market_intelligence_geographic_zone'), 'market_intelligence', ['geographic_zone'], unique=False)
+    op.create_index(op.f('ix_market_intelligence_time_period'), 'market_intelligence', ['time_period'], unique=False)
+    op.create_index(op.f('ix_market_intelligence_analysis_date'), 'market_intelligence', ['analysis_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table('market_intelligence')
+    op.drop_table('commission_analytics')
+    op.drop_table('pricing_analytics')
+    op.drop_table('usage_analytics')
+    op.drop_table('analytics_generations')
@@ -0,0 +1,51 @@
+"""Add analytics run measurements and stage metrics table
+
+Revision ID: c6b9e3f4a712
+Revises: a8f1d5c3e927
+Create Date: 2026-10-19 18:05:37.214903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6b9e3f4a712'
+down_revision = 'a8f1d5c3e927'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('analytics_generations', sa.Column('run_mode', sa.String(), nullable=True))
+    op.add_column('analytics_generations', sa.Column('duration_seconds', sa.Float(), nullable=True))
+    op.add_column('analytics_generations', sa.Column('data_quality_score', sa.Float(), nullable=True))
+    op.add_column('analytics_generations', sa.Column('model_accuracy', sa.Float(), nullable=True))
+    op.create_table('analytics_stage_metrics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation_id', sa.Integer(), nullable=True),
+    sa.Column('analysis_date', sa.DateTime(), nullable=True),
+    sa.Column('run_mode', sa.String(), nullable=True),
+    sa.Column('stage', sa.String(), nullable=True),
+    sa.Column('location', sa.String(), nullable=True),
+    sa.Column('offset_seconds', sa.Float(), nullable=True),
+    sa.Column('wall_seconds', sa.Float(), nullable=True),
+    sa.Column('cpu_seconds', sa.Float(), nullable=True),
+    sa.Column('peak_rss_mb', sa.Float(), nullable=True),
+    sa.Column('rows_in', sa.Integer(), nullable=True),
+    sa.Column('rows_out', sa.Integer(), nullable=True),
+    sa.Column('groups', sa.Integer(), nullable=True),
+    sa.Column('groups_per_second', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_analytics_stage_metrics_id'), 'analytics_stage_metrics', ['id'], unique=False)
+    op.create_index('idx_analytics_stage_metrics_generation_stage', 'analytics_stage_metrics',
+                    ['generation_id', 'stage'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_stage_metrics')
+    op.drop_column('analytics_generations', 'model_accuracy')
+    op.drop_column('analytics_generations', 'data_quality_score')
+    op.drop_column('analytics_generations', 'duration_seconds')
+    op.drop_column('analytics_generations', 'run_mode')
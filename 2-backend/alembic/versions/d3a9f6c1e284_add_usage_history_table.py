@@ -0,0 +1,36 @@
+"""Add usage_history table
+
+Revision ID: d3a9f6c1e284
+Revises: b5e2c8d4f019
+Create Date: 2026-10-19 13:42:51.207364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a9f6c1e284'
+down_revision = 'b5e2c8d4f019'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('usage_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('account_name', sa.String(), nullable=True),
+    sa.Column('period', sa.Integer(), nullable=True),
+    sa.Column('total_usage_kwh', sa.Float(), nullable=True),
+    sa.Column('esiid_count', sa.Integer(), nullable=True),
+    sa.Column('recorded_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('account_name', 'period', name='uq_usage_history_account_period')
+    )
+    op.create_index(op.f('ix_usage_history_id'), 'usage_history', ['id'], unique=False)
+    op.create_index(op.f('ix_usage_history_account_name'), 'usage_history', ['account_name'], unique=False)
+    op.create_index(op.f('ix_usage_history_period'), 'usage_history', ['period'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table('usage_history')
@@ -0,0 +1,50 @@
+"""Add esiid_anomalies table
+
+Revision ID: e7c4b2a9d518
+Revises: d3a9f6c1e284
+Create Date: 2026-10-19 15:08:33.519274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c4b2a9d518'
+down_revision = 'd3a9f6c1e284'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('esiid_anomalies',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation_id', sa.Integer(), nullable=True),
+    sa.Column('esi_id', sa.String(), nullable=True),
+    sa.Column('account_name', sa.String(), nullable=True),
+    sa.Column('zone', sa.String(), nullable=True),
+    sa.Column('load_profile', sa.String(), nullable=True),
+    sa.Column('rep', sa.String(), nullable=True),
+    sa.Column('kwh_mo', sa.Float(), nullable=True),
+    sa.Column('cost_per_kwh', sa.Float(), nullable=True),
+    sa.Column('peer_group', sa.String(), nullable=True),
+    sa.Column('usage_score', sa.Float(), nullable=True),
+    sa.Column('cost_score', sa.Float(), nullable=True),
+    sa.Column('anomaly_score', sa.Float(), nullable=True),
+    sa.Column('anomaly_type', sa.String(), nullable=True),
+    sa.Column('severity', sa.String(), nullable=True),
+    sa.Column('analysis_date', sa.DateTime(), nullable=True),
+    sa.Column('model_version', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['generation_id'], ['analytics_generations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_esiid_anomalies_id'), 'esiid_anomalies', ['id'], unique=False)
+    op.create_index(op.f('ix_esiid_anomalies_generation_id'), 'esiid_anomalies', ['generation_id'], unique=False)
+    op.create_index(op.f('ix_esiid_anomalies_esi_id'), 'esiid_anomalies', ['esi_id'], unique=False)
+    op.create_index(op.f('ix_esiid_anomalies_account_name'), 'esiid_anomalies', ['account_name'], unique=False)
+    op.create_index(op.f('ix_esiid_anomalies_analysis_date'), 'esiid_anomalies', ['analysis_date'], unique=False)
+    op.create_index('idx_esiid_anomalies_generation_score', 'esiid_anomalies', ['generation_id', 'anomaly_score'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table('esiid_anomalies')
@@ -0,0 +1,30 @@
+"""Add analytics content hashes for ETag and delta delivery
+
+Revision ID: f2a7c9e1b384
+Revises: c6b9e3f4a712
+Create Date: 2026-10-19 19:12:48.503117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a7c9e1b384'
+down_revision = 'c6b9e3f4a712'
+branch_labels = None
+depends_on = None
+
+_ROW_HASH_TABLES = ['usage_analytics', 'esiid_anomalies', 'pricing_analytics', 'commission_analytics']
+
+
+def upgrade() -> None:
+    op.add_column('analytics_generations', sa.Column('content_hashes', sa.JSON(), nullable=True))
+    for table in _ROW_HASH_TABLES:
+        op.add_column(table, sa.Column('row_hash', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    for table in _ROW_HASH_TABLES:
+        op.drop_column(table, 'row_hash')
+    op.drop_column('analytics_generations', 'content_hashes')
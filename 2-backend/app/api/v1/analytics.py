@@ -1,44 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, select
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime, timedelta
-import json
-import math
-from pathlib import Path
+import numpy as np
+import orjson
 
-from app.database import get_db
-from app.core.dependencies import get_current_user_id, get_pagination_params
+from app.database import get_async_db, run_with_session
+from app.core.dependencies import get_current_user_id, get_pagination_params, require_manager_or_admin
+from app.core.principals import Principal
+from app.core.http_cache import CACHE_CONTROL, etag_matches, not_modified
 from app.schemas.analytics import (
     AnalyticsResults, ForecastRequest, ForecastResponse, OptimizationRequest, 
-    OptimizationResponse, AnomalyDetectionResponse, PerformanceMetrics, AnalyticsSummary
+    OptimizationResponse, AnomalyPage, PerformanceMetrics, AnalyticsSummary,
+    AnalyticsJobResponse, AnalyticsRefreshResponse, BatchForecastRequest,
+    PortfolioOptimizationRequest, PortfolioOptimizationResponse
+)
+from app.models.analytics import (
+    AnalyticsStageMetric, UsageAnalytics, ESIIDAnomaly, PricingAnalytics, CommissionAnalytics, MarketIntelligence
+)
+from app.models.daily_pricing import DailyPricing
+from app.services.analytics_results import results_store
+from app.services.analytics_jobs import job_runner
+from app.services.usage_index import get_usage_index
+from app.services.anomaly_detection import FLAG_THRESHOLD, severity_bounds
+from app.services.market_cube import DEFAULT_MEASURES, get_market_cube, parse_filters, parse_list
+from app.services.portfolio_optimizer import Units, load_units, optimize_accounts
+from app.services.usage_forecasting import (
+    get_forecast_model, forecast_usage, forecast_accounts, resolve_positions
+)
+from app.services.analytics_store import (
+    get_active_generation, get_retained_generation, generation_delta, usage_record, anomaly_record,
+    pricing_record, commission_record, market_intelligence_record, stage_metric_record, run_history
 )
 
 router = APIRouter()
 
-# Cache for analytics results
-_analytics_cache = {}
-_cache_timestamp = None
-CACHE_DURATION = 3600  # 1 hour
-
-
-def load_analytics_results():
-    """Load analytics results from file or cache"""
-    global _analytics_cache, _cache_timestamp
-    
-    # Check if cache is still valid
-    if _cache_timestamp and (datetime.now() - _cache_timestamp).seconds < CACHE_DURATION:
-        return _analytics_cache
-    
-    # Load from file
-    results_file = Path("1-frontend/src/data/analytics-results.json")
-    if results_file.exists():
-        with open(results_file, 'r') as f:
-            _analytics_cache = json.load(f)
-        _cache_timestamp = datetime.now()
-        return _analytics_cache
-    
-    return None
+def _require_results():
+    """Raise 404 when the analytics engine has not written results yet"""
+    if not results_store.refresh():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analytics results not found"
+        )
 
 
 @router.get("/results", response_model=Dict[str, Any])
@@ -46,13 +51,13 @@ async def get_analytics_results(
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get complete analytics results"""
-    results = load_analytics_results()
-    if not results:
+    if not results_store.refresh():
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Analytics results not found. Run analytics engine first."
         )
-    return results
+    # Served straight from disk; the engine replaces the file atomically
+    return FileResponse(results_store.path, media_type="application/json")
 
 
 @router.get("/summary", response_model=AnalyticsSummary)
@@ -60,14 +65,9 @@ async def get_analytics_summary(
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get analytics summary with key insights"""
-    results = load_analytics_results()
-    if not results:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Analytics results not found"
-        )
+    _require_results()
     
-    market_intel = results.get('market_intelligence', {})
+    market_intel = results_store.section('market_intelligence', {})
     market_overview = market_intel.get('market_overview', {})
     
     # Extract top performing zones
@@ -102,244 +102,394 @@ async def get_analytics_summary(
     )
 
 
+async def _require_generation(db: AsyncSession):
+    """Active analytics generation, or 404 before the engine has persisted a run"""
+    generation = await get_active_generation(db)
+    if generation is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analytics results not found. Run analytics engine first."
+        )
+    return generation
+
+
+async def _paginate(db: AsyncSession, query, pagination: dict, to_record, generation):
+    """Apply SQL offset/limit and wrap one page of records"""
+    total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+    rows = await db.scalars(query.offset(pagination["skip"]).limit(pagination["limit"]))
+    return {
+        "results": [to_record(row) for row in rows],
+        "total": total,
+        "page": pagination["skip"] // pagination["limit"] + 1,
+        "pages": (total + pagination["limit"] - 1) // pagination["limit"],
+        "generation_id": generation.id
+    }
+
+
+def _not_modified(request: Request, response: Response, generation, section: str) -> Optional[Response]:
+    """
+    Tag the response with the section's content hash; a 304 when the client's copy is current.
+
+    The hash covers content only, so a refresh that leaves a section unchanged keeps its ETag.
+    """
+    content_hash = (generation.content_hashes or {}).get(section)
+    if content_hash is None:
+        return None
+    etag = f'"{section}-{content_hash}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return None
+
+
+_SINCE_DESCRIPTION = "Return only rows changed since this generation, plus the keys of removed rows"
+
+
+async def _delta_page(db: AsyncSession, model, generation, since: int, criteria, order_by, pagination: dict,
+                      to_record):
+    """One page of the rows changed since an earlier generation; 410 once that generation is pruned"""
+    if since != generation.id and await get_retained_generation(db, since) is None:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"Generation {since} is no longer retained; fetch without 'since'"
+        )
+    changed, removed = await generation_delta(db, model, generation.id, since, criteria)
+    return {
+        **await _paginate(db, changed.order_by(*order_by(model)), pagination, to_record, generation),
+        "since": since,
+        "removed": removed
+    }
+
+
 @router.get("/usage-analysis")
 async def get_usage_analysis(
+    request: Request,
+    response: Response,
     pagination: dict = Depends(get_pagination_params),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id),
     account_name: Optional[str] = Query(None, description="Filter by account name"),
     usage_pattern: Optional[str] = Query(None, description="Filter by usage pattern"),
     min_usage: Optional[float] = Query(None, description="Minimum usage kWh"),
-    max_usage: Optional[float] = Query(None, description="Maximum usage kWh")
+    max_usage: Optional[float] = Query(None, description="Maximum usage kWh"),
+    since: Optional[int] = Query(None, description=_SINCE_DESCRIPTION)
 ):
     """Get usage analysis with filtering"""
-    results = load_analytics_results()
-    if not results:
-        raise HTTPException(status_code=404, detail="Analytics results not found")
-    
-    usage_analysis = results.get('usage_analysis', [])
-    
-    # Apply filters
-    filtered_results = usage_analysis
-    
-    if account_name:
-        filtered_results = [r for r in filtered_results 
-                          if account_name.lower() in r.get('account_name', '').lower()]
-    
-    if usage_pattern:
-        filtered_results = [r for r in filtered_results 
-                          if r.get('usage_pattern') == usage_pattern]
-    
-    if min_usage is not None:
-        filtered_results = [r for r in filtered_results 
-                          if r.get('total_usage_kwh', 0) >= min_usage]
+    generation = await _require_generation(db)
+    cached = _not_modified(request, response, generation, 'usage')
+    if cached:
+        return cached
+    
+    if since is not None:
+        # Same view as the index: case-insensitive name substring, inclusive usage range
+        def criteria(table):
+            conditions = []
+            if account_name:
+                conditions.append(func.lower(table.account_name).contains(account_name.lower(), autoescape=True))
+            if usage_pattern:
+                conditions.append(table.usage_pattern == usage_pattern)
+            if min_usage is not None:
+                conditions.append(table.current_usage_kwh >= min_usage)
+            if max_usage is not None:
+                conditions.append(table.current_usage_kwh <= max_usage)
+            return conditions
+        
+        return await _delta_page(db, UsageAnalytics, generation, since, criteria,
+                           lambda table: (table.account_name, table.id), pagination, usage_record)
     
-    if max_usage is not None:
-        filtered_results = [r for r in filtered_results 
-                          if r.get('total_usage_kwh', 0) <= max_usage]
+    index = await run_with_session(get_usage_index, generation.id)
     
-    # Apply pagination
-    start = pagination["skip"]
-    end = start + pagination["limit"]
-    paginated_results = filtered_results[start:end]
+    positions = index.filter(account_name, usage_pattern, min_usage, max_usage)
+    results, total = index.page(positions, pagination["skip"], pagination["limit"])
     
     return {
-        "results": paginated_results,
-        "total": len(filtered_results),
+        "results": results,
+        "total": total,
         "page": pagination["skip"] // pagination["limit"] + 1,
-        "pages": (len(filtered_results) + pagination["limit"] - 1) // pagination["limit"]
+        "pages": (total + pagination["limit"] - 1) // pagination["limit"],
+        "generation_id": generation.id
     }
 
 
 @router.get("/pricing-analysis")
 async def get_pricing_analysis(
+    request: Request,
+    response: Response,
+    pagination: dict = Depends(get_pagination_params),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id),
     zone: Optional[str] = Query(None, description="Filter by zone"),
     rep: Optional[str] = Query(None, description="Filter by REP"),
-    market_position: Optional[str] = Query(None, description="Filter by market position")
+    market_position: Optional[str] = Query(None, description="Filter by market position"),
+    since: Optional[int] = Query(None, description=_SINCE_DESCRIPTION)
 ):
     """Get pricing analysis with filtering"""
-    results = load_analytics_results()
-    if not results:
-        raise HTTPException(status_code=404, detail="Analytics results not found")
-    
-    pricing_analysis = results.get('pricing_analysis', [])
-    
-    # Apply filters
-    filtered_results = pricing_analysis
-    
-    if zone:
-        filtered_results = [r for r in filtered_results if r.get('zone') == zone]
-    
-    if rep:
-        filtered_results = [r for r in filtered_results if r.get('rep') == rep]
-    
-    if market_position:
-        filtered_results = [r for r in filtered_results 
-                          if r.get('market_position') == market_position]
-    
-    return filtered_results
+    generation = await _require_generation(db)
+    cached = _not_modified(request, response, generation, 'pricing')
+    if cached:
+        return cached
+    
+    def criteria(table):
+        conditions = []
+        if zone:
+            conditions.append(table.zone == zone)
+        if rep:
+            conditions.append(table.rep == rep)
+        if market_position:
+            conditions.append(table.market_position == market_position)
+        return conditions
+    
+    def order_by(table):
+        return table.zone, table.rep
+    
+    if since is not None:
+        return await _delta_page(db, PricingAnalytics, generation, since, criteria, order_by, pagination,
+                                 pricing_record)
+    
+    query = select(PricingAnalytics).where(
+        PricingAnalytics.generation_id == generation.id, *criteria(PricingAnalytics)
+    ).order_by(*order_by(PricingAnalytics))
+    return await _paginate(db, query, pagination, pricing_record, generation)
 
 
 @router.get("/commission-analysis")
 async def get_commission_analysis(
+    request: Request,
+    response: Response,
+    pagination: dict = Depends(get_pagination_params),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id),
-    rep: Optional[str] = Query(None, description="Filter by REP")
+    rep: Optional[str] = Query(None, description="Filter by REP"),
+    since: Optional[int] = Query(None, description=_SINCE_DESCRIPTION)
 ):
     """Get commission analysis with filtering"""
-    results = load_analytics_results()
-    if not results:
-        raise HTTPException(status_code=404, detail="Analytics results not found")
+    generation = await _require_generation(db)
+    cached = _not_modified(request, response, generation, 'commission')
+    if cached:
+        return cached
     
-    commission_analysis = results.get('commission_analysis', [])
+    def criteria(table):
+        return [table.rep == rep] if rep else []
     
-    if rep:
-        commission_analysis = [r for r in commission_analysis if r.get('rep') == rep]
+    if since is not None:
+        return await _delta_page(db, CommissionAnalytics, generation, since, criteria,
+                                 lambda table: (table.rep,), pagination, commission_record)
     
-    return commission_analysis
+    query = select(CommissionAnalytics).where(
+        CommissionAnalytics.generation_id == generation.id, *criteria(CommissionAnalytics)
+    )
+    return await _paginate(db, query.order_by(CommissionAnalytics.rep), pagination, commission_record, generation)
 
 
 @router.get("/market-intelligence")
 async def get_market_intelligence(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get market intelligence data"""
-    results = load_analytics_results()
-    if not results:
-        raise HTTPException(status_code=404, detail="Analytics results not found")
+    generation = await _require_generation(db)
+    cached = _not_modified(request, response, generation, 'market')
+    if cached:
+        return cached
+    
+    market = await db.scalar(select(MarketIntelligence).where(
+        MarketIntelligence.generation_id == generation.id
+    ).limit(1))
+    if market is None:
+        return {}
+    
+    return market_intelligence_record(market)
+
+
+@router.get("/cube")
+async def get_market_cube_rollup(
+    request: Request,
+    response: Response,
+    pagination: dict = Depends(get_pagination_params),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id),
+    dims: Optional[str] = Query(
+        None, description="Comma-separated dimensions: zone, rep, load_profile, management_company, month"
+    ),
+    measures: Optional[str] = Query(
+        None, description="Comma-separated measures: esiid_count, total_kwh, total_bill, avg_kwh, cost_per_kwh, "
+                          "rate_count, avg_rate, min_rate, max_rate (default: esiid_count, total_kwh, total_bill)"
+    ),
+    filters: Optional[str] = Query(None, description="Filters as dimension:value|value, comma-separated")
+):
+    """Get market measures rolled up along the requested dimensions"""
+    generation = await _require_generation(db)
+    cached = _not_modified(request, response, generation, 'cube')
+    if cached:
+        return cached
+    cube = await run_with_session(get_market_cube, generation.id)
+    
+    try:
+        cells = cube.query(
+            parse_list(dims), parse_list(measures) or DEFAULT_MEASURES, parse_filters(filters)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    return results.get('market_intelligence', {})
+    total = len(cells)
+    return {
+        "results": cells[pagination["skip"]:pagination["skip"] + pagination["limit"]],
+        "total": total,
+        "page": pagination["skip"] // pagination["limit"] + 1,
+        "pages": (total + pagination["limit"] - 1) // pagination["limit"],
+        "generation_id": generation.id
+    }
+
+
+async def _require_forecast_model(db: AsyncSession):
+    """Fitted usage forecasts of the active generation, or 404"""
+    model = await run_with_session(get_forecast_model, (await _require_generation(db)).id)
+    if model is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Usage forecasts not available. Refresh analytics first."
+        )
+    return model
 
 
 @router.post("/forecast", response_model=ForecastResponse)
 async def generate_forecast(
     request: ForecastRequest,
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
-    """Generate usage or pricing forecasts"""
-    results = load_analytics_results()
-    if not results:
-        raise HTTPException(status_code=404, detail="Analytics results not found")
-    
-    # Simple forecast based on trends
-    usage_analysis = results.get('usage_analysis', [])
-    
-    if request.account_name:
-        # Account-specific forecast
-        account_data = next((a for a in usage_analysis 
-                           if a.get('account_name') == request.account_name), None)
-        if not account_data:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
-        current_usage = account_data.get('total_usage_kwh', 0)
-        predicted_usage = account_data.get('predicted_usage_kwh', current_usage)
-        seasonal_factor = account_data.get('seasonal_factor', 1.0)
-        
-        # Generate forecast data
-        forecast_data = []
-        for i in range(request.forecast_horizon):
-            # Simple trend-based forecast with seasonal adjustment
-            growth_factor = 1.02 ** i  # 2% monthly growth assumption
-            seasonal_adj = seasonal_factor * (1 + 0.1 * math.sin(i * math.pi / 6))  # Seasonal variation
-            forecasted_value = predicted_usage * growth_factor * seasonal_adj
-            
-            forecast_data.append({
-                "period": i + 1,
-                "forecasted_usage_kwh": round(forecasted_value, 2),
-                "confidence_interval_low": round(forecasted_value * 0.9, 2),
-                "confidence_interval_high": round(forecasted_value * 1.1, 2)
-            })
-        
-        return ForecastResponse(
-            forecast_type="usage",
-            forecast_period=request.forecast_period,
-            forecast_horizon=request.forecast_horizon,
-            forecast_data=forecast_data,
-            confidence_level=0.85,
-            model_accuracy=0.78,
-            generated_at=datetime.now()
-        )
+    """Generate account or portfolio usage forecasts from the fitted models"""
+    model = await _require_forecast_model(db)
+    
+    forecast = forecast_usage(model, request.forecast_horizon, request.forecast_period, request.account_name)
+    if forecast is None:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    # Account forecasts keep their historical field name; the portfolio is the "market"
+    value_key = "forecasted_usage_kwh" if request.account_name else "forecasted_market_kwh"
+    forecast_data = []
+    for row in forecast["forecast_data"]:
+        row[value_key] = row.pop("forecast")
+        forecast_data.append(row)
+    
+    return ForecastResponse(
+        forecast_type="usage" if request.account_name else "market",
+        forecast_period=request.forecast_period,
+        forecast_horizon=request.forecast_horizon,
+        forecast_data=forecast_data,
+        confidence_level=forecast["confidence_level"],
+        model_accuracy=forecast["model_accuracy"],
+        generated_at=datetime.now()
+    )
+
+
+# Accounts serialized per streamed chunk
+_BATCH_CHUNK = 500
+
+
+@router.post("/forecast/batch")
+async def generate_batch_forecast(
+    request: BatchForecastRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """Stream usage forecasts for many accounts as NDJSON, one line per account"""
+    model = await _require_forecast_model(db)
+    positions, missing = await run_with_session(
+        resolve_positions, model, request.account_names, request.zone, request.manager_name,
+        request.management_company
+    )
+    starts, point, lower, upper = forecast_accounts(
+        model, positions, request.forecast_horizon, request.forecast_period
+    )
     
-    else:
-        # Market-level forecast
-        market_intel = results.get('market_intelligence', {})
-        market_overview = market_intel.get('market_overview', {})
-        total_consumption = market_overview.get('total_annual_consumption_kwh', 0)
-        
-        forecast_data = []
-        for i in range(request.forecast_horizon):
-            growth_factor = 1.03 ** i  # 3% annual growth assumption
-            forecasted_value = total_consumption * growth_factor / 12  # Monthly
-            
-            forecast_data.append({
+    def forecast_rows(points, lows, highs):
+        return [
+            {
                 "period": i + 1,
-                "forecasted_market_kwh": round(forecasted_value, 2),
-                "confidence_interval_low": round(forecasted_value * 0.85, 2),
-                "confidence_interval_high": round(forecasted_value * 1.15, 2)
-            })
-        
-        return ForecastResponse(
-            forecast_type="market",
-            forecast_period=request.forecast_period,
-            forecast_horizon=request.forecast_horizon,
-            forecast_data=forecast_data,
-            confidence_level=0.75,
-            model_accuracy=0.72,
-            generated_at=datetime.now()
-        )
+                "period_start": start,
+                "forecasted_usage_kwh": value,
+                "confidence_interval_low": low,
+                "confidence_interval_high": high
+            }
+            for i, (start, value, low, high) in enumerate(zip(starts, points, lows, highs))
+        ]
+    
+    def lines():
+        for name in missing:
+            yield orjson.dumps({"account_name": name, "error": "Account not found"}) + b"\n"
+        for begin in range(0, len(positions), _BATCH_CHUNK):
+            chunk = slice(begin, begin + _BATCH_CHUNK)
+            rounded = [np.round(values[chunk], 2).tolist() for values in (point, lower, upper)]
+            yield b"".join(
+                orjson.dumps({
+                    "account_name": model.accounts[position],
+                    "model_accuracy": model.accuracy(position),
+                    "forecast": forecast_rows(points, lows, highs)
+                }) + b"\n"
+                for position, points, lows, highs in zip(positions[chunk].tolist(), *rounded)
+            )
+        if request.include_total:
+            totals = [np.round(values.sum(axis=0), 2).tolist() for values in (point, lower, upper)]
+            yield orjson.dumps({
+                "total": True,
+                "accounts": len(positions),
+                "model_accuracy": model.accuracy(),
+                "forecast": forecast_rows(*totals)
+            }) + b"\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @router.post("/optimize", response_model=OptimizationResponse)
 async def optimize_costs(
     request: OptimizationRequest,
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
-    """Generate cost optimization recommendations"""
-    results = load_analytics_results()
-    if not results:
-        raise HTTPException(status_code=404, detail="Analytics results not found")
-    
-    # Get pricing data for optimization
-    pricing_analysis = results.get('pricing_analysis', [])
-    
-    if request.zone:
-        zone_pricing = [p for p in pricing_analysis if p.get('zone') == request.zone]
+    """Generate cost optimization recommendations against the current pricing offers"""
+    if request.account_name:
+        units = await run_with_session(load_units, account_names=[request.account_name], zone=request.zone)
+        if not len(units):
+            raise HTTPException(status_code=404, detail="Account not found")
     else:
-        zone_pricing = pricing_analysis
+        # A hypothetical account: monthly kWh at a $/kWh rate, priced in one zone or every zone
+        usage_kwh = request.current_usage_kwh or 10000
+        annual_cost = usage_kwh * (request.current_rate or 0.12) * 12
+        zones = [request.zone] if request.zone else list(
+            await db.scalars(select(DailyPricing.zone).where(DailyPricing.zone.isnot(None)).distinct())
+        )
+        units = Units(["Requested usage"] * len(zones), zones, [None] * len(zones), [1] * len(zones),
+                      [usage_kwh * 12 / 1000] * len(zones), [annual_cost] * len(zones))
     
-    if not zone_pricing:
+    optimization = await run_with_session(optimize_accounts, units)
+    assigned = [a for a in optimization["assignments"] if a["offer_id"] is not None]
+    if not assigned:
         raise HTTPException(status_code=404, detail="No pricing data found for optimization")
+    if not request.account_name:
+        # Alternatives for the same usage: keep the cheapest zone
+        assigned = [min(assigned, key=lambda a: a["annual_cost"])]
     
-    # Find best rates
-    competitive_options = [p for p in zone_pricing if p.get('market_position') == 'competitive']
-    if not competitive_options:
-        competitive_options = sorted(zone_pricing, key=lambda x: x.get('current_rate', float('inf')))[:3]
-    
-    current_cost = (request.current_usage_kwh or 10000) * (request.current_rate or 0.12) * 30  # Monthly
-    best_rate = min(competitive_options, key=lambda x: x.get('current_rate', float('inf')))
-    optimized_cost = (request.current_usage_kwh or 10000) * best_rate.get('current_rate', 0.10) * 30
-    
+    current_cost = sum(a["current_annual_cost"] for a in assigned)
+    optimized_cost = sum(a["annual_cost"] for a in assigned)
     potential_savings = current_cost - optimized_cost
     savings_percentage = (potential_savings / current_cost * 100) if current_cost > 0 else 0
     
     recommendations = [
         {
             "type": "provider_switch",
-            "description": f"Switch to {best_rate.get('rep')} in {best_rate.get('zone')} zone",
-            "potential_savings": round(potential_savings, 2),
+            "description": f"Switch {a['meters']} {a['load_profile'] + ' ' if a['load_profile'] else ''}"
+                           f"meter(s) in {a['zone']} to "
+                           f"{a['rep']} at {a['daily_rate']:.2f}/MWh"
+                           + (f" for {a['term_months']:.0f} months" if a['term_months'] else ""),
+            "offer_id": a["offer_id"],
+            "potential_savings": a["annual_savings"],
             "implementation_effort": "medium"
-        },
-        {
-            "type": "usage_optimization",
-            "description": "Implement energy efficiency measures",
-            "potential_savings": round(current_cost * 0.15, 2),
-            "implementation_effort": "high"
-        },
-        {
-            "type": "contract_timing",
-            "description": "Optimize contract renewal timing",
-            "potential_savings": round(current_cost * 0.05, 2),
-            "implementation_effort": "low"
         }
+        for a in assigned
     ]
     
     return OptimizationResponse(
@@ -353,82 +503,149 @@ async def optimize_costs(
     )
 
 
-@router.get("/anomalies")
+@router.post("/optimize/portfolio", response_model=PortfolioOptimizationResponse)
+async def optimize_portfolio_costs(
+    request: PortfolioOptimizationRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """Assign accounts' meters to the lowest-cost eligible pricing offers"""
+    units = await run_with_session(load_units, request.account_names, request.esi_ids, request.zone)
+    if not len(units):
+        raise HTTPException(status_code=404, detail="No ESIIDs with usage match the selection")
+    
+    return await run_with_session(
+        optimize_accounts, units, term_months=request.term_months, max_rep_share=request.max_rep_share,
+        refine=request.refine
+    )
+
+
+@router.get("/anomalies", response_model=AnomalyPage)
 async def detect_anomalies(
+    request: Request,
+    response: Response,
+    pagination: dict = Depends(get_pagination_params),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id),
-    severity: Optional[str] = Query(None, description="Filter by severity level")
+    severity: Optional[Literal['critical', 'high', 'medium', 'low']] = Query(
+        None, description="Filter by severity level"
+    ),
+    anomaly_type: Optional[Literal['usage', 'cost']] = Query(None, description="Filter by anomaly type"),
+    min_score: Optional[float] = Query(None, ge=0, description="Minimum anomaly score (default: medium severity)"),
+    account_name: Optional[str] = Query(None, description="Filter by account name"),
+    zone: Optional[str] = Query(None, description="Filter by zone"),
+    since: Optional[int] = Query(None, description=_SINCE_DESCRIPTION)
 ):
-    """Detect usage and cost anomalies"""
-    results = load_analytics_results()
-    if not results:
-        raise HTTPException(status_code=404, detail="Analytics results not found")
-    
-    usage_analysis = results.get('usage_analysis', [])
-    anomalies = []
-    
-    for account in usage_analysis:
-        anomaly_score = account.get('anomaly_score', 0)
-        
-        if anomaly_score > 0.7:
-            severity_level = "critical"
-        elif anomaly_score > 0.5:
-            severity_level = "high"
-        elif anomaly_score > 0.3:
-            severity_level = "medium"
+    """Get ESIID usage and cost anomalies, highest score first"""
+    generation = await _require_generation(db)
+    cached = _not_modified(request, response, generation, 'anomalies')
+    if cached:
+        return cached
+    
+    def criteria(table):
+        # Severities are score ranges, served from the (generation, score) index
+        if severity:
+            low, high = severity_bounds(severity)
+            conditions = [table.anomaly_score >= max(low, min_score or 0)]
+            if high is not None:
+                conditions.append(table.anomaly_score < high)
         else:
-            continue  # Skip low anomaly scores
-        
-        if severity and severity_level != severity:
-            continue
-        
-        anomalies.append({
-            "account_name": account.get('account_name'),
-            "anomaly_type": "usage",
-            "anomaly_score": anomaly_score,
-            "severity": severity_level,
-            "description": f"Unusual usage pattern detected (score: {anomaly_score:.2f})",
-            "detected_at": datetime.now().isoformat(),
-            "recommended_action": "Investigate usage patterns and verify meter readings"
-        })
-    
-    return anomalies
+            conditions = [table.anomaly_score >= (FLAG_THRESHOLD if min_score is None else min_score)]
+        if anomaly_type:
+            conditions.append(table.anomaly_type == anomaly_type)
+        if account_name:
+            conditions.append(table.account_name == account_name)
+        if zone:
+            conditions.append(table.zone == zone)
+        return conditions
+    
+    def order_by(table):
+        return table.anomaly_score.desc(), table.id
+    
+    if since is not None:
+        return await _delta_page(db, ESIIDAnomaly, generation, since, criteria, order_by, pagination,
+                                 anomaly_record)
+    
+    query = select(ESIIDAnomaly).where(
+        ESIIDAnomaly.generation_id == generation.id, *criteria(ESIIDAnomaly)
+    ).order_by(*order_by(ESIIDAnomaly))
+    return await _paginate(db, query, pagination, anomaly_record, generation)
 
 
-@router.get("/performance")
+@router.get("/performance", response_model=PerformanceMetrics)
 async def get_performance_metrics(
+    history: int = Query(20, ge=1, le=100, description="Number of recent engine runs to include"),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
-    """Get analytics performance metrics"""
-    results = load_analytics_results()
-    if not results:
-        raise HTTPException(status_code=404, detail="Analytics results not found")
-    
-    usage_analysis = results.get('usage_analysis', [])
-    market_intel = results.get('market_intelligence', {})
-    market_overview = market_intel.get('market_overview', {})
-    
-    return PerformanceMetrics(
-        total_accounts_analyzed=len(usage_analysis),
-        total_esiids_processed=market_overview.get('total_esiids', 0),
-        analysis_duration_seconds=45.2,  # Placeholder
-        data_quality_score=0.87,  # Placeholder
-        model_accuracy=0.78,  # Placeholder
-        last_updated=datetime.fromisoformat(results.get('analysis_timestamp', datetime.now().isoformat()))
+    """Measured engine performance of the active generation, with recent runs for comparison"""
+    generation = await _require_generation(db)
+    market = await db.scalar(
+        select(MarketIntelligence).where(MarketIntelligence.generation_id == generation.id).limit(1)
     )
+    market_overview = (market.market_overview if market else None) or {}
+    stages = await db.scalars(select(AnalyticsStageMetric).where(
+        AnalyticsStageMetric.generation_id == generation.id
+    ).order_by(AnalyticsStageMetric.offset_seconds, AnalyticsStageMetric.id))
+
+    return {
+        'total_accounts_analyzed': generation.usage_count or 0,
+        'total_esiids_processed': market_overview.get('total_esiids', 0),
+        'analysis_duration_seconds': generation.duration_seconds,
+        'data_quality_score': generation.data_quality_score,
+        'model_accuracy': generation.model_accuracy,
+        'last_updated': generation.analysis_date,
+        'generation_id': generation.id,
+        'run_mode': generation.run_mode,
+        'stages': [stage_metric_record(row) for row in stages if row.stage != 'total'],
+        'history': await run_history(db, history)
+    }
 
 
-@router.post("/refresh")
+@router.post("/refresh", response_model=AnalyticsRefreshResponse, status_code=status.HTTP_202_ACCEPTED)
 async def refresh_analytics(
-    background_tasks: BackgroundTasks,
-    current_user_id: int = Depends(get_current_user_id)
+    incremental: bool = Query(False, description="Recompute only data changed since the last run"),
+    current_user: Principal = Depends(require_manager_or_admin)
 ):
-    """Trigger analytics refresh in background"""
-    
-    def run_analytics():
-        """Background task to run analytics"""
-        import subprocess
-        subprocess.run(["python", "analytics_engine.py"], cwd=".")
-    
-    background_tasks.add_task(run_analytics)
-    
-    return {"message": "Analytics refresh started in background"}
+    """Start an analytics refresh job, or return the one already in progress (requires manager or admin role)"""
+    try:
+        job, created = job_runner.start(incremental=incremental, requested_by=current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    if created:
+        message = "Analytics refresh started"
+    elif job.cancel_requested:
+        message = "Previous analytics refresh is still being cancelled; retry once it has stopped"
+    else:
+        message = "Analytics refresh already in progress"
+    return {**job.to_dict(), 'message': message, 'deduplicated': not created}
+
+
+def _require_job(job_id: str):
+    job = job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analytics job not found"
+        )
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=AnalyticsJobResponse)
+async def get_analytics_job(
+    job_id: str,
+    current_user: Principal = Depends(require_manager_or_admin)
+):
+    """Get progress and stage timings of an analytics refresh job (requires manager or admin role)"""
+    return _require_job(job_id).to_dict()
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=AnalyticsJobResponse)
+async def cancel_analytics_job(
+    job_id: str,
+    current_user: Principal = Depends(require_manager_or_admin)
+):
+    """Cancel an analytics refresh job at its next stage (requires manager or admin role)"""
+    _require_job(job_id)
+    return job_runner.cancel(job_id).to_dict()
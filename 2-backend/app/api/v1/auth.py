@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from app.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token, create_refresh_token, verify_token
+from app.database import get_async_db
+from app.core.security import (
+    verify_password_async, get_password_hash_async, create_access_token, create_refresh_token, verify_token
+)
 from app.core.dependencies import get_current_user_id
 from app.models.user import User
 from app.schemas.user import UserCreate, UserLogin, Token, UserResponse
@@ -13,12 +16,12 @@ router = APIRouter()
 
 
 @router.post("/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
     # Check if user already exists
-    existing_user = db.query(User).filter(
-        (User.username == user_data.username) | (User.email == user_data.email)
-    ).first()
+    existing_user = await db.scalar(select(User).where(
+        or_(User.username == user_data.username, User.email == user_data.email)
+    ).limit(1))
     
     if existing_user:
         raise HTTPException(
@@ -27,7 +30,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     db_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -35,21 +38,21 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 
 @router.post("/login", response_model=Token)
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Login user and return access token"""
     # Find user by username or email
-    user = db.query(User).filter(
-        (User.username == user_credentials.username) | (User.email == user_credentials.username)
-    ).first()
+    user = await db.scalar(select(User).where(
+        or_(User.username == user_credentials.username, User.email == user_credentials.username)
+    ).limit(1))
     
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    if not user or not await verify_password_async(user_credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -76,14 +79,14 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """OAuth2 compatible token login"""
-    user = db.query(User).filter(
-        (User.username == form_data.username) | (User.email == form_data.username)
-    ).first()
+    user = await db.scalar(select(User).where(
+        or_(User.username == form_data.username, User.email == form_data.username)
+    ).limit(1))
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -108,7 +111,7 @@ async def login_for_access_token(
 
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
+async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_async_db)):
     """Refresh access token using refresh token"""
     payload = verify_token(refresh_token)
     if not payload:
@@ -118,7 +121,7 @@ async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
         )
     
     user_id = payload.get("sub")
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, int(user_id)) if user_id is not None else None
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -135,9 +138,9 @@ async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
     }
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user(current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+async def get_current_user(current_user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_db)):
     """Get current user information"""
-    user = db.query(User).filter(User.id == current_user_id).first()
+    user = await db.get(User, current_user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
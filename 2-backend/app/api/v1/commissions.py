@@ -1,13 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, select
 from typing import List, Optional
 from datetime import datetime
-from app.database import get_db
+from app.database import get_async_db, run_with_session
+from app.core.cache import cache
 from app.core.dependencies import get_current_user_id, get_pagination_params, require_manager_or_admin
-from app.models.commission import Commission
-from app.models.user import User
-from app.schemas.commission import CommissionCreate, CommissionUpdate, CommissionResponse, CommissionSummary, CommissionStats
+from app.core.principals import Principal
+from app.models.commission import Commission, CommissionReconciliation
+from app.schemas.commission import (
+    CommissionCreate, CommissionUpdate, CommissionResponse, CommissionSummary, CommissionStats,
+    CommissionReconciliationResponse, ReconciliationRunSummary, CommissionForecast
+)
+from app.services.commission_reconciliation import run_reconciliation
+from app.services.commission_forecasting import forecast_commissions
 
 router = APIRouter()
 
@@ -15,8 +21,8 @@ router = APIRouter()
 @router.get("/", response_model=List[CommissionSummary])
 async def get_commissions(
     pagination: dict = Depends(get_pagination_params),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_manager_or_admin),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_manager_or_admin),
     search: Optional[str] = Query(None, description="Search by account name or REP"),
     commission_type: Optional[str] = Query(None, description="Filter by commission type (received/scheduled)"),
     k_rep: Optional[str] = Query(None, description="Filter by K_REP/provider"),
@@ -27,7 +33,7 @@ async def get_commissions(
     date_to: Optional[str] = Query(None, description="Filter to date (YYYY-MM-DD)")
 ):
     """Get all commissions with advanced filtering (requires manager or admin role)"""
-    query = db.query(Commission)
+    query = select(Commission)
 
     # Apply filters
     if search:
@@ -35,49 +41,160 @@ async def get_commissions(
             Commission.account_name.ilike(f"%{search}%"),
             Commission.k_rep.ilike(f"%{search}%")
         )
-        query = query.filter(search_filter)
+        query = query.where(search_filter)
 
     if commission_type:
-        query = query.filter(Commission.commission_type == commission_type)
+        query = query.where(Commission.commission_type == commission_type)
 
     if k_rep:
-        query = query.filter(Commission.k_rep.ilike(f"%{k_rep}%"))
+        query = query.where(Commission.k_rep.ilike(f"%{k_rep}%"))
 
     if status:
-        query = query.filter(Commission.status == status)
+        query = query.where(Commission.status == status)
 
     if manager_id:
-        query = query.filter(Commission.manager_id == manager_id)
+        query = query.where(Commission.manager_id == manager_id)
 
     if is_active is not None:
-        query = query.filter(Commission.is_active == is_active)
+        query = query.where(Commission.is_active == is_active)
 
+    # Bound payment_year first so the range is resolved from the payment period index
     if date_from:
         try:
             from_date = datetime.strptime(date_from, "%Y-%m-%d")
-            query = query.filter(Commission.actual_payment_date >= from_date)
+            query = query.where(
+                Commission.payment_year >= from_date.year,
+                Commission.actual_payment_date >= from_date
+            )
         except ValueError:
             pass
 
     if date_to:
         try:
             to_date = datetime.strptime(date_to, "%Y-%m-%d")
-            query = query.filter(Commission.actual_payment_date <= to_date)
+            query = query.where(
+                Commission.payment_year <= to_date.year,
+                Commission.actual_payment_date <= to_date
+            )
         except ValueError:
             pass
 
-    commissions = query.offset(pagination["skip"]).limit(pagination["limit"]).all()
-    return commissions
+    commissions = await db.scalars(query.offset(pagination["skip"]).limit(pagination["limit"]))
+    return commissions.all()
+
+
+@router.get("/monthly-summary")
+async def get_monthly_commission_summary(
+    year: int = Query(2024, description="Year for summary"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_manager_or_admin)
+):
+    """Get monthly commission summary for a given year"""
+    return await cache.get_or_compute(
+        f"commissions:monthly:{year}", lambda: _monthly_commission_summary(db, year), tags=[Commission]
+    )
+
+
+async def _monthly_commission_summary(db: AsyncSession, year: int) -> dict:
+    # Get received commissions by month (served from idx_commissions_type_payment_period)
+    received_by_month = await db.execute(select(
+        Commission.payment_month.label('month'),
+        func.sum(Commission.actual_payment_amount).label('total_amount'),
+        func.count(Commission.id).label('count')
+    ).where(
+        Commission.commission_type == 'received',
+        Commission.payment_year == year
+    ).group_by(Commission.payment_month).order_by(Commission.payment_month))
+
+    monthly_data = {}
+    for month, total, count in received_by_month:
+        month_name = datetime(year, month, 1).strftime('%B')
+        monthly_data[month_name] = {
+            'total_amount': float(total or 0),
+            'count': count or 0
+        }
+
+    return {
+        'year': year,
+        'monthly_data': monthly_data,
+        'total_year_amount': sum(data['total_amount'] for data in monthly_data.values()),
+        'total_year_count': sum(data['count'] for data in monthly_data.values())
+    }
+
+
+@router.get("/reconciliation", response_model=List[CommissionReconciliationResponse])
+async def get_commission_reconciliation(
+    pagination: dict = Depends(get_pagination_params),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_manager_or_admin),
+    account_name: Optional[str] = Query(None, description="Filter by account name"),
+    k_rep: Optional[str] = Query(None, description="Filter by K_REP/provider"),
+    status: Optional[str] = Query(None, description="Filter by outcome (matched/missed/short/over/duplicate/unscheduled)"),
+    period_from: Optional[int] = Query(None, description="Filter from month (YYYYMM)"),
+    period_to: Optional[int] = Query(None, description="Filter to month (YYYYMM)")
+):
+    """Get scheduled vs received reconciliation results (requires manager or admin role)"""
+    query = select(CommissionReconciliation)
+
+    if account_name:
+        query = query.where(CommissionReconciliation.account_name.ilike(f"%{account_name}%"))
+
+    if k_rep:
+        query = query.where(CommissionReconciliation.k_rep.ilike(f"%{k_rep}%"))
+
+    if status:
+        query = query.where(CommissionReconciliation.status == status)
+
+    if period_from:
+        query = query.where(CommissionReconciliation.period >= period_from)
+
+    if period_to:
+        query = query.where(CommissionReconciliation.period <= period_to)
+
+    results = await db.scalars(query.order_by(
+        CommissionReconciliation.period.desc(),
+        CommissionReconciliation.account_name
+    ).offset(pagination["skip"]).limit(pagination["limit"]))
+    return results.all()
+
+
+@router.post("/reconciliation/run", response_model=ReconciliationRunSummary)
+async def run_commission_reconciliation(
+    current_user: Principal = Depends(require_manager_or_admin),
+    full: bool = Query(False, description="Recompute every month instead of only changed months"),
+    periods: Optional[List[int]] = Query(None, description="Specific months to recompute (YYYYMM)")
+):
+    """Reconcile scheduled against received commissions and store the results"""
+    return await run_with_session(run_reconciliation, periods=periods, full=full)
+
+
+@router.get("/forecast", response_model=List[CommissionForecast])
+async def get_commission_forecast(
+    pagination: dict = Depends(get_pagination_params),
+    current_user: Principal = Depends(require_manager_or_admin),
+    by: str = Query("rep", pattern="^(rep|account)$", description="Forecast per REP or per REP/account"),
+    horizon: int = Query(6, ge=1, le=36, description="Months to forecast"),
+    confidence: float = Query(0.9, gt=0, lt=1, description="Prediction interval coverage"),
+    k_rep: Optional[str] = Query(None, description="Filter by K_REP/provider"),
+    account_name: Optional[str] = Query(None, description="Filter by account name (by=account only)")
+):
+    """Forecast monthly received commissions with prediction intervals"""
+    forecasts = await run_with_session(
+        forecast_commissions, by=by, horizon=horizon, confidence=confidence,
+        k_rep=k_rep, account_name=account_name
+    )
+    start = pagination["skip"]
+    return forecasts[start:start + pagination["limit"]]
 
 
 @router.get("/{commission_id}", response_model=CommissionResponse)
 async def get_commission(
     commission_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get commission by ID"""
-    commission = db.query(Commission).filter(Commission.id == commission_id).first()
+    commission = await db.get(Commission, commission_id)
     if commission is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -89,14 +206,14 @@ async def get_commission(
 @router.post("/", response_model=CommissionResponse)
 async def create_commission(
     commission_data: CommissionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Create a new commission"""
     db_commission = Commission(**commission_data.dict())
     db.add(db_commission)
-    db.commit()
-    db.refresh(db_commission)
+    await db.commit()
+    await db.refresh(db_commission)
     return db_commission
 
 
@@ -104,11 +221,11 @@ async def create_commission(
 async def update_commission(
     commission_id: int,
     commission_data: CommissionUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Update a commission"""
-    commission = db.query(Commission).filter(Commission.id == commission_id).first()
+    commission = await db.get(Commission, commission_id)
     if commission is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -119,19 +236,19 @@ async def update_commission(
     for field, value in update_data.items():
         setattr(commission, field, value)
     
-    db.commit()
-    db.refresh(commission)
+    await db.commit()
+    await db.refresh(commission)
     return commission
 
 
 @router.post("/{commission_id}/process-payment")
 async def process_payment(
     commission_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Process payment for a commission"""
-    commission = db.query(Commission).filter(Commission.id == commission_id).first()
+    commission = await db.get(Commission, commission_id)
     if commission is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -140,38 +257,41 @@ async def process_payment(
     
     commission.status = "paid"
     commission.payment_date = datetime.utcnow()
-    db.commit()
-    db.refresh(commission)
+    await db.commit()
+    await db.refresh(commission)
 
     return {"message": "Payment processed successfully", "commission_id": commission_id}
 
 
 @router.get("/stats/overview", response_model=CommissionStats)
 async def get_commission_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_manager_or_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_manager_or_admin)
 ):
     """Get commission statistics overview"""
+    return await cache.get_or_compute("commissions:stats", lambda: _commission_stats(db), tags=[Commission])
+
 
+async def _commission_stats(db: AsyncSession) -> CommissionStats:
     # Total received commissions
-    received_stats = db.query(
+    received_stats = (await db.execute(select(
         func.sum(Commission.actual_payment_amount).label('total_received'),
         func.count(Commission.id).label('count_received')
-    ).filter(Commission.commission_type == 'received').first()
+    ).where(Commission.commission_type == 'received'))).first()
 
     # Total scheduled commissions (count only, amounts are in JSON)
-    scheduled_stats = db.query(
+    scheduled_stats = (await db.execute(select(
         func.count(Commission.id).label('count_scheduled')
-    ).filter(Commission.commission_type == 'scheduled').first()
+    ).where(Commission.commission_type == 'scheduled'))).first()
 
     # Active schedules
-    active_schedules = db.query(Commission).filter(
+    active_schedules = await db.scalar(select(func.count(Commission.id)).where(
         Commission.commission_type == 'scheduled',
         Commission.is_active == True
-    ).count()
+    ))
 
     # Total commissions
-    total_commissions = db.query(Commission).count()
+    total_commissions = await db.scalar(select(func.count(Commission.id)))
 
     return CommissionStats(
         total_received=received_stats.total_received or 0,
@@ -187,46 +307,12 @@ async def get_commission_stats(
 async def get_commissions_by_rep(
     rep_name: str,
     pagination: dict = Depends(get_pagination_params),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_manager_or_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_manager_or_admin)
 ):
     """Get commissions for a specific REP/provider"""
-    commissions = db.query(Commission).filter(
+    commissions = await db.scalars(select(Commission).where(
         Commission.k_rep.ilike(f"%{rep_name}%")
-    ).offset(pagination["skip"]).limit(pagination["limit"]).all()
-
-    return commissions
-
-
-@router.get("/monthly-summary")
-async def get_monthly_commission_summary(
-    year: int = Query(2024, description="Year for summary"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_manager_or_admin)
-):
-    """Get monthly commission summary for a given year"""
-
-    # Get received commissions by month
-    received_by_month = db.query(
-        func.strftime('%m', Commission.actual_payment_date).label('month'),
-        func.sum(Commission.actual_payment_amount).label('total_amount'),
-        func.count(Commission.id).label('count')
-    ).filter(
-        Commission.commission_type == 'received',
-        func.strftime('%Y', Commission.actual_payment_date) == str(year)
-    ).group_by(func.strftime('%m', Commission.actual_payment_date)).all()
-
-    monthly_data = {}
-    for month, total, count in received_by_month:
-        month_name = datetime.strptime(month, '%m').strftime('%B')
-        monthly_data[month_name] = {
-            'total_amount': float(total or 0),
-            'count': count or 0
-        }
+    ).offset(pagination["skip"]).limit(pagination["limit"]))
 
-    return {
-        'year': year,
-        'monthly_data': monthly_data,
-        'total_year_amount': sum(data['total_amount'] for data in monthly_data.values()),
-        'total_year_count': sum(data['count'] for data in monthly_data.values())
-    }
\ No newline at end of file
+    return commissions.all()
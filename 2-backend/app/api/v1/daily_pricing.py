@@ -1,23 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, select
 from typing import List, Optional
 from datetime import datetime, date
-from app.database import get_db
+from app.database import get_async_db, run_with_session
+from app.core.cache import cache
+from app.core.date_buckets import date_part
 from app.core.dependencies import get_current_user_id, get_pagination_params
+from app.core.response_cache import cache_response
 from app.models.daily_pricing import DailyPricing
 from app.schemas.daily_pricing import (
     DailyPricingCreate, DailyPricingUpdate, DailyPricingResponse, 
-    DailyPricingSummary, PricingStats, ZonePricingComparison, RepPricingAnalysis
+    DailyPricingSummary, PricingStats, ZonePricingComparison, RepPricingAnalysis,
+    ZoneRatePercentile
 )
+from app.services.rate_percentiles import get_zone_rate_index, market_position
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[DailyPricingSummary])
+@cache_response(DailyPricing)
 async def get_daily_pricing(
     pagination: dict = Depends(get_pagination_params),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id),
     zone: Optional[str] = Query(None, description="Filter by zone"),
     rep: Optional[str] = Query(None, description="Filter by REP/provider"),
@@ -29,54 +35,56 @@ async def get_daily_pricing(
     active_only: bool = Query(True, description="Show only active pricing")
 ):
     """Get daily pricing records with filtering options"""
-    query = db.query(DailyPricing)
+    query = select(DailyPricing)
     
     # Apply filters
     if active_only:
-        query = query.filter(DailyPricing.is_active == True)
+        query = query.where(DailyPricing.is_active == True)
     
     if zone:
-        query = query.filter(DailyPricing.zone.ilike(f"%{zone}%"))
+        query = query.where(DailyPricing.zone.ilike(f"%{zone}%"))
     
     if rep:
-        query = query.filter(DailyPricing.rep.ilike(f"%{rep}%"))
+        query = query.where(DailyPricing.rep.ilike(f"%{rep}%"))
     
     if load_profile:
-        query = query.filter(DailyPricing.load_profile.ilike(f"%{load_profile}%"))
+        query = query.where(DailyPricing.load_profile.ilike(f"%{load_profile}%"))
     
     if date_from:
         try:
             from_date = datetime.strptime(date_from, "%Y-%m-%d")
-            query = query.filter(DailyPricing.effective_date >= from_date)
+            query = query.where(DailyPricing.effective_date >= from_date)
         except ValueError:
             pass
     
     if date_to:
         try:
             to_date = datetime.strptime(date_to, "%Y-%m-%d")
-            query = query.filter(DailyPricing.effective_date <= to_date)
+            query = query.where(DailyPricing.effective_date <= to_date)
         except ValueError:
             pass
     
     if min_rate is not None:
-        query = query.filter(DailyPricing.daily_rate >= min_rate)
+        query = query.where(DailyPricing.daily_rate >= min_rate)
     
     if max_rate is not None:
-        query = query.filter(DailyPricing.daily_rate <= max_rate)
+        query = query.where(DailyPricing.daily_rate <= max_rate)
     
     # Apply pagination and ordering
-    pricing_records = query.order_by(DailyPricing.effective_date.desc()).offset(pagination["skip"]).limit(pagination["limit"]).all()
-    return pricing_records
+    pricing_records = await db.scalars(
+        query.order_by(DailyPricing.effective_date.desc()).offset(pagination["skip"]).limit(pagination["limit"])
+    )
+    return pricing_records.all()
 
 
 @router.get("/{pricing_id}", response_model=DailyPricingResponse)
 async def get_pricing_record(
     pricing_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get pricing record by ID"""
-    pricing = db.query(DailyPricing).filter(DailyPricing.id == pricing_id).first()
+    pricing = await db.get(DailyPricing, pricing_id)
     if pricing is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -86,44 +94,50 @@ async def get_pricing_record(
 
 
 @router.get("/stats/overview", response_model=PricingStats)
+@cache_response(DailyPricing)
 async def get_pricing_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get pricing statistics overview"""
-    
+    return await cache.get_or_compute("pricing:stats", lambda: _pricing_stats(db), tags=[DailyPricing])
+
+
+async def _pricing_stats(db: AsyncSession) -> PricingStats:
     # Total pricing records
-    total_records = db.query(DailyPricing).filter(DailyPricing.is_active == True).count()
+    total_records = await db.scalar(
+        select(func.count(DailyPricing.id)).where(DailyPricing.is_active == True)
+    )
     
     # Unique zones and REPs
-    unique_zones = db.query(func.count(func.distinct(DailyPricing.zone))).filter(
+    unique_zones = await db.scalar(select(func.count(func.distinct(DailyPricing.zone))).where(
         DailyPricing.is_active == True,
         DailyPricing.zone.isnot(None)
-    ).scalar()
+    ))
     
-    unique_reps = db.query(func.count(func.distinct(DailyPricing.rep))).filter(
+    unique_reps = await db.scalar(select(func.count(func.distinct(DailyPricing.rep))).where(
         DailyPricing.is_active == True,
         DailyPricing.rep.isnot(None)
-    ).scalar()
+    ))
     
     # Date range
-    date_range = db.query(
+    date_range = (await db.execute(select(
         func.min(DailyPricing.effective_date).label('start_date'),
         func.max(DailyPricing.effective_date).label('end_date')
-    ).filter(
+    ).where(
         DailyPricing.is_active == True,
         DailyPricing.effective_date.isnot(None)
-    ).first()
+    ))).first()
     
     # Rate statistics
-    rate_stats = db.query(
+    rate_stats = (await db.execute(select(
         func.avg(DailyPricing.daily_rate).label('avg_rate'),
         func.min(DailyPricing.daily_rate).label('min_rate'),
         func.max(DailyPricing.daily_rate).label('max_rate')
-    ).filter(
+    ).where(
         DailyPricing.is_active == True,
         DailyPricing.daily_rate.isnot(None)
-    ).first()
+    ))).first()
     
     return PricingStats(
         total_pricing_records=total_records,
@@ -138,25 +152,29 @@ async def get_pricing_stats(
 
 
 @router.get("/analysis/zones", response_model=List[ZonePricingComparison])
+@cache_response(DailyPricing)
 async def get_zone_pricing_analysis(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get pricing analysis by zone"""
-    
-    zone_analysis = db.query(
+    return await cache.get_or_compute("pricing:zones", lambda: _zone_pricing(db), tags=[DailyPricing])
+
+
+async def _zone_pricing(db: AsyncSession) -> List[ZonePricingComparison]:
+    zone_analysis = await db.execute(select(
         DailyPricing.zone,
         func.avg(DailyPricing.daily_rate).label('avg_rate'),
         func.min(DailyPricing.daily_rate).label('min_rate'),
         func.max(DailyPricing.daily_rate).label('max_rate'),
         func.count(DailyPricing.id).label('record_count')
-    ).filter(
+    ).where(
         DailyPricing.is_active == True,
         DailyPricing.zone.isnot(None),
         DailyPricing.daily_rate.isnot(None)
     ).group_by(DailyPricing.zone).order_by(
         func.avg(DailyPricing.daily_rate).desc()
-    ).all()
+    ))
     
     return [
         ZonePricingComparison(
@@ -170,27 +188,58 @@ async def get_zone_pricing_analysis(
     ]
 
 
+@router.get("/analysis/percentile", response_model=ZoneRatePercentile)
+@cache_response(DailyPricing)
+async def get_zone_rate_percentile(
+    zone: str = Query(..., description="Pricing zone"),
+    rate: float = Query(..., description="Daily rate to rank"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """Get the percentile rank of a rate among all daily rates in a zone"""
+    
+    rate_index = await run_with_session(get_zone_rate_index)
+    percentile = rate_index.percentile_of(zone, rate)
+    if percentile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No pricing data for zone {zone}"
+        )
+    
+    return ZoneRatePercentile(
+        zone=zone,
+        rate=rate,
+        percentile_rank=percentile,
+        market_position=str(market_position(percentile)),
+        zone_rate_count=rate_index.counts[zone]
+    )
+
+
 @router.get("/analysis/reps", response_model=List[RepPricingAnalysis])
+@cache_response(DailyPricing)
 async def get_rep_pricing_analysis(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get pricing analysis by REP"""
-    
-    rep_analysis = db.query(
+    return await cache.get_or_compute("pricing:reps", lambda: _rep_pricing(db), tags=[DailyPricing])
+
+
+async def _rep_pricing(db: AsyncSession) -> List[RepPricingAnalysis]:
+    rep_analysis = await db.execute(select(
         DailyPricing.rep,
         func.avg(DailyPricing.daily_rate).label('avg_rate'),
         func.min(DailyPricing.daily_rate).label('min_rate'),
         func.max(DailyPricing.daily_rate).label('max_rate'),
         func.count(DailyPricing.id).label('record_count'),
         func.count(func.distinct(DailyPricing.zone)).label('zones_served')
-    ).filter(
+    ).where(
         DailyPricing.is_active == True,
         DailyPricing.rep.isnot(None),
         DailyPricing.daily_rate.isnot(None)
     ).group_by(DailyPricing.rep).order_by(
         func.avg(DailyPricing.daily_rate).asc()
-    ).all()
+    ))
     
     return [
         RepPricingAnalysis(
@@ -206,48 +255,40 @@ async def get_rep_pricing_analysis(
 
 
 @router.get("/trends/monthly")
+@cache_response(DailyPricing)
 async def get_monthly_pricing_trends(
     year: int = Query(2025, description="Year for trends"),
     zone: Optional[str] = Query(None, description="Filter by zone"),
     rep: Optional[str] = Query(None, description="Filter by REP"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get monthly pricing trends"""
     
-    query = db.query(
-        func.strftime('%m', DailyPricing.effective_date).label('month'),
+    month = date_part('month', DailyPricing.effective_date)
+    query = select(
+        month.label('month'),
         func.avg(DailyPricing.daily_rate).label('avg_rate'),
         func.min(DailyPricing.daily_rate).label('min_rate'),
         func.max(DailyPricing.daily_rate).label('max_rate'),
         func.count(DailyPricing.id).label('record_count')
-    ).filter(
+    ).where(
         DailyPricing.is_active == True,
-        func.strftime('%Y', DailyPricing.effective_date) == str(year),
+        date_part('year', DailyPricing.effective_date) == year,
         DailyPricing.daily_rate.isnot(None)
     )
     
     if zone:
-        query = query.filter(DailyPricing.zone.ilike(f"%{zone}%"))
+        query = query.where(DailyPricing.zone.ilike(f"%{zone}%"))
     
     if rep:
-        query = query.filter(DailyPricing.rep.ilike(f"%{rep}%"))
+        query = query.where(DailyPricing.rep.ilike(f"%{rep}%"))
     
-    monthly_trends = query.group_by(
-        func.strftime('%m', DailyPricing.effective_date)
-    ).order_by(
-        func.strftime('%m', DailyPricing.effective_date)
-    ).all()
-    
-    month_names = {
-        '01': 'January', '02': 'February', '03': 'March', '04': 'April',
-        '05': 'May', '06': 'June', '07': 'July', '08': 'August',
-        '09': 'September', '10': 'October', '11': 'November', '12': 'December'
-    }
+    monthly_trends = await db.execute(query.group_by(month).order_by(month))
     
     trends_data = {}
-    for month, avg_rate, min_rate, max_rate, count in monthly_trends:
-        month_name = month_names.get(month, f"Month {month}")
+    for month_number, avg_rate, min_rate, max_rate, count in monthly_trends:
+        month_name = datetime(year, month_number, 1).strftime('%B')
         trends_data[month_name] = {
             'avg_rate': float(avg_rate),
             'min_rate': float(min_rate),
@@ -264,31 +305,32 @@ async def get_monthly_pricing_trends(
 
 
 @router.get("/best-rates")
+@cache_response(DailyPricing)
 async def get_best_rates(
     zone: Optional[str] = Query(None, description="Filter by zone"),
     load_profile: Optional[str] = Query(None, description="Filter by load profile"),
     term_months: Optional[float] = Query(None, description="Filter by term length"),
     limit: int = Query(10, description="Number of best rates to return"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get best available rates with filters"""
     
-    query = db.query(DailyPricing).filter(
+    query = select(DailyPricing).where(
         DailyPricing.is_active == True,
         DailyPricing.daily_rate.isnot(None)
     )
     
     if zone:
-        query = query.filter(DailyPricing.zone.ilike(f"%{zone}%"))
+        query = query.where(DailyPricing.zone.ilike(f"%{zone}%"))
     
     if load_profile:
-        query = query.filter(DailyPricing.load_profile.ilike(f"%{load_profile}%"))
+        query = query.where(DailyPricing.load_profile.ilike(f"%{load_profile}%"))
     
     if term_months:
-        query = query.filter(DailyPricing.term_months == term_months)
+        query = query.where(DailyPricing.term_months == term_months)
     
-    best_rates = query.order_by(DailyPricing.daily_rate.asc()).limit(limit).all()
+    best_rates = await db.scalars(query.order_by(DailyPricing.daily_rate.asc()).limit(limit))
     
     return [
         {
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, select
 from typing import List, Optional
-from app.database import get_db
+from app.database import get_async_db
+from app.core.cache import cache
 from app.core.dependencies import get_current_user_id, get_optional_current_user_id, get_test_user_id, get_pagination_params
+from app.core.response_cache import cache_response
 from app.models.esiid import ESIID
 from app.models.provider import Provider
 from app.models.management_company import ManagementCompany
@@ -13,9 +15,10 @@ router = APIRouter()
 
 
 @router.get("/", response_model=List[ESIIDSummary])
+@cache_response(ESIID, anonymous=True)
 async def get_esiids(
     pagination: dict = Depends(get_pagination_params),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_test_user_id),
     search: Optional[str] = Query(None, description="Search by ESIID, account name, or address"),
     rep: Optional[str] = Query(None, description="Filter by REP/provider"),
@@ -28,11 +31,11 @@ async def get_esiids(
     active_only: bool = Query(True, description="Show only active ESIIDs")
 ):
     """Get ESIIDs with filtering options"""
-    query = db.query(ESIID)
+    query = select(ESIID)
     
     # Apply filters
     if active_only:
-        query = query.filter(ESIID.is_active == True)
+        query = query.where(ESIID.is_active == True)
     
     if search:
         search_filter = or_(
@@ -40,42 +43,42 @@ async def get_esiids(
             ESIID.account_name.ilike(f"%{search}%"),
             ESIID.service_address_1.ilike(f"%{search}%")
         )
-        query = query.filter(search_filter)
+        query = query.where(search_filter)
     
     if rep:
-        query = query.filter(ESIID.rep.ilike(f"%{rep}%"))
+        query = query.where(ESIID.rep.ilike(f"%{rep}%"))
     
     if load_profile:
-        query = query.filter(ESIID.load_profile.ilike(f"%{load_profile}%"))
+        query = query.where(ESIID.load_profile.ilike(f"%{load_profile}%"))
     
     if zone:
-        query = query.filter(ESIID.zone.ilike(f"%{zone}%"))
+        query = query.where(ESIID.zone.ilike(f"%{zone}%"))
     
     if min_kwh_mo is not None:
-        query = query.filter(ESIID.kwh_mo >= min_kwh_mo)
+        query = query.where(ESIID.kwh_mo >= min_kwh_mo)
     
     if max_kwh_mo is not None:
-        query = query.filter(ESIID.kwh_mo <= max_kwh_mo)
+        query = query.where(ESIID.kwh_mo <= max_kwh_mo)
     
     if min_bill is not None:
-        query = query.filter(ESIID.total_bill >= min_bill)
+        query = query.where(ESIID.total_bill >= min_bill)
     
     if max_bill is not None:
-        query = query.filter(ESIID.total_bill <= max_bill)
+        query = query.where(ESIID.total_bill <= max_bill)
     
     # Apply pagination
-    esiids = query.offset(pagination["skip"]).limit(pagination["limit"]).all()
-    return esiids
+    esiids = await db.scalars(query.offset(pagination["skip"]).limit(pagination["limit"]))
+    return esiids.all()
 
 
 @router.get("/{esiid_id}", response_model=ESIIDWithDetails)
 async def get_esiid(
     esiid_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get ESIID by ID with detailed information"""
-    esiid = db.query(ESIID).filter(ESIID.id == esiid_id).first()
+    esiid = await db.get(ESIID, esiid_id)
     if esiid is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -87,14 +90,14 @@ async def get_esiid(
 @router.post("/", response_model=ESIIDResponse)
 async def create_esiid(
     esiid_data: ESIIDCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Create a new ESIID"""
     db_esiid = ESIID(**esiid_data.dict())
     db.add(db_esiid)
-    db.commit()
-    db.refresh(db_esiid)
+    await db.commit()
+    await db.refresh(db_esiid)
     return db_esiid
 
 
@@ -102,11 +105,11 @@ async def create_esiid(
 async def update_esiid(
     esiid_id: int,
     esiid_data: ESIIDUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Update an ESIID"""
-    esiid = db.query(ESIID).filter(ESIID.id == esiid_id).first()
+    esiid = await db.get(ESIID, esiid_id)
     if esiid is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -117,93 +120,90 @@ async def update_esiid(
     for field, value in update_data.items():
         setattr(esiid, field, value)
     
-    db.commit()
-    db.refresh(esiid)
+    await db.commit()
+    await db.refresh(esiid)
     return esiid
 
 
 @router.delete("/{esiid_id}")
 async def delete_esiid(
     esiid_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Delete an ESIID"""
-    esiid = db.query(ESIID).filter(ESIID.id == esiid_id).first()
+    esiid = await db.get(ESIID, esiid_id)
     if esiid is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="ESIID not found"
         )
     
-    db.delete(esiid)
-    db.commit()
+    await db.delete(esiid)
+    await db.commit()
     return {"message": "ESIID deleted successfully"}
 
 
 @router.get("/stats/overview")
+@cache_response(ESIID)
 async def get_esiids_overview(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get overview statistics for ESIIDs"""
+    return await cache.get_or_compute("esiids:stats", lambda: _esiids_overview(db), tags=[ESIID])
+
+
+async def _esiids_overview(db: AsyncSession) -> dict:
+    def count(*conditions):
+        return db.scalar(select(func.count(ESIID.id)).where(ESIID.is_active == True, *conditions))
     
     # Total ESIIDs
-    total_esiids = db.query(ESIID).filter(ESIID.is_active == True).count()
+    total_esiids = await count()
     
     # ESIIDs with usage data
-    esiids_with_usage = db.query(ESIID).filter(
-        ESIID.is_active == True,
-        ESIID.kwh_mo.isnot(None),
-        ESIID.kwh_mo > 0
-    ).count()
+    esiids_with_usage = await count(ESIID.kwh_mo.isnot(None), ESIID.kwh_mo > 0)
     
     # ESIIDs linked to providers
-    esiids_with_provider = db.query(ESIID).filter(
-        ESIID.is_active == True,
-        ESIID.provider_id.isnot(None)
-    ).count()
+    esiids_with_provider = await count(ESIID.provider_id.isnot(None))
     
     # ESIIDs linked to management companies
-    esiids_with_company = db.query(ESIID).filter(
-        ESIID.is_active == True,
-        ESIID.management_company_id.isnot(None)
-    ).count()
+    esiids_with_company = await count(ESIID.management_company_id.isnot(None))
     
     # Usage statistics
-    usage_stats = db.query(
+    usage_stats = (await db.execute(select(
         func.sum(ESIID.kwh_mo).label('total_kwh_mo'),
         func.sum(ESIID.kwh_yr).label('total_kwh_yr'),
         func.sum(ESIID.total_bill).label('total_billing'),
         func.avg(ESIID.kwh_mo).label('avg_kwh_mo'),
         func.avg(ESIID.total_bill).label('avg_bill')
-    ).filter(
+    ).where(
         ESIID.is_active == True,
         ESIID.kwh_mo.isnot(None),
         ESIID.kwh_mo > 0
-    ).first()
+    ))).first()
     
     # Top REPs by ESIID count
-    top_reps = db.query(
+    top_reps = await db.execute(select(
         ESIID.rep,
         func.count(ESIID.id).label('count')
-    ).filter(
+    ).where(
         ESIID.is_active == True,
         ESIID.rep.isnot(None)
     ).group_by(ESIID.rep).order_by(
         func.count(ESIID.id).desc()
-    ).limit(10).all()
+    ).limit(10))
     
     # Load profile distribution
-    load_profiles = db.query(
+    load_profiles = await db.execute(select(
         ESIID.load_profile,
         func.count(ESIID.id).label('count')
-    ).filter(
+    ).where(
         ESIID.is_active == True,
         ESIID.load_profile.isnot(None)
     ).group_by(ESIID.load_profile).order_by(
         func.count(ESIID.id).desc()
-    ).limit(10).all()
+    ).limit(10))
     
     return {
         "total_esiids": total_esiids,
@@ -229,32 +229,34 @@ async def get_esiids_overview(
 
 
 @router.get("/by-provider/{provider_id}")
+@cache_response(ESIID)
 async def get_esiids_by_provider(
     provider_id: int,
     pagination: dict = Depends(get_pagination_params),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get ESIIDs for a specific provider"""
-    esiids = db.query(ESIID).filter(
+    esiids = await db.scalars(select(ESIID).where(
         ESIID.provider_id == provider_id,
         ESIID.is_active == True
-    ).offset(pagination["skip"]).limit(pagination["limit"]).all()
+    ).offset(pagination["skip"]).limit(pagination["limit"]))
     
-    return esiids
+    return esiids.all()
 
 
 @router.get("/by-company/{company_id}")
+@cache_response(ESIID)
 async def get_esiids_by_company(
     company_id: int,
     pagination: dict = Depends(get_pagination_params),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Get ESIIDs for a specific management company"""
-    esiids = db.query(ESIID).filter(
+    esiids = await db.scalars(select(ESIID).where(
         ESIID.management_company_id == company_id,
         ESIID.is_active == True
-    ).offset(pagination["skip"]).limit(pagination["limit"]).all()
+    ).offset(pagination["skip"]).limit(pagination["limit"]))
     
-    return esiids
+    return esiids.all()
@@ -3,9 +3,10 @@ from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
 from app.database import get_db
+from app.core.cache import cache
 from app.core.dependencies import get_current_user_id, get_pagination_params, require_admin_user
+from app.core.principals import Principal
 from app.models.system_health import SystemHealth
-from app.models.user import User
 from app.schemas.system_health import SystemHealthCreate, SystemHealthResponse
 from app.services.centerpoint import centerpoint_client
 try:
@@ -23,7 +24,7 @@ async def get_system_health(
     pagination: dict = Depends(get_pagination_params),
     service_name: str = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin_user)
+    current_user: Principal = Depends(require_admin_user)
 ):
     """Get system health status for all services (admin only)"""
     query = db.query(SystemHealth)
@@ -87,6 +88,12 @@ async def get_comprehensive_health_status(db: Session = Depends(get_db)):
     return health_status
 
 
+@router.get("/cache")
+async def get_cache_stats(current_user: Principal = Depends(require_admin_user)):
+    """Hit, miss and Redis counters of the shared stats cache in this worker (admin only)"""
+    return cache.stats()
+
+
 @router.post("/check")
 async def run_health_check(db: Session = Depends(get_db)):
     """Run comprehensive health check and store results"""
@@ -4,9 +4,10 @@ from sqlalchemy import func
 from typing import List, Optional
 from app.database import get_db
 from app.core.dependencies import get_current_user_id, get_pagination_params, require_manager_or_admin
+from app.core.principals import Principal
+from app.core.response_cache import cache_response
 from app.models.management_company import ManagementCompany
 from app.models.manager import Manager
-from app.models.user import User
 from app.schemas.management_company import (
     ManagementCompanyCreate, 
     ManagementCompanyUpdate, 
@@ -18,10 +19,11 @@ router = APIRouter()
 
 
 @router.get("/", response_model=List[ManagementCompanyResponse])
+@cache_response(ManagementCompany)
 async def get_management_companies(
     pagination: dict = Depends(get_pagination_params),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_manager_or_admin),
+    current_user: Principal = Depends(require_manager_or_admin),
     search: Optional[str] = Query(None, description="Search by company name or code"),
     status: Optional[str] = Query(None, description="Filter by management status"),
     active_only: bool = Query(True, description="Show only active companies")
@@ -48,10 +50,11 @@ async def get_management_companies(
 
 
 @router.get("/with-stats", response_model=List[ManagementCompanyWithStats])
+@cache_response(ManagementCompany, Manager)
 async def get_management_companies_with_stats(
     pagination: dict = Depends(get_pagination_params),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_manager_or_admin),
+    current_user: Principal = Depends(require_manager_or_admin),
     active_only: bool = Query(True, description="Show only active companies")
 ):
     """Get management companies with manager and account statistics"""
@@ -158,6 +161,7 @@ async def delete_management_company(
 
 
 @router.get("/stats/overview")
+@cache_response(ManagementCompany, Manager)
 async def get_companies_overview(
     db: Session = Depends(get_db),
     current_user_id: int = Depends(get_current_user_id)
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.database import get_db
 from app.core.dependencies import get_current_user_id, get_optional_current_user_id, get_test_user_id, get_pagination_params, require_manager_or_admin
+from app.core.response_cache import cache_response
 from app.models.manager import Manager
 from app.models.user import User
 from app.schemas.manager import ManagerCreate, ManagerUpdate, ManagerResponse
@@ -11,6 +12,7 @@ router = APIRouter()
 
 
 @router.get("/", response_model=List[ManagerResponse])
+@cache_response(Manager, anonymous=True)
 async def get_managers(
     pagination: dict = Depends(get_pagination_params),
     db: Session = Depends(get_db),
@@ -119,6 +121,7 @@ async def delete_manager(
 
 
 @router.get("/stats/companies")
+@cache_response(Manager)
 async def get_management_companies_stats(
     db: Session = Depends(get_db),
     current_user_id: int = Depends(get_current_user_id)
@@ -4,6 +4,7 @@ from sqlalchemy import func
 from typing import List, Optional
 from app.database import get_db
 from app.core.dependencies import get_current_user_id, get_pagination_params, require_admin_user
+from app.core.response_cache import cache_response
 from app.models.provider import Provider
 from app.models.user import User
 from app.schemas.provider import ProviderCreate, ProviderUpdate, ProviderResponse, ProviderWithStats
@@ -12,6 +13,7 @@ router = APIRouter()
 
 
 @router.get("/", response_model=List[ProviderResponse])
+@cache_response(Provider)
 async def get_providers(
     pagination: dict = Depends(get_pagination_params),
     db: Session = Depends(get_db),
@@ -120,6 +122,7 @@ async def delete_provider(
 
 
 @router.get("/stats/overview")
+@cache_response(Provider)
 async def get_providers_overview(
     db: Session = Depends(get_db),
     current_user_id: int = Depends(get_current_user_id)
@@ -0,0 +1,382 @@
+"""
+Two-tier cache for values that are expensive to compute and shared by every caller.
+
+Routes cache computed values here and whole responses in the response cache
+(app.core.invalidation describes how the layers divide the work).
+
+Each worker keeps a size-bounded LRU of values with a TTL. When Redis is
+reachable, values are also stored there, so a value one worker computes is
+served to the others. Without the redis package, or while the server is down,
+the cache runs on the local tier alone.
+
+Values are tagged with the tables they are computed from. Every tag has a
+version, bumped when the tag is invalidated (watch_writes in
+app.core.invalidation does this as transactions commit), and every value
+records the versions it was computed at, so a value is served only while
+none of its tags has moved since. With Redis the versions live there too,
+and an invalidation in one worker reaches the others' local tiers within
+version_check_seconds. Invalidations are
+called from commit hooks, so only the local bump happens inline; the Redis
+bump is sent from a background thread, and until it lands the bumped tags
+are served from the local tier alone.
+
+Concurrent misses for a key compute it once: callers in the same worker await
+the first caller's result, and callers in other workers wait for the value it
+stores in Redis while it holds the key's lock.
+
+Values are kept in their JSON form, so a value reads the same from either tier.
+"""
+
+import asyncio
+import inspect
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple, Union
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+from app.core.config import settings
+
+# Seconds Redis is left alone after a failed call
+REDIS_RETRY_SECONDS = 30
+# Seconds between polls while another worker computes a value
+_REMOTE_POLL_SECONDS = 0.025
+
+
+def _tag_names(tags: Iterable) -> Tuple[str, ...]:
+    """Sorted tag names; tags are names or models"""
+    return tuple(sorted({tag if isinstance(tag, str) else tag.__tablename__ for tag in tags}))
+
+
+class LocalTier:
+    """Bounded LRU of (value, versions, expiry) in this worker"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, tuple, float]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def versions(self, tags: Tuple[str, ...]) -> tuple:
+        with self._lock:
+            return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def get(self, key: str) -> Optional[Tuple[Any, tuple]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def set(self, key: str, value: Any, versions: tuple, ttl: float):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, versions, time.monotonic() + ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def bump(self, tags: Iterable[str]):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisTier:
+    """Values, tag versions and compute locks in Redis; every call may raise redis.RedisError"""
+
+    def __init__(self, url: str, prefix: str, timeout: float = 0.25):
+        self.prefix = prefix
+        self.client = redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+    def versions(self, tags: Tuple[str, ...]) -> tuple:
+        if not tags:
+            return ()
+        raw = self.client.mget([f"{self.prefix}tag:{tag}" for tag in tags])
+        return tuple(int(value or 0) for value in raw)
+
+    def get(self, key: str) -> Optional[Tuple[Any, tuple]]:
+        raw = self.client.get(f"{self.prefix}value:{key}")
+        if raw is None:
+            return None
+        entry = orjson.loads(raw)
+        return entry["value"], tuple(entry["versions"])
+
+    def set(self, key: str, value: Any, versions: tuple, ttl: float):
+        self.client.set(
+            f"{self.prefix}value:{key}", orjson.dumps({"value": value, "versions": versions}),
+            px=int(ttl * 1000)
+        )
+
+    def bump(self, tags: Iterable[str]):
+        pipe = self.client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.incr(f"{self.prefix}tag:{tag}")
+        pipe.execute()
+
+    def lock(self, key: str, token: str, timeout: float) -> bool:
+        return bool(self.client.set(f"{self.prefix}lock:{key}", token, nx=True, px=int(timeout * 1000)))
+
+    def unlock(self, key: str, token: str):
+        # Only the holder's token releases the lock; an expired one may belong to someone else now
+        name = f"{self.prefix}lock:{key}"
+        if self.client.get(name) == token.encode():
+            self.client.delete(name)
+
+
+class Cache:
+    """Local LRU/TTL tier with an optional shared Redis tier, single-flight and tag invalidation"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, redis_url: Optional[str] = None,
+                 prefix: str = "cache:", version_check_seconds: float = 1.0, lock_timeout_seconds: float = 10.0):
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+        self.lock_timeout_seconds = lock_timeout_seconds
+        self.local = LocalTier(max_entries)
+        self.remote = RedisTier(redis_url, prefix) if redis_url and REDIS_AVAILABLE else None
+        self._remote_down_until = 0.0
+        self._remote_versions: Dict[Tuple[str, ...], Tuple[tuple, float]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Tags with a Redis bump not yet sent; their shared versions are stale until it lands
+        self._pending_bumps: Dict[str, int] = {}
+        self._pending_lock = threading.Lock()
+        # One thread, so bumps reach Redis in commit order
+        self._bump_executor = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-bump") if self.remote is not None else None
+        )
+        self._counters = {
+            "local_hits": 0, "redis_hits": 0, "misses": 0, "coalesced": 0,
+            "remote_waits": 0, "invalidations": 0, "redis_errors": 0
+        }
+        self._last_redis_error: Optional[str] = None
+
+    # Redis, with failures counted and the tier skipped until it is retried
+
+    @property
+    def redis_active(self) -> bool:
+        return self.remote is not None and time.monotonic() >= self._remote_down_until
+
+    def _remote_call(self, method: str, *args):
+        """Call a RedisTier method; None (and Redis skipped for a while) when it fails"""
+        if not self.redis_active:
+            return None
+        try:
+            return getattr(self.remote, method)(*args)
+        except redis.RedisError as exc:
+            self._counters["redis_errors"] += 1
+            self._last_redis_error = str(exc)
+            self._remote_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+            self._remote_versions.clear()
+            return None
+
+    async def _shared_versions(self, tags: Tuple[str, ...]) -> Optional[tuple]:
+        """Redis tag versions, re-read at most every version_check_seconds; None without Redis"""
+        if not self.redis_active or self._bump_pending(tags):
+            return None
+        cached = self._remote_versions.get(tags)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        versions = await run_in_threadpool(self._remote_call, "versions", tags)
+        if versions is not None:
+            self._remote_versions[tags] = (versions, time.monotonic() + self.version_check_seconds)
+        return versions
+
+    # Lookups
+
+    def _local_get(self, key: str, local_versions: tuple, shared_versions: Optional[tuple]):
+        entry = self.local.get(key)
+        if entry is None:
+            return None
+        value, (entry_local, entry_shared) = entry
+        # A value stored without Redis was never checked against the other workers' invalidations
+        if entry_local != local_versions or (shared_versions is not None and entry_shared != shared_versions):
+            self.local.delete(key)
+            return None
+        return (value,)
+
+    def _remote_get(self, key: str, shared_versions: Optional[tuple]):
+        if shared_versions is None:
+            return None
+        entry = self._remote_call("get", key)
+        if entry is None or entry[1] != shared_versions:
+            return None
+        return (entry[0],)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Union[Any, Awaitable[Any]]],
+                             tags: Iterable = (), ttl: Optional[float] = None) -> Any:
+        """
+        Cached value of key, computing it with compute() on a miss.
+
+        Args:
+            key: Cache key; include every parameter the value depends on
+            compute: Called without arguments; may return the value or an awaitable of it
+            tags: Table names or models the value is computed from
+            ttl: Seconds the value is kept (defaults to ttl_seconds)
+
+        Returns:
+            The value in its JSON form (models and dates encoded as in a response)
+        """
+        tags = _tag_names(tags)
+        ttl = ttl or self.ttl_seconds
+        local_versions = self.local.versions(tags)
+        shared_versions = await self._shared_versions(tags)
+
+        hit = self._local_get(key, local_versions, shared_versions)
+        if hit is not None:
+            self._counters["local_hits"] += 1
+            return hit[0]
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(flight)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._inflight[key] = flight
+        try:
+            value = await self._fill(key, compute, tags, ttl, local_versions, shared_versions)
+            flight.set_result(value)
+            return value
+        except BaseException as exc:
+            flight.set_exception(exc)
+            # Mark the exception retrieved; callers awaiting the flight still get it
+            flight.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _fill(self, key: str, compute, tags: Tuple[str, ...], ttl: float,
+                    local_versions: tuple, shared_versions: Optional[tuple]) -> Any:
+        hit = await run_in_threadpool(self._remote_get, key, shared_versions)
+        if hit is not None:
+            self._counters["redis_hits"] += 1
+            self.local.set(key, hit[0], (local_versions, shared_versions), ttl)
+            return hit[0]
+
+        token = uuid.uuid4().hex if shared_versions is not None else None
+        if token is not None:
+            locked = await run_in_threadpool(self._remote_call, "lock", key, token, self.lock_timeout_seconds)
+            if locked is None:
+                # Redis failed; compute without it
+                token = None
+            elif not locked:
+                # Another worker is computing it; wait for its value, or compute once its lock expires
+                self._counters["remote_waits"] += 1
+                deadline = time.monotonic() + self.lock_timeout_seconds
+                while time.monotonic() < deadline and self.redis_active:
+                    await asyncio.sleep(_REMOTE_POLL_SECONDS)
+                    hit = await run_in_threadpool(self._remote_get, key, shared_versions)
+                    if hit is not None:
+                        self._counters["redis_hits"] += 1
+                        self.local.set(key, hit[0], (local_versions, shared_versions), ttl)
+                        return hit[0]
+                token = None
+
+        try:
+            self._counters["misses"] += 1
+            value = compute()
+            if inspect.isawaitable(value):
+                value = await value
+            value = jsonable_encoder(value)
+            # Stored at the versions read before computing, so a value that raced a write is never served
+            self.local.set(key, value, (local_versions, shared_versions), ttl)
+            if shared_versions is not None:
+                await run_in_threadpool(self._remote_call, "set", key, value, shared_versions, ttl)
+            return value
+        finally:
+            if token is not None:
+                await run_in_threadpool(self._remote_call, "unlock", key, token)
+
+    # Invalidation and metrics
+
+    def invalidate(self, tags: Iterable):
+        """Retire every value computed from any of tags, in this worker and (through Redis) the others"""
+        tags = _tag_names(tags)
+        if not tags:
+            return
+        self._counters["invalidations"] += 1
+        self.local.bump(tags)
+        self._remote_versions.clear()
+        if not self.redis_active:
+            return
+        # A commit hook may run on the event loop; a Redis round trip (or timeout) must not block it
+        with self._pending_lock:
+            for tag in tags:
+                self._pending_bumps[tag] = self._pending_bumps.get(tag, 0) + 1
+        self._bump_executor.submit(self._remote_bump, tags)
+
+    def _remote_bump(self, tags: Tuple[str, ...]):
+        try:
+            self._remote_call("bump", tags)
+        finally:
+            with self._pending_lock:
+                for tag in tags:
+                    remaining = self._pending_bumps.pop(tag) - 1
+                    if remaining:
+                        self._pending_bumps[tag] = remaining
+            self._remote_versions.clear()
+
+    def _bump_pending(self, tags: Tuple[str, ...]) -> bool:
+        return bool(self._pending_bumps) and any(tag in self._pending_bumps for tag in tags)
+
+    def flush(self, timeout: Optional[float] = None):
+        """Wait until every Redis bump sent so far has landed (or failed)"""
+        if self._bump_executor is not None:
+            self._bump_executor.submit(lambda: None).result(timeout)
+
+    def clear(self):
+        """Drop this worker's local tier"""
+        self.local.clear()
+        self._remote_versions.clear()
+
+    def stats(self) -> dict:
+        """Hit, miss and error counters of this worker, with the state of each tier"""
+        lookups = self._counters["local_hits"] + self._counters["redis_hits"] + self._counters["misses"]
+        hits = lookups - self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "local_entries": len(self.local),
+            "local_max_entries": self.local.max_entries,
+            "redis": (
+                "not_installed" if not REDIS_AVAILABLE
+                else "disabled" if self.remote is None
+                else "active" if self.redis_active
+                else "unavailable"
+            ),
+            "last_redis_error": self._last_redis_error
+        }
+
+
+cache = Cache(
+    settings.cache_max_entries,
+    settings.cache_ttl_seconds,
+    redis_url=settings.redis_url if settings.cache_use_redis else None,
+    prefix=settings.cache_key_prefix,
+    version_check_seconds=settings.cache_version_check_seconds,
+    lock_timeout_seconds=settings.cache_lock_timeout_seconds
+)
@@ -1,7 +1,11 @@
 from pydantic_settings import BaseSettings
 from typing import List, Optional
+from pathlib import Path
 import os
 
+# Repository root (2-backend/app/core/config.py -> repo), for paths shared with the scripts
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+
 
 class Settings(BaseSettings):
     # Application
@@ -13,11 +17,33 @@ class Settings(BaseSettings):
     database_url: str = "sqlite:///./kilowatt_dev.db"
     database_test_url: str = "sqlite:///./kilowatt_test.db"
     
+    # SQLite engine profile (WAL; reads and writes on separate pools)
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size_bytes: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 32 * 1024
+    sqlite_read_pool_size: int = 8
+    sqlite_read_max_overflow: int = 16
+    sqlite_write_pool_size: int = 2
+    sqlite_write_max_overflow: int = 2
+    sqlite_pool_timeout_seconds: float = 30
+    
+    # PostgreSQL engine profile (per engine; the API runs a sync and an async engine per worker)
+    postgres_pool_size: int = 10
+    postgres_max_overflow: int = 10
+    postgres_pool_timeout_seconds: float = 30
+    postgres_pool_recycle_seconds: int = 1800
+    postgres_statement_timeout_ms: int = 30000
+    
     # Security
     secret_key: str = "your-secret-key-here-make-it-long-and-random"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
+    # Verified tokens and resolved principals (user id, role, active flag) kept in memory
+    token_cache_max_entries: int = 4096
+    principal_cache_ttl_seconds: int = 30
+    # Threads hashing and verifying passwords (bcrypt) for the auth endpoints
+    password_hash_workers: int = 4
     
     # Centerpoint API
     centerpoint_api_url: str = "https://api.centerpoint.com"
@@ -38,6 +64,27 @@ class Settings(BaseSettings):
     # Logging
     log_level: str = "INFO"
     
+    # Analytics engine
+    analytics_engine_file: str = str(PROJECT_ROOT / "scripts" / "analysis" / "analytics_engine.py")
+    analytics_results_file: str = str(PROJECT_ROOT / "1-frontend" / "src" / "data" / "analytics-results.json")
+    analytics_job_history: int = 20
+    
+    # Response cache for polled read endpoints
+    response_cache_max_entries: int = 512
+    response_cache_max_entry_bytes: int = 1024 * 1024
+    response_cache_ttl_seconds: int = 300
+    
+    # Shared cache for computed stats (local LRU per worker, plus Redis when reachable)
+    cache_max_entries: int = 1024
+    cache_ttl_seconds: int = 300
+    cache_use_redis: bool = True
+    cache_key_prefix: str = "kilowatt:cache:"
+    cache_version_check_seconds: float = 1.0
+    cache_lock_timeout_seconds: float = 10.0
+    # Seconds the live rate percentile index is served without re-checking daily_pricing; commits
+    # in this worker rebuild it at once, the check covers writers outside it (imports, other workers)
+    rate_index_check_seconds: float = 30.0
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
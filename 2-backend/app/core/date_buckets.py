@@ -0,0 +1,42 @@
+"""
+Date bucketing that compiles to each database's own date functions.
+
+Trend and summary queries group by calendar fields of date columns. SQLite
+has no date type (dates are ISO strings read with strftime), PostgreSQL
+has EXTRACT, so date_part compiles per dialect and returns the same
+integer on both.
+"""
+
+from sqlalchemy import Integer
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+# strftime format of each EXTRACT field on SQLite
+_SQLITE_FIELDS = {"year": "%Y", "month": "%m", "day": "%d"}
+
+
+class date_part(FunctionElement):
+    """Integer calendar field (year, month or day) of a date or datetime column"""
+
+    type = Integer()
+    inherit_cache = True
+    # The field is compiled into the SQL, so it is part of the statement cache key
+    _traverse_internals = FunctionElement._traverse_internals + [("field", InternalTraversal.dp_string)]
+
+    def __init__(self, field: str, expr):
+        if field not in _SQLITE_FIELDS:
+            raise ValueError(f"Unsupported date field: {field}")
+        self.field = field
+        super().__init__(expr)
+
+
+@compiles(date_part)
+def _date_part(element, compiler, **kw):
+    return f"CAST(EXTRACT({element.field.upper()} FROM {compiler.process(element.clauses, **kw)}) AS INTEGER)"
+
+
+@compiles(date_part, "sqlite")
+def _date_part_sqlite(element, compiler, **kw):
+    field = _SQLITE_FIELDS[element.field]
+    return f"CAST(strftime('{field}', {compiler.process(element.clauses, **kw)}) AS INTEGER)"
@@ -1,29 +1,26 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
 from typing import Optional
-from app.database import get_db
-from app.core.security import verify_token
-from app.models.user import User
+from app.core.principals import Principal, principals, tokens
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 
 
-def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     """
-    Extract and validate user ID from JWT token.
+    Get the current authenticated user's principal (cached; see app.core.principals).
     
     Args:
         token: JWT access token from Authorization header
         
     Returns:
-        int: User ID from token payload
+        Principal: Current user's id, role and active flag
         
     Raises:
-        HTTPException: If token is invalid or expired
+        HTTPException: If token is invalid or expired, its user no longer exists, or the user is inactive
     """
-    payload = verify_token(token)
+    payload = tokens.verify(token)
     if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -39,31 +36,13 @@ def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return int(user_id)
-
-
-def get_current_user(
-    current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
-) -> User:
-    """
-    Get the current authenticated user from the database.
-    
-    Args:
-        current_user_id: User ID from JWT token
-        db: Database session
-        
-    Returns:
-        User: Current authenticated user object
-        
-    Raises:
-        HTTPException: If user not found or inactive
-    """
-    user = db.query(User).filter(User.id == current_user_id).first()
-    if not user:
+    # A valid token outlives its user: deleted users are unauthenticated, deactivated ones refused
+    user = await principals.resolve(int(user_id))
+    if user is None:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
         )
     
     if not user.is_active:
@@ -75,7 +54,23 @@ def get_current_user(
     return user
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_user_id(current_user: Principal = Depends(get_current_user)) -> int:
+    """
+    Extract the user ID of the current active user (memoized until the token expires).
+    
+    Args:
+        current_user: Current user from get_current_user dependency
+        
+    Returns:
+        int: User ID from token payload
+        
+    Raises:
+        HTTPException: If token is invalid or expired, or its user is missing or inactive
+    """
+    return current_user.id
+
+
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """
     Get current active user (alias for get_current_user for clarity).
     
@@ -83,12 +78,12 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
         current_user: Current user from get_current_user dependency
         
     Returns:
-        User: Current active user object
+        Principal: Current active user
     """
     return current_user
 
 
-def require_admin_user(current_user: User = Depends(get_current_user)) -> User:
+async def require_admin_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """
     Require current user to have admin role.
     
@@ -96,7 +91,7 @@ def require_admin_user(current_user: User = Depends(get_current_user)) -> User:
         current_user: Current authenticated user
         
     Returns:
-        User: Current user if admin
+        Principal: Current user if admin
         
     Raises:
         HTTPException: If user is not admin
@@ -109,7 +104,7 @@ def require_admin_user(current_user: User = Depends(get_current_user)) -> User:
     return current_user
 
 
-def require_manager_or_admin(current_user: User = Depends(get_current_user)) -> User:
+async def require_manager_or_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
     """
     Require current user to have manager or admin role.
     
@@ -117,7 +112,7 @@ def require_manager_or_admin(current_user: User = Depends(get_current_user)) ->
         current_user: Current authenticated user
         
     Returns:
-        User: Current user if manager or admin
+        Principal: Current user if manager or admin
         
     Raises:
         HTTPException: If user is not manager or admin
@@ -130,7 +125,7 @@ def require_manager_or_admin(current_user: User = Depends(get_current_user)) ->
     return current_user
 
 
-def get_optional_current_user_id(
+async def get_optional_current_user_id(
     token: Optional[str] = Depends(oauth2_scheme)
 ) -> Optional[int]:
     """
@@ -141,17 +136,17 @@ def get_optional_current_user_id(
         token: Optional JWT access token
         
     Returns:
-        Optional[int]: User ID if token is valid, None otherwise
+        Optional[int]: User ID if token is valid and its user active, None otherwise
     """
     if not token:
         return None
     
-    payload = verify_token(token)
-    if payload is None:
+    payload = tokens.verify(token)
+    if payload is None or not payload.get("sub"):
         return None
     
-    user_id = payload.get("sub")
-    return int(user_id) if user_id else None
+    user = await principals.resolve(int(payload["sub"]))
+    return user.id if user is not None and user.is_active else None
 
 
 def get_test_user_id() -> Optional[int]:
@@ -0,0 +1,27 @@
+"""
+HTTP validators for conditional GETs.
+
+Responses carry an ETag and 'Cache-Control: no-cache', so browsers keep
+their copy but revalidate it on every use; a matching If-None-Match is
+answered with an empty 304.
+"""
+
+from typing import Optional
+
+from fastapi import Response, status
+
+CACHE_CONTROL = "no-cache"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names etag (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag.removeprefix('W/') in (tag.removeprefix('W/') for tag in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 for a client whose copy is current"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
@@ -0,0 +1,84 @@
+"""
+Write-driven invalidation for the API's in-process caches.
+
+Data read from the database is cached in three layers, from the outside in:
+
+- response_cache (app.core.response_cache): serialized 200 responses of
+  GET routes opted in with @cache_response, kept per worker and keyed by
+  path, query and caller role, with ETags for conditional polls. A hit
+  skips the route, its auth dependencies included, entirely.
+- cache (app.core.cache): JSON values of expensive aggregates a route
+  computes (overview stats, rate tables), keyed by name and shared by every
+  caller and role, and by every worker through Redis when it is configured.
+  A response cache miss on a stats route is usually a hit here.
+- principals (app.core.principals): each user's role and active flag, read
+  by the auth dependencies and the response cache.
+
+Routes use the response cache for whole responses and the value cache for
+values worth sharing across roles or workers; neither stores the other's
+entries, and neither decides freshness on its own. watch_writes records the
+tables every transaction on an engine writes and, as it commits, calls
+invalidate(tables) on each cache it was given. A new cache implements
+invalidate(tables) and is passed to watch_writes in app.main rather than
+adding listeners of its own.
+
+Writes from outside this process (import scripts, the analytics engine,
+other workers) reach response_cache and principals only through their TTLs;
+cache also follows other workers' invalidations through its Redis tag
+versions.
+"""
+
+import threading
+from typing import Callable, Dict, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+_WRITTEN_TABLES = "invalidation_written_tables"
+# Per thread: tables committed by each watch_writes since the last session commit
+_committed = threading.local()
+
+
+def watch_writes(engine, *caches):
+    """
+    Invalidate caches as transactions on engine commit inserts, updates or deletes.
+
+    Each cache's invalidate() is called with the names of the tables written,
+    once as the connection commits and again once the session's commit has
+    landed, so a read racing the commit cannot store data from before it.
+    """
+    def invalidate(tables: Set[str]):
+        for cache in caches:
+            cache.invalidate(tables)
+
+    @event.listens_for(engine, "after_execute")
+    def record_write(conn, clauseelement, multiparams, params, execution_options, result):
+        if isinstance(clauseelement, UpdateBase) and getattr(clauseelement, "table", None) is not None:
+            conn.info.setdefault(_WRITTEN_TABLES, set()).add(clauseelement.table.name)
+
+    @event.listens_for(engine, "commit")
+    def invalidate_on_commit(conn):
+        tables = conn.info.pop(_WRITTEN_TABLES, None)
+        if tables:
+            invalidate(tables)
+            pending = _pending()
+            pending[invalidate] = pending.get(invalidate, set()) | tables
+
+    @event.listens_for(engine, "rollback")
+    def forget_on_rollback(conn):
+        conn.info.pop(_WRITTEN_TABLES, None)
+
+
+def _pending() -> Dict[Callable[[Set[str]], None], Set[str]]:
+    pending = getattr(_committed, "pending", None)
+    if pending is None:
+        pending = _committed.pending = {}
+    return pending
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    pending, _committed.pending = _pending(), {}
+    for invalidate, tables in pending.items():
+        invalidate(tables)
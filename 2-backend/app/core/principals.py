@@ -0,0 +1,118 @@
+"""
+Principal resolution for authenticated requests.
+
+Every authenticated request turns its bearer token into a principal: the
+user's id, role and active flag. Decoding the JWT and loading the user are
+both memoized here, so a repeat caller costs two dict lookups:
+
+- verified tokens are kept (bounded LRU) until their exp claim passes
+- principals are kept per user id (the token's sub) for a short TTL, and
+  dropped as soon as a write to the users table commits (watch_writes calls
+  invalidate); writers outside this process are covered by the TTL
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.security import verify_token
+from app.database import SessionLocal
+from app.models.user import User
+
+
+class Principal:
+    """The caller of a request: user id, role and active flag"""
+
+    __slots__ = ("id", "role", "is_active")
+
+    def __init__(self, id: int, role: Optional[str], is_active: bool):
+        self.id = id
+        self.role = role
+        self.is_active = is_active
+
+
+class TokenCache:
+    """Bounded LRU of verified token payloads, each kept until its exp claim"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def verify(self, token: str) -> Optional[dict]:
+        """Payload of a valid token, or None; a memoized token is not decoded again"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(token)
+                    return entry[0]
+                del self._entries[token]
+        payload = verify_token(token)
+        if payload is None or self.max_entries <= 0:
+            return payload
+        expires_at = payload.get("exp", now + settings.access_token_expire_minutes * 60)
+        with self._lock:
+            self._entries[token] = (payload, expires_at)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class PrincipalCache:
+    """Principals by user id with a TTL, cleared by writes to the users table"""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[int, Tuple[Optional[Principal], float]] = {}
+        # Bumped by every invalidation, so a principal loaded across a write is not stored
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Tuple[bool, Optional[Principal]]:
+        """(found, principal); principal is None for a user id that does not exist"""
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] <= time.monotonic():
+            return False, None
+        return True, entry[0]
+
+    async def resolve(self, user_id: int) -> Optional[Principal]:
+        """Principal of user_id, loaded from the database on a miss; None when the user does not exist"""
+        found, principal = self.get(user_id)
+        if found:
+            return principal
+        version = self._version
+        principal = await run_in_threadpool(_load_principal, user_id)
+        with self._lock:
+            if version == self._version:
+                self._entries[user_id] = (principal, time.monotonic() + self.ttl_seconds)
+        return principal
+
+    def invalidate(self, tables: Iterable[str]):
+        """Drop every principal once the users table is written"""
+        if User.__tablename__ in tables:
+            self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+
+def _load_principal(user_id: int) -> Optional[Principal]:
+    with SessionLocal() as db:
+        user = db.query(User.role, User.is_active).filter(User.id == user_id).first()
+    return Principal(user_id, user.role, bool(user.is_active)) if user is not None else None
+
+
+tokens = TokenCache(settings.token_cache_max_entries)
+principals = PrincipalCache(settings.principal_cache_ttl_seconds)
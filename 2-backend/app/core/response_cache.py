@@ -0,0 +1,243 @@
+"""
+Response cache for the read endpoints dashboards poll.
+
+Routes opt in with @cache_response(...), naming the tables (or models) their
+responses are computed from. ResponseCacheMiddleware keeps the serialized
+200 responses of those routes keyed by path, query string and the caller's
+role, tags each entry with the route's tables and answers repeat requests
+from memory. Every cached response carries an ETag of its body, so a poll
+whose If-None-Match still matches gets an empty 304.
+
+Only callers whose token resolves to an active user are cached, unless the
+route is opted in with anonymous=True (routes that need no token). Anyone
+else goes through the route and its auth dependencies every time, so a
+cached response is never handed to a caller the route would reject.
+
+Writes through the app's database engines invalidate the entries tagged with
+the tables they touch when their transaction commits (watch_writes in
+app.core.invalidation, which also describes how this cache and the value
+cache in app.core.cache divide the work). Writers outside this process
+(import scripts, the analytics engine, other workers) are covered by the
+entries' TTL.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers
+from starlette.routing import Match
+
+from app.core.config import settings
+from app.core.http_cache import CACHE_CONTROL, etag_matches
+from app.core.principals import principals, tokens
+
+_TABLES_ATTRIBUTE = "__response_cache_tables__"
+_ANONYMOUS_ATTRIBUTE = "__response_cache_anonymous__"
+
+# Response headers recomputed for every cached response
+_REPLACED_HEADERS = {b"content-length", b"etag", b"cache-control", b"vary"}
+
+def cache_response(*tables, anonymous: bool = False):
+    """
+    Opt a GET endpoint into the response cache; tables are names or models its response reads.
+
+    anonymous=True also caches callers without a valid token, for routes that
+    do not require one.
+    """
+    def decorate(endpoint):
+        setattr(endpoint, _TABLES_ATTRIBUTE, frozenset(
+            table if isinstance(table, str) else table.__tablename__ for table in tables
+        ))
+        setattr(endpoint, _ANONYMOUS_ATTRIBUTE, anonymous)
+        return endpoint
+    return decorate
+
+
+class _Entry:
+    """One cached response"""
+
+    __slots__ = ("body", "headers", "etag", "tables", "expires_at")
+
+    def __init__(self, body: bytes, headers: List[Tuple[bytes, bytes]], tables: frozenset, ttl: float):
+        self.body = body
+        self.headers = headers
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.tables = tables
+        self.expires_at = time.monotonic() + ttl
+
+
+class ResponseCache:
+    """Bounded LRU of serialized responses, tagged by the tables they were computed from"""
+
+    def __init__(self, max_entries: int, max_entry_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._tagged: Dict[str, Set[tuple]] = {}
+        # Bumped on every invalidation, so a response computed across a write is not stored
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def versions(self, tables: Iterable[str]) -> tuple:
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in sorted(tables))
+
+    def get(self, key: tuple) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, entry: _Entry, versions: tuple):
+        """Store an entry unless it is too large or one of its tables was written since versions"""
+        if len(entry.body) > self.max_entry_bytes:
+            return
+        with self._lock:
+            if versions != tuple(self._versions.get(table, 0) for table in sorted(entry.tables)):
+                return
+            self._drop(key)
+            self._entries[key] = entry
+            for table in entry.tables:
+                self._tagged.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, tables: Iterable[str]):
+        """Drop every entry computed from any of tables"""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                for key in self._tagged.pop(table, ()):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tagged.clear()
+
+    def _drop(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for table in entry.tables:
+            keys = self._tagged.get(table)
+            if keys is not None:
+                keys.discard(key)
+
+
+response_cache = ResponseCache(
+    settings.response_cache_max_entries,
+    settings.response_cache_max_entry_bytes,
+    settings.response_cache_ttl_seconds
+)
+
+async def _caller_role(authorization: Optional[str]) -> Optional[str]:
+    """Role of a valid bearer token's active user; None for anonymous or invalid callers"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = tokens.verify(token)
+    if payload is None or payload.get("sub") is None:
+        return None
+    principal = await principals.resolve(int(payload["sub"]))
+    return principal.role if principal is not None and principal.is_active else None
+
+
+def _route_endpoint(scope):
+    """Endpoint of the opted-in route a request is for, or None"""
+    for route in getattr(scope.get("app"), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            endpoint = getattr(route, "endpoint", None)
+            return endpoint if hasattr(endpoint, _TABLES_ATTRIBUTE) else None
+    return None
+
+
+def _canonical_query(query_string: bytes) -> str:
+    return urlencode(sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)))
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware serving opted-in GET routes from the response cache"""
+
+    def __init__(self, app, cache: ResponseCache = response_cache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        endpoint = _route_endpoint(scope)
+        if endpoint is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if_none_match = headers.get("if-none-match")
+        role = await _caller_role(headers.get("authorization"))
+        if role is None and not getattr(endpoint, _ANONYMOUS_ATTRIBUTE):
+            # No active user behind the token; the route's own dependencies answer
+            await self.app(scope, receive, send)
+            return
+        tables = getattr(endpoint, _TABLES_ATTRIBUTE)
+        key = (scope["path"], _canonical_query(scope["query_string"]), role)
+        entry = self.cache.get(key)
+        if entry is not None:
+            await self._send(send, entry, if_none_match, b"hit")
+            return
+
+        versions = self.cache.versions(tables)
+        start, chunks = None, []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body"):
+                return
+            body = b"".join(chunks)
+            raw_headers = list(start.get("headers", []))
+            if start["status"] != 200 or any(name.lower() == b"set-cookie" for name, _ in raw_headers):
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+            entry = _Entry(
+                body, [(name, value) for name, value in raw_headers if name.lower() not in _REPLACED_HEADERS],
+                tables, self.cache.ttl_seconds
+            )
+            self.cache.put(key, entry, versions)
+            await self._send(send, entry, if_none_match, b"miss")
+
+        await self.app(scope, receive, capture)
+
+    @staticmethod
+    async def _send(send, entry: _Entry, if_none_match: Optional[str], outcome: bytes):
+        validators = [
+            (b"etag", entry.etag.encode()),
+            (b"cache-control", CACHE_CONTROL.encode()),
+            (b"vary", b"Authorization"),
+            (b"x-cache", outcome)
+        ]
+        if etag_matches(if_none_match, entry.etag):
+            await send({"type": "http.response.start", "status": 304, "headers": validators})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": entry.headers + validators + [(b"content-length", str(len(entry.body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": entry.body})
@@ -1,18 +1,158 @@
-from sqlalchemy import create_engine
+from functools import lru_cache
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
 
-# Create database engine
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    echo=settings.debug
-)
+# Async drivers by backend; the sync URL's driver is swapped for these
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg"
+}
+
+
+def async_database_url(url: str) -> str:
+    """The same database with its backend's async driver (aiosqlite, asyncpg)"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def is_sqlite_file(url: str) -> bool:
+    """True for a SQLite database on disk (not in memory)"""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def _sqlite_pragmas(read_only: bool) -> list:
+    pragmas = [
+        # WAL lets readers run alongside a writer (the API, import scripts, the analytics engine)
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        f"PRAGMA busy_timeout = {settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA mmap_size = {settings.sqlite_mmap_size_bytes}",
+        f"PRAGMA cache_size = -{settings.sqlite_cache_size_kib}",
+        "PRAGMA temp_store = MEMORY"
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    return pragmas
+
+
+def apply_sqlite_profile(engine, read_only: bool = False):
+    """Set the SQLite pragmas on every connection engine opens (a sync engine, or an async one's sync_engine)"""
+    pragmas = _sqlite_pragmas(read_only)
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def _postgres_options(url: str) -> dict:
+    """Pool and session options for PostgreSQL through psycopg2 or asyncpg"""
+    timeout = str(settings.postgres_statement_timeout_ms)
+    if make_url(url).get_driver_name() == "asyncpg":
+        connect_args = {"server_settings": {"statement_timeout": timeout}}
+    else:
+        connect_args = {"options": f"-c statement_timeout={timeout}"}
+    return {
+        "pool_pre_ping": True,
+        "pool_size": settings.postgres_pool_size,
+        "max_overflow": settings.postgres_max_overflow,
+        "pool_timeout": settings.postgres_pool_timeout_seconds,
+        "pool_recycle": settings.postgres_pool_recycle_seconds,
+        "connect_args": connect_args
+    }
+
+
+def _engine_options(url: str, read_only: bool = False) -> dict:
+    """Pool options for an engine on url; SQLite files get a reader or writer pool"""
+    if make_url(url).get_backend_name() == "postgresql":
+        return _postgres_options(url)
+    if not is_sqlite_file(url):
+        return {"pool_pre_ping": True, "pool_recycle": 300}
+    # A local file needs no liveness checks; writers are few since SQLite serializes them anyway
+    return {
+        "pool_size": settings.sqlite_read_pool_size if read_only else settings.sqlite_write_pool_size,
+        "max_overflow": settings.sqlite_read_max_overflow if read_only else settings.sqlite_write_max_overflow,
+        "pool_timeout": settings.sqlite_pool_timeout_seconds
+    }
+
+
+def _create_engines(url: str, create, sync_engine=lambda engine: engine):
+    """Write engine and read engine (None unless url is a SQLite file) on url"""
+    write_engine = create(url, echo=settings.debug, **_engine_options(url))
+    if not is_sqlite_file(url):
+        return write_engine, None
+    read_engine = create(url, echo=settings.debug, **_engine_options(url, read_only=True))
+    apply_sqlite_profile(sync_engine(write_engine))
+    apply_sqlite_profile(sync_engine(read_engine), read_only=True)
+    return write_engine, read_engine
+
+
+class RoutingSession(Session):
+    """
+    Session reading through read_bind and writing through its bind.
+
+    Once a transaction writes (or flushes), the rest of it stays on the write
+    engine so it reads its own changes. Without a read_bind (databases other
+    than SQLite files) every statement uses the bind.
+    """
+
+    read_bind = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.read_bind is None:
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if self._flushing or isinstance(clause, UpdateBase) or self.info.get("writing"):
+            self.info["writing"] = True
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        return self.read_bind
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _end_writing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("writing", None)
+
+
+# Create database engines: writes, and reads on query-only connections for SQLite
+engine, read_engine = _create_engines(settings.database_url, create_engine)
+
+
+class _RoutingSession(RoutingSession):
+    read_bind = read_engine
+
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=_RoutingSession)
+
+# Async engines and sessions for endpoints that await their queries instead of blocking the event loop
+async_engine, async_read_engine = _create_engines(
+    async_database_url(settings.database_url), create_async_engine, lambda engine: engine.sync_engine
+)
+
+
+class _AsyncRoutingSession(RoutingSession):
+    read_bind = async_read_engine.sync_engine if async_read_engine is not None else None
+
+
+# Objects stay loaded after commit; async sessions cannot lazy-load expired attributes
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False, sync_session_class=_AsyncRoutingSession
+)
 
 # Create base class for models
 Base = declarative_base()
@@ -27,17 +167,48 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency to get an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def run_with_session(fn, *args, **kwargs):
+    """
+    Call fn(session, *args, **kwargs) with its own sync session in a worker thread.
+
+    For services written against the sync Session (and holding thread locks
+    around their queries) called from async endpoints.
+    """
+    def call():
+        with SessionLocal() as db:
+            return fn(db, *args, **kwargs)
+    return await run_in_threadpool(call)
+
+
+@lru_cache(maxsize=None)
+def _test_session_factories():
+    """Sync and async session factories on the test database, created on first use"""
+    url = settings.database_test_url
+    test_engine = create_engine(url, echo=False, **_engine_options(url))
+    async_url = async_database_url(url)
+    async_test_engine = create_async_engine(async_url, echo=False, **_engine_options(async_url))
+    return (
+        sessionmaker(autocommit=False, autoflush=False, bind=test_engine),
+        async_sessionmaker(async_test_engine, autoflush=False, expire_on_commit=False)
+    )
+
+
 def get_test_db():
     """Dependency to get test database session"""
-    test_engine = create_engine(
-        settings.database_test_url,
-        pool_pre_ping=True,
-        pool_recycle=300,
-        echo=False
-    )
-    TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
-    db = TestSessionLocal()
+    db = _test_session_factories()[0]()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+
+async def get_async_test_db():
+    """Dependency to get an async test database session, configured like get_async_db's"""
+    async with _test_session_factories()[1]() as db:
+        yield db
@@ -1,7 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.cache import cache
+from app.core.invalidation import watch_writes
+from app.core.principals import principals
+from app.core.response_cache import ResponseCacheMiddleware, response_cache
+from app.database import async_engine, engine
 from app.api.v1 import auth, accounts, tasks, managers, commissions, providers, emails, health, management_companies, esiids, daily_pricing, analytics, simple_test
+from app.services.analytics_jobs import job_runner
 
 # Create FastAPI app
 app = FastAPI(
@@ -12,6 +18,11 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Serve polled read endpoints from memory; CORS (added after) wraps the cached responses
+app.add_middleware(ResponseCacheMiddleware)
+watch_writes(engine, response_cache, cache, principals)
+watch_writes(async_engine.sync_engine, response_cache, cache, principals)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -37,6 +48,12 @@ app.include_router(health.router, prefix="/api/v1/health", tags=["System Health"
 app.include_router(simple_test.router, prefix="/api/v1/simple", tags=["Simple Test"])
 
 
+@app.on_event("shutdown")
+def shutdown_analytics_jobs():
+    """Stop the analytics worker process"""
+    job_runner.shutdown()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
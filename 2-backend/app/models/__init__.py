@@ -2,10 +2,14 @@ from .user import User
 from .account import Account
 from .task import Task
 from .manager import Manager
-from .commission import Commission
+from .commission import Commission, CommissionReconciliation
 from .provider import Provider
 from .email import EmailDraft
 from .system_health import SystemHealth
+from .analytics import (
+    AnalyticsGeneration, AnalyticsStageMetric, UsageHistory, UsageAnalytics, ESIIDAnomaly, PricingAnalytics, CommissionAnalytics,
+    MarketCubeCell, MarketIntelligence
+)
 
 __all__ = [
     "User",
@@ -13,7 +17,17 @@ __all__ = [
     "Task",
     "Manager",
     "Commission",
+    "CommissionReconciliation",
     "Provider",
     "EmailDraft",
-    "SystemHealth"
+    "SystemHealth",
+    "AnalyticsGeneration",
+    "AnalyticsStageMetric",
+    "UsageHistory",
+    "UsageAnalytics",
+    "ESIIDAnomaly",
+    "PricingAnalytics",
+    "CommissionAnalytics",
+    "MarketCubeCell",
+    "MarketIntelligence"
 ] 
\ No newline at end of file
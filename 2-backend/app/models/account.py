@@ -48,3 +48,9 @@ class Account(Base):
     provider = relationship("Provider", back_populates="accounts")
     tasks = relationship("Task", back_populates="account")
     commissions = relationship("Commission", back_populates="account")
+    esiids = relationship("ESIID", back_populates="account")
+    # Accounts name their management company rather than referencing it by id
+    management_company_rel = relationship(
+        "ManagementCompany", primaryjoin="foreign(Account.management_company) == ManagementCompany.company_name",
+        viewonly=True
+    )
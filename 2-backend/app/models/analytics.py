@@ -1,13 +1,89 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text, JSON, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 
+class AnalyticsGeneration(Base):
+    __tablename__ = "analytics_generations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # One analytics engine run; readers only see the single 'active' generation
+    model_version = Column(String)
+    analysis_date = Column(DateTime, index=True)
+    status = Column(String, index=True)  # 'building', 'active', 'retired'
+    
+    # Row counts written for this generation
+    usage_count = Column(Integer, default=0)
+    pricing_count = Column(Integer, default=0)
+    commission_count = Column(Integer, default=0)
+    
+    # Run measurements (stage detail in analytics_stage_metrics)
+    run_mode = Column(String)  # 'full', 'incremental'
+    duration_seconds = Column(Float)
+    data_quality_score = Column(Float)  # Share of ESIIDs with complete usage inputs
+    model_accuracy = Column(Float)  # Usage forecast backtest accuracy
+    content_hashes = Column(JSON)  # Content hash of each served section, used as its ETag
+    
+    # System fields
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    activated_at = Column(DateTime(timezone=True))
+
+
+class AnalyticsStageMetric(Base):
+    __tablename__ = "analytics_stage_metrics"
+    __table_args__ = (
+        Index('idx_analytics_stage_metrics_generation_stage', 'generation_id', 'stage'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # Outlives its generation (no foreign key) so run history survives pruning
+    generation_id = Column(Integer)
+    analysis_date = Column(DateTime)
+    run_mode = Column(String)  # 'full', 'incremental'
+    
+    # One pipeline stage, or 'total' for the whole run
+    stage = Column(String)
+    location = Column(String)  # 'local' (engine process) or 'pool' (worker process)
+    offset_seconds = Column(Float)  # Start relative to the run's first stage
+    wall_seconds = Column(Float)
+    cpu_seconds = Column(Float)
+    peak_rss_mb = Column(Float)  # High-water RSS of the process the stage ran in
+    rows_in = Column(Integer)
+    rows_out = Column(Integer)
+    groups = Column(Integer)  # Accounts, zone/REP pairs, REPs, ... the stage produced
+    groups_per_second = Column(Float)
+
+
+class UsageHistory(Base):
+    __tablename__ = "usage_history"
+    __table_args__ = (
+        UniqueConstraint('account_name', 'period', name='uq_usage_history_account_period'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # Monthly usage per account, one row per analytics month; the series usage forecasts are fitted to
+    account_name = Column(String, index=True)
+    period = Column(Integer, index=True)  # yyyymm
+    total_usage_kwh = Column(Float)
+    esiid_count = Column(Integer)
+    recorded_at = Column(DateTime)
+
+
 class UsageAnalytics(Base):
     __tablename__ = "usage_analytics"
+    __table_args__ = (
+        Index('idx_usage_analytics_generation_account', 'generation_id', 'account_name'),
+        Index('idx_usage_analytics_generation_pattern', 'generation_id', 'usage_pattern'),
+        Index('idx_usage_analytics_generation_usage', 'generation_id', 'current_usage_kwh'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    generation_id = Column(Integer, ForeignKey("analytics_generations.id"), index=True)
+    row_hash = Column(String)  # Content hash compared across generations for ?since deltas
     
     # Reference information
     account_name = Column(String, index=True)
@@ -17,7 +93,9 @@ class UsageAnalytics(Base):
     load_profile = Column(String, index=True)
     
     # Usage metrics
+    esiid_count = Column(Integer)  # ESIIDs on the account
     current_usage_kwh = Column(Float)  # Current monthly usage
+    avg_usage_kwh = Column(Float)  # Average monthly usage per ESIID
     predicted_usage_kwh = Column(Float)  # Predicted next month usage
     usage_trend = Column(String)  # 'increasing', 'decreasing', 'stable'
     seasonal_factor = Column(Float)  # Seasonal adjustment factor
@@ -27,6 +105,8 @@ class UsageAnalytics(Base):
     efficiency_score = Column(Float)  # Energy efficiency rating (0-100)
     cost_optimization_potential = Column(Float)  # Potential savings percentage
     anomaly_score = Column(Float)  # Anomaly detection score (0-1)
+    cost_per_kwh = Column(Float)
+    total_monthly_bill = Column(Float)
     
     # Forecasting data
     forecast_period = Column(String)  # 'monthly', 'quarterly', 'annual'
@@ -44,10 +124,50 @@ class UsageAnalytics(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 
+class ESIIDAnomaly(Base):
+    __tablename__ = "esiid_anomalies"
+    __table_args__ = (
+        Index('idx_esiid_anomalies_generation_score', 'generation_id', 'anomaly_score'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    generation_id = Column(Integer, ForeignKey("analytics_generations.id"), index=True)
+    row_hash = Column(String)  # Content hash compared across generations for ?since deltas
+    
+    # Reference information
+    esi_id = Column(String, index=True)
+    account_name = Column(String, index=True)
+    zone = Column(String)
+    load_profile = Column(String)
+    rep = Column(String)
+    
+    # Measures scored against the ESIID's peers
+    kwh_mo = Column(Float)
+    cost_per_kwh = Column(Float)
+    peer_group = Column(String)  # 'zone_profile', 'zone', 'all'
+    
+    # Robust (median/MAD) z-scores
+    usage_score = Column(Float)  # Of log monthly kWh
+    cost_score = Column(Float)  # Of cost per kWh
+    anomaly_score = Column(Float)  # Larger of |usage_score| and |cost_score|
+    anomaly_type = Column(String)  # 'usage', 'cost'
+    severity = Column(String)  # 'critical', 'high', 'medium', 'low', 'normal'
+    
+    # Analysis metadata
+    analysis_date = Column(DateTime, index=True)
+    model_version = Column(String)
+
+
 class PricingAnalytics(Base):
     __tablename__ = "pricing_analytics"
+    __table_args__ = (
+        Index('idx_pricing_analytics_generation_zone_rep', 'generation_id', 'zone', 'rep'),
+        Index('idx_pricing_analytics_generation_position', 'generation_id', 'market_position'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    generation_id = Column(Integer, ForeignKey("analytics_generations.id"), index=True)
+    row_hash = Column(String)  # Content hash compared across generations for ?since deltas
     
     # Reference information
     zone = Column(String, index=True)
@@ -56,6 +176,7 @@ class PricingAnalytics(Base):
     
     # Current pricing
     current_rate = Column(Float)  # Current daily rate
+    avg_rate = Column(Float)  # Average daily rate over the REP's history in the zone
     predicted_rate = Column(Float)  # Predicted future rate
     rate_trend = Column(String)  # 'increasing', 'decreasing', 'stable'
     
@@ -63,6 +184,8 @@ class PricingAnalytics(Base):
     market_position = Column(String)  # 'competitive', 'average', 'expensive'
     price_volatility = Column(Float)  # Price volatility score (0-1)
     seasonal_adjustment = Column(Float)  # Seasonal price factor
+    percentile_rank = Column(Float)  # Current rate percentile within the zone (0-100)
+    data_points = Column(Integer)  # Rate observations analyzed
     
     # Optimization insights
     best_contract_term = Column(Integer)  # Recommended contract length (months)
@@ -87,8 +210,13 @@ class PricingAnalytics(Base):
 
 class CommissionAnalytics(Base):
     __tablename__ = "commission_analytics"
+    __table_args__ = (
+        Index('idx_commission_analytics_generation_rep', 'generation_id', 'rep'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    generation_id = Column(Integer, ForeignKey("analytics_generations.id"), index=True)
+    row_hash = Column(String)  # Content hash compared across generations for ?since deltas
     
     # Reference information
     rep = Column(String, index=True)
@@ -101,6 +229,9 @@ class CommissionAnalytics(Base):
     commission_trend = Column(String)  # 'increasing', 'decreasing', 'stable'
     
     # Performance metrics
+    total_commission = Column(Float)
+    commission_count = Column(Integer)
+    monthly_performance = Column(JSON)  # Received amount per 'YYYY-MM'
     conversion_rate = Column(Float)  # Success rate (0-1)
     average_commission_value = Column(Float)
     commission_growth_rate = Column(Float)  # Monthly growth rate
@@ -126,10 +257,34 @@ class CommissionAnalytics(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 
+class MarketCubeCell(Base):
+    __tablename__ = "market_cube"
+
+    id = Column(Integer, primary_key=True, index=True)
+    generation_id = Column(Integer, ForeignKey("analytics_generations.id"), index=True)
+    
+    # Base cell: one combination of every dimension its fact has (NULL where the fact lacks one)
+    fact = Column(String)  # 'usage' (ESIIDs), 'pricing' (daily pricing)
+    zone = Column(String)
+    rep = Column(String)
+    load_profile = Column(String)
+    management_company = Column(String)  # usage only
+    month = Column(String)  # 'YYYY-MM': analysis month for usage, effective month for pricing
+    
+    # Additive measures rolled up by the API
+    record_count = Column(Integer)  # ESIIDs or rate observations
+    kwh_sum = Column(Float)  # Monthly kWh
+    bill_sum = Column(Float)  # Monthly bill
+    rate_sum = Column(Float)
+    rate_min = Column(Float)
+    rate_max = Column(Float)
+
+
 class MarketIntelligence(Base):
     __tablename__ = "market_intelligence"
 
     id = Column(Integer, primary_key=True, index=True)
+    generation_id = Column(Integer, ForeignKey("analytics_generations.id"), index=True)
     
     # Market scope
     market_segment = Column(String, index=True)  # 'residential', 'commercial', 'industrial'
@@ -137,6 +292,8 @@ class MarketIntelligence(Base):
     time_period = Column(String, index=True)  # 'monthly', 'quarterly', 'annual'
     
     # Market metrics
+    market_overview = Column(JSON)  # Totals, average cost and account/ESIID counts
+    zone_analysis = Column(JSON)  # Usage totals per zone
     total_market_size = Column(Float)  # Total market size (kWh or $)
     market_growth_rate = Column(Float)  # Growth rate percentage
     competitive_intensity = Column(Float)  # Competition level (0-1)
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric, JSON, Boolean, Float, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric, JSON, Boolean, Float, Text, Index, event
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 from app.database import Base
 
 
@@ -21,6 +21,8 @@ class Commission(Base):
     actual_payment_amount = Column(Numeric(12, 2))  # Act_PYMT_Amt field
     actual_payment_received = Column(Numeric(12, 2))  # Act_PYMT_Recvd field
     actual_payment_date = Column(DateTime)  # Act_PYMT_Date field
+    payment_year = Column(Integer)  # Year of actual_payment_date (indexed for monthly summaries)
+    payment_month = Column(Integer)  # Month (1-12) of actual_payment_date
     actual_mils = Column(Float)  # Act_Mils field
     payment_type = Column(String)  # Pymt_Type field
 
@@ -51,7 +53,56 @@ class Commission(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Old values are loaded when these change, so reconciliation can retire the months a row moves out of
+    commission_type = column_property(commission_type, active_history=True)
+    actual_payment_date = column_property(actual_payment_date, active_history=True)
+    monthly_scheduled = column_property(monthly_scheduled, active_history=True)
+
     # Relationships
     manager = relationship("Manager", back_populates="commissions")
     account = relationship("Account", back_populates="commissions")
-    provider = relationship("Provider", back_populates="commissions")
\ No newline at end of file
+    provider = relationship("Provider", back_populates="commissions")
+
+    # Indexes for performance
+    __table_args__ = (
+        Index('idx_commissions_type_payment_period', 'commission_type', 'payment_year', 'payment_month'),
+    )
+
+
+@event.listens_for(Commission, "before_insert")
+@event.listens_for(Commission, "before_update")
+def set_payment_period(mapper, connection, target):
+    """Keep payment_year/payment_month in step with actual_payment_date"""
+    payment_date = target.actual_payment_date
+    target.payment_year = payment_date.year if payment_date else None
+    target.payment_month = payment_date.month if payment_date else None
+
+
+class CommissionReconciliation(Base):
+    __tablename__ = "commission_reconciliation"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Reconciliation key
+    account_name = Column(String, index=True)  # Acct_Name shared by both sides
+    k_rep = Column(String, index=True)  # K_REP shared by both sides
+    period = Column(Integer, index=True)  # Payment month as yyyymm (e.g. 202501)
+
+    # Scheduled vs received
+    scheduled_amount = Column(Float)  # Sum of monthly_scheduled for the month
+    received_amount = Column(Float)  # Sum of actual_payment_amount for the month
+    variance = Column(Float)  # received_amount - scheduled_amount
+    payment_count = Column(Integer)  # Number of received payments in the month
+    duplicate_count = Column(Integer)  # Payments repeating an earlier amount in the month
+
+    # Outcome: 'matched', 'missed', 'short', 'over', 'duplicate', 'unscheduled'
+    status = Column(String, index=True)
+
+    # System fields
+    reconciled_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Indexes for performance
+    __table_args__ = (
+        Index('idx_reconciliation_key', 'account_name', 'k_rep', 'period', unique=True),
+        Index('idx_reconciliation_period_status', 'period', 'status'),
+    )
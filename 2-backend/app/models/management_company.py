@@ -44,5 +44,8 @@ class ManagementCompany(Base):
 
     # Relationships
     managers = relationship("Manager", back_populates="management_company_rel")
-    accounts = relationship("Account", back_populates="management_company_rel")
+    accounts = relationship(
+        "Account", primaryjoin="ManagementCompany.company_name == foreign(Account.management_company)",
+        viewonly=True
+    )
     esiids = relationship("ESIID", back_populates="management_company")
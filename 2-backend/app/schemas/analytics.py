@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, List, Any
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List, Any, Literal
 from datetime import datetime
 
 
@@ -86,8 +86,19 @@ class ForecastRequest(BaseModel):
     account_name: Optional[str] = None
     zone: Optional[str] = None
     rep: Optional[str] = None
-    forecast_period: str = "monthly"  # monthly, quarterly, annual
-    forecast_horizon: int = 12  # number of periods to forecast
+    forecast_period: Literal["monthly", "quarterly", "annual"] = "monthly"
+    forecast_horizon: int = Field(12, ge=1, le=60)  # number of periods to forecast
+
+
+class BatchForecastRequest(BaseModel):
+    # Selectors combine with AND; with none given every account is forecast
+    account_names: Optional[List[str]] = Field(None, max_length=5000)
+    zone: Optional[str] = None
+    manager_name: Optional[str] = None
+    management_company: Optional[str] = None
+    forecast_period: Literal["monthly", "quarterly", "annual"] = "monthly"
+    forecast_horizon: int = Field(12, ge=1, le=60)
+    include_total: bool = False  # append a line with the summed forecast of the selection
 
 
 class ForecastResponse(BaseModel):
@@ -96,7 +107,7 @@ class ForecastResponse(BaseModel):
     forecast_horizon: int
     forecast_data: List[Dict[str, Any]]
     confidence_level: float
-    model_accuracy: float
+    model_accuracy: Optional[float] = None  # 1 - backtest MAPE; None until enough history for a backtest
     generated_at: datetime
 
 
@@ -108,6 +119,46 @@ class OptimizationRequest(BaseModel):
     optimization_goal: str = "cost"  # cost, efficiency, sustainability
 
 
+class PortfolioOptimizationRequest(BaseModel):
+    # Selectors combine with AND
+    account_names: Optional[List[str]] = Field(None, max_length=20000)
+    esi_ids: Optional[List[str]] = Field(None, max_length=50000)
+    zone: Optional[str] = None
+    term_months: Optional[List[float]] = None  # allowed contract terms; any when omitted
+    max_rep_share: Optional[float] = Field(None, gt=0, le=1)  # cap on any REP's share of portfolio MWh
+    refine: bool = True  # LP refinement when a cap binds (needs scipy)
+
+
+class PortfolioAssignment(BaseModel):
+    account_name: str
+    zone: Optional[str] = None
+    load_profile: Optional[str] = None
+    meters: int
+    annual_mwh: float
+    current_annual_cost: float
+    offer_id: Optional[int] = None  # None when no offer is eligible
+    rep: Optional[str] = None
+    term_months: Optional[float] = None
+    daily_rate: Optional[float] = None
+    annual_cost: Optional[float] = None
+    annual_savings: Optional[float] = None
+
+
+class PortfolioOptimizationResponse(BaseModel):
+    units: int
+    assigned: int
+    offers_considered: int
+    method: str  # greedy, greedy+lp
+    lp_status: Optional[str] = None  # solved, infeasible, unavailable; None when no cap binds
+    duration_seconds: float
+    current_annual_cost: float
+    optimized_annual_cost: float
+    potential_savings: float
+    savings_percentage: float
+    rep_mwh_share: Dict[str, float]
+    assignments: List[PortfolioAssignment]
+
+
 class OptimizationResponse(BaseModel):
     optimization_goal: str
     current_cost: float
@@ -119,22 +170,70 @@ class OptimizationResponse(BaseModel):
 
 
 class AnomalyDetectionResponse(BaseModel):
+    esi_id: Optional[str] = None
     account_name: str
-    anomaly_type: str  # usage, cost, pattern
-    anomaly_score: float
+    zone: Optional[str] = None
+    load_profile: Optional[str] = None
+    rep: Optional[str] = None
+    anomaly_type: str  # usage, cost
+    anomaly_score: float  # larger |robust z-score| of usage and cost
+    usage_score: Optional[float] = None
+    cost_score: Optional[float] = None
+    kwh_mo: Optional[float] = None
+    cost_per_kwh: Optional[float] = None
+    peer_group: Optional[str] = None  # zone_profile, zone, all
     severity: str  # low, medium, high, critical
     description: str
     detected_at: datetime
     recommended_action: str
 
 
+class AnomalyPage(BaseModel):
+    results: List[AnomalyDetectionResponse]
+    total: int
+    page: int
+    pages: int
+    generation_id: int
+    since: Optional[int] = None  # Set for ?since deltas: results are the changed rows
+    removed: Optional[List[Dict[str, Any]]] = None  # Keys of rows no longer in the view
+
+
+class StageMetrics(BaseModel):
+    stage: str
+    location: Optional[str] = None
+    offset_seconds: Optional[float] = None
+    wall_seconds: Optional[float] = None
+    cpu_seconds: Optional[float] = None
+    peak_rss_mb: Optional[float] = None
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    groups: Optional[int] = None
+    groups_per_second: Optional[float] = None
+
+
+class RunMetrics(BaseModel):
+    generation_id: int
+    analysis_date: Optional[datetime] = None
+    run_mode: Optional[str] = None
+    wall_seconds: Optional[float] = None
+    cpu_seconds: Optional[float] = None
+    peak_rss_mb: Optional[float] = None
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    stage_seconds: Dict[str, float]  # Wall seconds by stage
+
+
 class PerformanceMetrics(BaseModel):
     total_accounts_analyzed: int
     total_esiids_processed: int
-    analysis_duration_seconds: float
-    data_quality_score: float
-    model_accuracy: float
+    analysis_duration_seconds: Optional[float] = None
+    data_quality_score: Optional[float] = None
+    model_accuracy: Optional[float] = None
     last_updated: datetime
+    generation_id: int
+    run_mode: Optional[str] = None
+    stages: List[StageMetrics]  # Active generation's run, in start order
+    history: List[RunMetrics]  # Most recent runs first
 
 
 class AnalyticsSummary(BaseModel):
@@ -145,3 +244,28 @@ class AnalyticsSummary(BaseModel):
     growth_opportunities: List[str]
     risk_factors: List[str]
     key_insights: List[str]
+
+
+class AnalyticsJobStage(BaseModel):
+    stage: str
+    started_at: datetime
+    duration_seconds: float
+
+
+class AnalyticsJobResponse(BaseModel):
+    job_id: str
+    mode: str  # full, incremental
+    status: str  # queued, running, cancelling, succeeded, failed, cancelled
+    current_stage: Optional[str] = None
+    stages: List[AnalyticsJobStage] = []
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+    error: Optional[str] = None
+    summary: Optional[Dict[str, Any]] = None
+
+
+class AnalyticsRefreshResponse(AnalyticsJobResponse):
+    message: str
+    deduplicated: bool
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from decimal import Decimal
 
@@ -115,4 +115,48 @@ class CommissionStats(BaseModel):
     total_commissions: int
     received_commissions: int
     scheduled_commissions: int
-    active_schedules: int
\ No newline at end of file
+    active_schedules: int
+
+
+class CommissionReconciliationResponse(BaseModel):
+    id: int
+    account_name: Optional[str]
+    k_rep: Optional[str]
+    period: int
+    scheduled_amount: float
+    received_amount: float
+    variance: float
+    payment_count: int
+    duplicate_count: int
+    status: str
+    reconciled_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
+class ReconciliationRunSummary(BaseModel):
+    mode: str  # 'full' or 'incremental'
+    periods: List[int]
+    cells: int
+    status_counts: Dict[str, int]
+    duration_seconds: float
+
+
+class CommissionForecastPoint(BaseModel):
+    period: int  # yyyymm
+    forecast: float
+    lower: float
+    upper: float
+
+
+class CommissionForecast(BaseModel):
+    k_rep: str
+    account_name: Optional[str] = None
+    alpha: float
+    beta: float
+    level: float
+    trend: float
+    residual_std: float
+    last_period: int
+    forecast: List[CommissionForecastPoint]
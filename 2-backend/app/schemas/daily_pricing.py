@@ -99,3 +99,11 @@ class RepPricingAnalysis(BaseModel):
     max_rate: float
     record_count: int
     zones_served: int
+
+
+class ZoneRatePercentile(BaseModel):
+    zone: str
+    rate: float
+    percentile_rank: float
+    market_position: str
+    zone_rate_count: int
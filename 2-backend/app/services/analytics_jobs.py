@@ -0,0 +1,270 @@
+"""
+Analytics refresh jobs.
+
+A refresh runs the analytics engine (scripts/analysis/analytics_engine.py,
+loaded by file path) in a single-worker process pool, so the pandas work
+never ties up an API thread and only one run touches the results at a time.
+Refresh requests made while a job is queued or running get that job back
+instead of starting another; a cancelled job counts as running until its
+worker has stopped.
+
+The engine reports each pipeline stage through a progress callback; the
+worker forwards stages over a queue so GET /analytics/jobs/{id} can show the
+current stage and per-stage timings. Cancellation is cooperative: the worker
+checks for it as each stage starts, so a cancelled job stops at the next
+stage boundary and never publishes partial results.
+
+Publishing is atomic end to end: the engine replaces the results file with
+os.replace and switches analytics generations in one transaction, and a
+finished job re-indexes the results store, which swaps in its new snapshot
+with a single assignment.
+"""
+
+import importlib.util
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.services.analytics_results import results_store
+
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+
+class AnalysisCancelled(Exception):
+    """Raised in the worker when the running job has been cancelled"""
+
+
+def sqlite_database_path(database_url: str) -> str:
+    """Absolute path of a SQLite database URL (the engine reads SQLite directly)"""
+    url = make_url(database_url)
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        raise ValueError(f"The analytics engine needs a SQLite database file, got {url.get_backend_name()}")
+    # Relative paths resolve against the API's working directory, as in SQLAlchemy
+    return os.path.abspath(url.database)
+
+
+# Set in the worker process by _init_worker
+_events = None
+_cancelled_through = None
+
+
+def _init_worker(events, cancelled_through):
+    global _events, _cancelled_through
+    _events, _cancelled_through = events, cancelled_through
+
+
+def _load_engine_class(engine_file: str):
+    """EnergyAnalyticsEngine from the engine script, which is not an importable module"""
+    spec = importlib.util.spec_from_file_location('analytics_engine', engine_file)
+    module = importlib.util.module_from_spec(spec)
+    # Registered so the engine's pipeline stages pickle by reference to its pool workers
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module.EnergyAnalyticsEngine
+
+
+def _run_job(sequence: int, job_id: str, engine_file: str, db_path: str, output_file: str,
+             incremental: bool) -> dict:
+    """Run the engine in the worker process, reporting stages to the API process"""
+
+    def progress(stage: str):
+        if sequence <= _cancelled_through.value:
+            raise AnalysisCancelled()
+        _events.put((job_id, stage, time.time()))
+
+    progress('prepare')
+    engine_class = _load_engine_class(engine_file)
+    engine = engine_class(db_path, output_file=output_file, progress=progress)
+    results = engine.run_incremental_analysis() if incremental else engine.run_full_analysis()
+    if results is None:
+        if isinstance(engine.last_error, AnalysisCancelled):
+            raise AnalysisCancelled()
+        raise RuntimeError(str(engine.last_error or "Analytics run failed"))
+
+    return {
+        'usage_analysis': len(results['usage_analysis']),
+        'pricing_analysis': len(results['pricing_analysis']),
+        'commission_analysis': len(results['commission_analysis']),
+        'analysis_timestamp': results['analysis_timestamp']
+    }
+
+
+class AnalyticsJob:
+    """One refresh request and its progress"""
+
+    def __init__(self, sequence: int, incremental: bool, requested_by: Optional[int]):
+        self.id = uuid.uuid4().hex
+        self.sequence = sequence
+        self.mode = 'incremental' if incremental else 'full'
+        self.requested_by = requested_by
+        self.status = 'queued'
+        self.cancel_requested = False
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[float] = None
+        # (stage, start time) in the order the worker reported them
+        self.stages: List[Tuple[str, float]] = []
+        self.error: Optional[str] = None
+        self.summary: Optional[dict] = None
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        stages = sorted(self.stages, key=lambda stage: stage[1])
+        timings = []
+        for i, (name, started) in enumerate(stages):
+            stopped = stages[i + 1][1] if i + 1 < len(stages) else end
+            timings.append({
+                'stage': name,
+                'started_at': datetime.utcfromtimestamp(started),
+                'duration_seconds': round(max(stopped - started, 0.0), 3)
+            })
+
+        status = self.status
+        if status in ('queued', 'running') and self.cancel_requested:
+            status = 'cancelling'
+        return {
+            'job_id': self.id,
+            'mode': self.mode,
+            'status': status,
+            'current_stage': timings[-1]['stage'] if timings and status in ('running', 'cancelling') else None,
+            'stages': timings,
+            'created_at': self.created_at,
+            'started_at': timings[0]['started_at'] if timings else None,
+            'finished_at': datetime.utcfromtimestamp(self.finished_at) if self.finished_at else None,
+            'duration_seconds': round(end - stages[0][1], 3) if stages else None,
+            'error': self.error,
+            'summary': self.summary
+        }
+
+
+class AnalyticsJobRunner:
+    """Single-flight analytics refreshes in a one-process pool"""
+
+    def __init__(self, history: int = 20):
+        self.history = history
+        self._lock = threading.Lock()
+        self._jobs: 'OrderedDict[str, AnalyticsJob]' = OrderedDict()
+        self._sequence = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._events = None
+        self._cancelled_through = None
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned, not forked: the API process runs threads
+            context = multiprocessing.get_context('spawn')
+            if self._events is None:
+                self._events = context.Queue()
+                self._cancelled_through = context.Value('q', 0)
+                threading.Thread(target=self._drain_events, name='analytics-job-events', daemon=True).start()
+            self._executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=context,
+                initializer=_init_worker, initargs=(self._events, self._cancelled_through)
+            )
+        return self._executor
+
+    def _drain_events(self):
+        """Record stages reported by the worker"""
+        while True:
+            job_id, stage, started = self._events.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                if job.status == 'queued':
+                    job.status = 'running'
+                job.stages.append((stage, started))
+
+    def _active_job(self) -> Optional[AnalyticsJob]:
+        """The queued or running job, cancelling ones included until the worker has stopped them"""
+        for job in reversed(self._jobs.values()):
+            if job.status not in FINISHED_STATUSES:
+                return job
+        return None
+
+    def _trim_history(self):
+        finished = [job.id for job in self._jobs.values() if job.status in FINISHED_STATUSES]
+        for job_id in finished[:max(len(finished) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def start(self, incremental: bool = False, requested_by: Optional[int] = None) -> Tuple[AnalyticsJob, bool]:
+        """Start a refresh, or return the one already queued, running or cancelling; returns (job, created)"""
+        db_path = sqlite_database_path(settings.database_url)
+        with self._lock:
+            active = self._active_job()
+            if active is not None:
+                return active, False
+
+            self._sequence += 1
+            job = AnalyticsJob(self._sequence, incremental, requested_by)
+            self._jobs[job.id] = job
+            self._trim_history()
+            executor = self._ensure_executor()
+            try:
+                future = executor.submit(
+                    _run_job, job.sequence, job.id, settings.analytics_engine_file, db_path,
+                    settings.analytics_results_file, incremental
+                )
+            except BrokenProcessPool:
+                # The previous worker died; start over with a fresh pool
+                self._executor = None
+                future = self._ensure_executor().submit(
+                    _run_job, job.sequence, job.id, settings.analytics_engine_file, db_path,
+                    settings.analytics_results_file, incremental
+                )
+        future.add_done_callback(lambda done: self._finish(job, done))
+        return job, True
+
+    def _finish(self, job: AnalyticsJob, future: Future):
+        try:
+            summary = future.result()
+        except (AnalysisCancelled, CancelledError):
+            status, error, summary = 'cancelled', None, None
+        except BrokenProcessPool:
+            status, error, summary = 'failed', "Analytics worker process exited unexpectedly", None
+            with self._lock:
+                self._executor = None
+        except Exception as e:
+            status, error, summary = 'failed', str(e), None
+        else:
+            status, error = 'succeeded', None
+            # Swap the API's view of the results to the new file before reporting success
+            results_store.refresh()
+
+        with self._lock:
+            job.status, job.error, job.summary = status, error, summary
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Optional[AnalyticsJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[AnalyticsJob]:
+        """Ask a queued or running job to stop at its next stage; None for unknown jobs"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATUSES:
+                return job
+            job.cancel_requested = True
+            with self._cancelled_through.get_lock():
+                self._cancelled_through.value = max(self._cancelled_through.value, job.sequence)
+            return job
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+job_runner = AnalyticsJobRunner(history=settings.analytics_job_history)
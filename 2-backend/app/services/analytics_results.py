@@ -0,0 +1,214 @@
+"""
+Lazy loader for the analytics engine's results file.
+
+The results file is only re-read when its mtime, size or inode change. A
+change just locates the top-level sections (usage_analysis,
+pricing_analysis, ...). Each section is parsed the first time it is asked
+for, using orjson, and lists of records are kept as column-oriented
+ResultTables rather than lists of dicts. A lock makes concurrent requests
+after a refresh share one reload and one parse per section.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+from app.core.config import settings
+
+# With json.dump(indent=2), and only there, a top-level key starts a line
+# indented by exactly two spaces (JSON strings cannot contain raw newlines)
+_TOP_LEVEL_KEY = re.compile(rb'\n  "((?:[^"\\]|\\.)*)": ')
+
+# String columns with at most this share of distinct values are dictionary-encoded
+_CATEGORICAL_RATIO = 0.5
+
+
+def _loads(data: bytes):
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        # json.dump writes NaN for missing floats, which orjson rejects
+        return json.loads(data)
+
+
+class _CategoricalColumn:
+    """Repeated strings stored once, referenced by integer codes (-1 for None)"""
+
+    def __init__(self, values: List[Optional[str]]):
+        self.categories = sorted({v for v in values if v is not None})
+        lookup = {category: code for code, category in enumerate(self.categories)}
+        self.codes = np.array([-1 if v is None else lookup[v] for v in values], dtype=np.int32)
+
+    def __getitem__(self, index):
+        code = self.codes[index]
+        return None if code < 0 else self.categories[code]
+
+    def array(self) -> np.ndarray:
+        # Code -1 picks the trailing None
+        return np.array(self.categories + [None], dtype=object)[self.codes]
+
+
+def _compact_column(values: List[Any]):
+    """Numbers as numpy arrays, repetitive strings dictionary-encoded, anything else as a list"""
+    if values and all(isinstance(v, bool) for v in values):
+        return np.array(values, dtype=bool)
+    if values and all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return np.array(values, dtype=np.int64)
+    if values and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return np.array(values, dtype=np.float64)
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, str) for v in present) and len(set(present)) <= len(values) * _CATEGORICAL_RATIO:
+        return _CategoricalColumn(values)
+    return list(values)
+
+
+def _python_value(column, index: int):
+    value = column[index]
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class ResultTable:
+    """Column-oriented list of result records (e.g. usage_analysis)"""
+
+    def __init__(self, records: List[dict]):
+        self.length = len(records)
+        self.names: List[str] = list(records[0]) if records else []
+        self.columns = {
+            name: _compact_column([record.get(name) for record in records]) for name in self.names
+        }
+
+    def __len__(self) -> int:
+        return self.length
+
+    def column(self, name: str) -> np.ndarray:
+        """All values of one column as an array"""
+        column = self.columns[name]
+        if isinstance(column, _CategoricalColumn):
+            return column.array()
+        if isinstance(column, list):
+            return np.array(column, dtype=object)
+        return column
+
+    def record(self, index: int) -> dict:
+        return {name: _python_value(self.columns[name], index) for name in self.names}
+
+    def records(self, indices=None) -> List[dict]:
+        if indices is None:
+            indices = range(self.length)
+        return [self.record(int(i)) for i in indices]
+
+    def find(self, name: str, value) -> Optional[int]:
+        """Index of the first record whose column equals value"""
+        matches = np.flatnonzero(self.column(name) == value)
+        return int(matches[0]) if len(matches) else None
+
+
+class _Snapshot:
+    """One version of the results file: its signature, section spans and parsed sections"""
+
+    def __init__(self, signature, spans: Dict[str, Tuple[int, int]], sections: Dict[str, Any]):
+        self.signature = signature
+        self.spans = spans
+        self.sections = sections
+
+
+class AnalyticsResultsStore:
+    """Analytics results file, reloaded on change and parsed one section at a time"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = Lock()
+        # Replaced as a whole, so a reader never mixes sections of two files
+        self._snapshot = _Snapshot(None, {}, {})
+
+    def _stat_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _index(self, data: bytes, signature) -> _Snapshot:
+        """Record the byte span of every top-level section"""
+        spans: Dict[str, Tuple[int, int]] = {}
+        sections: Dict[str, Any] = {}
+        matches = list(_TOP_LEVEL_KEY.finditer(data))
+        if matches:
+            end_of_object = data.rstrip().rfind(b'}')
+            for i, match in enumerate(matches):
+                end = matches[i + 1].start() if i + 1 < len(matches) else end_of_object
+                spans[json.loads(b'"' + match.group(1) + b'"')] = (match.end(), end)
+        elif data.strip():
+            # Not written with indent=2: parse the whole file once
+            sections = {key: self._build(value) for key, value in _loads(data).items()}
+        return _Snapshot(signature, spans, sections)
+
+    def _load(self) -> _Snapshot:
+        with open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self._snapshot = self._index(f.read(), (stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        return self._snapshot
+
+    def refresh(self) -> bool:
+        """Re-index the file if it changed; returns whether results exist"""
+        signature = self._stat_signature()
+        if signature is None:
+            return False
+        if signature != self._snapshot.signature:
+            with self._lock:
+                if self._stat_signature() != self._snapshot.signature:
+                    self._load()
+        return True
+
+    @staticmethod
+    def _build(value):
+        if isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+            return ResultTable(value)
+        return value
+
+    def _read_span(self, snapshot: _Snapshot, start: int, end: int) -> Optional[bytes]:
+        """Bytes of a section, or None if the file was replaced since the snapshot was taken"""
+        with open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if (stat.st_mtime_ns, stat.st_size, stat.st_ino) != snapshot.signature:
+                return None
+            f.seek(start)
+            return f.read(end - start)
+
+    def section(self, name: str, default=None):
+        """A top-level section, parsed on first access after each change"""
+        if not self.refresh():
+            return default
+        snapshot = self._snapshot
+        if name in snapshot.sections:
+            return snapshot.sections[name]
+
+        with self._lock:
+            for _ in range(2):
+                snapshot = self._snapshot
+                if name in snapshot.sections:
+                    return snapshot.sections[name]
+                if name not in snapshot.spans:
+                    return default
+                data = self._read_span(snapshot, *snapshot.spans[name])
+                if data is not None:
+                    value = self._build(_loads(data.rstrip().rstrip(b',')))
+                    snapshot.sections[name] = value
+                    return value
+                # Replaced between refresh and read: re-index and retry once
+                self._load()
+            return self._snapshot.sections.get(name, default)
+
+    def table(self, name: str) -> ResultTable:
+        """A list-of-records section as a ResultTable (empty when missing)"""
+        value = self.section(name)
+        return value if isinstance(value, ResultTable) else ResultTable(value or [])
+
+
+results_store = AnalyticsResultsStore(settings.analytics_results_file)
@@ -0,0 +1,214 @@
+"""
+Read access to persisted analytics generations.
+
+The analytics engine writes each run as a generation in analytics_generations
+and flips exactly one to 'active' in a single transaction. Readers resolve the
+active generation once per request and filter every result table on its id,
+so a refresh never exposes a half-written run.
+
+Each generation also records a content hash per section (the API's ETags)
+and a hash per result row. Rows are matched across generations on their
+natural key, so a delta between two generations is a pair of anti-joins on
+(key, row_hash) without loading either generation.
+
+Lookups take the API's AsyncSession; the record helpers are plain functions
+of loaded rows.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import Select, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.models.analytics import (
+    AnalyticsGeneration, AnalyticsStageMetric, UsageAnalytics, ESIIDAnomaly, PricingAnalytics, CommissionAnalytics, MarketIntelligence
+)
+
+_PEER_DESCRIPTIONS = {
+    'zone_profile': 'zone and load profile', 'zone': 'zone', 'all': 'portfolio'
+}
+_RECOMMENDED_ACTIONS = {
+    'usage': 'Verify meter readings and recent changes in site operations',
+    'cost': 'Review the bill and contract rate for this ESIID'
+}
+
+
+# Natural key of the rows of each generation table
+ROW_KEYS = {
+    UsageAnalytics: ('account_name',),
+    ESIIDAnomaly: ('esi_id', 'account_name'),
+    PricingAnalytics: ('zone', 'rep'),
+    CommissionAnalytics: ('rep',)
+}
+
+
+async def get_active_generation(db: AsyncSession) -> Optional[AnalyticsGeneration]:
+    """The generation API reads are served from, or None before the first run"""
+    return await db.scalar(select(AnalyticsGeneration).where(
+        AnalyticsGeneration.status == 'active'
+    ).order_by(AnalyticsGeneration.id.desc()).limit(1))
+
+
+async def get_retained_generation(db: AsyncSession, generation_id: int) -> Optional[AnalyticsGeneration]:
+    """A completed generation still in the tables, or None once pruned"""
+    return await db.scalar(select(AnalyticsGeneration).where(
+        AnalyticsGeneration.id == generation_id,
+        AnalyticsGeneration.status.in_(('active', 'retired'))
+    ))
+
+
+async def generation_delta(db: AsyncSession, model, generation_id: int, since_id: int,
+                           criteria: Callable[[Any], list]) -> Tuple[Select, List[Dict[str, Any]]]:
+    """
+    Changes between two generations of a result table, within a filtered view.
+
+    criteria(table) returns the view's filter conditions on the table or an
+    alias of it. Returns a select of the rows of generation_id that are new or
+    changed since since_id and the keys of rows that left the view.
+    """
+    keys = ROW_KEYS[model]
+    current, previous = aliased(model), aliased(model)
+
+    def same_key(a, b):
+        return [getattr(a, key).is_not_distinct_from(getattr(b, key)) for key in keys]
+
+    changed = select(model).where(
+        model.generation_id == generation_id, *criteria(model),
+        ~exists().where(previous.generation_id == since_id, *criteria(previous),
+                        *same_key(previous, model), previous.row_hash == model.row_hash)
+    )
+    removed = await db.execute(select(*(getattr(previous, key) for key in keys)).where(
+        previous.generation_id == since_id, *criteria(previous),
+        ~exists().where(current.generation_id == generation_id, *criteria(current), *same_key(current, previous))
+    ).order_by(*(getattr(previous, key) for key in keys)))
+    return changed, [dict(zip(keys, row)) for row in removed]
+
+
+def usage_record(row: UsageAnalytics) -> dict:
+    """Usage analytics row in the engine's result format"""
+    return {
+        'account_name': row.account_name,
+        'esiid_count': row.esiid_count,
+        'total_usage_kwh': row.current_usage_kwh,
+        'avg_usage_kwh': row.avg_usage_kwh,
+        'predicted_usage_kwh': row.predicted_usage_kwh,
+        'usage_pattern': row.usage_pattern,
+        'efficiency_score': row.efficiency_score,
+        'anomaly_score': row.anomaly_score,
+        'seasonal_factor': row.seasonal_factor,
+        'cost_per_kwh': row.cost_per_kwh,
+        'total_monthly_bill': row.total_monthly_bill
+    }
+
+
+def anomaly_record(row: ESIIDAnomaly) -> dict:
+    """ESIID anomaly row with a readable description"""
+    score = row.usage_score if row.anomaly_type == 'usage' else row.cost_score
+    measure = 'Usage' if row.anomaly_type == 'usage' else 'Cost per kWh'
+    peers = _PEER_DESCRIPTIONS.get(row.peer_group, row.peer_group)
+    return {
+        'esi_id': row.esi_id,
+        'account_name': row.account_name,
+        'zone': row.zone,
+        'load_profile': row.load_profile,
+        'rep': row.rep,
+        'anomaly_type': row.anomaly_type,
+        'anomaly_score': row.anomaly_score,
+        'usage_score': row.usage_score,
+        'cost_score': row.cost_score,
+        'kwh_mo': row.kwh_mo,
+        'cost_per_kwh': row.cost_per_kwh,
+        'peer_group': row.peer_group,
+        'severity': row.severity,
+        'description': f"{measure} {'above' if (score or 0) > 0 else 'below'} {peers} peers "
+                       f"(robust z-score {score or 0:+.1f})",
+        'detected_at': row.analysis_date,
+        'recommended_action': _RECOMMENDED_ACTIONS.get(row.anomaly_type, 'Investigate this ESIID')
+    }
+
+
+def pricing_record(row: PricingAnalytics) -> dict:
+    """Pricing analytics row in the engine's result format"""
+    return {
+        'zone': row.zone,
+        'rep': row.rep,
+        'current_rate': row.current_rate,
+        'avg_rate': row.avg_rate,
+        'predicted_rate': row.predicted_rate,
+        'rate_trend': row.rate_trend,
+        'market_position': row.market_position,
+        'volatility': row.price_volatility,
+        'percentile_rank': row.percentile_rank,
+        'data_points': row.data_points
+    }
+
+
+def commission_record(row: CommissionAnalytics) -> dict:
+    """Commission analytics row in the engine's result format"""
+    return {
+        'rep': row.rep,
+        'total_commission': row.total_commission,
+        'avg_commission': row.average_commission_value,
+        'commission_count': row.commission_count,
+        'predicted_monthly_commission': row.predicted_monthly_commission,
+        'commission_trend': row.commission_trend,
+        'monthly_performance': row.monthly_performance or {}
+    }
+
+
+def market_intelligence_record(row: MarketIntelligence) -> dict:
+    """Market intelligence row in the engine's result format"""
+    return {
+        'market_overview': row.market_overview or {},
+        'zone_analysis': row.zone_analysis or {},
+        'rep_market_share': row.market_leaders or {},
+        'pricing_competitiveness': row.competitive_positioning or {},
+        'analysis_date': row.analysis_date.isoformat() if row.analysis_date else None
+    }
+
+
+def stage_metric_record(row: AnalyticsStageMetric) -> dict:
+    """Stage measurements of an engine run"""
+    return {
+        'stage': row.stage,
+        'location': row.location,
+        'offset_seconds': row.offset_seconds,
+        'wall_seconds': row.wall_seconds,
+        'cpu_seconds': row.cpu_seconds,
+        'peak_rss_mb': row.peak_rss_mb,
+        'rows_in': row.rows_in,
+        'rows_out': row.rows_out,
+        'groups': row.groups,
+        'groups_per_second': row.groups_per_second
+    }
+
+
+async def run_history(db: AsyncSession, limit: int) -> List[dict]:
+    """Totals and per-stage wall time of the most recent engine runs, newest first"""
+    generation_ids = list(await db.scalars(select(AnalyticsStageMetric.generation_id).distinct()
+                                           .order_by(AnalyticsStageMetric.generation_id.desc()).limit(limit)))
+    runs = {generation_id: None for generation_id in generation_ids}
+    stage_seconds = {generation_id: {} for generation_id in generation_ids}
+    rows = await db.scalars(select(AnalyticsStageMetric).where(
+        AnalyticsStageMetric.generation_id.in_(generation_ids)
+    ).order_by(AnalyticsStageMetric.generation_id.desc(), AnalyticsStageMetric.offset_seconds))
+    for row in rows:
+        if row.stage == 'total':
+            runs[row.generation_id] = row
+        else:
+            stage_seconds[row.generation_id][row.stage] = row.wall_seconds
+    return [
+        {
+            'generation_id': generation_id,
+            'analysis_date': total.analysis_date,
+            'run_mode': total.run_mode,
+            'wall_seconds': total.wall_seconds,
+            'cpu_seconds': total.cpu_seconds,
+            'peak_rss_mb': total.peak_rss_mb,
+            'rows_in': total.rows_in,
+            'rows_out': total.rows_out,
+            'stage_seconds': stage_seconds[generation_id]
+        }
+        for generation_id, total in runs.items() if total is not None
+    ]
@@ -0,0 +1,154 @@
+"""
+Robust per-ESIID anomaly scores.
+
+Every ESIID is scored against its peers, the meters sharing its zone and
+load profile, on two measures:
+
+- usage: log monthly kWh, so a meter using 10x its peers scores like one
+  using a tenth of them
+- cost: total bill per kWh
+
+Each score is a modified z-score, 0.6745 * (x - median) / MAD, so a handful
+of extreme meters cannot drag the baseline they are measured against. When
+more than half of a group is identical (MAD of 0) the mean absolute deviation
+stands in, scaled to match. Peer groups smaller than MIN_PEERS fall back to
+the whole zone, then to every meter.
+
+Grouped medians are computed for all groups at once from a single sort, so
+scoring is a handful of array passes whatever the number of groups.
+"""
+
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Smallest peer group a meter is scored against before falling back to a wider one
+MIN_PEERS = 5
+
+# Lowest |modified z| of each severity, highest first; 3.5 is the usual outlier cutoff
+SEVERITY_THRESHOLDS: Tuple[Tuple[str, float], ...] = (
+    ('critical', 8.0), ('high', 5.0), ('medium', 3.5), ('low', 2.5)
+)
+# Scores below this are not reported unless asked for
+FLAG_THRESHOLD = dict(SEVERITY_THRESHOLDS)['medium']
+
+PEER_LEVELS = ('zone_profile', 'zone', 'all')
+
+_MAD_SCALE = 0.6745
+_MEAN_AD_SCALE = 0.7979
+
+
+def _codes(*keys: Sequence) -> np.ndarray:
+    """Dense group codes for the combinations of the given key columns"""
+    labels = ['\x1f'.join('' if value is None else str(value) for value in row) for row in zip(*keys)]
+    return np.unique(np.array(labels, dtype=str), return_inverse=True)[1].reshape(-1)
+
+
+def _group_medians(codes: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """Median of values per group code (NaN for empty groups) from one sort"""
+    order = np.lexsort((values, codes))
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    sorted_values = values[order]
+    medians = np.full(n_groups, np.nan)
+    present = counts > 0
+    low = starts[present] + (counts[present] - 1) // 2
+    high = starts[present] + counts[present] // 2
+    medians[present] = (sorted_values[low] + sorted_values[high]) / 2
+    return medians
+
+
+def robust_z(values: np.ndarray, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Modified z-score of every value within its group.
+
+    Returns:
+        Tuple of (scores, peer count of each value's group); NaN values get
+        a NaN score and are not counted as peers
+    """
+    scores = np.full(len(values), np.nan)
+    peers = np.zeros(len(values), dtype=np.int64)
+    valid = np.isfinite(values)
+    if not valid.any():
+        return scores, peers
+
+    group = np.unique(codes[valid], return_inverse=True)[1].reshape(-1)
+    x = values[valid]
+    n_groups = int(group.max()) + 1
+    counts = np.bincount(group, minlength=n_groups)
+
+    median = _group_medians(group, x, n_groups)[group]
+    deviation = np.abs(x - median)
+    mad = _group_medians(group, deviation, n_groups)[group]
+    mean_ad = (np.bincount(group, weights=deviation, minlength=n_groups) / np.maximum(counts, 1))[group]
+
+    scale = np.where(mad > 0, mad / _MAD_SCALE, mean_ad / _MEAN_AD_SCALE)
+    scores[valid] = np.divide(x - median, scale, out=np.zeros_like(x), where=scale > 0)
+    peers[valid] = counts[group]
+    return scores, peers
+
+
+def _tiered_z(values: np.ndarray, tiers: Sequence[np.ndarray], min_peers: int):
+    """Score against the narrowest tier of peer groups with at least min_peers members"""
+    scores = np.full(len(values), np.nan)
+    level = np.full(len(values), len(tiers) - 1, dtype=np.int64)
+    pending = np.ones(len(values), dtype=bool)
+    for i, codes in enumerate(tiers):
+        tier_scores, peers = robust_z(values, codes)
+        use = pending & ((peers >= min_peers) | (i == len(tiers) - 1))
+        scores[use], level[use] = tier_scores[use], i
+        pending &= ~use
+    return scores, level
+
+
+def severity_of(scores: np.ndarray) -> np.ndarray:
+    """Severity label of each anomaly score ('normal' below the lowest threshold)"""
+    return np.select(
+        [scores >= threshold for _, threshold in SEVERITY_THRESHOLDS],
+        [name for name, _ in SEVERITY_THRESHOLDS], default='normal'
+    )
+
+
+def severity_bounds(severity: str) -> Tuple[float, Optional[float]]:
+    """Score range [low, high) of a severity, for range queries on the score index"""
+    thresholds = dict(SEVERITY_THRESHOLDS)
+    if severity not in thresholds:
+        raise ValueError(f"Unknown severity: {severity}")
+    names = [name for name, _ in SEVERITY_THRESHOLDS]
+    position = names.index(severity)
+    return thresholds[severity], (SEVERITY_THRESHOLDS[position - 1][1] if position else None)
+
+
+def score_esiids(zones: Sequence, load_profiles: Sequence, kwh_mo: Sequence, total_bill: Sequence,
+                 min_peers: int = MIN_PEERS) -> Dict[str, np.ndarray]:
+    """
+    Usage and cost anomaly scores of every ESIID against its peers.
+
+    Returns:
+        Dict of arrays aligned with the input: usage_score, cost_score,
+        cost_per_kwh, anomaly_score (the larger |score|), anomaly_type
+        ('usage' or 'cost'), severity and peer_group (one of PEER_LEVELS)
+    """
+    kwh = np.asarray(kwh_mo, dtype=np.float64)
+    bill = np.asarray(total_bill, dtype=np.float64)
+    n = len(kwh)
+
+    tiers = [_codes(zones, load_profiles), _codes(zones), np.zeros(n, dtype=np.int64)]
+    log_usage = np.log(np.where(kwh > 0, kwh, np.nan))
+    cost_per_kwh = np.divide(bill, kwh, out=np.full(n, np.nan), where=(kwh > 0) & (bill > 0))
+
+    usage_score, level = _tiered_z(log_usage, tiers, min_peers)
+    cost_score, _ = _tiered_z(cost_per_kwh, tiers, min_peers)
+
+    usage_abs = np.nan_to_num(np.abs(usage_score))
+    cost_abs = np.nan_to_num(np.abs(cost_score))
+    anomaly_score = np.maximum(usage_abs, cost_abs)
+    return {
+        'usage_score': usage_score,
+        'cost_score': cost_score,
+        'cost_per_kwh': cost_per_kwh,
+        'anomaly_score': anomaly_score,
+        'anomaly_type': np.where(cost_abs > usage_abs, 'cost', 'usage'),
+        'severity': severity_of(anomaly_score),
+        'peer_group': np.array(PEER_LEVELS, dtype=object)[level]
+    }
@@ -0,0 +1,209 @@
+"""
+Commission forecasting engine.
+
+Builds a series x month matrix of received commissions (per K_REP, or per
+K_REP/account pair) in one aggregate query and fits Holt's linear method to
+every series in a single vectorized pass (see app.services.forecasting).
+
+Fitted state is cached per series grouping. When new payment months arrive,
+the cached state is advanced with just those months; a full refit only
+happens when already-fitted months change or new series appear.
+"""
+
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.commission import Commission
+from app.services.forecasting import HoltState, fit_holt, period_index, shift_period
+
+# Fitted state per grouping: {'rep': {...}, 'account': {...}}
+_forecast_cache: Dict[str, dict] = {}
+_cache_lock = Lock()
+
+
+def _group_columns(by: str):
+    if by == 'account':
+        return [Commission.k_rep, Commission.account_name]
+    return [Commission.k_rep]
+
+
+def _fingerprint(db: Session, through_period: Optional[int] = None):
+    """Row count and amount total of received commissions, optionally up to a month"""
+    query = db.query(
+        func.count(Commission.id),
+        func.sum(Commission.actual_payment_amount)
+    ).filter(
+        Commission.commission_type == 'received',
+        Commission.actual_payment_amount.isnot(None),
+        Commission.payment_year.isnot(None)
+    )
+    if through_period is not None:
+        year, month = divmod(through_period, 100)
+        query = query.filter(
+            (Commission.payment_year < year) |
+            ((Commission.payment_year == year) & (Commission.payment_month <= month))
+        )
+    count, total = query.first()
+    return int(count or 0), round(float(total or 0), 2)
+
+
+def build_series_matrix(db: Session, by: str = 'rep', after_period: Optional[int] = None):
+    """
+    Aggregate received commissions into a series x month matrix.
+
+    Args:
+        db: Database session
+        by: 'rep' for one series per K_REP, 'account' for one per K_REP/account
+        after_period: Only include months after this yyyymm period
+
+    Returns:
+        Tuple (keys, first_period, matrix) where keys is a list of series
+        keys, first_period the yyyymm of column 0 and matrix is
+        (n_series x n_months) with NaN before each series' first payment
+    """
+    columns = _group_columns(by)
+    query = db.query(
+        *columns,
+        Commission.payment_year,
+        Commission.payment_month,
+        func.sum(Commission.actual_payment_amount)
+    ).filter(
+        Commission.commission_type == 'received',
+        Commission.actual_payment_amount.isnot(None),
+        Commission.payment_year.isnot(None)
+    )
+    if after_period is not None:
+        year, month = divmod(after_period, 100)
+        query = query.filter(
+            (Commission.payment_year > year) |
+            ((Commission.payment_year == year) & (Commission.payment_month > month))
+        )
+    rows = query.group_by(*columns, Commission.payment_year, Commission.payment_month).all()
+    if not rows:
+        return [], None, np.empty((0, 0))
+
+    n_key_columns = len(columns)
+    keys = np.array(['\x1f'.join(str(v or '') for v in r[:n_key_columns]) for r in rows], dtype=object)
+    periods = np.array([r[n_key_columns] * 100 + r[n_key_columns + 1] for r in rows], dtype=np.int64)
+    amounts = np.array([float(r[-1] or 0) for r in rows], dtype=np.float64)
+
+    unique_keys, series_index = np.unique(keys.astype(str), return_inverse=True)
+    first_period = int(periods.min())
+    month_index = period_index(periods, origin=first_period)
+    n_months = int(month_index.max()) + 1
+
+    matrix = np.zeros((len(unique_keys), n_months))
+    np.add.at(matrix, (series_index, month_index), amounts)
+
+    # Months before a series' first payment are "not started" rather than zero
+    first_month = np.full(len(unique_keys), n_months)
+    np.minimum.at(first_month, series_index, month_index)
+    matrix[np.arange(n_months)[None, :] < first_month[:, None]] = np.nan
+
+    return [tuple(k.split('\x1f')) for k in unique_keys], first_period, matrix
+
+
+def _fit(db: Session, by: str) -> dict:
+    keys, first_period, matrix = build_series_matrix(db, by)
+    last_period = shift_period(first_period, matrix.shape[1] - 1) if keys else None
+    return {
+        'keys': keys,
+        'key_index': {key: i for i, key in enumerate(keys)},
+        'state': fit_holt(matrix) if keys else None,
+        'last_period': last_period,
+        'fingerprint': _fingerprint(db, last_period) if keys else (0, 0.0),
+        'fitted_at': datetime.utcnow()
+    }
+
+
+def _advance(db: Session, by: str, cached: dict) -> Optional[dict]:
+    """Advance cached state with months after its last period, or None if a refit is needed"""
+    keys, first_period, matrix = build_series_matrix(db, by, after_period=cached['last_period'])
+    if not keys:
+        return cached
+    if any(key not in cached['key_index'] for key in keys):
+        return None
+
+    # Align the new months with the cached series order; gaps count as zero
+    gap = period_index(np.array([first_period]), origin=cached['last_period'])[0] - 1
+    aligned = np.zeros((len(cached['keys']), gap + matrix.shape[1]))
+    rows = np.array([cached['key_index'][key] for key in keys])
+    aligned[rows, gap:] = np.nan_to_num(matrix)
+    aligned[~cached['state'].started] = np.nan
+
+    last_period = shift_period(cached['last_period'], aligned.shape[1])
+    return {
+        **cached,
+        'state': cached['state'].update(aligned),
+        'last_period': last_period,
+        'fingerprint': _fingerprint(db, last_period),
+        'fitted_at': datetime.utcnow()
+    }
+
+
+def get_fitted_state(db: Session, by: str = 'rep') -> dict:
+    """Return cached fitted state for a grouping, updating it incrementally when data changed"""
+    with _cache_lock:
+        cached = _forecast_cache.get(by)
+        if cached is None or cached['state'] is None:
+            cached = _fit(db, by)
+        elif _fingerprint(db, cached['last_period']) != cached['fingerprint']:
+            # Already-fitted months changed: start over
+            cached = _fit(db, by)
+        elif _fingerprint(db) != cached['fingerprint']:
+            cached = _advance(db, by, cached) or _fit(db, by)
+        _forecast_cache[by] = cached
+        return cached
+
+
+def forecast_commissions(
+    db: Session,
+    by: str = 'rep',
+    horizon: int = 6,
+    confidence: float = 0.9,
+    k_rep: Optional[str] = None,
+    account_name: Optional[str] = None
+) -> List[dict]:
+    """Forecast received commissions for every series matching the filters"""
+    fitted = get_fitted_state(db, by)
+    state: Optional[HoltState] = fitted['state']
+    if state is None:
+        return []
+
+    selected = np.arange(len(fitted['keys']))
+    if k_rep:
+        selected = np.array([i for i in selected if k_rep.lower() in fitted['keys'][i][0].lower()], dtype=int)
+    if account_name and by == 'account':
+        selected = np.array([i for i in selected if account_name.lower() in fitted['keys'][i][1].lower()], dtype=int)
+
+    point, lower, upper = state.forecast(horizon, confidence)
+    periods = [shift_period(fitted['last_period'], h) for h in range(1, horizon + 1)]
+
+    forecasts = []
+    for i in selected:
+        key = fitted['keys'][i]
+        forecasts.append({
+            'k_rep': key[0],
+            'account_name': key[1] if by == 'account' else None,
+            'alpha': float(state.alpha[i]),
+            'beta': float(state.beta[i]),
+            'level': round(float(state.level[i]), 2),
+            'trend': round(float(state.trend[i]), 2),
+            'residual_std': round(float(state.sigma[i]), 2),
+            'last_period': fitted['last_period'],
+            'forecast': [
+                {
+                    'period': periods[h],
+                    'forecast': round(float(max(point[i, h], 0)), 2),
+                    'lower': round(float(max(lower[i, h], 0)), 2),
+                    'upper': round(float(max(upper[i, h], 0)), 2)
+                }
+                for h in range(horizon)
+            ]
+        })
+    return forecasts
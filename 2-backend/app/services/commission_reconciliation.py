@@ -0,0 +1,373 @@
+"""
+Commission reconciliation engine.
+
+Matches received commission payments (actual_payment_amount/actual_payment_date)
+against the monthly amounts on commission schedules (monthly_scheduled) for each
+(account, K_REP, month) and classifies every cell as matched, missed, short,
+over, duplicate or unscheduled.
+
+Both sides are flattened into aligned NumPy arrays and aggregated with
+np.unique/np.bincount, so a full book reconciliation is a handful of array
+passes rather than a per-account loop.
+
+Incremental runs recompute only the months whose stored results may be out
+of date:
+
+- months of commission rows created or updated since the last run
+- months whose stored results were marked stale: an ORM update that moves a
+  payment date, schedule or type, or deletes a commission, clears
+  reconciled_at on the results of the months the row used to count towards
+- months whose received payment count no longer matches the stored
+  payment_count, which catches payments deleted outside the ORM
+
+The commission import replaces the whole table; run a full reconciliation
+after it.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import event, func, inspect, or_, update
+from sqlalchemy.orm import Session
+
+from app.models.commission import Commission, CommissionReconciliation
+
+# Schedule JSON keys look like "Jan 25"
+MONTH_ABBREVIATIONS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
+}
+
+# Variances within a cent are treated as a match
+AMOUNT_TOLERANCE = 0.01
+
+
+def parse_schedule_period(label: str) -> Optional[int]:
+    """Convert a monthly_scheduled key such as 'Jan 25' to a yyyymm period"""
+    parts = str(label).split()
+    if len(parts) != 2 or parts[0] not in MONTH_ABBREVIATIONS:
+        return None
+    try:
+        year = int(parts[1])
+    except ValueError:
+        return None
+    if year < 100:
+        year += 2000
+    return year * 100 + MONTH_ABBREVIATIONS[parts[0]]
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def load_scheduled(db: Session, periods: Optional[Set[int]] = None) -> Dict[str, np.ndarray]:
+    """Flatten monthly_scheduled JSON into one array entry per (account, rep, month)"""
+    accounts: List[str] = []
+    reps: List[str] = []
+    row_periods: List[int] = []
+    amounts: List[float] = []
+
+    rows = db.query(
+        Commission.account_name,
+        Commission.k_rep,
+        Commission.monthly_scheduled
+    ).filter(
+        Commission.commission_type == 'scheduled',
+        Commission.monthly_scheduled.isnot(None)
+    ).all()
+
+    for account_name, k_rep, monthly_scheduled in rows:
+        if not isinstance(monthly_scheduled, dict):
+            continue
+        for label, value in monthly_scheduled.items():
+            period = parse_schedule_period(label)
+            amount = _to_float(value)
+            if period is None or amount is None or amount == 0:
+                continue
+            if periods is not None and period not in periods:
+                continue
+            accounts.append(account_name or '')
+            reps.append(k_rep or '')
+            row_periods.append(period)
+            amounts.append(amount)
+
+    return {
+        'account_name': np.array(accounts, dtype=object),
+        'k_rep': np.array(reps, dtype=object),
+        'period': np.array(row_periods, dtype=np.int64),
+        'amount': np.array(amounts, dtype=np.float64)
+    }
+
+
+def load_received(db: Session, periods: Optional[Set[int]] = None) -> Dict[str, np.ndarray]:
+    """Load received payments as aligned arrays keyed by payment month"""
+    query = db.query(
+        Commission.account_name,
+        Commission.k_rep,
+        Commission.actual_payment_amount,
+        Commission.payment_year,
+        Commission.payment_month
+    ).filter(
+        Commission.commission_type == 'received',
+        Commission.actual_payment_amount.isnot(None),
+        Commission.payment_year.isnot(None)
+    )
+
+    if periods:
+        # Narrow by year on the payment period index; exact months are masked below
+        query = query.filter(Commission.payment_year.in_({p // 100 for p in periods}))
+
+    rows = query.all()
+    received = {
+        'account_name': np.array([r[0] or '' for r in rows], dtype=object),
+        'k_rep': np.array([r[1] or '' for r in rows], dtype=object),
+        'period': np.array([r[3] * 100 + r[4] for r in rows], dtype=np.int64),
+        'amount': np.array([float(r[2]) for r in rows], dtype=np.float64)
+    }
+
+    if periods:
+        mask = np.isin(received['period'], np.fromiter(periods, dtype=np.int64))
+        received = {key: values[mask] for key, values in received.items()}
+
+    return received
+
+
+def reconcile(scheduled: Dict[str, np.ndarray], received: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Reconcile scheduled against received amounts.
+
+    Args:
+        scheduled: Arrays account_name, k_rep, period, amount from load_scheduled
+        received: Arrays account_name, k_rep, period, amount from load_received
+
+    Returns:
+        Dict of aligned arrays, one entry per (account, rep, period) cell
+    """
+    n_scheduled = len(scheduled['period'])
+
+    # Factorize the string keys once across both sides
+    accounts, account_codes = np.unique(
+        np.concatenate([scheduled['account_name'], received['account_name']]).astype(str),
+        return_inverse=True
+    )
+    reps, rep_codes = np.unique(
+        np.concatenate([scheduled['k_rep'], received['k_rep']]).astype(str),
+        return_inverse=True
+    )
+    periods = np.concatenate([scheduled['period'], received['period']])
+
+    pair_codes = account_codes.astype(np.int64) * len(reps) + rep_codes
+    cell_keys = pair_codes * 1_000_000 + periods
+    cells, cell_index = np.unique(cell_keys, return_inverse=True)
+    n_cells = len(cells)
+
+    scheduled_index = cell_index[:n_scheduled]
+    received_index = cell_index[n_scheduled:]
+
+    scheduled_amount = np.bincount(scheduled_index, weights=scheduled['amount'], minlength=n_cells)
+    received_amount = np.bincount(received_index, weights=received['amount'], minlength=n_cells)
+    payment_count = np.bincount(received_index, minlength=n_cells)
+
+    # A duplicate is a payment repeating an amount already paid for the same cell
+    duplicate_count = np.zeros(n_cells, dtype=np.int64)
+    if len(received_index):
+        cents = np.round(received['amount'] * 100).astype(np.int64)
+        payment_groups, group_sizes = np.unique(
+            np.stack([received_index, cents], axis=1), axis=0, return_counts=True
+        )
+        duplicate_count = np.bincount(
+            payment_groups[:, 0], weights=group_sizes - 1, minlength=n_cells
+        ).astype(np.int64)
+
+    variance = received_amount - scheduled_amount
+    # Repeated amounts are only a duplicate when together they overpay the month;
+    # two equal instalments that add up to the schedule are a match
+    status = np.select(
+        [
+            (duplicate_count > 0) & (variance > AMOUNT_TOLERANCE),
+            (scheduled_amount > 0) & (payment_count == 0),
+            (scheduled_amount <= 0) & (payment_count > 0),
+            variance < -AMOUNT_TOLERANCE,
+            variance > AMOUNT_TOLERANCE
+        ],
+        ['duplicate', 'missed', 'unscheduled', 'short', 'over'],
+        default='matched'
+    )
+
+    cell_pairs = cells // 1_000_000
+    return {
+        'account_name': accounts[cell_pairs // len(reps)] if n_cells else np.array([], dtype=str),
+        'k_rep': reps[cell_pairs % len(reps)] if n_cells else np.array([], dtype=str),
+        'period': cells % 1_000_000,
+        'scheduled_amount': np.round(scheduled_amount, 2),
+        'received_amount': np.round(received_amount, 2),
+        'variance': np.round(variance, 2),
+        'payment_count': payment_count,
+        'duplicate_count': duplicate_count,
+        'status': status
+    }
+
+
+def commission_periods(commission_type, payment_year, payment_month, monthly_scheduled) -> Set[int]:
+    """yyyymm months a commission row counts towards in a reconciliation"""
+    if commission_type == 'received' and payment_year is not None:
+        return {payment_year * 100 + payment_month}
+    if commission_type == 'scheduled' and isinstance(monthly_scheduled, dict):
+        return {p for p in (parse_schedule_period(label) for label in monthly_scheduled) if p}
+    return set()
+
+
+def find_changed_periods(db: Session, since: datetime) -> Set[int]:
+    """Months whose stored results may have changed since the run at `since`"""
+    # created_at/updated_at come from the database clock, which may only keep whole
+    # seconds (SQLite's CURRENT_TIMESTAMP); rows written in the second of the run are included
+    since = since.replace(microsecond=0) - timedelta(seconds=1)
+    changed = db.query(
+        Commission.commission_type,
+        Commission.payment_year,
+        Commission.payment_month,
+        Commission.monthly_scheduled
+    ).filter(
+        or_(Commission.created_at > since, Commission.updated_at > since)
+    ).all()
+
+    periods: Set[int] = set()
+    for row in changed:
+        periods.update(commission_periods(*row))
+
+    stale = db.query(CommissionReconciliation.period).filter(
+        CommissionReconciliation.reconciled_at.is_(None)
+    ).distinct()
+    periods.update(period for (period,) in stale)
+
+    # Payments removed without the ORM leave their month with fewer payments than recorded
+    counted = dict(db.query(
+        Commission.payment_year * 100 + Commission.payment_month,
+        func.count()
+    ).filter(
+        Commission.commission_type == 'received',
+        Commission.actual_payment_amount.isnot(None),
+        Commission.payment_year.isnot(None)
+    ).group_by(Commission.payment_year, Commission.payment_month).all())
+    recorded = db.query(
+        CommissionReconciliation.period,
+        func.sum(CommissionReconciliation.payment_count)
+    ).group_by(CommissionReconciliation.period).all()
+    periods.update(period for period, payments in recorded if counted.get(period, 0) != (payments or 0))
+    return periods
+
+
+def _mark_stale(connection, periods: Set[int]):
+    if periods:
+        connection.execute(
+            update(CommissionReconciliation.__table__)
+            .where(CommissionReconciliation.period.in_(periods))
+            .values(reconciled_at=None)
+        )
+
+
+@event.listens_for(Commission, "after_update")
+def _mark_moved_periods_stale(mapper, connection, target):
+    """Mark the months a commission no longer counts towards for the next incremental run"""
+    state = inspect(target)
+    old = {}
+    for name in ('commission_type', 'actual_payment_date', 'monthly_scheduled'):
+        history = state.attrs[name].history
+        old[name] = history.deleted[0] if history.deleted else getattr(target, name)
+    if not any(state.attrs[name].history.deleted for name in old):
+        return
+    payment_date = old['actual_payment_date']
+    _mark_stale(connection, commission_periods(
+        old['commission_type'], payment_date.year if payment_date else None,
+        payment_date.month if payment_date else None, old['monthly_scheduled']
+    ) - commission_periods(
+        target.commission_type, target.payment_year, target.payment_month, target.monthly_scheduled
+    ))
+
+
+@event.listens_for(Commission, "after_delete")
+def _mark_deleted_periods_stale(mapper, connection, target):
+    """Mark the months a deleted commission counted towards for the next incremental run"""
+    _mark_stale(connection, commission_periods(
+        target.commission_type, target.payment_year, target.payment_month, target.monthly_scheduled
+    ))
+
+
+def run_reconciliation(
+    db: Session,
+    periods: Optional[Iterable[int]] = None,
+    full: bool = False
+) -> dict:
+    """
+    Reconcile the commission book and store the results.
+
+    Args:
+        db: Database session
+        periods: Explicit yyyymm months to recompute
+        full: Recompute every month regardless of what changed
+
+    Without explicit periods the run is incremental: only months whose stored
+    results may have changed since the last reconciliation (see
+    find_changed_periods) are recomputed.
+    """
+    started = datetime.utcnow()
+    target: Optional[Set[int]] = set(periods) if periods else None
+
+    if target is None and not full:
+        last_run = db.query(func.max(CommissionReconciliation.reconciled_at)).scalar()
+        if last_run is not None:
+            target = find_changed_periods(db, last_run)
+            if not target:
+                return {
+                    'mode': 'incremental',
+                    'periods': [],
+                    'cells': 0,
+                    'status_counts': {},
+                    'duration_seconds': 0.0
+                }
+
+    scheduled = load_scheduled(db, target)
+    received = load_received(db, target)
+    result = reconcile(scheduled, received)
+
+    delete_query = db.query(CommissionReconciliation)
+    if target is not None:
+        delete_query = delete_query.filter(CommissionReconciliation.period.in_(target))
+    delete_query.delete(synchronize_session=False)
+
+    rows = [
+        {
+            'account_name': account_name,
+            'k_rep': k_rep,
+            'period': int(period),
+            'scheduled_amount': float(scheduled_amount),
+            'received_amount': float(received_amount),
+            'variance': float(variance),
+            'payment_count': int(payment_count),
+            'duplicate_count': int(duplicate_count),
+            'status': status,
+            'reconciled_at': started
+        }
+        for account_name, k_rep, period, scheduled_amount, received_amount, variance,
+            payment_count, duplicate_count, status in zip(
+                result['account_name'], result['k_rep'], result['period'],
+                result['scheduled_amount'], result['received_amount'], result['variance'],
+                result['payment_count'], result['duplicate_count'], result['status']
+            )
+    ]
+    if rows:
+        db.bulk_insert_mappings(CommissionReconciliation, rows)
+    db.commit()
+
+    statuses, counts = np.unique(result['status'], return_counts=True)
+    return {
+        'mode': 'full' if target is None else 'incremental',
+        'periods': sorted(int(p) for p in np.unique(result['period'])) if target is None else sorted(target),
+        'cells': len(rows),
+        'status_counts': {str(s): int(c) for s, c in zip(statuses, counts)},
+        'duration_seconds': round((datetime.utcnow() - started).total_seconds(), 3)
+    }
@@ -0,0 +1,146 @@
+"""
+Vectorized exponential smoothing for many series at once.
+
+Series are rows of a (n_series x n_periods) matrix. Holt's linear method is
+fitted for every row in a single pass over the periods: each step updates
+the level/trend of every series under every candidate (alpha, beta) pair, and
+each series keeps the pair with the lowest one-step-ahead squared error.
+"""
+
+from statistics import NormalDist
+from typing import Optional
+
+import numpy as np
+
+# Candidate smoothing parameters evaluated for every series
+ALPHA_GRID = (0.1, 0.2, 0.3, 0.5, 0.7, 0.9)
+BETA_GRID = (0.01, 0.05, 0.1, 0.2, 0.3)
+
+
+class HoltState:
+    """Fitted Holt state for a batch of series, updatable as new periods arrive"""
+
+    def __init__(self, level, trend, alpha, beta, sse, n_errors, started):
+        self.level = level
+        self.trend = trend
+        self.alpha = alpha
+        self.beta = beta
+        self.sse = sse
+        self.n_errors = n_errors
+        self.started = started
+
+    @property
+    def sigma(self) -> np.ndarray:
+        """One-step-ahead residual standard deviation per series"""
+        return np.sqrt(self.sse / np.maximum(self.n_errors, 1))
+
+    def update(self, values: np.ndarray) -> "HoltState":
+        """Advance every series by the new periods in `values` (n_series x k)"""
+        level, trend = self.level.copy(), self.trend.copy()
+        sse, n_errors, started = self.sse.copy(), self.n_errors.copy(), self.started.copy()
+        for t in range(values.shape[1]):
+            level, trend, sse, n_errors, started = _holt_step(
+                values[:, t], level, trend, self.alpha, self.beta, sse, n_errors, started
+            )
+        return HoltState(level, trend, self.alpha, self.beta, sse, n_errors, started)
+
+    def forecast(self, horizon: int, confidence: float = 0.9):
+        """
+        Forecast `horizon` periods ahead for every series.
+
+        Returns:
+            Tuple of (point, lower, upper) arrays shaped (n_series x horizon)
+        """
+        steps = np.arange(1, horizon + 1)
+        point = self.level[:, None] + self.trend[:, None] * steps[None, :]
+
+        # Holt prediction variance: sigma^2 * (1 + sum_{j<h} (alpha * (1 + j*beta))^2)
+        j = np.arange(horizon)
+        weights = (self.alpha[:, None] * (1 + j[None, :] * self.beta[:, None])) ** 2
+        weights[:, 0] = 0
+        variance = self.sigma[:, None] ** 2 * (1 + np.cumsum(weights, axis=1))
+
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        half_width = z * np.sqrt(variance)
+        return point, point - half_width, point + half_width
+
+
+def _holt_step(y, level, trend, alpha, beta, sse, n_errors, started):
+    """One Holt recursion step for arrays of any matching shape"""
+    observed = ~np.isnan(y)
+    y = np.where(observed, y, 0.0)
+
+    # A series starts at its first observation: level = y, trend = 0
+    first = observed & ~started
+    active = started
+
+    prediction = level + trend
+    error = y - prediction
+    new_level = prediction + alpha * error
+    new_trend = trend + alpha * beta * error
+
+    sse = np.where(active, sse + error ** 2, sse)
+    n_errors = np.where(active, n_errors + 1, n_errors)
+    level = np.where(active, new_level, np.where(first, y, level))
+    trend = np.where(active, new_trend, trend)
+    started = started | first
+    return level, trend, sse, n_errors, started
+
+
+def fit_holt(values: np.ndarray, alphas=ALPHA_GRID, betas=BETA_GRID) -> HoltState:
+    """
+    Fit Holt's linear method to every row of `values`.
+
+    Args:
+        values: (n_series x n_periods) matrix; NaN marks periods before a
+            series starts (later NaNs count as zero)
+        alphas: Candidate level smoothing factors
+        betas: Candidate trend smoothing factors
+
+    Returns:
+        HoltState holding the best parameters and final state per series
+    """
+    n_series = values.shape[0]
+    grid_alpha, grid_beta = np.meshgrid(np.asarray(alphas, float), np.asarray(betas, float))
+    alpha = grid_alpha.ravel()[:, None]
+    beta = grid_beta.ravel()[:, None]
+    n_grid = alpha.shape[0]
+
+    shape = (n_grid, n_series)
+    level = np.zeros(shape)
+    trend = np.zeros(shape)
+    sse = np.zeros(shape)
+    n_errors = np.zeros(shape, dtype=np.int64)
+    started = np.zeros(shape, dtype=bool)
+
+    for t in range(values.shape[1]):
+        level, trend, sse, n_errors, started = _holt_step(
+            np.broadcast_to(values[:, t], shape), level, trend, alpha, beta,
+            sse, n_errors, started
+        )
+
+    best = np.argmin(sse, axis=0)
+    columns = np.arange(n_series)
+    return HoltState(
+        level=level[best, columns],
+        trend=trend[best, columns],
+        alpha=alpha[best, 0],
+        beta=beta[best, 0],
+        sse=sse[best, columns],
+        n_errors=n_errors[best, columns],
+        started=started[best, columns]
+    )
+
+
+def period_index(periods: np.ndarray, origin: Optional[int] = None) -> np.ndarray:
+    """Convert yyyymm periods to consecutive month numbers (relative to `origin`)"""
+    months = (periods // 100) * 12 + (periods % 100 - 1)
+    if origin is not None:
+        months = months - ((origin // 100) * 12 + (origin % 100 - 1))
+    return months
+
+
+def shift_period(period: int, months: int) -> int:
+    """Add `months` to a yyyymm period"""
+    total = (period // 100) * 12 + (period % 100 - 1) + months
+    return (total // 12) * 100 + total % 12 + 1
@@ -0,0 +1,213 @@
+"""
+Market cube: usage and pricing rolled up along any combination of dimensions.
+
+The analytics engine materializes the cube's base cells with each generation
+(market_cube table): usage cells per zone, REP, load profile, management
+company and month, and pricing cells per zone, REP, load profile and month.
+Every measure is kept as additive parts (counts, sums, extremes), so any
+coarser view is a rollup of the base cells and no query touches raw ESIID or
+pricing rows.
+
+Cells are loaded once per generation with each dimension dictionary-encoded.
+A rollup filters on the codes, combines the requested dimensions' codes into
+one group key and aggregates every measure with a single bincount per part.
+"""
+
+from threading import Lock
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.analytics import MarketCubeCell
+
+DIMENSIONS = ('zone', 'rep', 'load_profile', 'management_company', 'month')
+
+# Dimensions each fact's cells carry
+FACT_DIMENSIONS = {
+    'usage': DIMENSIONS,
+    'pricing': ('zone', 'rep', 'load_profile', 'month')
+}
+
+# Measure -> fact it is computed from
+MEASURES = {
+    'esiid_count': 'usage',
+    'total_kwh': 'usage',
+    'total_bill': 'usage',
+    'avg_kwh': 'usage',
+    'cost_per_kwh': 'usage',
+    'rate_count': 'pricing',
+    'avg_rate': 'pricing',
+    'min_rate': 'pricing',
+    'max_rate': 'pricing'
+}
+
+DEFAULT_MEASURES = ('esiid_count', 'total_kwh', 'total_bill')
+
+# Generations whose cubes are kept (the active one and the one it replaced)
+_CACHED_GENERATIONS = 2
+
+
+def parse_list(text: Optional[str]) -> List[str]:
+    """Comma-separated names, blanks dropped"""
+    return [part.strip() for part in (text or '').split(',') if part.strip()]
+
+
+def parse_filters(text: Optional[str]) -> Dict[str, List[str]]:
+    """Filters written as dim:value|value,dim:value"""
+    filters: Dict[str, List[str]] = {}
+    for part in parse_list(text):
+        dim, separator, values = part.partition(':')
+        if not separator or not values:
+            raise ValueError(f"Filter '{part}' must look like dimension:value")
+        filters.setdefault(dim.strip(), []).extend(value.strip() for value in values.split('|'))
+    return filters
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(numerator, denominator, out=np.full(len(numerator), np.nan), where=denominator > 0)
+
+
+class _FactCells:
+    """Base cells of one fact with dictionary-encoded dimensions"""
+
+    def __init__(self, fact: str, rows: Sequence[MarketCubeCell]):
+        self.dimensions = FACT_DIMENSIONS[fact]
+        self.labels: Dict[str, list] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        for dim in self.dimensions:
+            lookup: Dict[object, int] = {}
+            self.codes[dim] = np.array(
+                [lookup.setdefault(getattr(row, dim), len(lookup)) for row in rows], dtype=np.int64
+            )
+            self.labels[dim] = list(lookup)
+
+        def column(name):
+            return np.array([getattr(row, name) for row in rows], dtype=np.float64)
+
+        # Missing sums (all-NULL bills) add nothing, as in SQL
+        self.count = np.nan_to_num(column('record_count'))
+        self.kwh = np.nan_to_num(column('kwh_sum'))
+        self.bill = np.nan_to_num(column('bill_sum'))
+        self.rate_sum = np.nan_to_num(column('rate_sum'))
+        self.rate_min = column('rate_min')
+        self.rate_max = column('rate_max')
+
+    def rollup(self, dims: Sequence[str], filters: Dict[str, List[str]]):
+        """
+        Aggregate the cells matching filters by dims.
+
+        Returns:
+            Tuple of (group keys as tuples of dimension values, measure arrays by name)
+        """
+        rows = np.arange(len(self.count))
+        for dim, values in filters.items():
+            allowed = [code for code, label in enumerate(self.labels[dim]) if label in values]
+            rows = rows[np.isin(self.codes[dim][rows], allowed)]
+        if not len(rows):
+            return [], {}
+
+        key = np.zeros(len(rows), dtype=np.int64)
+        for dim in dims:
+            key = key * len(self.labels[dim]) + self.codes[dim][rows]
+        _, first, group = np.unique(key, return_index=True, return_inverse=True)
+        group = group.reshape(-1)
+        n_groups = len(first)
+
+        def total(values):
+            return np.bincount(group, weights=values[rows], minlength=n_groups)
+
+        rate_min = np.full(n_groups, np.nan)
+        rate_max = np.full(n_groups, np.nan)
+        np.fmin.at(rate_min, group, self.rate_min[rows])
+        np.fmax.at(rate_max, group, self.rate_max[rows])
+
+        count, kwh, bill, rate_sum = total(self.count), total(self.kwh), total(self.bill), total(self.rate_sum)
+        measures = {
+            'esiid_count': count,
+            'total_kwh': kwh,
+            'total_bill': bill,
+            'avg_kwh': _ratio(kwh, count),
+            'cost_per_kwh': _ratio(bill, kwh),
+            'rate_count': count,
+            'avg_rate': _ratio(rate_sum, count),
+            'min_rate': rate_min,
+            'max_rate': rate_max
+        }
+        keys = [
+            tuple(self.labels[dim][self.codes[dim][rows[i]]] for dim in dims) for i in first
+        ]
+        return keys, measures
+
+
+class MarketCube:
+    """Base cells of one generation, answering rollup queries"""
+
+    def __init__(self, rows: Sequence[MarketCubeCell]):
+        self.facts = {
+            fact: _FactCells(fact, [row for row in rows if row.fact == fact]) for fact in FACT_DIMENSIONS
+        }
+
+    def query(self, dims: Sequence[str], measures: Sequence[str] = DEFAULT_MEASURES,
+              filters: Optional[Dict[str, List[str]]] = None) -> List[dict]:
+        """
+        One record per combination of dims values, with the requested measures.
+
+        Measures of different facts are joined on the dimension values; a
+        measure is None where its fact has no cells. Raises ValueError for
+        unknown names or a dimension the measures' fact does not carry.
+        """
+        filters = filters or {}
+        for name in list(dims) + list(filters):
+            if name not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension '{name}'; use one of {', '.join(DIMENSIONS)}")
+        for name in measures:
+            if name not in MEASURES:
+                raise ValueError(f"Unknown measure '{name}'; use one of {', '.join(MEASURES)}")
+        if len(set(dims)) != len(dims):
+            raise ValueError("Dimensions must not repeat")
+
+        facts = list(dict.fromkeys(MEASURES[name] for name in measures))
+        for fact in facts:
+            for name in list(dims) + list(filters):
+                if name not in FACT_DIMENSIONS[fact]:
+                    raise ValueError(f"'{name}' is not a dimension of {fact} measures")
+
+        cells: Dict[tuple, dict] = {}
+        for fact in facts:
+            keys, values = self.facts[fact].rollup(dims, filters)
+            fact_measures = [name for name in measures if MEASURES[name] == fact]
+            for i, key in enumerate(keys):
+                cell = cells.setdefault(key, {})
+                for name in fact_measures:
+                    value = float(values[name][i])
+                    cell[name] = None if np.isnan(value) else (int(value) if name.endswith('_count') else value)
+
+        def sort_key(key):
+            return tuple((value is not None, value or '') for value in key)
+
+        return [
+            {**dict(zip(dims, key)), **{name: cells[key].get(name) for name in measures}}
+            for key in sorted(cells, key=sort_key)
+        ]
+
+
+_cubes: Dict[int, MarketCube] = {}
+_lock = Lock()
+
+
+def get_market_cube(db: Session, generation_id: int) -> MarketCube:
+    """Cube of a generation, loaded on first use"""
+    cube = _cubes.get(generation_id)
+    if cube is not None:
+        return cube
+    with _lock:
+        cube = _cubes.get(generation_id)
+        if cube is None:
+            cube = MarketCube(
+                db.query(MarketCubeCell).filter(MarketCubeCell.generation_id == generation_id).all()
+            )
+            _cubes[generation_id] = cube
+            for stale in sorted(_cubes)[:-_CACHED_GENERATIONS]:
+                del _cubes[stale]
+        return cube
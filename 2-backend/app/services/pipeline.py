@@ -0,0 +1,197 @@
+"""
+DAG executor for pipelines of CPU-bound stages.
+
+A pipeline is a set of named stages with dependencies. Pooled stages run in a
+process pool as soon as their dependencies finish; local stages run in the
+calling process, in between, as soon as theirs do. A stage is called with its
+dependencies' outputs in the order it lists them. Local stages get the very
+objects earlier stages returned, so only the inputs and outputs of pooled
+stages are ever pickled; pipelines keep large frames in the process that
+loads them and ship results rather than raw rows.
+
+Every stage is measured where it runs (wall time, CPU time and the process's
+peak RSS), so the timings show true overlap, and a stage can count the rows
+it read and wrote. Without a multiprocessing context, or with a single
+worker, every stage runs in the calling process in dependency order and the
+results are the same.
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+
+def peak_rss_mb() -> Optional[float]:
+    """High-water resident set size of this process in MB, or None where unsupported"""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class StageMeter:
+    """Wall time, CPU time and peak RSS of a stage running in the current process"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._cpu = time.process_time()
+
+    def finish(self) -> dict:
+        return {
+            'started_at': self.started_at,
+            'seconds': round(time.time() - self.started_at, 4),
+            'cpu_seconds': round(time.process_time() - self._cpu, 4),
+            'peak_rss_mb': peak_rss_mb()
+        }
+
+
+class Stage:
+    """One pipeline step"""
+
+    def __init__(self, name: str, run: Callable, deps: Sequence[str] = (), pooled: bool = False,
+                 counts: Optional[Callable[..., dict]] = None):
+        # Pooled stages must be picklable: module-level functions with picklable arguments
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.pooled = pooled
+        # Called in the calling process with (output, *inputs); returns rows_in, rows_out and groups
+        self.counts = counts
+
+
+def _measured_call(run: Callable, args: tuple) -> Tuple[int, dict, Any]:
+    """Run a stage in a worker, returning (pid, measurements, output)"""
+    meter = StageMeter()
+    output = run(*args)
+    return os.getpid(), meter.finish(), output
+
+
+def _ordered(stages: Sequence[Stage]) -> List[Stage]:
+    """Stages in a dependency-respecting order; ValueError on unknown dependencies or cycles"""
+    by_name = {stage.name: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Stage names must be unique")
+    ordered, state = [], {}
+
+    def visit(stage: Stage, path: Tuple[str, ...]):
+        if state.get(stage.name) == 'done':
+            return
+        if state.get(stage.name) == 'visiting':
+            raise ValueError(f"Pipeline cycle: {' -> '.join(path + (stage.name,))}")
+        state[stage.name] = 'visiting'
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+            visit(by_name[dep], path + (stage.name,))
+        state[stage.name] = 'done'
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage, ())
+    return ordered
+
+
+class Pipeline:
+    """Runs stages as their dependencies complete"""
+
+    def __init__(self, stages: Sequence[Stage], workers: int = 1, mp_context=None,
+                 initializer: Optional[Callable] = None, initargs: tuple = (),
+                 on_start: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            stages: The pipeline's stages
+            workers: Size of the process pool for pooled stages
+            mp_context: multiprocessing context for the pool; None runs everything in-process
+            initializer: Called with initargs in each worker (or once in-process) before any stage
+            on_start: Called in the calling process as each stage starts; an exception it raises
+                cancels the stages not yet finished and propagates
+        """
+        self.stages = _ordered(stages)
+        self.workers = workers
+        self.mp_context = mp_context
+        self.initializer = initializer
+        self.initargs = initargs
+        self.on_start = on_start
+        self.timings: Dict[str, dict] = {}
+        self.wall_seconds: Optional[float] = None
+
+    @property
+    def parallel(self) -> bool:
+        return self.mp_context is not None and self.workers > 1 and any(stage.pooled for stage in self.stages)
+
+    def _record(self, stage: Stage, measurements: dict, pid: int, outputs: Dict[str, Any]):
+        timing = {
+            **measurements,
+            'location': 'pool' if stage.pooled and self.parallel else 'local',
+            'pid': pid,
+            'rows_in': None, 'rows_out': None, 'groups': None
+        }
+        if stage.counts:
+            timing.update(stage.counts(outputs[stage.name], *(outputs[dep] for dep in stage.deps)))
+        self.timings[stage.name] = timing
+
+    def _run_local(self, stage: Stage, outputs: Dict[str, Any]):
+        if self.on_start:
+            self.on_start(stage.name)
+        meter = StageMeter()
+        outputs[stage.name] = stage.run(*(outputs[dep] for dep in stage.deps))
+        self._record(stage, meter.finish(), os.getpid(), outputs)
+
+    def run(self) -> Dict[str, Any]:
+        """Run every stage; returns outputs by stage name (timings are left in self.timings)"""
+        started = time.time()
+        outputs: Dict[str, Any] = {}
+        try:
+            if not self.parallel:
+                if self.initializer:
+                    self.initializer(*self.initargs)
+                for stage in self.stages:
+                    self._run_local(stage, outputs)
+            else:
+                self._run_parallel(outputs)
+        finally:
+            self.wall_seconds = round(time.time() - started, 4)
+        return outputs
+
+    def _run_parallel(self, outputs: Dict[str, Any]):
+        pending = list(self.stages)
+        running: Dict[Future, Stage] = {}
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=self.mp_context,
+            initializer=self.initializer, initargs=self.initargs
+        )
+        try:
+            while pending or running:
+                ready = [stage for stage in pending if all(dep in outputs for dep in stage.deps)]
+                # Queue every ready pooled stage before working on local ones
+                for stage in [stage for stage in ready if stage.pooled]:
+                    pending.remove(stage)
+                    if self.on_start:
+                        self.on_start(stage.name)
+                    args = tuple(outputs[dep] for dep in stage.deps)
+                    running[executor.submit(_measured_call, stage.run, args)] = stage
+                local = [stage for stage in ready if not stage.pooled]
+                if local:
+                    pending.remove(local[0])
+                    self._run_local(local[0], outputs)
+                    continue
+                if not running:
+                    raise RuntimeError("Pipeline stalled with stages pending")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    pid, measurements, output = future.result()
+                    outputs[stage.name] = output
+                    self._record(stage, measurements, pid, outputs)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
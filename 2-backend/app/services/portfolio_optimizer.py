@@ -0,0 +1,348 @@
+"""
+Portfolio cost optimizer: assign groups of meters to daily pricing offers.
+
+A unit is one account's ESIIDs in one zone and load profile, the meters a
+single contract would cover. An offer (a daily_pricing row from the latest
+matrix) is eligible for a unit when its zone matches, its load profile
+matches or either side's is unset, its term is allowed, the unit's annual MWh lies within
+min_mwh/max_mwh and the unit has no more than max_meters meters. The annual
+cost of a unit under an offer is MWh x daily_rate ($/MWh) plus 12 x meters x
+meter_fee.
+
+Without portfolio constraints the cheapest eligible offer for each unit is
+optimal, and it is found in one vectorized pass per zone; units are costed in
+chunks so the units x offers matrix never exists in full. Each unit keeps its
+cheapest few candidates. An optional cap on the share of portfolio MWh any one
+REP may carry couples the units:
+
+- The greedy pass assigns units in order of regret (what losing their best
+  offer would cost), each to its cheapest candidate with room under the cap.
+- The LP refinement (scipy's HiGHS, when installed) solves the relaxation over
+  the same candidates. Its solution is rounded with the same capacity-aware
+  pass and kept when it beats the greedy assignment.
+"""
+
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.daily_pricing import DailyPricing
+from app.models.esiid import ESIID
+
+try:
+    from scipy.optimize import linprog
+    from scipy.sparse import csr_matrix
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+# Cheapest eligible offers kept per unit for the capacity-aware passes
+CANDIDATES_PER_UNIT = 5
+
+# Upper bound on units x offers cells costed at once
+_CHUNK_CELLS = 4_000_000
+
+
+class Units:
+    """Meter groups to be priced, as parallel arrays"""
+
+    def __init__(self, account_names: Sequence[str], zones: Sequence[Optional[str]],
+                 load_profiles: Sequence[Optional[str]], meters, annual_mwh, current_cost):
+        self.account_names = list(account_names)
+        self.zones = np.array(zones, dtype=object)
+        self.load_profiles = np.array(load_profiles, dtype=object)
+        self.meters = np.asarray(meters, dtype=np.float64)
+        self.annual_mwh = np.asarray(annual_mwh, dtype=np.float64)
+        self.current_cost = np.asarray(current_cost, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.account_names)
+
+
+class Offers:
+    """Daily pricing offers as parallel arrays"""
+
+    def __init__(self, rows):
+        self.ids = np.array([r.id for r in rows], dtype=np.int64)
+        self.zones = np.array([r.zone for r in rows], dtype=object)
+        self.load_profiles = np.array([r.load_profile for r in rows], dtype=object)
+        self.reps = np.array([r.rep for r in rows], dtype=object)
+        self.term_months = np.array([np.nan if r.term_months is None else r.term_months for r in rows])
+        self.rates = np.array([r.daily_rate for r in rows], dtype=np.float64)
+        self.meter_fees = np.array([r.meter_fee or 0.0 for r in rows], dtype=np.float64)
+        # Missing limits do not restrict
+        self.min_mwh = np.array([-np.inf if r.min_mwh is None else r.min_mwh for r in rows])
+        self.max_mwh = np.array([np.inf if r.max_mwh is None else r.max_mwh for r in rows])
+        self.max_meters = np.array([np.inf if r.max_meters is None else r.max_meters for r in rows])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def load_units(db: Session, account_names: Optional[List[str]] = None, esi_ids: Optional[List[str]] = None,
+               zone: Optional[str] = None) -> Units:
+    """Group the selected ESIIDs into units (account, zone, load profile)"""
+    annual_kwh = func.coalesce(ESIID.kwh_yr, ESIID.kwh_mo * 12)
+    query = db.query(
+        ESIID.account_name, ESIID.zone, ESIID.load_profile,
+        func.count(ESIID.id), func.sum(annual_kwh), func.sum(ESIID.total_bill)
+    ).filter(ESIID.kwh_mo.isnot(None), ESIID.kwh_mo > 0)
+    if account_names:
+        query = query.filter(ESIID.account_name.in_(account_names))
+    if esi_ids:
+        query = query.filter(ESIID.esi_id.in_(esi_ids))
+    if zone:
+        query = query.filter(ESIID.zone == zone)
+    rows = query.group_by(ESIID.account_name, ESIID.zone, ESIID.load_profile).all()
+    return Units(
+        [r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows],
+        [r[3] for r in rows], [(r[4] or 0) / 1000 for r in rows],
+        # total_bill is monthly
+        [(r[5] or 0) * 12 for r in rows]
+    )
+
+
+def load_offers(db: Session, zones: Optional[Sequence[str]] = None,
+                term_months: Optional[Sequence[float]] = None) -> Offers:
+    """Active offers from the most recent pricing date"""
+    latest = db.query(func.max(DailyPricing.effective_date)).scalar()
+    query = db.query(DailyPricing).filter(
+        DailyPricing.is_active.isnot(False),
+        DailyPricing.daily_rate.isnot(None),
+        DailyPricing.daily_rate > 0
+    )
+    if latest is not None:
+        query = query.filter(DailyPricing.effective_date == latest)
+    if zones is not None:
+        query = query.filter(DailyPricing.zone.in_(list(zones)))
+    if term_months:
+        query = query.filter(DailyPricing.term_months.in_(list(term_months)))
+    return Offers(query.all())
+
+
+def candidate_offers(units: Units, offers: Offers, k: int = CANDIDATES_PER_UNIT):
+    """
+    Cheapest k eligible offers per unit.
+
+    Returns:
+        Tuple of (offer positions, annual costs), both (n_units x k) and
+        sorted by cost; ineligible slots have cost inf and offer -1
+    """
+    n = len(units)
+    candidates = np.full((n, k), -1, dtype=np.int64)
+    costs = np.full((n, k), np.inf)
+
+    profile_codes: Dict[object, int] = {}
+    # -1 for an unset profile, which matches any
+    unit_profiles = np.array([-1 if p is None else profile_codes.setdefault(p, len(profile_codes))
+                              for p in units.load_profiles], dtype=np.int64)
+    offer_profiles = np.array([-1 if p is None else profile_codes.setdefault(p, len(profile_codes))
+                               for p in offers.load_profiles], dtype=np.int64)
+
+    for zone in set(units.zones.tolist()):
+        unit_rows = np.flatnonzero(units.zones == zone)
+        offer_columns = np.flatnonzero(offers.zones == zone)
+        if not len(offer_columns):
+            continue
+        rates, fees = offers.rates[offer_columns], offers.meter_fees[offer_columns]
+        min_mwh, max_mwh = offers.min_mwh[offer_columns], offers.max_mwh[offer_columns]
+        max_meters, profiles = offers.max_meters[offer_columns], offer_profiles[offer_columns]
+        width = min(k, len(offer_columns))
+
+        chunk = max(1, _CHUNK_CELLS // len(offer_columns))
+        for start in range(0, len(unit_rows), chunk):
+            rows = unit_rows[start:start + chunk]
+            mwh = units.annual_mwh[rows][:, None]
+            meters = units.meters[rows][:, None]
+            unit_profile = unit_profiles[rows][:, None]
+            cost = mwh * rates + 12 * meters * fees
+            eligible = (
+                (mwh >= min_mwh) & (mwh <= max_mwh) & (meters <= max_meters) &
+                ((profiles == -1) | (unit_profile == -1) | (profiles == unit_profile))
+            )
+            cost[~eligible] = np.inf
+
+            if width < cost.shape[1]:
+                best = np.argpartition(cost, width - 1, axis=1)[:, :width]
+            else:
+                best = np.broadcast_to(np.arange(width), (len(rows), width))
+            best_cost = np.take_along_axis(cost, best, axis=1)
+            order = np.argsort(best_cost, axis=1, kind='stable')
+            best, best_cost = np.take_along_axis(best, order, axis=1), np.take_along_axis(best_cost, order, axis=1)
+
+            candidates[rows, :width] = np.where(np.isfinite(best_cost), offer_columns[best], -1)
+            costs[rows, :width] = best_cost
+    return candidates, costs
+
+
+def _assign_with_cap(order, preferences, candidates, costs, mwh, offer_reps, cap):
+    """Give each unit, in order, its first preferred candidate whose REP stays under the cap"""
+    assigned = np.full(len(mwh), -1, dtype=np.int64)
+    load: Dict[object, float] = {}
+    for unit in order:
+        for slot in preferences[unit]:
+            offer = candidates[unit, slot]
+            if offer < 0:
+                break
+            rep = offer_reps[offer]
+            if load.get(rep, 0.0) + mwh[unit] <= cap:
+                load[rep] = load.get(rep, 0.0) + mwh[unit]
+                assigned[unit] = slot
+                break
+    return assigned
+
+
+def _refine_lp(candidates, costs, mwh, offer_reps, cap):
+    """LP relaxation over the candidates; returns per-unit slot preferences and the order to round in"""
+    rows, slots = np.nonzero(np.isfinite(costs))
+    if not len(rows):
+        return None
+    n_vars = len(rows)
+    units_with_candidates = np.unique(rows)
+    unit_index = np.searchsorted(units_with_candidates, rows)
+    rep_codes, rep_index = np.unique(offer_reps[candidates[rows, slots]].astype(str), return_inverse=True)
+
+    result = linprog(
+        costs[rows, slots],
+        A_ub=csr_matrix((mwh[rows], (rep_index, np.arange(n_vars))), shape=(len(rep_codes), n_vars)),
+        b_ub=np.full(len(rep_codes), cap),
+        A_eq=csr_matrix((np.ones(n_vars), (unit_index, np.arange(n_vars))), shape=(len(units_with_candidates), n_vars)),
+        b_eq=np.ones(len(units_with_candidates)),
+        bounds=(0, 1),
+        method='highs'
+    )
+    if not result.success:
+        return None
+
+    fractions = np.zeros(costs.shape)
+    fractions[rows, slots] = result.x
+    # Most fractional weight first, ties broken by cost (slots are cost-sorted)
+    preferences = np.argsort(-fractions, axis=1, kind='stable')
+    order = np.argsort(-fractions.max(axis=1), kind='stable')
+    return preferences, order
+
+
+def optimize_portfolio(units: Units, offers: Offers, max_rep_share: Optional[float] = None,
+                       refine: bool = True) -> dict:
+    """
+    Lowest-cost assignment of units to offers.
+
+    Args:
+        units: Meter groups to price
+        offers: Candidate offers
+        max_rep_share: Largest share (0-1] of the portfolio's MWh any one REP may carry
+        refine: Run the LP refinement when a cap is set and scipy is installed
+
+    Returns:
+        Dict with the per-unit assignment (offer position or -1, annual cost)
+        and a summary of the run
+    """
+    started = time.perf_counter()
+    candidates, costs = candidate_offers(units, offers)
+    mwh = units.annual_mwh
+    slots = np.where(np.isfinite(costs[:, 0]), 0, -1) if len(units) else np.empty(0, dtype=np.int64)
+    method, lp_status = 'greedy', None
+    # Portfolio MWh the REP cap applies to: units with an eligible offer
+    eligible_mwh = float(mwh[np.isfinite(costs[:, 0])].sum()) if len(units) else 0.0
+
+    if max_rep_share is not None and len(units):
+        cap = max_rep_share * eligible_mwh
+        # Cheapest first is optimal unless a REP ends up over the cap
+        best_reps = offers.reps[candidates[slots >= 0, 0]].astype(str)
+        rep_index = np.unique(best_reps, return_inverse=True)[1]
+        if len(best_reps) and np.bincount(rep_index, weights=mwh[slots >= 0]).max() > cap:
+            preferences = np.broadcast_to(np.arange(costs.shape[1]), costs.shape)
+            regret = np.full(len(units), np.inf)
+            if costs.shape[1] > 1:
+                both = np.isfinite(costs[:, 1])
+                regret[both] = costs[both, 1] - costs[both, 0]
+            slots = _assign_with_cap(np.argsort(-regret, kind='stable'), preferences, candidates, costs,
+                                     mwh, offers.reps, cap)
+
+            if refine and SCIPY_AVAILABLE:
+                refined = _refine_lp(candidates, costs, mwh, offers.reps, cap)
+                lp_status = 'infeasible' if refined is None else 'solved'
+                if refined is not None:
+                    lp_slots = _assign_with_cap(refined[1], refined[0], candidates, costs, mwh, offers.reps, cap)
+                    if _better(lp_slots, slots, costs):
+                        slots, method = lp_slots, 'greedy+lp'
+            elif refine:
+                lp_status = 'unavailable'
+
+    assigned = slots >= 0
+    offer_positions = np.where(assigned, candidates[np.arange(len(units)), np.maximum(slots, 0)], -1)
+    annual_cost = np.where(assigned, costs[np.arange(len(units)), np.maximum(slots, 0)], np.nan)
+    return {
+        'offers': offer_positions,
+        'annual_cost': annual_cost,
+        'eligible_mwh': eligible_mwh,
+        'summary': {
+            'units': len(units),
+            'assigned': int(assigned.sum()),
+            'offers_considered': len(offers),
+            'method': method,
+            'lp_status': lp_status,
+            'duration_seconds': round(time.perf_counter() - started, 3)
+        }
+    }
+
+
+def _better(candidate_slots, current_slots, costs) -> bool:
+    """More units assigned, then lower total cost"""
+    def score(slots):
+        assigned = slots >= 0
+        return int(assigned.sum()), -float(costs[np.flatnonzero(assigned), slots[assigned]].sum())
+    return score(candidate_slots) > score(current_slots)
+
+
+def optimize_accounts(db: Session, units: Units, term_months: Optional[Sequence[float]] = None,
+                      max_rep_share: Optional[float] = None, refine: bool = True) -> dict:
+    """Optimize units against the current offers and describe the assignment"""
+    offers = load_offers(db, zones=sorted({z for z in units.zones.tolist() if z is not None}), term_months=term_months)
+    result = optimize_portfolio(units, offers, max_rep_share=max_rep_share, refine=refine)
+
+    assignments = []
+    rep_mwh: Dict[str, float] = {}
+    current_total = optimized_total = 0.0
+    for i, offer in enumerate(result['offers'].tolist()):
+        assignment = {
+            'account_name': units.account_names[i],
+            'zone': units.zones[i],
+            'load_profile': units.load_profiles[i],
+            'meters': int(units.meters[i]),
+            'annual_mwh': round(float(units.annual_mwh[i]), 3),
+            'current_annual_cost': round(float(units.current_cost[i]), 2),
+            'offer_id': None, 'rep': None, 'term_months': None, 'daily_rate': None,
+            'annual_cost': None, 'annual_savings': None
+        }
+        if offer >= 0:
+            cost = float(result['annual_cost'][i])
+            rep = offers.reps[offer]
+            assignment.update({
+                'offer_id': int(offers.ids[offer]),
+                'rep': rep,
+                'term_months': None if np.isnan(offers.term_months[offer]) else float(offers.term_months[offer]),
+                'daily_rate': float(offers.rates[offer]),
+                'annual_cost': round(cost, 2),
+                'annual_savings': round(float(units.current_cost[i]) - cost, 2)
+            })
+            current_total += float(units.current_cost[i])
+            optimized_total += cost
+            rep_mwh[str(rep)] = rep_mwh.get(str(rep), 0.0) + float(units.annual_mwh[i])
+        assignments.append(assignment)
+
+    eligible_mwh = result['eligible_mwh']
+    savings = current_total - optimized_total
+    return {
+        **result['summary'],
+        'current_annual_cost': round(current_total, 2),
+        'optimized_annual_cost': round(optimized_total, 2),
+        'potential_savings': round(savings, 2),
+        'savings_percentage': round(savings / current_total * 100, 1) if current_total > 0 else 0.0,
+        # Shares of the MWh the cap applies to, so they can be checked against max_rep_share
+        'rep_mwh_share': {rep: round(mwh / eligible_mwh, 4) for rep, mwh in rep_mwh.items()} if eligible_mwh else {},
+        'assignments': assignments
+    }
@@ -0,0 +1,134 @@
+"""
+Zone rate percentile ranking.
+
+ZoneRateIndex keeps every zone's daily rates sorted once, so the percentile
+of any number of (zone, rate) pairs is a binary search (np.searchsorted) per
+zone instead of a scan over the zone's full pricing history.
+
+The index is numpy-only so the analytics engine can build it straight from
+its pricing DataFrame; get_zone_rate_index() builds and caches one from the
+daily_pricing table for live API lookups, keyed on the table's cache version.
+"""
+
+import time
+from threading import Lock
+from typing import Dict, Optional
+
+import numpy as np
+
+# Same thresholds the analytics engine uses for market_position
+COMPETITIVE_PERCENTILE = 25
+EXPENSIVE_PERCENTILE = 75
+
+_index_cache: Dict[str, object] = {}
+_cache_lock = Lock()
+
+
+class ZoneRateIndex:
+    """Per-zone sorted rate arrays for percentile ranking"""
+
+    def __init__(self, zones, rates):
+        zones = np.asarray(zones, dtype=object)
+        rates = np.asarray(rates, dtype=np.float64)
+
+        present = np.array([zone is not None and zone == zone for zone in zones], dtype=bool)
+        zones, rates = zones[present].astype(str), rates[present]
+
+        self.sorted_rates: Dict[str, np.ndarray] = {}
+        self.counts: Dict[str, int] = {}
+        if len(zones):
+            order = np.lexsort((rates, zones))
+            zones, rates = zones[order], rates[order]
+            unique_zones, starts, counts = np.unique(zones, return_index=True, return_counts=True)
+            for zone, start, count in zip(unique_zones, starts, counts):
+                zone_rates = rates[start:start + count]
+                # NaN rates sort last; they count toward the total but never rank below
+                self.sorted_rates[str(zone)] = zone_rates[~np.isnan(zone_rates)]
+                self.counts[str(zone)] = int(count)
+
+    @property
+    def zones(self):
+        return sorted(self.sorted_rates)
+
+    def percentiles(self, zones, rates) -> np.ndarray:
+        """
+        Percentage of each zone's rates strictly below the given rate.
+
+        Args:
+            zones: Zone per query
+            rates: Rate per query
+
+        Returns:
+            Array of percentiles (0-100); NaN for zones not in the index
+        """
+        zones = np.asarray(zones, dtype=object).astype(str)
+        rates = np.asarray(rates, dtype=np.float64)
+        result = np.full(len(rates), np.nan)
+
+        for zone in np.unique(zones):
+            if zone not in self.sorted_rates:
+                continue
+            mask = zones == zone
+            below = np.searchsorted(self.sorted_rates[zone], rates[mask], side='left')
+            below = np.where(np.isnan(rates[mask]), 0, below)
+            result[mask] = below / self.counts[zone] * 100
+        return result
+
+    def percentile_of(self, zone: str, rate: float) -> Optional[float]:
+        """Percentile of a single rate within its zone, or None for an unknown zone"""
+        if zone not in self.sorted_rates:
+            return None
+        return float(self.percentiles([zone], [rate])[0])
+
+
+def market_position(percentile):
+    """Classify percentiles as competitive, average or expensive"""
+    percentile = np.asarray(percentile, dtype=np.float64)
+    return np.select(
+        [percentile < COMPETITIVE_PERCENTILE, percentile < EXPENSIVE_PERCENTILE],
+        ['competitive', 'average'],
+        default='expensive'
+    )
+
+
+def get_zone_rate_index(db) -> ZoneRateIndex:
+    """
+    Return a ZoneRateIndex over daily_pricing, rebuilt when the table changes.
+
+    Commits in this worker bump the table's cache version (watch_writes), so
+    the index follows them at once without touching the table. Writes from
+    other processes are caught by a fingerprint query, run at most every
+    rate_index_check_seconds.
+    """
+    # Imported here so the analytics engine can use ZoneRateIndex without app settings
+    from sqlalchemy import func
+    from app.core.cache import cache
+    from app.core.config import settings
+    from app.models.daily_pricing import DailyPricing
+
+    version = cache.local.versions((DailyPricing.__tablename__,))
+    with _cache_lock:
+        if (_index_cache.get('version') == version
+                and time.monotonic() < _index_cache['checked_at'] + settings.rate_index_check_seconds):
+            return _index_cache['index']
+
+        rates_filter = (DailyPricing.daily_rate.isnot(None), DailyPricing.daily_rate > 0)
+        # updated_at may only keep whole seconds, so the rate total catches edits made within one
+        fingerprint = tuple(db.query(
+            func.count(DailyPricing.id),
+            func.max(DailyPricing.id),
+            func.max(DailyPricing.updated_at),
+            func.sum(DailyPricing.daily_rate)
+        ).filter(*rates_filter).first())
+        if _index_cache.get('version') != version or _index_cache.get('fingerprint') != fingerprint:
+            rows = db.query(DailyPricing.zone, DailyPricing.daily_rate).filter(*rates_filter).all()
+            _index_cache['index'] = ZoneRateIndex(
+                [zone for zone, _ in rows], [rate for _, rate in rows]
+            )
+        _index_cache.update(version=version, fingerprint=fingerprint, checked_at=time.monotonic())
+        return _index_cache['index']
+
+
+def percentile_of(db, zone: str, rate: float) -> Optional[float]:
+    """Live percentile of `rate` among all daily_pricing rates in `zone`"""
+    return get_zone_rate_index(db).percentile_of(zone, rate)
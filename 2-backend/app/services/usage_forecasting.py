@@ -0,0 +1,221 @@
+"""
+Usage forecasts served from the active analytics generation.
+
+The analytics engine fits seasonally adjusted Holt linear models to every
+account's monthly usage in one batch (deseasonalized with monthly indices
+fitted from two seasons of history, or a fixed table before then, then
+Holt's linear method from app.services.forecasting) and stores the
+parameters with each generation: per account in
+usage_analytics.forecast_data, and the shared model summary (seasonal
+factors, backtest accuracy, empirical interval ratios) in
+market_intelligence.demand_forecast.
+
+Parameters are loaded once per generation into arrays with an account-name
+lookup, so an account forecast is O(1) and a portfolio forecast is a single
+vectorized pass over all accounts. Batch requests resolve their account
+selection to array positions through the same lookup and forecast every
+selected account and horizon in one array operation.
+"""
+
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.account import Account
+from app.models.analytics import UsageAnalytics, MarketIntelligence
+from app.models.esiid import ESIID
+from app.services.forecasting import HoltState, shift_period
+
+MONTHS_PER_PERIOD = {'monthly': 1, 'quarterly': 3, 'annual': 12}
+
+# Generations whose models are kept (the active one and the one it replaced)
+_CACHED_GENERATIONS = 2
+
+
+class UsageForecastModel:
+    """Fitted usage models of one generation"""
+
+    def __init__(self, models: List[dict], summary: dict):
+        self.summary = summary
+        self.last_period: int = summary['last_period']
+        self.confidence: float = summary['confidence']
+        self.seasonal = np.array([summary['seasonal_factors'][str(month)] for month in range(1, 13)])
+        self.accounts: List[str] = [model['account_name'] for model in models]
+        self.positions: Dict[str, int] = {account: i for i, account in enumerate(self.accounts)}
+
+        def column(key, dtype=np.float64):
+            return np.array([model[key] for model in models], dtype=dtype)
+
+        n_errors = column('fit_points', np.int64)
+        self.level = column('level')
+        self.trend = column('trend')
+        self.alpha = column('alpha')
+        self.beta = column('beta')
+        self.n_errors = n_errors
+        self.sse = column('residual_std') ** 2 * np.maximum(n_errors, 1)
+        self.backtest_mape = np.array(
+            [np.nan if model['backtest_mape'] is None else model['backtest_mape'] for model in models],
+            dtype=np.float64
+        )
+
+    def _state(self, positions) -> HoltState:
+        return HoltState(
+            self.level[positions], self.trend[positions], self.alpha[positions], self.beta[positions],
+            self.sse[positions], self.n_errors[positions], np.ones(len(positions), dtype=bool)
+        )
+
+    def _interval_ratios(self, months: int):
+        """Empirical (lower, upper) ratios per step, widened like sqrt(h) past the backtest horizon"""
+        ratios = np.array(self.summary['interval_ratios'], dtype=np.float64)
+        steps = np.arange(1, months + 1)
+        observed = np.minimum(steps, len(ratios)) - 1
+        scale = np.sqrt(np.maximum(steps / len(ratios), 1.0))
+        log_ratios = np.log(np.maximum(ratios[observed], 1e-9)) * scale[:, None]
+        return np.exp(log_ratios[:, 0]), np.exp(log_ratios[:, 1])
+
+    def forecast(self, positions: np.ndarray, months: int):
+        """
+        Monthly forecasts for the selected accounts.
+
+        Returns:
+            Tuple of (periods, point, lower, upper), the arrays shaped
+            (len(positions) x months)
+        """
+        point, lower, upper = self._state(positions).forecast(months, self.confidence)
+        periods = [shift_period(self.last_period, h) for h in range(1, months + 1)]
+        factors = self.seasonal[[period % 100 - 1 for period in periods]]
+        point, lower, upper = point * factors, lower * factors, upper * factors
+
+        if self.summary.get('interval_ratios'):
+            low, high = self._interval_ratios(months)
+            lower, upper = point * low, point * high
+        return periods, point, np.maximum(lower, 0), upper
+
+    def accuracy(self, position: Optional[int] = None) -> Optional[float]:
+        """1 - backtest MAPE of one account (falling back to the portfolio), or None before a backtest"""
+        if position is not None and not np.isnan(self.backtest_mape[position]):
+            return max(0.0, 1 - float(self.backtest_mape[position]))
+        return self.summary.get('model_accuracy')
+
+
+_models: Dict[int, Optional[UsageForecastModel]] = {}
+_lock = Lock()
+
+
+def get_forecast_model(db: Session, generation_id: int) -> Optional[UsageForecastModel]:
+    """Fitted models of a generation, loaded on first use; None when it has no forecasts"""
+    if generation_id in _models:
+        return _models[generation_id]
+    with _lock:
+        if generation_id not in _models:
+            summary = db.query(MarketIntelligence.demand_forecast).filter(
+                MarketIntelligence.generation_id == generation_id
+            ).scalar()
+            model = None
+            if summary:
+                rows = db.query(UsageAnalytics.forecast_data).filter(
+                    UsageAnalytics.generation_id == generation_id,
+                    UsageAnalytics.forecast_data.isnot(None)
+                ).order_by(UsageAnalytics.id).all()
+                model = UsageForecastModel([row[0] for row in rows], summary)
+            _models[generation_id] = model
+            for stale in sorted(_models)[:-_CACHED_GENERATIONS]:
+                del _models[stale]
+        return _models[generation_id]
+
+
+def resolve_positions(
+    db: Session,
+    model: UsageForecastModel,
+    account_names: Optional[Iterable[str]] = None,
+    zone: Optional[str] = None,
+    manager_name: Optional[str] = None,
+    management_company: Optional[str] = None
+):
+    """
+    Model positions of the accounts matching every given selector (all accounts when none is given).
+
+    Returns:
+        Tuple of (sorted positions, requested account names without a model)
+    """
+    selected: Optional[set] = None
+    missing: List[str] = []
+
+    def narrow(names: Iterable[str]):
+        nonlocal selected
+        positions = {model.positions[name] for name in names if name in model.positions}
+        selected = positions if selected is None else selected & positions
+
+    if account_names is not None:
+        account_names = list(dict.fromkeys(account_names))
+        missing = [name for name in account_names if name not in model.positions]
+        narrow(account_names)
+    if zone:
+        narrow(row[0] for row in db.query(ESIID.account_name).filter(ESIID.zone == zone).distinct())
+    if manager_name:
+        narrow(row[0] for row in db.query(Account.account_name).filter(Account.manager_name == manager_name))
+    if management_company:
+        narrow(row[0] for row in db.query(Account.account_name).filter(
+            Account.management_company == management_company
+        ))
+
+    if selected is None:
+        return np.arange(len(model.accounts)), missing
+    return np.array(sorted(selected), dtype=np.int64), missing
+
+
+def forecast_accounts(model: UsageForecastModel, positions: np.ndarray, horizon: int, period: str = 'monthly'):
+    """
+    Forecasts of every selected account, with monthly values summed into the requested period.
+
+    Returns:
+        Tuple of (period start labels, point, lower, upper), the arrays shaped
+        (len(positions) x horizon)
+    """
+    months_per_period = MONTHS_PER_PERIOD.get(period, 1)
+    periods, point, lower, upper = model.forecast(positions, horizon * months_per_period)
+
+    def by_period(values):
+        return values.reshape(len(positions), horizon, months_per_period).sum(axis=2)
+
+    starts = [f"{p // 100}-{p % 100:02d}" for p in periods[::months_per_period]]
+    return starts, by_period(point), by_period(lower), by_period(upper)
+
+
+def forecast_usage(model: UsageForecastModel, horizon: int, period: str = 'monthly',
+                   account_name: Optional[str] = None) -> Optional[dict]:
+    """
+    Forecast one account, or the whole portfolio when account_name is None.
+
+    Portfolio intervals add up the account bounds, which is conservative (it
+    assumes account errors move together). Returns None for an account
+    without a model.
+    """
+    if account_name is not None:
+        position = model.positions.get(account_name)
+        if position is None:
+            return None
+        positions = np.array([position])
+    else:
+        position = None
+        positions = np.arange(len(model.accounts))
+
+    starts, point, lower, upper = forecast_accounts(model, positions, horizon, period)
+    point, lower, upper = point.sum(axis=0), lower.sum(axis=0), upper.sum(axis=0)
+    return {
+        'forecast_data': [
+            {
+                'period': i + 1,
+                'period_start': starts[i],
+                'forecast': round(float(point[i]), 2),
+                'confidence_interval_low': round(float(lower[i]), 2),
+                'confidence_interval_high': round(float(upper[i]), 2)
+            }
+            for i in range(horizon)
+        ],
+        'confidence_level': model.confidence,
+        'model_accuracy': model.accuracy(position),
+        'accounts': len(positions)
+    }
@@ -0,0 +1,118 @@
+"""
+In-memory secondary indexes over a generation's usage analytics.
+
+GET /analytics/usage-analysis filters accounts by name substring, usage
+pattern and a total_usage_kwh range. A generation never changes once
+activated, so its rows are loaded once into a column-oriented ResultTable
+(ordered by account name, the order pages are served in) with:
+
+- total_usage_kwh sorted once, so a range filter is two binary searches
+- a hash index from usage_pattern to row positions
+- lowercased account names for substring search
+
+Each filter yields a sorted array of row positions; filters intersect as
+arrays, the name search only scans rows the other filters kept, and a page
+is materialized from just the positions it covers.
+"""
+
+from threading import Lock
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.analytics import UsageAnalytics
+from app.services.analytics_results import ResultTable
+from app.services.analytics_store import usage_record
+
+# Generations whose indexes are kept (the active one and the one it replaced)
+_CACHED_GENERATIONS = 2
+
+
+class UsageIndex:
+    """Usage analytics rows with sorted, hash and lowercase-name indexes"""
+
+    def __init__(self, records):
+        self.table = ResultTable(records)
+        self.length = len(records)
+        if not self.length:
+            self.usage_order = np.empty(0, dtype=np.int64)
+            self.usage_sorted = np.empty(0, dtype=np.float64)
+            self.usage_count = 0
+            self.pattern_positions: Dict[str, np.ndarray] = {}
+            self.names_lower = np.empty(0, dtype=object)
+            return
+
+        usage = np.asarray(self.table.column('total_usage_kwh'), dtype=np.float64)
+        # NaN (no usage) sorts last and is excluded from every range
+        self.usage_order = np.argsort(usage, kind='stable')
+        self.usage_sorted = usage[self.usage_order]
+        self.usage_count = int(np.count_nonzero(~np.isnan(usage)))
+
+        patterns = self.table.column('usage_pattern')
+        self.pattern_positions = {}
+        for position, pattern in enumerate(patterns):
+            self.pattern_positions.setdefault(pattern, []).append(position)
+        self.pattern_positions = {
+            pattern: np.array(positions, dtype=np.int64) for pattern, positions in self.pattern_positions.items()
+        }
+
+        self.names_lower = np.array(
+            [name.lower() if name is not None else '' for name in self.table.column('account_name')], dtype=object
+        )
+
+    def usage_range(self, min_usage: Optional[float], max_usage: Optional[float]) -> np.ndarray:
+        """Sorted positions with min_usage <= total_usage_kwh <= max_usage"""
+        lo = 0 if min_usage is None else int(np.searchsorted(self.usage_sorted[:self.usage_count], min_usage, 'left'))
+        hi = self.usage_count if max_usage is None else \
+            int(np.searchsorted(self.usage_sorted[:self.usage_count], max_usage, 'right'))
+        return np.sort(self.usage_order[lo:max(hi, lo)])
+
+    def filter(self, account_name: Optional[str] = None, usage_pattern: Optional[str] = None,
+               min_usage: Optional[float] = None, max_usage: Optional[float] = None) -> Optional[np.ndarray]:
+        """Sorted positions matching every filter, or None when no filter is given (all rows)"""
+        positions = None
+        if usage_pattern:
+            positions = self.pattern_positions.get(usage_pattern, np.empty(0, dtype=np.int64))
+        if min_usage is not None or max_usage is not None:
+            in_range = self.usage_range(min_usage, max_usage)
+            positions = in_range if positions is None else np.intersect1d(positions, in_range, assume_unique=True)
+        if account_name:
+            needle = account_name.lower()
+            candidates = np.arange(self.length) if positions is None else positions
+            names = self.names_lower[candidates]
+            matches = np.fromiter((needle in name for name in names), dtype=bool, count=len(names))
+            positions = candidates[matches]
+        return positions
+
+    def page(self, positions: Optional[np.ndarray], skip: int, limit: int):
+        """Records for one page of positions and the total number of matches"""
+        if positions is None:
+            total = self.length
+            window = range(min(skip, total), min(skip + limit, total))
+        else:
+            total = len(positions)
+            window = positions[skip:skip + limit]
+        return self.table.records(window), total
+
+
+_indexes: Dict[int, UsageIndex] = {}
+_lock = Lock()
+
+
+def get_usage_index(db: Session, generation_id: int) -> UsageIndex:
+    """Index for a generation, loaded on first use"""
+    index = _indexes.get(generation_id)
+    if index is not None:
+        return index
+    with _lock:
+        index = _indexes.get(generation_id)
+        if index is None:
+            rows = db.query(UsageAnalytics).filter(
+                UsageAnalytics.generation_id == generation_id
+            ).order_by(UsageAnalytics.account_name, UsageAnalytics.id).all()
+            index = UsageIndex([usage_record(row) for row in rows])
+            _indexes[generation_id] = index
+            for stale in sorted(_indexes)[:-_CACHED_GENERATIONS]:
+                del _indexes[stale]
+        return index
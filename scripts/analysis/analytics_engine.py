@@ -9,20 +9,95 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 from datetime import datetime, timedelta
+import hashlib
 import json
+import multiprocessing
+import os
+import sys
+import time
 import warnings
+from functools import partial
 warnings.filterwarnings('ignore')
 
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "2-backend"))
+
+from app.services.anomaly_detection import FLAG_THRESHOLD, SEVERITY_THRESHOLDS, score_esiids
+from app.services.forecasting import fit_holt, period_index, shift_period
+from app.services.pipeline import Pipeline, Stage, StageMeter
+from app.services.rate_percentiles import ZoneRateIndex, market_position as classify_market_position
+
 class EnergyAnalyticsEngine:
-    def __init__(self, db_path="2-backend/kilowatt_dev.db"):
+    # Seasonal usage adjustment by calendar month (winter high, summer low)
+    SEASONAL_FACTORS = {
+        1: 1.2, 2: 1.1, 3: 1.0, 4: 0.9, 5: 0.8, 6: 0.7,
+        7: 0.6, 8: 0.7, 9: 0.8, 10: 0.9, 11: 1.0, 12: 1.1
+    }
+
+    # Tables tracked for incremental runs: the keys each analysis groups on
+    # and the filter its loader applies
+    TRACKED_TABLES = {
+        'esiids': {'keys': ('account_name', 'zone', 'rep'), 'filter': 'kwh_mo IS NOT NULL AND kwh_mo > 0'},
+        'daily_pricing': {'keys': ('zone', 'rep'), 'filter': 'daily_rate IS NOT NULL AND daily_rate > 0'},
+        'commissions': {'keys': ('k_rep',), 'filter': 'actual_payment_amount IS NOT NULL'}
+    }
+    STATE_VERSION = 1
+    MODEL_VERSION = "1.0"
+    # Generations kept in the analytics tables: the active one and its predecessor
+    KEEP_GENERATIONS = 2
+    # Runs whose stage metrics are kept; they outlive the generations they describe
+    KEEP_RUN_METRICS = 50
+    GENERATION_TABLES = [
+        'usage_analytics', 'esiid_anomalies', 'pricing_analytics', 'commission_analytics', 'market_cube',
+        'market_intelligence'
+    ]
+    ANOMALY_COLUMNS = [
+        'esi_id', 'account_name', 'zone', 'load_profile', 'rep', 'kwh_mo', 'cost_per_kwh', 'peer_group',
+        'usage_score', 'cost_score', 'anomaly_score', 'anomaly_type', 'severity'
+    ]
+    CUBE_COLUMNS = [
+        'fact', 'zone', 'rep', 'load_profile', 'management_company', 'month',
+        'record_count', 'kwh_sum', 'bill_sum', 'rate_sum', 'rate_min', 'rate_max'
+    ]
+    USAGE_SUMMARY_COLUMNS = ['account_name', 'zone', 'rep', 'esiid_count', 'kwh_sum', 'bill_sum']
+    PRICING_SUMMARY_COLUMNS = ['zone', 'rep', 'rate_count', 'rate_sum', 'rate_min', 'rate_max']
+    # Usage forecasting: months of history fitted, months held out for the backtest,
+    # and the pooled backtest ratios needed per step before intervals are empirical;
+    # seasonal indices are fitted from SEASONAL_FIT_MONTHS (two seasons) of history
+    HISTORY_MONTHS = 36
+    SEASONAL_FIT_MONTHS = 24
+    BACKTEST_MONTHS = 3
+    MIN_TRAINING_MONTHS = 3
+    MIN_INTERVAL_SAMPLES = 20
+    FORECAST_CONFIDENCE = 0.9
+
+    def __init__(self, db_path="2-backend/kilowatt_dev.db",
+                 output_file="1-frontend/src/data/analytics-results.json", state_file=None, progress=None,
+                 workers=None):
         self.db_path = db_path
+        self.output_file = output_file
+        # Incremental-run state belongs with the database it describes
+        self.state_file = state_file or str(Path(db_path).with_name("analytics_state.json"))
         self.conn = None
+        # Called with the stage name as each pipeline stage starts (the API's job runner
+        # uses it for progress and cancellation); an exception it raises aborts the run
+        self.progress = progress
+        self.last_error = None
+        # Worker processes for the full run's independent stages; 1 runs everything in this process
+        self.workers = workers if workers is not None else min(4, os.cpu_count() or 1)
+        # Measurements of the current run by stage: timings plus rows_in, rows_out and groups
+        self.stage_metrics = {}
+        self.run_mode = None
+        self._run_started = None
+        self._open_stage = None
         
     def connect(self):
         """Connect to the database"""
         if not Path(self.db_path).exists():
             raise FileNotFoundError(f"Database not found: {self.db_path}")
         self.conn = sqlite3.connect(self.db_path)
+        # Publishing waits out API writes; WAL keeps API reads running while a generation is written
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA busy_timeout = 30000")
         return self.conn
     
     def disconnect(self):
@@ -31,9 +106,42 @@ class EnergyAnalyticsEngine:
             self.conn.close()
             self.conn = None
     
-    def load_usage_data(self):
-        """Load ESIID usage data for analysis"""
-        query = """
+    def begin_run(self, mode):
+        """Reset the stage measurements for a new run"""
+        self.run_mode = mode
+        self.stage_metrics = {}
+        self._open_stage = None
+        self._run_started = time.time()
+
+    def notify_stage(self, stage):
+        """Tell the progress callback a pipeline stage is starting"""
+        if self.progress:
+            self.progress(stage)
+
+    def report_stage(self, stage):
+        """Start measuring a stage run in this process, closing the previous one, and report it"""
+        self.finish_stage()
+        self._open_stage = (stage, StageMeter())
+        self.notify_stage(stage)
+
+    def finish_stage(self):
+        """Record the measurements of the stage started by report_stage, if any"""
+        if self._open_stage is None:
+            return
+        stage, meter = self._open_stage
+        self._open_stage = None
+        self.stage_metrics[stage] = {**self.stage_metrics.get(stage, {}), **meter.finish(), 'location': 'local'}
+
+    def count_rows(self, stage, rows_in=None, rows_out=None, groups=None):
+        """Record how many rows a stage read and wrote and how many groups it produced"""
+        self.stage_metrics.setdefault(stage, {}).update(rows_in=rows_in, rows_out=rows_out, groups=groups)
+    
+    def load_usage_data(self, keys_table=None):
+        """Load ESIID usage data for analysis, optionally only accounts staged in keys_table"""
+        source = "esiids"
+        if keys_table:
+            source = f"{keys_table} k JOIN esiids ON esiids.account_name IS k.k0"
+        query = f"""
             SELECT 
                 account_name,
                 esi_id,
@@ -44,16 +152,19 @@ class EnergyAnalyticsEngine:
                 kwh_yr,
                 total_bill,
                 created_at
-            FROM esiids 
+            FROM {source} 
             WHERE kwh_mo IS NOT NULL 
             AND kwh_mo > 0
             ORDER BY kwh_mo DESC
         """
         return pd.read_sql_query(query, self.conn)
     
-    def load_pricing_data(self):
-        """Load pricing data for analysis"""
-        query = """
+    def load_pricing_data(self, keys_table=None):
+        """Load pricing data for analysis, optionally only (zone, REP) pairs staged in keys_table"""
+        source = "daily_pricing"
+        if keys_table:
+            source = f"{keys_table} k JOIN daily_pricing ON daily_pricing.zone IS k.k0 AND daily_pricing.rep IS k.k1"
+        query = f"""
             SELECT 
                 effective_date,
                 zone,
@@ -62,254 +173,511 @@ class EnergyAnalyticsEngine:
                 daily_rate,
                 term_months,
                 created_at
-            FROM daily_pricing 
+            FROM {source} 
             WHERE daily_rate IS NOT NULL 
             AND daily_rate > 0
             ORDER BY effective_date DESC
         """
         return pd.read_sql_query(query, self.conn)
     
-    def load_commission_data(self):
-        """Load commission data for analysis"""
-        query = """
+    def load_commission_data(self, keys_table=None):
+        """Load commission data for analysis, optionally only REPs staged in keys_table"""
+        source = "commissions"
+        if keys_table:
+            source = f"{keys_table} k JOIN commissions ON commissions.k_rep IS k.k0"
+        query = f"""
             SELECT 
                 account_name,
                 k_rep,
                 commission_type,
                 actual_payment_amount,
                 actual_payment_date,
+                payment_year,
+                payment_month,
                 contract_date,
                 created_at
-            FROM commissions 
+            FROM {source} 
             WHERE actual_payment_amount IS NOT NULL
             ORDER BY actual_payment_date DESC
         """
         return pd.read_sql_query(query, self.conn)
+
+    def load_zone_rates(self, keys_table=None):
+        """Load the zone and rate of every priced row, optionally only zones staged in keys_table"""
+        source = "daily_pricing"
+        if keys_table:
+            source = f"{keys_table} k JOIN daily_pricing ON daily_pricing.zone = k.k0"
+        query = f"""
+            SELECT zone, daily_rate
+            FROM {source}
+            WHERE daily_rate IS NOT NULL
+            AND daily_rate > 0
+        """
+        return pd.read_sql_query(query, self.conn)
     
     def analyze_usage_patterns(self, usage_df):
         """Analyze usage patterns and generate insights"""
-        results = []
-        
-        # Group by account for analysis
-        for account_name, group in usage_df.groupby('account_name'):
-            if len(group) < 2:  # Need at least 2 ESIIDs for meaningful analysis
-                continue
-                
-            total_usage = group['kwh_mo'].sum()
-            avg_usage = group['kwh_mo'].mean()
-            usage_std = group['kwh_mo'].std()
-            total_bill = group['total_bill'].sum()
-            
-            # Determine usage pattern
-            cv = usage_std / avg_usage if avg_usage > 0 else 0
-            if cv < 0.2:
-                pattern = 'stable'
-            elif cv < 0.5:
-                pattern = 'moderate_variation'
-            else:
-                pattern = 'high_variation'
-            
-            # Calculate efficiency score (lower cost per kWh is better)
-            cost_per_kwh = total_bill / total_usage if total_usage > 0 else 0
-            efficiency_score = max(0, 100 - (cost_per_kwh * 1000))  # Normalize to 0-100
-            
-            # Simple forecast (seasonal adjustment)
-            current_month = datetime.now().month
-            seasonal_factors = {
-                1: 1.2, 2: 1.1, 3: 1.0, 4: 0.9, 5: 0.8, 6: 0.7,  # Winter high, summer low
-                7: 0.6, 8: 0.7, 9: 0.8, 10: 0.9, 11: 1.0, 12: 1.1
-            }
-            seasonal_factor = seasonal_factors.get(current_month, 1.0)
-            predicted_usage = total_usage * seasonal_factor
-            
-            # Anomaly detection (simple z-score based)
-            z_scores = np.abs((group['kwh_mo'] - avg_usage) / usage_std) if usage_std > 0 else np.zeros(len(group))
-            anomaly_score = np.mean(z_scores > 2)  # Percentage of outliers
-            
-            result = {
-                'account_name': account_name,
-                'esiid_count': int(len(group)),
-                'total_usage_kwh': float(total_usage),
-                'avg_usage_kwh': float(avg_usage),
-                'predicted_usage_kwh': float(predicted_usage),
-                'usage_pattern': pattern,
-                'efficiency_score': float(efficiency_score),
-                'anomaly_score': float(anomaly_score),
-                'seasonal_factor': float(seasonal_factor),
-                'cost_per_kwh': float(cost_per_kwh),
-                'total_monthly_bill': float(total_bill)
-            }
-            results.append(result)
-        
-        return pd.DataFrame(results)
+        # Per-account aggregates in one grouped pass
+        grouped = usage_df.groupby('account_name')
+        accounts = grouped['kwh_mo'].agg(['size', 'sum', 'mean', 'std'])
+        accounts['total_bill'] = grouped['total_bill'].sum()
+
+        # Need at least 2 ESIIDs for meaningful analysis
+        accounts = accounts[accounts['size'] >= 2]
+        if accounts.empty:
+            return pd.DataFrame()
+
+        total_usage = accounts['sum'].to_numpy()
+        avg_usage = accounts['mean'].to_numpy()
+        usage_std = accounts['std'].to_numpy()
+        total_bill = accounts['total_bill'].to_numpy()
+
+        # Determine usage pattern from the coefficient of variation
+        cv = np.divide(usage_std, avg_usage, out=np.zeros_like(avg_usage), where=avg_usage > 0)
+        pattern = np.select([cv < 0.2, cv < 0.5], ['stable', 'moderate_variation'], default='high_variation')
+
+        # Calculate efficiency score (lower cost per kWh is better)
+        cost_per_kwh = np.divide(total_bill, total_usage, out=np.zeros_like(total_usage), where=total_usage > 0)
+        efficiency_score = np.maximum(0, 100 - (cost_per_kwh * 1000))  # Normalize to 0-100
+
+        # Simple forecast (seasonal adjustment)
+        seasonal_factor = self.SEASONAL_FACTORS.get(datetime.now().month, 1.0)
+        predicted_usage = total_usage * seasonal_factor
+
+        # Anomaly detection: share of each account's meters with |z| > 2
+        group_mean = grouped['kwh_mo'].transform('mean')
+        group_std = grouped['kwh_mo'].transform('std')
+        outlier = (group_std > 0) & (((usage_df['kwh_mo'] - group_mean) / group_std).abs() > 2)
+        anomaly_score = outlier.groupby(usage_df['account_name']).mean().reindex(accounts.index).to_numpy()
+
+        return pd.DataFrame({
+            'account_name': accounts.index.to_numpy(),
+            'esiid_count': accounts['size'].to_numpy().astype(int),
+            'total_usage_kwh': total_usage.astype(float),
+            'avg_usage_kwh': avg_usage.astype(float),
+            'predicted_usage_kwh': predicted_usage.astype(float),
+            'usage_pattern': pattern,
+            'efficiency_score': efficiency_score.astype(float),
+            'anomaly_score': anomaly_score.astype(float),
+            'seasonal_factor': float(seasonal_factor),
+            'cost_per_kwh': cost_per_kwh.astype(float),
+            'total_monthly_bill': total_bill.astype(float)
+        })
     
-    def analyze_pricing_trends(self, pricing_df):
-        """Analyze pricing trends and market intelligence"""
-        results = []
-        
+    def detect_anomalies(self, usage_df):
+        """Robust usage and cost-per-kWh anomaly scores of every ESIID against its zone/load-profile peers"""
+        scores = score_esiids(
+            usage_df['zone'].to_numpy(dtype=object), usage_df['load_profile'].to_numpy(dtype=object),
+            usage_df['kwh_mo'].to_numpy(dtype=float), usage_df['total_bill'].to_numpy(dtype=float)
+        )
+        anomalies = usage_df[['esi_id', 'account_name', 'zone', 'load_profile', 'rep', 'kwh_mo']].copy()
+        for column, values in scores.items():
+            anomalies[column] = values
+        return anomalies[self.ANOMALY_COLUMNS].sort_values('anomaly_score', ascending=False, kind='mergesort')
+
+    @staticmethod
+    def summarize_anomalies(anomalies):
+        """Counts per severity and type for the results file (rows go to esiid_anomalies)"""
+        flagged = anomalies[anomalies['anomaly_score'] >= FLAG_THRESHOLD]
+        counts = anomalies['severity'].value_counts()
+        return {
+            'esiids_scored': int(len(anomalies)),
+            'flagged': int(len(flagged)),
+            'by_severity': {name: int(counts.get(name, 0)) for name, _ in SEVERITY_THRESHOLDS},
+            'by_type': {kind: int(count) for kind, count in flagged['anomaly_type'].value_counts().sort_index().items()},
+            'accounts_flagged': int(flagged['account_name'].nunique())
+        }
+
+    def analyze_pricing_trends(self, pricing_df, rate_index=None):
+        """
+        Analyze pricing trends and market intelligence
+
+        rate_index is the ZoneRateIndex current rates are ranked against; it
+        defaults to the rates in pricing_df.
+        """
         # Convert dates
         pricing_df['effective_date'] = pd.to_datetime(pricing_df['effective_date'])
-        
-        # Group by zone and REP
-        for (zone, rep), group in pricing_df.groupby(['zone', 'rep']):
-            if len(group) < 5:  # Need sufficient data points
-                continue
-            
-            # Sort by date
-            group = group.sort_values('effective_date')
-            
-            current_rate = group['daily_rate'].iloc[-1]
-            avg_rate = group['daily_rate'].mean()
-            rate_std = group['daily_rate'].std()
-            
-            # Calculate trend
-            if len(group) >= 10:
-                recent_avg = group['daily_rate'].tail(5).mean()
-                older_avg = group['daily_rate'].head(5).mean()
-                if recent_avg > older_avg * 1.05:
-                    trend = 'increasing'
-                elif recent_avg < older_avg * 0.95:
-                    trend = 'decreasing'
-                else:
-                    trend = 'stable'
-            else:
-                trend = 'stable'
-            
-            # Market position analysis
-            zone_rates = pricing_df[pricing_df['zone'] == zone]['daily_rate']
-            percentile = (zone_rates < current_rate).mean() * 100
-            
-            if percentile < 25:
-                market_position = 'competitive'
-            elif percentile < 75:
-                market_position = 'average'
-            else:
-                market_position = 'expensive'
-            
-            # Volatility calculation
-            volatility = rate_std / avg_rate if avg_rate > 0 else 0
-            
-            # Simple price forecast
-            trend_factor = {'increasing': 1.05, 'stable': 1.0, 'decreasing': 0.95}[trend]
-            predicted_rate = current_rate * trend_factor
-            
-            result = {
-                'zone': zone,
-                'rep': rep,
-                'current_rate': float(current_rate),
-                'avg_rate': float(avg_rate),
-                'predicted_rate': float(predicted_rate),
-                'rate_trend': trend,
-                'market_position': market_position,
-                'volatility': float(volatility),
-                'percentile_rank': float(percentile),
-                'data_points': int(len(group))
-            }
-            results.append(result)
-        
-        return pd.DataFrame(results)
+
+        # Order every (zone, REP) series by date once; ties keep load order
+        ordered = pricing_df.dropna(subset=['zone', 'rep']).sort_values(
+            ['zone', 'rep', 'effective_date'], kind='mergesort'
+        )
+        grouped = ordered.groupby(['zone', 'rep'], sort=True)
+        position = grouped.cumcount()
+        size = grouped['daily_rate'].transform('size')
+
+        groups = grouped['daily_rate'].agg(['size', 'mean', 'std', 'last'])
+        groups['head_avg'] = ordered['daily_rate'][position < 5].groupby([ordered['zone'], ordered['rep']]).mean()
+        groups['tail_avg'] = ordered['daily_rate'][position >= size - 5].groupby([ordered['zone'], ordered['rep']]).mean()
+
+        # Need sufficient data points
+        groups = groups[groups['size'] >= 5]
+        if groups.empty:
+            return pd.DataFrame()
+
+        zones = groups.index.get_level_values('zone').to_numpy()
+        current_rate = groups['last'].to_numpy()
+        avg_rate = groups['mean'].to_numpy()
+        rate_std = groups['std'].to_numpy()
+        recent_avg = groups['tail_avg'].to_numpy()
+        older_avg = groups['head_avg'].to_numpy()
+
+        # Calculate trend from the first and last five observations
+        has_history = groups['size'].to_numpy() >= 10
+        trend = np.select(
+            [has_history & (recent_avg > older_avg * 1.05), has_history & (recent_avg < older_avg * 0.95)],
+            ['increasing', 'decreasing'],
+            default='stable'
+        )
+
+        # Market position analysis: one binary search per group against sorted zone rates
+        if rate_index is None:
+            rate_index = ZoneRateIndex(pricing_df['zone'].to_numpy(), pricing_df['daily_rate'].to_numpy())
+        percentile = rate_index.percentiles(zones, current_rate)
+        market_position = classify_market_position(percentile)
+
+        # Volatility calculation
+        volatility = np.divide(rate_std, avg_rate, out=np.zeros_like(avg_rate), where=avg_rate > 0)
+
+        # Simple price forecast
+        trend_factor = np.select([trend == 'increasing', trend == 'decreasing'], [1.05, 0.95], default=1.0)
+        predicted_rate = current_rate * trend_factor
+
+        return pd.DataFrame({
+            'zone': zones,
+            'rep': groups.index.get_level_values('rep').to_numpy(),
+            'current_rate': current_rate.astype(float),
+            'avg_rate': avg_rate.astype(float),
+            'predicted_rate': predicted_rate.astype(float),
+            'rate_trend': trend,
+            'market_position': market_position,
+            'volatility': volatility.astype(float),
+            'percentile_rank': percentile.astype(float),
+            'data_points': groups['size'].to_numpy().astype(int)
+        })
     
     def analyze_commission_performance(self, commission_df):
         """Analyze commission performance and forecasting"""
-        results = []
-        
-        # Convert dates
-        commission_df['actual_payment_date'] = pd.to_datetime(commission_df['actual_payment_date'])
-        
-        # Group by REP
-        for rep, group in commission_df.groupby('k_rep'):
-            if len(group) < 3:  # Need sufficient data
-                continue
-            
-            total_commission = group['actual_payment_amount'].sum()
-            avg_commission = group['actual_payment_amount'].mean()
-            commission_count = len(group)
-            
-            # Calculate monthly performance
-            group['month'] = group['actual_payment_date'].dt.to_period('M')
-            monthly_performance = group.groupby('month')['actual_payment_amount'].sum()
-            
-            if len(monthly_performance) >= 3:
-                # Calculate growth trend
-                recent_months = monthly_performance.tail(3).mean()
-                older_months = monthly_performance.head(3).mean()
-                
-                if recent_months > older_months * 1.1:
-                    trend = 'increasing'
-                elif recent_months < older_months * 0.9:
-                    trend = 'decreasing'
-                else:
-                    trend = 'stable'
-                
-                # Forecast next month
-                growth_rate = (recent_months / older_months - 1) if older_months > 0 else 0
-                predicted_monthly = recent_months * (1 + growth_rate)
-            else:
-                trend = 'stable'
-                predicted_monthly = avg_commission
-            
-            # Convert Period index to string for JSON serialization
-            monthly_dict = {}
-            if len(monthly_performance) > 0:
-                for period, value in monthly_performance.items():
-                    monthly_dict[str(period)] = float(value)
-
-            result = {
-                'rep': rep,
-                'total_commission': float(total_commission),
-                'avg_commission': float(avg_commission),
-                'commission_count': int(commission_count),
-                'predicted_monthly_commission': float(predicted_monthly),
-                'commission_trend': trend,
-                'monthly_performance': monthly_dict
-            }
-            results.append(result)
-        
-        return pd.DataFrame(results)
+        # Per-REP totals; need sufficient data
+        reps = commission_df.groupby('k_rep')['actual_payment_amount'].agg(['sum', 'mean', 'size'])
+        reps = reps[reps['size'] >= 3]
+        if reps.empty:
+            return pd.DataFrame()
+
+        # Calculate monthly performance from the stored payment period
+        monthly = commission_df[commission_df['k_rep'].isin(reps.index)].groupby(
+            ['k_rep', 'payment_year', 'payment_month']
+        )['actual_payment_amount'].sum().reset_index()
+        by_rep = monthly.groupby('k_rep')['actual_payment_amount']
+        position = by_rep.cumcount()
+        month_count = by_rep.transform('size')
+
+        months = pd.DataFrame({'month_count': by_rep.size()})
+        months['older_months'] = monthly['actual_payment_amount'][position < 3].groupby(monthly['k_rep']).mean()
+        months['recent_months'] = monthly['actual_payment_amount'][position >= month_count - 3].groupby(monthly['k_rep']).mean()
+        months = months.reindex(reps.index)
+
+        avg_commission = reps['mean'].to_numpy()
+        recent_months = months['recent_months'].to_numpy()
+        older_months = months['older_months'].to_numpy()
+        has_history = months['month_count'].fillna(0).to_numpy() >= 3
+
+        # Calculate growth trend from the first and last three months
+        trend = np.select(
+            [has_history & (recent_months > older_months * 1.1), has_history & (recent_months < older_months * 0.9)],
+            ['increasing', 'decreasing'],
+            default='stable'
+        )
+
+        # Forecast next month
+        growth_rate = np.divide(
+            recent_months, older_months, out=np.ones_like(recent_months), where=older_months > 0
+        ) - 1
+        predicted_monthly = np.where(has_history, recent_months * (1 + growth_rate), avg_commission)
+
+        # Convert (year, month) index to 'YYYY-MM' strings for JSON serialization
+        labels = (
+            monthly['payment_year'].astype(int).astype(str).str.zfill(4) + '-' +
+            monthly['payment_month'].astype(int).astype(str).str.zfill(2)
+        )
+        monthly_dicts = {rep: {} for rep in reps.index}
+        for rep, label, value in zip(monthly['k_rep'], labels, monthly['actual_payment_amount']):
+            monthly_dicts[rep][label] = float(value)
+
+        return pd.DataFrame({
+            'rep': reps.index.to_numpy(),
+            'total_commission': reps['sum'].to_numpy().astype(float),
+            'avg_commission': avg_commission.astype(float),
+            'commission_count': reps['size'].to_numpy().astype(int),
+            'predicted_monthly_commission': predicted_monthly.astype(float),
+            'commission_trend': trend,
+            'monthly_performance': [monthly_dicts[rep] for rep in reps.index]
+        })
     
+    def record_usage_history(self, usage_records, period):
+        """Store this month's usage per account in usage_history; False when the table is missing"""
+        if not self.has_table('usage_history'):
+            return False
+        recorded_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        self.conn.executemany(
+            """
+            INSERT INTO usage_history (account_name, period, total_usage_kwh, esiid_count, recorded_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (account_name, period) DO UPDATE SET
+                total_usage_kwh = excluded.total_usage_kwh,
+                esiid_count = excluded.esiid_count,
+                recorded_at = excluded.recorded_at
+            """,
+            [(r['account_name'], period, r['total_usage_kwh'], r['esiid_count'], recorded_at) for r in usage_records]
+        )
+        self.conn.commit()
+        return True
+
+    def load_usage_history(self, period):
+        """Monthly usage per account for the HISTORY_MONTHS up to period"""
+        return pd.read_sql_query(
+            "SELECT account_name, period, total_usage_kwh FROM usage_history WHERE period >= ? AND period <= ?",
+            self.conn, params=(shift_period(period, 1 - self.HISTORY_MONTHS), period)
+        )
+
+    def fit_seasonal_factors(self, usage, observed, months):
+        """
+        Multiplicative seasonal indices by calendar month, pooled over all accounts.
+
+        Classical decomposition: each observed month's usage over its centred
+        12-month moving average, with the median ratio per calendar month
+        across accounts and years (months filled in for a missing run give no
+        ratio). Indices are scaled to the mean of SEASONAL_FACTORS so levels
+        stay on the scale of the fixed table.
+
+        Returns:
+            Dict of month -> index, or None under SEASONAL_FIT_MONTHS of history
+            or when a calendar month has no ratio
+        """
+        if not len(usage) or usage.shape[1] < self.SEASONAL_FIT_MONTHS:
+            return None
+        weights = np.r_[0.5, np.ones(11), 0.5] / 12
+        moving_average = np.lib.stride_tricks.sliding_window_view(usage, 13, axis=1) @ weights
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(observed[:, 6:-6], usage[:, 6:-6], np.nan) / moving_average
+        centred_months = months[6:-6]
+
+        factors = {}
+        for month in range(1, 13):
+            values = ratios[:, centred_months == month]
+            values = values[np.isfinite(values) & (values > 0)]
+            if not len(values):
+                return None
+            factors[month] = float(np.median(values))
+        scale = np.mean(list(self.SEASONAL_FACTORS.values())) / np.mean(list(factors.values()))
+        return {month: factor * scale for month, factor in factors.items()}
+
+    def forecast_usage(self, usage_records):
+        """
+        Fit seasonally adjusted Holt linear models to every account's monthly usage in one batch.
+
+        Monthly usage (usage_history) is divided by monthly seasonal indices and
+        Holt's linear method is fitted to all accounts at once. With at least
+        two seasons of history the indices are fitted from it
+        (fit_seasonal_factors, model 'holt_linear_fitted_seasonal'); otherwise
+        the fixed SEASONAL_FACTORS table is used ('holt_linear_fixed_seasonal').
+        Unlike Holt-Winters, the indices are not smoothed per account. The last
+        BACKTEST_MONTHS are also forecast from the months before them: the
+        per-account MAPE measures accuracy, and the pooled ratios of actual to
+        forecast usage give empirical prediction intervals.
+
+        Returns:
+            Tuple of (per-account model parameters, model summary)
+        """
+        period = int(datetime.now().strftime('%Y%m'))
+        accounts = pd.Index([r['account_name'] for r in usage_records])
+        if self.record_usage_history(usage_records, period):
+            history = self.load_usage_history(period)
+        else:
+            history = pd.DataFrame({
+                'account_name': accounts,
+                'period': period,
+                'total_usage_kwh': [r['total_usage_kwh'] for r in usage_records]
+            })
+
+        rows = accounts.get_indexer(history['account_name'])
+        history = history[rows >= 0]
+        rows = rows[rows >= 0]
+        first_period = int(history['period'].min()) if len(history) else period
+        n_months = int(period_index(np.array([period]), origin=first_period)[0]) + 1
+
+        usage = np.full((len(accounts), n_months), np.nan)
+        usage[rows, period_index(history['period'].to_numpy(), origin=first_period)] = \
+            history['total_usage_kwh'].to_numpy(dtype=float)
+        observed = ~np.isnan(usage)
+        # A month without a run repeats the month before it
+        usage = pd.DataFrame(usage).ffill(axis=1).to_numpy()
+
+        months = (period_index(np.array([first_period]))[0] + np.arange(n_months)) % 12 + 1
+        fitted_factors = self.fit_seasonal_factors(usage, observed, months)
+        seasonal_factors = fitted_factors or self.SEASONAL_FACTORS
+        seasonal = np.array([seasonal_factors[m] for m in months])
+        deseasonalized = usage / seasonal
+        state = fit_holt(deseasonalized)
+
+        mape = np.full(len(accounts), np.nan)
+        interval_ratios = None
+        holdout = self.BACKTEST_MONTHS
+        if len(accounts) and n_months >= holdout + self.MIN_TRAINING_MONTHS:
+            backtest = fit_holt(deseasonalized[:, :-holdout])
+            point, _, _ = backtest.forecast(holdout)
+            predicted = point * seasonal[-holdout:]
+            actual = usage[:, -holdout:]
+            valid = backtest.started[:, None] & (predicted > 0) & (actual > 0)
+            error = np.where(valid, np.abs(actual - predicted) / np.where(valid, actual, 1), np.nan)
+            mape = np.nanmean(error, axis=1)
+
+            tail = (1 - self.FORECAST_CONFIDENCE) / 2
+            ratio = actual / np.where(valid, predicted, 1)
+            if valid.sum(axis=0).min() >= self.MIN_INTERVAL_SAMPLES:
+                interval_ratios = [
+                    [float(np.quantile(ratio[valid[:, h], h], tail)), float(np.quantile(ratio[valid[:, h], h], 1 - tail))]
+                    for h in range(holdout)
+                ]
+
+        backtested = ~np.isnan(mape)
+        portfolio_mape = float(np.mean(mape[backtested])) if backtested.any() else None
+        models = [
+            {
+                'account_name': account,
+                'level': float(state.level[i]),
+                'trend': float(state.trend[i]),
+                'alpha': float(state.alpha[i]),
+                'beta': float(state.beta[i]),
+                'residual_std': float(state.sigma[i]),
+                'fit_points': int(state.n_errors[i]),
+                'history_months': int(np.count_nonzero(~np.isnan(usage[i]))),
+                'backtest_mape': float(mape[i]) if backtested[i] else None
+            }
+            for i, account in enumerate(accounts)
+        ]
+        summary = {
+            'model': 'holt_linear_fitted_seasonal' if fitted_factors else 'holt_linear_fixed_seasonal',
+            'seasonal_factors': {str(month): float(factor) for month, factor in seasonal_factors.items()},
+            'last_period': period,
+            'history_months': n_months,
+            'confidence': self.FORECAST_CONFIDENCE,
+            'backtest_months': holdout if backtested.any() else 0,
+            'accounts_backtested': int(backtested.sum()),
+            'backtest_mape': portfolio_mape,
+            'model_accuracy': max(0.0, 1 - portfolio_mape) if portfolio_mape is not None else None,
+            'interval_ratios': interval_ratios
+        }
+        return models, summary
+
+    def summarize_usage(self, usage_df):
+        """Per (account, zone, REP) ESIID counts and totals that market aggregates are built from"""
+        summary = usage_df.groupby(['account_name', 'zone', 'rep'], dropna=False).agg(
+            esiid_count=('kwh_mo', 'size'),
+            kwh_sum=('kwh_mo', 'sum'),
+            bill_sum=('total_bill', 'sum')
+        ).reset_index()
+        return summary[self.USAGE_SUMMARY_COLUMNS]
+
+    def summarize_pricing(self, pricing_df):
+        """Per (zone, REP) rate counts and totals that pricing competitiveness is built from"""
+        summary = pricing_df.groupby(['zone', 'rep'], dropna=False).agg(
+            rate_count=('daily_rate', 'size'),
+            rate_sum=('daily_rate', 'sum'),
+            rate_min=('daily_rate', 'min'),
+            rate_max=('daily_rate', 'max')
+        ).reset_index()
+        return summary[self.PRICING_SUMMARY_COLUMNS]
+
+    def build_market_cube(self):
+        """
+        Base cells of the market cube, aggregated in SQLite.
+
+        Usage cells hold ESIID counts, kWh and bills per zone, REP, load
+        profile and management company, stamped with the analysis month (usage
+        is a snapshot). Pricing cells hold rate counts, sums and extremes per
+        zone, REP, load profile and effective month. Every coarser view is a
+        rollup of these cells.
+        """
+        if self.has_table('accounts'):
+            company_source = """
+                LEFT JOIN (
+                    SELECT account_name, MIN(management_company) AS management_company
+                    FROM accounts GROUP BY account_name
+                ) a ON a.account_name = e.account_name"""
+            company = "a.management_company"
+        else:
+            company_source, company = "", "NULL"
+        usage = pd.read_sql_query(
+            f"""
+            SELECT 'usage' AS fact, e.zone, e.rep, e.load_profile, {company} AS management_company,
+                   ? AS month, COUNT(*) AS record_count, SUM(e.kwh_mo) AS kwh_sum, SUM(e.total_bill) AS bill_sum
+            FROM esiids e {company_source}
+            WHERE e.kwh_mo IS NOT NULL AND e.kwh_mo > 0
+            GROUP BY e.zone, e.rep, e.load_profile, {company}
+            """,
+            self.conn, params=(datetime.now().strftime('%Y-%m'),)
+        )
+        pricing = pd.read_sql_query(
+            """
+            SELECT 'pricing' AS fact, zone, rep, load_profile, substr(effective_date, 1, 7) AS month,
+                   COUNT(*) AS record_count, SUM(daily_rate) AS rate_sum,
+                   MIN(daily_rate) AS rate_min, MAX(daily_rate) AS rate_max
+            FROM daily_pricing
+            WHERE daily_rate IS NOT NULL AND daily_rate > 0
+            GROUP BY zone, rep, load_profile, substr(effective_date, 1, 7)
+            """,
+            self.conn
+        )
+        return pd.concat([usage, pricing], ignore_index=True).reindex(columns=self.CUBE_COLUMNS)
+
     def generate_market_intelligence(self, usage_df, pricing_df, commission_df):
         """Generate comprehensive market intelligence"""
+        return self.build_market_intelligence(self.summarize_usage(usage_df), self.summarize_pricing(pricing_df))
+
+    def build_market_intelligence(self, usage_summary, pricing_summary):
+        """Fold usage and pricing summaries into market intelligence"""
         
         # Market size analysis
-        total_market_kwh = usage_df['kwh_mo'].sum() * 12  # Annual
-        total_market_value = usage_df['total_bill'].sum() * 12  # Annual
+        total_market_kwh = usage_summary['kwh_sum'].sum() * 12  # Annual
+        total_market_value = usage_summary['bill_sum'].sum() * 12  # Annual
         
-        # Zone analysis - flatten multi-level columns
-        zone_agg = usage_df.groupby('zone').agg({
-            'kwh_mo': ['sum', 'mean', 'count'],
-            'total_bill': 'sum'
-        }).round(2)
+        # Zone analysis
+        zone_agg = usage_summary.groupby('zone')[['kwh_sum', 'esiid_count', 'bill_sum']].sum()
 
         zone_analysis = {}
         for zone in zone_agg.index:
+            kwh_sum, esiid_count, bill_sum = zone_agg.loc[zone]
             zone_analysis[zone] = {
-                'total_kwh': float(zone_agg.loc[zone, ('kwh_mo', 'sum')]),
-                'avg_kwh': float(zone_agg.loc[zone, ('kwh_mo', 'mean')]),
-                'esiid_count': int(zone_agg.loc[zone, ('kwh_mo', 'count')]),
-                'total_bill': float(zone_agg.loc[zone, ('total_bill', 'sum')])
+                'total_kwh': round(float(kwh_sum), 2),
+                'avg_kwh': round(float(kwh_sum / esiid_count), 2),
+                'esiid_count': int(esiid_count),
+                'total_bill': round(float(bill_sum), 2)
             }
 
         # REP market share
-        rep_agg = usage_df.groupby('rep').agg({
-            'kwh_mo': 'sum',
-            'total_bill': 'sum'
-        }).sort_values('kwh_mo', ascending=False)
+        rep_agg = usage_summary.groupby('rep')[['kwh_sum', 'bill_sum']].sum().sort_values('kwh_sum', ascending=False)
 
         rep_market_share = {}
         for rep in rep_agg.index:
             rep_market_share[rep] = {
-                'total_kwh': float(rep_agg.loc[rep, 'kwh_mo']),
-                'total_bill': float(rep_agg.loc[rep, 'total_bill'])
+                'total_kwh': float(rep_agg.loc[rep, 'kwh_sum']),
+                'total_bill': float(rep_agg.loc[rep, 'bill_sum'])
             }
 
         # Pricing competitiveness
-        pricing_agg = pricing_df.groupby('rep')['daily_rate'].agg(['mean', 'min', 'max']).round(2)
+        pricing_agg = pricing_summary.groupby('rep').agg(
+            rate_count=('rate_count', 'sum'),
+            rate_sum=('rate_sum', 'sum'),
+            rate_min=('rate_min', 'min'),
+            rate_max=('rate_max', 'max')
+        )
         pricing_competitiveness = {}
         for rep in pricing_agg.index:
             pricing_competitiveness[rep] = {
-                'avg_rate': float(pricing_agg.loc[rep, 'mean']),
-                'min_rate': float(pricing_agg.loc[rep, 'min']),
-                'max_rate': float(pricing_agg.loc[rep, 'max'])
+                'avg_rate': round(float(pricing_agg.loc[rep, 'rate_sum'] / pricing_agg.loc[rep, 'rate_count']), 2),
+                'min_rate': round(float(pricing_agg.loc[rep, 'rate_min']), 2),
+                'max_rate': round(float(pricing_agg.loc[rep, 'rate_max']), 2)
             }
         
         intelligence = {
@@ -317,8 +685,8 @@ class EnergyAnalyticsEngine:
                 'total_annual_consumption_kwh': float(total_market_kwh),
                 'total_annual_value': float(total_market_value),
                 'average_cost_per_kwh': float(total_market_value / total_market_kwh if total_market_kwh > 0 else 0),
-                'total_accounts': int(len(usage_df['account_name'].unique())),
-                'total_esiids': int(len(usage_df))
+                'total_accounts': int(usage_summary['account_name'].nunique(dropna=False)),
+                'total_esiids': int(usage_summary['esiid_count'].sum())
             },
             'zone_analysis': zone_analysis,
             'rep_market_share': rep_market_share,
@@ -327,72 +695,751 @@ class EnergyAnalyticsEngine:
         }
         
         return intelligence
+
+    @staticmethod
+    def frame_rows(df):
+        """DataFrame rows as plain lists with missing values as None (JSON-safe)"""
+        return df.astype(object).where(df.notna(), None).values.tolist()
+
+    def read_watermarks(self):
+        """
+        High-water marks (max id, max updated_at) for every tracked table.
+
+        updated_at is capped a few seconds in the past so rows written while a
+        run is reading are picked up again by the next run.
+        """
+        watermarks = {}
+        for table in self.TRACKED_TABLES:
+            max_id, max_updated_at = self.conn.execute(
+                f"SELECT MAX(id), MIN(MAX(updated_at), datetime('now', '-5 seconds')) FROM {table}"
+            ).fetchone()
+            watermarks[table] = {'max_id': max_id, 'max_updated_at': max_updated_at}
+        return watermarks
+
+    def count_keys(self, table):
+        """Rows per grouping key among the rows a table's loader reads"""
+        spec = self.TRACKED_TABLES[table]
+        keys = ', '.join(spec['keys'])
+        rows = self.conn.execute(
+            f"SELECT {keys}, COUNT(*) FROM {table} WHERE {spec['filter']} GROUP BY {keys}"
+        ).fetchall()
+        return {tuple(row[:-1]): row[-1] for row in rows}
+
+    def find_affected_keys(self, table, watermark, key_counts):
+        """
+        Grouping keys touched since a previous run.
+
+        Rows inserted or updated after the watermark contribute their current
+        keys. Keys whose row count changed catch deleted rows and rows moved
+        to another key, which leave no trace under their old key.
+        """
+        spec = self.TRACKED_TABLES[table]
+        conditions, params = ["id > ?"], [watermark['max_id'] or 0]
+        if watermark['max_updated_at'] is None:
+            conditions.append("updated_at IS NOT NULL")
+        else:
+            conditions.append("updated_at > ?")
+            params.append(watermark['max_updated_at'])
+
+        changed = self.conn.execute(
+            f"SELECT DISTINCT {', '.join(spec['keys'])} FROM {table} WHERE {' OR '.join(conditions)}",
+            params
+        ).fetchall()
+        affected = {tuple(row) for row in changed}
+
+        current = self.count_keys(table)
+        affected.update(key for key in set(current) | set(key_counts) if current.get(key) != key_counts.get(key))
+        return affected
+
+    def stage_keys(self, name, keys):
+        """Load keys into a temp table (columns k0, k1, ...) for loaders to join against"""
+        keys = list(keys)
+        width = len(keys[0])
+        self.conn.execute(f"DROP TABLE IF EXISTS temp.{name}")
+        self.conn.execute(f"CREATE TEMP TABLE {name} ({', '.join(f'k{i}' for i in range(width))})")
+        self.conn.executemany(f"INSERT INTO temp.{name} VALUES ({', '.join('?' * width)})", keys)
+        return f"temp.{name}"
+
+    @staticmethod
+    def merge_records(records, analysis_df, key_columns, affected):
+        """Replace the records of affected keys with fresh analysis, in key order"""
+        kept = [r for r in records if tuple(r[c] for c in key_columns) not in affected]
+        merged = kept + analysis_df.to_dict('records')
+        return sorted(merged, key=lambda r: tuple(r[c] for c in key_columns))
+
+    def load_previous_run(self):
+        """Stored results and incremental state, or None when a full run is needed"""
+        output_path, state_path = Path(self.output_file), Path(self.state_file)
+        if not output_path.exists() or not state_path.exists():
+            return None
+        try:
+            with open(output_path, 'r') as f:
+                results = json.load(f)
+            with open(state_path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if state.get('version') != self.STATE_VERSION:
+            return None
+        # Usage forecasts carry the current month's seasonal factor
+        if state.get('analysis_month') != datetime.now().strftime('%Y-%m'):
+            return None
+        return results, state
+
+    def save_run(self, results, state, anomalies=None, cube=None):
+        """
+        Write results for the frontend and the state the next incremental run starts from.
+
+        anomalies are the per-ESIID scores to persist; None carries the active
+        generation's scores over unchanged. cube holds the market cube's base
+        cells.
+        """
+        output_path = Path(self.output_file)
+        output_path.parent.mkdir(exist_ok=True)
+        # Readers (the API serves this file directly) must never see a partial write
+        temp_path = output_path.with_name(output_path.name + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+        os.replace(temp_path, output_path)
+
+        state['version'] = self.STATE_VERSION
+        state['analysis_month'] = datetime.now().strftime('%Y-%m')
+        state_path = Path(self.state_file)
+        temp_path = state_path.with_name(state_path.name + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(state, f, default=str)
+        os.replace(temp_path, state_path)
+
+        generation_id = self.persist_results(results, anomalies, cube)
+        written = sum(len(results[key]) for key in ('usage_analysis', 'pricing_analysis', 'commission_analysis'))
+        written += (len(anomalies) if anomalies is not None else 0) + (len(cube) if cube is not None else 0) + 1
+        self.count_rows('save', rows_out=written)
+        self.finish_stage()
+        self.persist_metrics(generation_id, results)
+
+    def measure_data_quality(self):
+        """Share of ESIIDs with every usage input the analyses need, or None without ESIIDs"""
+        total, complete = self.conn.execute(
+            """
+            SELECT COUNT(*), SUM(CASE WHEN kwh_mo > 0 AND total_bill > 0 AND zone IS NOT NULL
+                                      AND load_profile IS NOT NULL AND rep IS NOT NULL THEN 1 ELSE 0 END)
+            FROM esiids
+            """
+        ).fetchone()
+        return round(complete / total, 4) if total else None
+
+    def run_metrics(self):
+        """Stage measurements of the current run plus a 'total' row for the whole run"""
+        stages = {name: metrics for name, metrics in self.stage_metrics.items() if 'started_at' in metrics}
+        started = min((m['started_at'] for m in stages.values()), default=self._run_started)
+        rows = []
+        for name, m in sorted(stages.items(), key=lambda item: item[1]['started_at']):
+            rows.append({
+                'stage': name,
+                'location': m['location'],
+                'offset_seconds': round(m['started_at'] - started, 4),
+                'wall_seconds': m['seconds'],
+                'cpu_seconds': m['cpu_seconds'],
+                'peak_rss_mb': m['peak_rss_mb'],
+                'rows_in': m.get('rows_in'),
+                'rows_out': m.get('rows_out'),
+                'groups': m.get('groups')
+            })
+        peaks = [row['peak_rss_mb'] for row in rows if row['peak_rss_mb'] is not None]
+        loaded = [row['rows_in'] for row in rows if row['stage'] in ('usage', 'pricing', 'commission')]
+        rows.append({
+            'stage': 'total',
+            'location': 'local',
+            'offset_seconds': 0.0,
+            'wall_seconds': round(time.time() - self._run_started, 4),
+            'cpu_seconds': round(sum(row['cpu_seconds'] for row in rows), 4),
+            'peak_rss_mb': max(peaks) if peaks else None,
+            'rows_in': sum(filter(None, loaded)) if loaded else None,
+            'rows_out': stages.get('save', {}).get('rows_out'),
+            'groups': None
+        })
+        for row in rows:
+            row['groups_per_second'] = round(row['groups'] / row['wall_seconds'], 2) \
+                if row['groups'] and row['wall_seconds'] > 0 else None
+        return rows
+
+    def persist_metrics(self, generation_id, results):
+        """Store the run's stage measurements, data quality and forecast accuracy with its generation"""
+        if generation_id is None or not self.has_table('analytics_stage_metrics'):
+            return
+        rows = self.run_metrics()
+        analysis_date = self.conn.execute(
+            "SELECT analysis_date FROM analytics_generations WHERE id = ?", (generation_id,)
+        ).fetchone()[0]
+        columns = ['stage', 'location', 'offset_seconds', 'wall_seconds', 'cpu_seconds', 'peak_rss_mb',
+                   'rows_in', 'rows_out', 'groups', 'groups_per_second']
+        self.conn.executemany(
+            f"""
+            INSERT INTO analytics_stage_metrics (generation_id, analysis_date, run_mode, {', '.join(columns)})
+            VALUES (?, ?, ?, {', '.join('?' * len(columns))})
+            """,
+            [(generation_id, analysis_date, self.run_mode) + tuple(row[c] for c in columns) for row in rows]
+        )
+        forecast_model = results.get('usage_forecast_model') or {}
+        self.conn.execute(
+            """
+            UPDATE analytics_generations
+            SET run_mode = ?, duration_seconds = ?, data_quality_score = ?, model_accuracy = ?
+            WHERE id = ?
+            """,
+            (self.run_mode, rows[-1]['wall_seconds'], self.measure_data_quality(),
+             forecast_model.get('model_accuracy'), generation_id)
+        )
+        self.conn.execute(
+            """
+            DELETE FROM analytics_stage_metrics WHERE generation_id NOT IN (
+                SELECT DISTINCT generation_id FROM analytics_stage_metrics ORDER BY generation_id DESC LIMIT ?
+            )
+            """,
+            (self.KEEP_RUN_METRICS,)
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def record_hash(record):
+        """Short content hash of one result record, compared across generations for deltas"""
+        return hashlib.blake2b(json.dumps(record, sort_keys=True, default=str).encode(), digest_size=8).hexdigest()
+
+    @staticmethod
+    def frame_hashes(df):
+        """Content hash of each row of a frame, in the same format as record_hash"""
+        return [f"{value:016x}" for value in pd.util.hash_pandas_object(df, index=False)]
+
+    @staticmethod
+    def section_hash(row_hashes):
+        """Content hash of a whole section from its rows' hashes, served as the ETag"""
+        return hashlib.blake2b(''.join(row_hashes).encode(), digest_size=16).hexdigest()
+
+    def has_table(self, name):
+        """Check whether a table exists in the database"""
+        row = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+        return row is not None
+
+    def persist_results(self, results, anomalies=None, cube=None):
+        """
+        Write results to the analytics tables as a new generation and activate it.
+
+        Rows are written under a 'building' generation first. The switch to
+        'active' happens in a single transaction, so API readers see the old
+        or the new generation, never a mix. Returns the generation id, or None
+        when the analytics tables have not been migrated.
+        """
+        if not self.has_table('analytics_generations'):
+            print("   Analytics tables not found, skipping database persistence (run 'alembic upgrade head')")
+            return None
+
+        analysis_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        usage, pricing, commission = (
+            results['usage_analysis'], results['pricing_analysis'], results['commission_analysis']
+        )
+        generation_id = self.conn.execute(
+            """
+            INSERT INTO analytics_generations
+                (model_version, analysis_date, status, usage_count, pricing_count, commission_count)
+            VALUES (?, ?, 'building', ?, ?, ?)
+            """,
+            (self.MODEL_VERSION, analysis_date, len(usage), len(pricing), len(commission))
+        ).lastrowid
+        generation = (generation_id, analysis_date, self.MODEL_VERSION)
+        row_hashes = {
+            name: [self.record_hash(r) for r in records]
+            for name, records in (('usage', usage), ('pricing', pricing), ('commission', commission))
+        }
+        forecast_model = results.get('usage_forecast_model')
+        forecasts = {f['account_name']: f for f in results.get('usage_forecasts', [])}
+        confidence = forecast_model['confidence'] if forecast_model else None
+
+        self.conn.executemany(
+            """
+            INSERT INTO usage_analytics
+                (generation_id, analysis_date, model_version, is_active, account_name, esiid_count,
+                 current_usage_kwh, avg_usage_kwh, predicted_usage_kwh, usage_pattern, efficiency_score,
+                 anomaly_score, seasonal_factor, cost_per_kwh, total_monthly_bill,
+                 forecast_period, forecast_confidence, forecast_data, row_hash)
+            VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'monthly', ?, ?, ?)
+            """,
+            [generation + (r['account_name'], r['esiid_count'], r['total_usage_kwh'], r['avg_usage_kwh'],
+                           r['predicted_usage_kwh'], r['usage_pattern'], r['efficiency_score'],
+                           r['anomaly_score'], r['seasonal_factor'], r['cost_per_kwh'],
+                           r['total_monthly_bill'], confidence,
+                           json.dumps(forecasts[r['account_name']]) if r['account_name'] in forecasts else None,
+                           row_hash)
+             for r, row_hash in zip(usage, row_hashes['usage'])]
+        )
+        self.conn.executemany(
+            """
+            INSERT INTO pricing_analytics
+                (generation_id, analysis_date, model_version, is_active, zone, rep, current_rate, avg_rate,
+                 predicted_rate, rate_trend, market_position, price_volatility, percentile_rank, data_points,
+                 row_hash)
+            VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [generation + (r['zone'], r['rep'], r['current_rate'], r['avg_rate'], r['predicted_rate'],
+                           r['rate_trend'], r['market_position'], r['volatility'], r['percentile_rank'],
+                           r['data_points'], row_hash)
+             for r, row_hash in zip(pricing, row_hashes['pricing'])]
+        )
+        self.conn.executemany(
+            """
+            INSERT INTO commission_analytics
+                (generation_id, analysis_date, model_version, is_active, rep, total_commission,
+                 average_commission_value, commission_count, predicted_monthly_commission,
+                 commission_trend, monthly_performance, row_hash)
+            VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [generation + (r['rep'], r['total_commission'], r['avg_commission'], r['commission_count'],
+                           r['predicted_monthly_commission'], r['commission_trend'],
+                           json.dumps(r['monthly_performance']), row_hash)
+             for r, row_hash in zip(commission, row_hashes['commission'])]
+        )
+        content_hashes = {name: self.section_hash(hashes) for name, hashes in row_hashes.items()}
+        if self.has_table('esiid_anomalies'):
+            content_hashes['anomalies'] = self.persist_anomalies(generation, anomalies)
+        if cube is not None:
+            content_hashes['cube'] = self.section_hash(self.frame_hashes(cube[self.CUBE_COLUMNS]))
+        if cube is not None and self.has_table('market_cube'):
+            self.conn.executemany(
+                f"""
+                INSERT INTO market_cube (generation_id, {', '.join(self.CUBE_COLUMNS)})
+                VALUES (?, {', '.join('?' * len(self.CUBE_COLUMNS))})
+                """,
+                [(generation_id,) + tuple(row) for row in
+                 cube.astype(object).where(cube.notna(), None).itertuples(index=False, name=None)]
+            )
+        market = results['market_intelligence']
+        self.conn.execute(
+            """
+            INSERT INTO market_intelligence
+                (generation_id, analysis_date, model_version, is_active, market_segment, time_period,
+                 market_overview, zone_analysis, total_market_size, average_market_rate,
+                 market_leaders, competitive_positioning, demand_forecast)
+            VALUES (?, ?, ?, 1, 'all', 'annual', ?, ?, ?, ?, ?, ?, ?)
+            """,
+            generation + (json.dumps(market['market_overview']), json.dumps(market['zone_analysis']),
+                          market['market_overview']['total_annual_consumption_kwh'],
+                          market['market_overview']['average_cost_per_kwh'],
+                          json.dumps(market['rep_market_share']),
+                          json.dumps(market['pricing_competitiveness']),
+                          json.dumps(forecast_model) if forecast_model else None)
+        )
+        # Unchanged intelligence keeps its ETag although every run restamps it
+        content_hashes['market'] = self.section_hash([
+            self.record_hash({key: value for key, value in market.items() if key != 'analysis_date'}),
+            self.record_hash(forecast_model)
+        ])
+        self.conn.execute(
+            "UPDATE analytics_generations SET content_hashes = ? WHERE id = ?",
+            (json.dumps(content_hashes), generation_id)
+        )
+        self.conn.commit()
+
+        # Atomic switchover to the new generation
+        self.conn.execute("UPDATE analytics_generations SET status = 'retired' WHERE status = 'active'")
+        self.conn.execute(
+            "UPDATE analytics_generations SET status = 'active', activated_at = ? WHERE id = ?",
+            (analysis_date, generation_id)
+        )
+        self.conn.commit()
+
+        self.prune_generations()
+        print(f"   Analytics generation {generation_id} activated")
+        return generation_id
+
+    def persist_anomalies(self, generation, anomalies):
+        """
+        Write ESIID anomaly scores under a new generation, or copy the active
+        generation's. Returns the section's content hash.
+        """
+        columns = ', '.join(self.ANOMALY_COLUMNS + ['row_hash'])
+        if anomalies is None:
+            self.conn.execute(
+                f"""
+                INSERT INTO esiid_anomalies (generation_id, analysis_date, model_version, {columns})
+                SELECT ?, ?, ?, {columns} FROM esiid_anomalies
+                WHERE generation_id = (
+                    SELECT id FROM analytics_generations WHERE status = 'active' ORDER BY id DESC LIMIT 1
+                )
+                ORDER BY id
+                """,
+                generation
+            )
+            return self.section_hash([row[0] for row in self.conn.execute(
+                "SELECT row_hash FROM esiid_anomalies WHERE generation_id = ? ORDER BY id", (generation[0],)
+            )])
+
+        frame = anomalies[self.ANOMALY_COLUMNS]
+        row_hashes = self.frame_hashes(frame)
+        rows = frame.astype(object).where(frame.notna(), None)
+        self.conn.executemany(
+            f"""
+            INSERT INTO esiid_anomalies (generation_id, analysis_date, model_version, {columns})
+            VALUES (?, ?, ?, {', '.join('?' * (len(self.ANOMALY_COLUMNS) + 1))})
+            """,
+            [generation + tuple(row) + (row_hash,)
+             for row, row_hash in zip(rows.itertuples(index=False, name=None), row_hashes)]
+        )
+        return self.section_hash(row_hashes)
+
+    def prune_generations(self):
+        """Delete generations older than the last KEEP_GENERATIONS, including abandoned builds"""
+        stale = [row[0] for row in self.conn.execute(
+            """
+            SELECT id FROM analytics_generations
+            WHERE id NOT IN (
+                SELECT id FROM analytics_generations
+                WHERE status IN ('active', 'retired')
+                ORDER BY id DESC LIMIT ?
+            )
+            """,
+            (self.KEEP_GENERATIONS,)
+        )]
+        if not stale:
+            return
+        placeholders = ', '.join('?' * len(stale))
+        for table in filter(self.has_table, self.GENERATION_TABLES):
+            self.conn.execute(f"DELETE FROM {table} WHERE generation_id IN ({placeholders})", stale)
+        self.conn.execute(f"DELETE FROM analytics_generations WHERE id IN ({placeholders})", stale)
+        self.conn.commit()
     
+    def usage_stage(self):
+        """Load ESIID usage and run every analysis of it, so the raw frame stays in one process"""
+        usage_df = self.load_usage_data()
+        return {
+            'records': len(usage_df),
+            'analysis': self.analyze_usage_patterns(usage_df),
+            'anomalies': self.detect_anomalies(usage_df),
+            'summary': self.summarize_usage(usage_df)
+        }
+
+    def pricing_stage(self):
+        """Load daily pricing and analyze it"""
+        pricing_df = self.load_pricing_data()
+        return {
+            'records': len(pricing_df),
+            'summary': self.summarize_pricing(pricing_df),
+            'analysis': self.analyze_pricing_trends(pricing_df)
+        }
+
+    def commission_stage(self):
+        """Load commissions and analyze them"""
+        commission_df = self.load_commission_data()
+        return {
+            'records': len(commission_df),
+            'analysis': self.analyze_commission_performance(commission_df),
+            'counts': commission_df.groupby('k_rep', dropna=False).size().reset_index()
+        }
+
+    def build_pipeline(self):
+        """
+        The full run as a DAG: the usage, pricing, commission and cube stages
+        only read the database and run in parallel worker processes, each on
+        its own read-only connection. Forecasts (which write usage_history)
+        and market intelligence run here as soon as their inputs arrive.
+        """
+        fork = 'fork' in multiprocessing.get_all_start_methods()
+        parallel = self.workers > 1 and fork
+
+        def pooled(method):
+            return partial(_run_pipeline_stage, method) if parallel else getattr(self, method)
+
+        def loaded(out):
+            return {'rows_in': out['records'], 'rows_out': len(out['analysis']), 'groups': len(out['analysis'])}
+
+        stages = [
+            Stage('usage', pooled('usage_stage'), pooled=True,
+                  counts=lambda out: {**loaded(out), 'rows_out': len(out['analysis']) + len(out['anomalies'])}),
+            Stage('pricing', pooled('pricing_stage'), pooled=True, counts=loaded),
+            Stage('commission', pooled('commission_stage'), pooled=True, counts=loaded),
+            Stage('cube', pooled('build_market_cube'), pooled=True,
+                  counts=lambda cube: {'rows_in': int(cube['record_count'].sum()), 'rows_out': len(cube),
+                                       'groups': len(cube)}),
+            Stage('forecast', lambda usage: self.forecast_usage(usage['analysis'].to_dict('records')),
+                  deps=['usage'],
+                  counts=lambda out, usage: {'rows_in': len(usage['analysis']), 'rows_out': len(out[0]),
+                                             'groups': len(out[0])}),
+            Stage('market', lambda usage, pricing: self.build_market_intelligence(usage['summary'], pricing['summary']),
+                  deps=['usage', 'pricing'],
+                  counts=lambda out, usage, pricing: {'rows_in': len(usage['summary']) + len(pricing['summary']),
+                                                      'groups': len(out['zone_analysis'])})
+        ]
+        messages = {
+            'usage': "🔍 Analyzing usage patterns and anomalies...",
+            'pricing': "📈 Analyzing pricing trends...",
+            'commission': "💰 Analyzing commission performance...",
+            'cube': "🧊 Building market cube...",
+            'forecast': "🔮 Fitting usage forecasts...",
+            'market': "🌐 Generating market intelligence..."
+        }
+
+        def on_start(stage):
+            print(messages[stage])
+            self.notify_stage(stage)
+
+        return Pipeline(
+            stages, workers=self.workers,
+            mp_context=multiprocessing.get_context('fork') if parallel else None,
+            initializer=_init_pipeline_worker if parallel else None, initargs=(self.db_path,),
+            on_start=on_start
+        )
+
+    @staticmethod
+    def pipeline_summary(pipeline):
+        """Per-stage timings of a pipeline run, offsets relative to its start"""
+        started = min((t['started_at'] for t in pipeline.timings.values()), default=0.0)
+        return {
+            'mode': 'parallel' if pipeline.parallel else 'serial',
+            'workers': pipeline.workers if pipeline.parallel else 1,
+            'wall_seconds': pipeline.wall_seconds,
+            'stage_seconds': round(sum(t['seconds'] for t in pipeline.timings.values()), 4),
+            'cpu_seconds': round(sum(t['cpu_seconds'] for t in pipeline.timings.values()), 4),
+            'stages': {
+                name: {
+                    'offset_seconds': round(t['started_at'] - started, 4),
+                    'seconds': t['seconds'],
+                    'cpu_seconds': t['cpu_seconds'],
+                    'peak_rss_mb': t['peak_rss_mb'],
+                    'location': t['location']
+                }
+                for name, t in sorted(pipeline.timings.items(), key=lambda item: item[1]['started_at'])
+            }
+        }
+
     def run_full_analysis(self):
         """Run complete analytics pipeline"""
         print("🚀 Starting Energy Analytics Engine...")
         
         try:
+            self.begin_run('full')
             self.connect()
             
-            # Load data
-            print("📊 Loading data...")
-            usage_df = self.load_usage_data()
-            pricing_df = self.load_pricing_data()
-            commission_df = self.load_commission_data()
-            
-            print(f"   Loaded {len(usage_df)} usage records")
-            print(f"   Loaded {len(pricing_df)} pricing records")
-            print(f"   Loaded {len(commission_df)} commission records")
-            
-            # Run analyses
-            print("🔍 Analyzing usage patterns...")
-            usage_analysis = self.analyze_usage_patterns(usage_df)
-            
-            print("📈 Analyzing pricing trends...")
-            pricing_analysis = self.analyze_pricing_trends(pricing_df)
-            
-            print("💰 Analyzing commission performance...")
-            commission_analysis = self.analyze_commission_performance(commission_df)
+            # Watermarks first: anything written while loading is seen again next run
+            watermarks = self.read_watermarks()
+
+            pipeline = self.build_pipeline()
+            outputs = pipeline.run()
+            self.stage_metrics.update(pipeline.timings)
+            usage, pricing, commission = outputs['usage'], outputs['pricing'], outputs['commission']
+            usage_analysis, anomalies = usage['analysis'], usage['anomalies']
+            pricing_analysis, commission_analysis = pricing['analysis'], commission['analysis']
+            usage_forecasts, usage_forecast_model = outputs['forecast']
+            market_intelligence = outputs['market']
             
-            print("🌐 Generating market intelligence...")
-            market_intelligence = self.generate_market_intelligence(usage_df, pricing_df, commission_df)
+            print(f"   Loaded {usage['records']} usage records")
+            print(f"   Loaded {pricing['records']} pricing records")
+            print(f"   Loaded {commission['records']} commission records")
             
             # Save results
             results = {
                 'usage_analysis': usage_analysis.to_dict('records'),
+                'usage_forecasts': usage_forecasts,
+                'usage_forecast_model': usage_forecast_model,
+                'anomaly_summary': self.summarize_anomalies(anomalies),
                 'pricing_analysis': pricing_analysis.to_dict('records'),
                 'commission_analysis': commission_analysis.to_dict('records'),
                 'market_intelligence': market_intelligence,
+                'pipeline': self.pipeline_summary(pipeline),
                 'analysis_timestamp': datetime.now().isoformat()
             }
+            state = {
+                'watermarks': watermarks,
+                'usage_summary': self.frame_rows(usage['summary']),
+                'pricing_summary': self.frame_rows(pricing['summary']),
+                'commission_counts': self.frame_rows(commission['counts'])
+            }
             
             # Export to JSON for frontend
-            output_file = "1-frontend/src/data/analytics-results.json"
-            Path(output_file).parent.mkdir(exist_ok=True)
+            self.report_stage('save')
+            self.save_run(results, state, anomalies, outputs['cube'])
             
-            with open(output_file, 'w') as f:
-                json.dump(results, f, indent=2, default=str)
-            
-            print(f"✅ Analytics completed! Results saved to {output_file}")
+            print(f"✅ Analytics completed! Results saved to {self.output_file}")
             
             # Print summary
             print(f"\n📋 ANALYTICS SUMMARY:")
             print(f"   Usage Analysis: {len(usage_analysis)} accounts analyzed")
+            print(f"   Anomalies: {results['anomaly_summary']['flagged']} of {len(anomalies)} ESIIDs flagged")
             print(f"   Pricing Analysis: {len(pricing_analysis)} zone/REP combinations")
             print(f"   Commission Analysis: {len(commission_analysis)} REPs analyzed")
             print(f"   Market Size: {market_intelligence['market_overview']['total_annual_consumption_kwh']:,.0f} kWh/year")
             print(f"   Market Value: ${market_intelligence['market_overview']['total_annual_value']:,.0f}/year")
+            print(f"   Pipeline: {results['pipeline']['wall_seconds']:.2f}s wall, "
+                  f"{results['pipeline']['stage_seconds']:.2f}s across stages ({results['pipeline']['mode']})")
             
             return results
             
         except Exception as e:
             print(f"❌ Analytics error: {e}")
+            self.last_error = e
             return None
         finally:
             self.disconnect()
 
+    def run_incremental_analysis(self):
+        """
+        Recompute only the groups touched since the previous run.
+
+        Accounts, (zone, REP) pairs and REPs with changed rows are reloaded and
+        re-analyzed, then merged into the stored results. Market intelligence
+        is refolded from the stored per-key summaries with only the affected
+        keys replaced. Falls back to a full run when there is no usable
+        previous run.
+        """
+        print("🚀 Starting incremental analytics run...")
+        previous = self.load_previous_run()
+        if previous is None:
+            print("   No usable previous run, running full analysis")
+            return self.run_full_analysis()
+        results, state = previous
+
+        try:
+            self.begin_run('incremental')
+            self.connect()
+            self.report_stage('detect')
+            watermarks = self.read_watermarks()
+
+            usage_rows = state['usage_summary']
+            pricing_rows = state['pricing_summary']
+            commission_rows = state['commission_counts']
+
+            # Usage: every account with a touched (account, zone, REP) key
+            self.report_stage('usage')
+            usage_keys = self.find_affected_keys(
+                'esiids', state['watermarks']['esiids'], {tuple(r[:3]): r[3] for r in usage_rows}
+            )
+            accounts = {(account,) for account, _, _ in usage_keys}
+            self.count_rows('usage', 0, 0, 0)
+            if accounts:
+                print(f"🔍 Re-analyzing {len(accounts)} accounts...")
+                usage_df = self.load_usage_data(self.stage_keys('affected_accounts', accounts))
+                usage_analysis = self.analyze_usage_patterns(usage_df)
+                results['usage_analysis'] = self.merge_records(
+                    results['usage_analysis'], usage_analysis, ['account_name'], accounts
+                )
+                self.count_rows('usage', len(usage_df), len(usage_analysis), len(usage_analysis))
+                usage_rows = [r for r in usage_rows if (r[0],) not in accounts] + \
+                    self.frame_rows(self.summarize_usage(usage_df))
+
+            # Anomalies: peer medians move with any usage change, so every ESIID is rescored
+            self.report_stage('anomaly')
+            anomalies = None
+            if accounts or 'anomaly_summary' not in results:
+                print("🚨 Scoring ESIID anomalies...")
+                anomaly_df = self.load_usage_data()
+                anomalies = self.detect_anomalies(anomaly_df)
+                results['anomaly_summary'] = self.summarize_anomalies(anomalies)
+                self.count_rows('anomaly', len(anomaly_df), len(anomalies), len(anomalies))
+
+            # Forecasts: refitted for every account, the batch fit is cheap
+            self.report_stage('forecast')
+            print("🔮 Fitting usage forecasts...")
+            results['usage_forecasts'], results['usage_forecast_model'] = self.forecast_usage(results['usage_analysis'])
+            self.count_rows('forecast', len(results['usage_analysis']), len(results['usage_forecasts']),
+                            len(results['usage_forecasts']))
+
+            # Pricing: touched (zone, REP) pairs, re-ranked against their zones' current rates
+            self.report_stage('pricing')
+            pairs = self.find_affected_keys(
+                'daily_pricing', state['watermarks']['daily_pricing'], {tuple(r[:2]): r[2] for r in pricing_rows}
+            )
+            self.count_rows('pricing', 0, 0, 0)
+            if pairs:
+                print(f"📈 Re-analyzing {len(pairs)} zone/REP combinations...")
+                pricing_df = self.load_pricing_data(self.stage_keys('affected_pairs', pairs))
+                zones = {zone for zone, _ in pairs if zone is not None}
+                zone_rates = self.load_zone_rates(self.stage_keys('affected_zones', [(z,) for z in zones])) \
+                    if zones else pd.DataFrame(columns=['zone', 'daily_rate'])
+                rate_index = ZoneRateIndex(zone_rates['zone'].to_numpy(), zone_rates['daily_rate'].to_numpy())
+
+                pricing_analysis = self.merge_records(
+                    results['pricing_analysis'],
+                    self.analyze_pricing_trends(pricing_df, rate_index),
+                    ['zone', 'rep'], pairs
+                )
+                # A rate change moves the percentile of every group in its zone
+                reranked = [r for r in pricing_analysis if r['zone'] in zones]
+                if reranked:
+                    percentile = rate_index.percentiles(
+                        [r['zone'] for r in reranked], [r['current_rate'] for r in reranked]
+                    )
+                    for record, rank, position in zip(reranked, percentile, classify_market_position(percentile)):
+                        record['percentile_rank'] = float(rank)
+                        record['market_position'] = str(position)
+                results['pricing_analysis'] = pricing_analysis
+                pricing_rows = [r for r in pricing_rows if tuple(r[:2]) not in pairs] + \
+                    self.frame_rows(self.summarize_pricing(pricing_df))
+                self.count_rows('pricing', len(pricing_df), len(pairs), len(pairs))
+
+            # Commissions: touched REPs
+            self.report_stage('commission')
+            reps = self.find_affected_keys(
+                'commissions', state['watermarks']['commissions'], {(r[0],): r[1] for r in commission_rows}
+            )
+            self.count_rows('commission', 0, 0, 0)
+            if reps:
+                print(f"💰 Re-analyzing {len(reps)} REPs...")
+                commission_df = self.load_commission_data(self.stage_keys('affected_reps', reps))
+                results['commission_analysis'] = self.merge_records(
+                    results['commission_analysis'], self.analyze_commission_performance(commission_df), ['rep'], reps
+                )
+                commission_rows = [r for r in commission_rows if (r[0],) not in reps] + \
+                    self.frame_rows(commission_df.groupby('k_rep', dropna=False).size().reset_index())
+                self.count_rows('commission', len(commission_df), len(reps), len(reps))
+
+            self.report_stage('market')
+            print("🌐 Updating market intelligence...")
+            results['market_intelligence'] = self.build_market_intelligence(
+                pd.DataFrame(usage_rows, columns=self.USAGE_SUMMARY_COLUMNS),
+                pd.DataFrame(pricing_rows, columns=self.PRICING_SUMMARY_COLUMNS)
+            )
+            # Two grouped scans in SQLite; also picks up accounts changing management company
+            market_cube = self.build_market_cube()
+            self.count_rows('market', len(usage_rows) + len(pricing_rows), len(market_cube),
+                            len(results['market_intelligence']['zone_analysis']))
+            results['analysis_timestamp'] = datetime.now().isoformat()
+
+            self.report_stage('save')
+            self.save_run(results, {
+                'watermarks': watermarks,
+                'usage_summary': usage_rows,
+                'pricing_summary': pricing_rows,
+                'commission_counts': commission_rows
+            }, anomalies, market_cube)
+
+            print(f"✅ Incremental analytics completed! Results saved to {self.output_file}")
+            print(f"   Accounts: {len(accounts)}, zone/REP combinations: {len(pairs)}, REPs: {len(reps)} recomputed")
+            return results
+
+        except Exception as e:
+            print(f"❌ Analytics error: {e}")
+            self.last_error = e
+            return None
+        finally:
+            self.disconnect()
+
+
+# Set in pipeline worker processes by _init_pipeline_worker
+_worker_engine = None
+
+
+def _init_pipeline_worker(db_path):
+    """Give a pipeline worker its own engine on a read-only connection"""
+    global _worker_engine
+    _worker_engine = EnergyAnalyticsEngine(db_path)
+    _worker_engine.conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+
+
+def _run_pipeline_stage(method, *args):
+    return getattr(_worker_engine, method)(*args)
+
 
 if __name__ == "__main__":
     engine = EnergyAnalyticsEngine()
-    results = engine.run_full_analysis()
+    if "--incremental" in sys.argv[1:]:
+        results = engine.run_incremental_analysis()
+    else:
+        results = engine.run_full_analysis()
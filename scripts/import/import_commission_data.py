@@ -36,9 +36,14 @@ def import_commission_received(cursor):
             try:
                 # Parse payment date
                 payment_date = None
+                payment_year = None
+                payment_month = None
                 if pd.notna(row.get('Act_PYMT_Date')):
                     try:
-                        payment_date = pd.to_datetime(row['Act_PYMT_Date']).strftime('%Y-%m-%d %H:%M:%S')
+                        parsed_date = pd.to_datetime(row['Act_PYMT_Date'])
+                        payment_date = parsed_date.strftime('%Y-%m-%d %H:%M:%S')
+                        payment_year = parsed_date.year
+                        payment_month = parsed_date.month
                     except:
                         pass
                 
@@ -46,8 +51,8 @@ def import_commission_received(cursor):
                     INSERT INTO commissions_new (
                         commission_sched_id, account_name, k_rep, commission_type,
                         actual_payment_amount, actual_payment_received, actual_payment_date,
-                        actual_mils, payment_type, is_active
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        payment_year, payment_month, actual_mils, payment_type, is_active
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """, (
                     int(row['COMM_SCHED_ID']) if pd.notna(row['COMM_SCHED_ID']) else None,
                     row['Acct_Name'] if pd.notna(row['Acct_Name']) else None,
@@ -56,6 +61,8 @@ def import_commission_received(cursor):
                     float(row['Act_PYMT_Amt']) if pd.notna(row['Act_PYMT_Amt']) else None,
                     float(row['Act_PYMT_Recvd']) if pd.notna(row['Act_PYMT_Recvd']) else None,
                     payment_date,
+                    payment_year,
+                    payment_month,
                     float(row['Act_Mils']) if pd.notna(row['Act_Mils']) else None,
                     row['Pymt_Type'] if pd.notna(row['Pymt_Type']) else None,
                     1
@@ -181,6 +188,9 @@ def import_commission_data():
     # Connect to SQLite database
     db_path = "2-backend/kilowatt_dev.db"
     conn = sqlite3.connect(db_path)
+    # WAL keeps the database readable by the API while the import writes
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA busy_timeout = 30000")
     cursor = conn.cursor()
     
     try:
@@ -201,6 +211,8 @@ def import_commission_data():
                 actual_payment_amount DECIMAL(12,2),
                 actual_payment_received DECIMAL(12,2),
                 actual_payment_date TIMESTAMP,
+                payment_year INTEGER,
+                payment_month INTEGER,
                 actual_mils REAL,
                 payment_type TEXT,
                 contract_date TIMESTAMP,
@@ -241,6 +253,7 @@ def import_commission_data():
         cursor.execute("CREATE INDEX idx_commissions_k_rep ON commissions(k_rep)")
         cursor.execute("CREATE INDEX idx_commissions_type ON commissions(commission_type)")
         cursor.execute("CREATE INDEX idx_commissions_payment_date ON commissions(actual_payment_date)")
+        cursor.execute("CREATE INDEX idx_commissions_type_payment_period ON commissions(commission_type, payment_year, payment_month)")
         cursor.execute("CREATE INDEX idx_commissions_active ON commissions(is_active)")
         
         # Commit changes
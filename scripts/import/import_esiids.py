@@ -42,6 +42,9 @@ def import_esiids_to_sqlite():
         # Connect to SQLite database
         db_path = "2-backend/kilowatt_dev.db"
         conn = sqlite3.connect(db_path)
+        # WAL keeps the database readable by the API while the import writes
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA busy_timeout = 30000")
         cursor = conn.cursor()
         
         # Create esiids table with comprehensive structure
@@ -87,7 +87,8 @@ def import_managers():
         
         # Create database connection
         database_url = "sqlite:///./2-backend/kilowatt_dev.db"
-        engine = create_engine(database_url)
+        # Wait out the API's write locks instead of failing with "database is locked"
+        engine = create_engine(database_url, connect_args={"timeout": 30})
         
         # Create tables if they don't exist
         Base.metadata.create_all(bind=engine)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Concurrent throughput benchmark for the database-heavy API routes.
+
+Fires a mix of pricing, ESIID, commission and analytics reads at the app
+with many requests in flight, and times a database-free probe (the root
+endpoint) alongside them. While endpoints run their queries on the event
+loop the probe waits behind them; with awaited queries it stays fast.
+
+The response and stats caches are turned off so every request reaches the
+database. By default the app runs in-process over ASGI; pass --base-url to
+load a running server instead (started with the same SECRET_KEY).
+
+With --import-writes a thread writes to the database the way the import
+scripts do (large batches in one transaction, on its own connection) for the
+whole run, into a scratch table dropped afterwards.
+
+Usage:
+    python benchmark_async_db.py --database ../2-backend/kilowatt_dev.db
+    python benchmark_async_db.py --database ../2-backend/kilowatt_dev.db --import-writes
+    python benchmark_async_db.py --base-url http://127.0.0.1:8000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent / "2-backend"
+
+# Read routes of the ported routers, cycled through by the load
+WORKLOAD = [
+    "/api/v1/pricing/?limit=500&rep=a",
+    "/api/v1/pricing/trends/monthly?year=2025",
+    "/api/v1/esiids/?limit=500&search=1",
+    "/api/v1/commissions/?limit=500",
+    "/api/v1/analytics/pricing-analysis?limit=500",
+    "/api/v1/analytics/anomalies?limit=500&min_score=0",
+]
+PROBE = "/"
+IMPORT_TABLE = "benchmark_import"
+IMPORT_BATCH_ROWS = 200_000
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000 if ordered else float("nan")
+
+
+def build_client(args):
+    import httpx
+
+    if args.base_url:
+        return httpx.AsyncClient(base_url=args.base_url, timeout=120)
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(args.database).resolve()}"
+    os.environ["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+    os.environ["CACHE_MAX_ENTRIES"] = "0"
+    os.environ["CACHE_USE_REDIS"] = "false"
+    sys.path.insert(0, str(BACKEND))
+    from app.main import app
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+
+
+def import_writes(database: str, stop: threading.Event, counts: dict):
+    """Write import-sized transactions until stop is set, as scripts/import/* would"""
+    conn = sqlite3.connect(database, timeout=30)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {IMPORT_TABLE} (id INTEGER PRIMARY KEY, payload TEXT)")
+    conn.commit()
+    try:
+        while not stop.is_set():
+            conn.execute(f"DELETE FROM {IMPORT_TABLE}")
+            conn.executemany(f"INSERT INTO {IMPORT_TABLE} (payload) VALUES (?)",
+                             ((f"row {i:09d}" * 4,) for i in range(IMPORT_BATCH_ROWS)))
+            conn.commit()
+            counts["transactions"] += 1
+    finally:
+        conn.execute(f"DROP TABLE IF EXISTS {IMPORT_TABLE}")
+        conn.commit()
+        conn.close()
+
+
+def auth_header(user_id: int) -> dict:
+    sys.path.insert(0, str(BACKEND))
+    from app.core.security import create_access_token
+
+    return {"Authorization": "Bearer " + create_access_token({"sub": str(user_id)})}
+
+
+async def run(args):
+    client = build_client(args)
+    headers = auth_header(args.user_id)
+    latencies, probes, failures = [], [], 0
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(WORKLOAD[i % len(WORKLOAD)])
+
+    async def worker():
+        nonlocal failures
+        while True:
+            try:
+                path = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                failures += 1
+
+    async def probe(done: asyncio.Event):
+        # Timed from when each probe is due, so time spent waiting for a blocked loop counts
+        due = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            await client.get(PROBE)
+            probes.append(time.perf_counter() - due)
+            due = time.perf_counter() + args.probe_interval
+
+    async with client:
+        # Warm up connections, routes and per-generation indexes
+        for path in WORKLOAD:
+            await client.get(path, headers=headers)
+
+        stop_import, imports = threading.Event(), {"transactions": 0}
+        importer = None
+        if args.import_writes:
+            importer = threading.Thread(target=import_writes, args=(args.database, stop_import, imports))
+            importer.start()
+
+        done = asyncio.Event()
+        prober = asyncio.create_task(probe(done))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+        if importer is not None:
+            stop_import.set()
+            importer.join()
+
+    print(f"requests        {args.requests} ({failures} non-200) at concurrency {args.concurrency}")
+    print(f"elapsed         {elapsed:.2f}s")
+    if args.import_writes:
+        print(f"import writes   {imports['transactions']} transactions of {IMPORT_BATCH_ROWS} rows")
+    print(f"throughput      {args.requests / elapsed:.1f} req/s")
+    print(f"latency         p50 {percentile(latencies, 50):.1f} ms, p95 {percentile(latencies, 95):.1f} ms")
+    if probes:
+        print(f"probe latency   p50 {percentile(probes, 50):.1f} ms, p95 {percentile(probes, 95):.1f} ms, "
+              f"mean {statistics.mean(probes) * 1000:.1f} ms, max {max(probes) * 1000:.1f} ms "
+              f"({len(probes)} probes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default=str(BACKEND / "kilowatt_dev.db"), help="SQLite file (in-process mode)")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--probe-interval", type=float, default=0.01, help="Seconds between probe requests")
+    parser.add_argument("--user-id", type=int, default=1, help="User the bearer token is issued for")
+    parser.add_argument("--import-writes", action="store_true",
+                        help="Write to the database like an import script during the run (in-process mode)")
+    args = parser.parse_args()
+    if args.import_writes and args.base_url:
+        parser.error("--import-writes needs the in-process app (--database)")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Login burst benchmark for the auth endpoints.
+
+Fires many concurrent logins (each a bcrypt verification) at the app and
+times a database-free probe (the root endpoint) alongside them, the way a
+morning login burst meets in-flight API calls. When logins verify passwords
+on the event loop the probe waits behind every bcrypt call; with hashing
+on worker threads it stays fast.
+
+By default the app runs in-process over ASGI; pass --base-url to load a
+running server instead. The user must exist with the given password.
+
+Usage:
+    python benchmark_login.py --database ../2-backend/kilowatt_dev.db --username admin --password admin123
+    python benchmark_login.py --base-url http://127.0.0.1:8000 --username admin --password admin123
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent / "2-backend"
+LOGIN = "/api/v1/auth/login"
+PROBE = "/"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000 if ordered else float("nan")
+
+
+def build_client(args):
+    import httpx
+
+    if args.base_url:
+        return httpx.AsyncClient(base_url=args.base_url, timeout=120)
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(args.database).resolve()}"
+    sys.path.insert(0, str(BACKEND))
+    from app.main import app
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+
+
+async def run(args):
+    client = build_client(args)
+    credentials = {"username": args.username, "password": args.password}
+    latencies, probes, failures = [], [], 0
+    queue = asyncio.Queue()
+    for _ in range(args.logins):
+        queue.put_nowait(credentials)
+
+    async def worker():
+        nonlocal failures
+        while True:
+            try:
+                body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            response = await client.post(LOGIN, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                failures += 1
+
+    async def probe(done: asyncio.Event):
+        # Timed from when each probe is due, so time spent waiting for a blocked loop counts
+        due = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            await client.get(PROBE)
+            probes.append(time.perf_counter() - due)
+            due = time.perf_counter() + args.probe_interval
+
+    async with client:
+        # Warm up the connection pool and bcrypt backend
+        response = await client.post(LOGIN, json=credentials)
+        if response.status_code != 200:
+            raise SystemExit(f"Login failed for {args.username}: {response.status_code} {response.text}")
+
+        done = asyncio.Event()
+        prober = asyncio.create_task(probe(done))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+    print(f"logins          {args.logins} ({failures} non-200) at concurrency {args.concurrency}")
+    print(f"elapsed         {elapsed:.2f}s")
+    print(f"throughput      {args.logins / elapsed:.1f} logins/s")
+    print(f"latency         p50 {percentile(latencies, 50):.1f} ms, p95 {percentile(latencies, 95):.1f} ms")
+    if probes:
+        print(f"probe latency   p50 {percentile(probes, 50):.1f} ms, p95 {percentile(probes, 95):.1f} ms, "
+              f"mean {statistics.mean(probes) * 1000:.1f} ms, max {max(probes) * 1000:.1f} ms "
+              f"({len(probes)} probes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default=str(BACKEND / "kilowatt_dev.db"), help="SQLite file (in-process mode)")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--probe-interval", type=float, default=0.01, help="Seconds between probe requests")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
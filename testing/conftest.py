@@ -0,0 +1,100 @@
+"""
+Shared setup for the backend tests.
+
+The app is imported against a throwaway SQLite file (or TEST_DATABASE_URL,
+e.g. a PostgreSQL test database) with Redis turned off. Each test starts
+from empty tables and empty caches; the fixtures create users and issue
+their tokens.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+BACKEND = Path(__file__).resolve().parent.parent / "2-backend"
+
+# Scripts run by hand against a live server and database, not pytest modules
+collect_ignore = [
+    "test_backend.py", "test_backend_api.py", "test_integration.py", "manual_backend_test.py", "quick_server_test.py"
+]
+
+# Settings are read at import, so the environment is set before the app is imported
+os.environ["DATABASE_URL"] = os.environ.get(
+    "TEST_DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp(prefix='kilowatt-tests-')) / 'test.db'}"
+)
+os.environ["CACHE_USE_REDIS"] = "false"
+sys.path.insert(0, str(BACKEND))
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app.database import Base, engine
+    from app.main import app as fastapi_app
+
+    Base.metadata.create_all(bind=engine)
+    yield fastapi_app
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(autouse=True)
+def _clean_state(request):
+    """Empty tables and caches after each test that used the app"""
+    yield
+    if "app" not in request.fixturenames:
+        return
+    from app.core.cache import cache
+    from app.core.principals import principals, tokens
+    from app.core.response_cache import response_cache
+    from app.database import Base, engine
+
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    for layer in (response_cache, cache, principals, tokens):
+        layer.clear()
+
+
+@pytest.fixture
+def db(app):
+    from app.database import SessionLocal
+
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest_asyncio.fixture
+async def async_db(app):
+    """A session from the async endpoints' factory; tests using it need @pytest.mark.asyncio"""
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def client(app):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_user(db):
+    """make_user(role=..., is_active=...) -> (user, Authorization headers)"""
+    from app.core.security import create_access_token
+    from app.models.user import User
+
+    def make(role: str = "admin", is_active: bool = True, username: str = None):
+        username = username or f"{role}-{db.query(User).count() + 1}"
+        user = User(username=username, email=f"{username}@example.com", hashed_password="not-a-hash",
+                    role=role, is_active=is_active)
+        db.add(user)
+        db.commit()
+        return user, {"Authorization": "Bearer " + create_access_token({"sub": str(user.id)})}
+
+    return make
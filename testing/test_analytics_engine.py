@@ -0,0 +1,641 @@
+#!/usr/bin/env python3
+"""
+Regression test for the vectorized EnergyAnalyticsEngine analyses.
+
+Compares analyze_usage_patterns, analyze_pricing_trends and
+analyze_commission_performance against the original per-group loop
+implementations (kept below as LegacyAnalytics) on synthetic data, and
+checks that an incremental run after edits matches a fresh full run, that
+batch usage forecasts recover a seasonal trend, that ESIID anomaly scores
+single out outliers against their peers, that market cube rollups agree
+with market intelligence and that the parallel pipeline matches a serial run
+with the same stage measurements.
+"""
+
+import sys
+import json
+import math
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "scripts" / "analysis"))
+
+from analytics_engine import EnergyAnalyticsEngine
+from datetime import datetime
+
+
+class LegacyAnalytics:
+    """Per-group loop implementations the vectorized engine must reproduce"""
+
+    def analyze_usage_patterns(self, usage_df):
+        """Analyze usage patterns and generate insights"""
+        results = []
+        
+        # Group by account for analysis
+        for account_name, group in usage_df.groupby('account_name'):
+            if len(group) < 2:  # Need at least 2 ESIIDs for meaningful analysis
+                continue
+                
+            total_usage = group['kwh_mo'].sum()
+            avg_usage = group['kwh_mo'].mean()
+            usage_std = group['kwh_mo'].std()
+            total_bill = group['total_bill'].sum()
+            
+            # Determine usage pattern
+            cv = usage_std / avg_usage if avg_usage > 0 else 0
+            if cv < 0.2:
+                pattern = 'stable'
+            elif cv < 0.5:
+                pattern = 'moderate_variation'
+            else:
+                pattern = 'high_variation'
+            
+            # Calculate efficiency score (lower cost per kWh is better)
+            cost_per_kwh = total_bill / total_usage if total_usage > 0 else 0
+            efficiency_score = max(0, 100 - (cost_per_kwh * 1000))  # Normalize to 0-100
+            
+            # Simple forecast (seasonal adjustment)
+            current_month = datetime.now().month
+            seasonal_factors = {
+                1: 1.2, 2: 1.1, 3: 1.0, 4: 0.9, 5: 0.8, 6: 0.7,  # Winter high, summer low
+                7: 0.6, 8: 0.7, 9: 0.8, 10: 0.9, 11: 1.0, 12: 1.1
+            }
+            seasonal_factor = seasonal_factors.get(current_month, 1.0)
+            predicted_usage = total_usage * seasonal_factor
+            
+            # Anomaly detection (simple z-score based)
+            z_scores = np.abs((group['kwh_mo'] - avg_usage) / usage_std) if usage_std > 0 else np.zeros(len(group))
+            anomaly_score = np.mean(z_scores > 2)  # Percentage of outliers
+            
+            result = {
+                'account_name': account_name,
+                'esiid_count': int(len(group)),
+                'total_usage_kwh': float(total_usage),
+                'avg_usage_kwh': float(avg_usage),
+                'predicted_usage_kwh': float(predicted_usage),
+                'usage_pattern': pattern,
+                'efficiency_score': float(efficiency_score),
+                'anomaly_score': float(anomaly_score),
+                'seasonal_factor': float(seasonal_factor),
+                'cost_per_kwh': float(cost_per_kwh),
+                'total_monthly_bill': float(total_bill)
+            }
+            results.append(result)
+        
+        return pd.DataFrame(results)
+    
+    def analyze_pricing_trends(self, pricing_df):
+        """Analyze pricing trends and market intelligence"""
+        results = []
+        
+        # Convert dates
+        pricing_df['effective_date'] = pd.to_datetime(pricing_df['effective_date'])
+        
+        # Group by zone and REP
+        for (zone, rep), group in pricing_df.groupby(['zone', 'rep']):
+            if len(group) < 5:  # Need sufficient data points
+                continue
+            
+            # Sort by date
+            group = group.sort_values('effective_date')
+            
+            current_rate = group['daily_rate'].iloc[-1]
+            avg_rate = group['daily_rate'].mean()
+            rate_std = group['daily_rate'].std()
+            
+            # Calculate trend
+            if len(group) >= 10:
+                recent_avg = group['daily_rate'].tail(5).mean()
+                older_avg = group['daily_rate'].head(5).mean()
+                if recent_avg > older_avg * 1.05:
+                    trend = 'increasing'
+                elif recent_avg < older_avg * 0.95:
+                    trend = 'decreasing'
+                else:
+                    trend = 'stable'
+            else:
+                trend = 'stable'
+            
+            # Market position analysis
+            zone_rates = pricing_df[pricing_df['zone'] == zone]['daily_rate']
+            percentile = (zone_rates < current_rate).mean() * 100
+            
+            if percentile < 25:
+                market_position = 'competitive'
+            elif percentile < 75:
+                market_position = 'average'
+            else:
+                market_position = 'expensive'
+            
+            # Volatility calculation
+            volatility = rate_std / avg_rate if avg_rate > 0 else 0
+            
+            # Simple price forecast
+            trend_factor = {'increasing': 1.05, 'stable': 1.0, 'decreasing': 0.95}[trend]
+            predicted_rate = current_rate * trend_factor
+            
+            result = {
+                'zone': zone,
+                'rep': rep,
+                'current_rate': float(current_rate),
+                'avg_rate': float(avg_rate),
+                'predicted_rate': float(predicted_rate),
+                'rate_trend': trend,
+                'market_position': market_position,
+                'volatility': float(volatility),
+                'percentile_rank': float(percentile),
+                'data_points': int(len(group))
+            }
+            results.append(result)
+        
+        return pd.DataFrame(results)
+    
+    def analyze_commission_performance(self, commission_df):
+        """Analyze commission performance and forecasting"""
+        results = []
+        
+        # Group by REP
+        for rep, group in commission_df.groupby('k_rep'):
+            if len(group) < 3:  # Need sufficient data
+                continue
+            
+            total_commission = group['actual_payment_amount'].sum()
+            avg_commission = group['actual_payment_amount'].mean()
+            commission_count = len(group)
+            
+            # Calculate monthly performance from the stored payment period
+            monthly_performance = group.groupby(['payment_year', 'payment_month'])['actual_payment_amount'].sum()
+            
+            if len(monthly_performance) >= 3:
+                # Calculate growth trend
+                recent_months = monthly_performance.tail(3).mean()
+                older_months = monthly_performance.head(3).mean()
+                
+                if recent_months > older_months * 1.1:
+                    trend = 'increasing'
+                elif recent_months < older_months * 0.9:
+                    trend = 'decreasing'
+                else:
+                    trend = 'stable'
+                
+                # Forecast next month
+                growth_rate = (recent_months / older_months - 1) if older_months > 0 else 0
+                predicted_monthly = recent_months * (1 + growth_rate)
+            else:
+                trend = 'stable'
+                predicted_monthly = avg_commission
+            
+            # Convert (year, month) index to 'YYYY-MM' strings for JSON serialization
+            monthly_dict = {}
+            if len(monthly_performance) > 0:
+                for (year, month), value in monthly_performance.items():
+                    monthly_dict[f"{int(year):04d}-{int(month):02d}"] = float(value)
+
+            result = {
+                'rep': rep,
+                'total_commission': float(total_commission),
+                'avg_commission': float(avg_commission),
+                'commission_count': int(commission_count),
+                'predicted_monthly_commission': float(predicted_monthly),
+                'commission_trend': trend,
+                'monthly_performance': monthly_dict
+            }
+            results.append(result)
+        
+        return pd.DataFrame(results)
+
+
+def build_usage_data(rng):
+    """ESIID usage rows: mixed account sizes, outliers and zero-variance accounts"""
+    rows = []
+    for account in range(300):
+        meters = int(rng.integers(1, 9))
+        base = rng.uniform(500, 5000)
+        for meter in range(meters):
+            if account % 17 == 0:
+                kwh = base  # identical meters -> zero std
+            elif rng.random() < 0.08:
+                kwh = base * rng.uniform(5, 20)  # outlier
+            else:
+                kwh = base * rng.uniform(0.5, 1.5)
+            rows.append({
+                'account_name': f"ACCOUNT {account:03d}",
+                'esi_id': f"1044{account:05d}{meter:03d}",
+                'rep': rng.choice(['TXU', 'RELIANT', 'DIRECT']),
+                'load_profile': 'BUSMEDLF',
+                'zone': rng.choice(['COAST', 'NORTH', 'SOUTH', 'WEST']),
+                'kwh_mo': kwh,
+                'kwh_yr': kwh * 12,
+                'total_bill': kwh * rng.uniform(0.05, 0.15) if rng.random() > 0.05 else np.nan,
+                'created_at': '2025-01-01 00:00:00'
+            })
+    return pd.DataFrame(rows).sort_values('kwh_mo', ascending=False).reset_index(drop=True)
+
+
+def build_pricing_data(rng):
+    """Daily pricing rows with one rate per (zone, REP, date) and varied history lengths"""
+    rows = []
+    for zone in ['COAST', 'NORTH', 'SOUTH', 'WEST', 'TNMP']:
+        for rep_number in range(12):
+            days = int(rng.integers(2, 40))
+            drift = rng.choice([-0.4, 0.0, 0.4])
+            for day in rng.permutation(days):
+                rows.append({
+                    'effective_date': (pd.Timestamp('2025-01-01') + pd.Timedelta(days=int(day))).strftime('%Y-%m-%d %H:%M:%S'),
+                    'zone': zone,
+                    'rep': f"REP {rep_number:02d}",
+                    'load_profile': 'BUSLOLF',
+                    'daily_rate': 70 + drift * day + rng.normal(0, 3),
+                    'term_months': 12.0,
+                    'created_at': '2025-01-01 00:00:00'
+                })
+    return pd.DataFrame(rows).sort_values('effective_date', ascending=False).reset_index(drop=True)
+
+
+def build_commission_data(rng):
+    """Received commission rows including REPs with few months and undated payments"""
+    rows = []
+    for rep_number in range(40):
+        payments = int(rng.integers(1, 60))
+        scale = rng.uniform(50, 500)
+        for _ in range(payments):
+            dated = rng.random() > 0.05
+            year = int(rng.integers(2022, 2026))
+            month = int(rng.integers(1, 13))
+            rows.append({
+                'account_name': f"ACCOUNT {int(rng.integers(0, 50)):03d}",
+                'k_rep': f"REP {rep_number:02d}",
+                'commission_type': 'received',
+                'actual_payment_amount': round(scale * rng.uniform(0.2, 2.0), 2),
+                'actual_payment_date': f"{year}-{month:02d}-15 00:00:00" if dated else None,
+                'payment_year': year if dated else np.nan,
+                'payment_month': month if dated else np.nan,
+                'contract_date': None,
+                'created_at': '2025-01-01 00:00:00'
+            })
+    return pd.DataFrame(rows).sort_values('actual_payment_date', ascending=False).reset_index(drop=True)
+
+
+def assert_same_records(expected_df, actual_df, label):
+    """Compare two result frames record by record with a tight float tolerance"""
+    expected = expected_df.to_dict('records')
+    actual = actual_df.to_dict('records')
+    assert len(expected) == len(actual), f"{label}: {len(expected)} vs {len(actual)} rows"
+
+    for expected_row, actual_row in zip(expected, actual):
+        assert list(expected_row) == list(actual_row), f"{label}: columns differ"
+        for column, expected_value in expected_row.items():
+            actual_value = actual_row[column]
+            if isinstance(expected_value, dict):
+                assert list(expected_value) == list(actual_value), f"{label}.{column}: keys differ"
+                for key in expected_value:
+                    assert math.isclose(expected_value[key], actual_value[key], rel_tol=1e-9), f"{label}.{column}[{key}]"
+            elif isinstance(expected_value, float):
+                assert math.isclose(expected_value, actual_value, rel_tol=1e-9, abs_tol=1e-12), \
+                    f"{label}.{column}: {expected_value} != {actual_value}"
+            else:
+                assert expected_value == actual_value, f"{label}.{column}: {expected_value} != {actual_value}"
+
+
+def test_usage_patterns_match_legacy():
+    """Vectorized usage analysis reproduces the per-account loop"""
+    usage_df = build_usage_data(np.random.default_rng(7))
+    expected = LegacyAnalytics().analyze_usage_patterns(usage_df.copy())
+    actual = EnergyAnalyticsEngine().analyze_usage_patterns(usage_df.copy())
+    assert_same_records(expected, actual, 'usage_analysis')
+
+
+def test_pricing_trends_match_legacy():
+    """Vectorized pricing analysis reproduces the per-(zone, REP) loop"""
+    pricing_df = build_pricing_data(np.random.default_rng(11))
+    expected = LegacyAnalytics().analyze_pricing_trends(pricing_df.copy())
+    actual = EnergyAnalyticsEngine().analyze_pricing_trends(pricing_df.copy())
+    assert_same_records(expected, actual, 'pricing_analysis')
+
+
+def test_commission_performance_matches_legacy():
+    """Vectorized commission analysis reproduces the per-REP loop"""
+    commission_df = build_commission_data(np.random.default_rng(13))
+    expected = LegacyAnalytics().analyze_commission_performance(commission_df.copy())
+    actual = EnergyAnalyticsEngine().analyze_commission_performance(commission_df.copy())
+    assert_same_records(expected, actual, 'commission_analysis')
+
+
+def build_database(path, rng):
+    """SQLite database with the columns the engine reads, all rows stamped in the past"""
+    conn = sqlite3.connect(path)
+    stamp = "2025-01-01 00:00:00"
+    conn.execute("""
+        CREATE TABLE esiids (id INTEGER PRIMARY KEY, account_name TEXT, esi_id TEXT, rep TEXT,
+            load_profile TEXT, zone TEXT, kwh_mo REAL, kwh_yr REAL, total_bill REAL,
+            created_at TIMESTAMP, updated_at TIMESTAMP)
+    """)
+    conn.execute("""
+        CREATE TABLE daily_pricing (id INTEGER PRIMARY KEY, effective_date TIMESTAMP, zone TEXT, rep TEXT,
+            load_profile TEXT, daily_rate REAL, term_months REAL, created_at TIMESTAMP, updated_at TIMESTAMP)
+    """)
+    conn.execute("""
+        CREATE TABLE commissions (id INTEGER PRIMARY KEY, account_name TEXT, k_rep TEXT, commission_type TEXT,
+            actual_payment_amount REAL, actual_payment_date TIMESTAMP, payment_year INTEGER,
+            payment_month INTEGER, contract_date TIMESTAMP, created_at TIMESTAMP, updated_at TIMESTAMP)
+    """)
+
+    usage_df = build_usage_data(rng)
+    conn.executemany(
+        "INSERT INTO esiids (account_name, esi_id, rep, load_profile, zone, kwh_mo, kwh_yr, total_bill, "
+        "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(r.account_name, r.esi_id, r.rep, r.load_profile, r.zone, r.kwh_mo, r.kwh_yr,
+          None if np.isnan(r.total_bill) else r.total_bill, stamp, stamp) for r in usage_df.itertuples()]
+    )
+    pricing_df = build_pricing_data(rng)
+    conn.executemany(
+        "INSERT INTO daily_pricing (effective_date, zone, rep, load_profile, daily_rate, term_months, "
+        "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(r.effective_date, r.zone, r.rep, r.load_profile, r.daily_rate, r.term_months, stamp, stamp)
+         for r in pricing_df.itertuples()]
+    )
+    commission_df = build_commission_data(rng)
+    conn.executemany(
+        "INSERT INTO commissions (account_name, k_rep, commission_type, actual_payment_amount, "
+        "actual_payment_date, payment_year, payment_month, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(r.account_name, r.k_rep, r.commission_type, r.actual_payment_amount, r.actual_payment_date,
+          None if np.isnan(r.payment_year) else int(r.payment_year),
+          None if np.isnan(r.payment_month) else int(r.payment_month), stamp, stamp)
+         for r in commission_df.itertuples()]
+    )
+    conn.commit()
+    return conn
+
+
+def assert_same_intelligence(expected, actual):
+    """Compare market intelligence dicts, ignoring the analysis timestamp"""
+    for section in ['market_overview', 'zone_analysis', 'rep_market_share', 'pricing_competitiveness']:
+        assert list(expected[section]) == list(actual[section]), f"{section}: keys differ"
+        for key, value in expected[section].items():
+            if isinstance(value, dict):
+                for field, number in value.items():
+                    assert math.isclose(number, actual[section][key][field], rel_tol=1e-9), f"{section}.{key}.{field}"
+            else:
+                assert math.isclose(value, actual[section][key], rel_tol=1e-9), f"{section}.{key}"
+
+
+def load_state(engine):
+    """Incremental-run state written by the engine's last run"""
+    with open(engine.state_file) as f:
+        return json.load(f)
+
+
+def test_incremental_run_matches_full_run():
+    """An incremental run after inserts, updates, moves and deletes matches a full run"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "analytics.db")
+        conn = build_database(db_path, np.random.default_rng(17))
+
+        engine = EnergyAnalyticsEngine(db_path, output_file=str(Path(tmp) / "results.json"))
+        assert engine.run_full_analysis() is not None
+
+        now = "datetime('now')"
+        conn.execute(f"UPDATE esiids SET kwh_mo = kwh_mo * 3, updated_at = {now} WHERE id = 5")
+        conn.execute(f"UPDATE esiids SET account_name = 'ACCOUNT 001', zone = 'WEST', updated_at = {now} WHERE id = 40")
+        conn.execute("DELETE FROM esiids WHERE id = 77")
+        conn.execute(
+            "INSERT INTO esiids (account_name, esi_id, rep, load_profile, zone, kwh_mo, kwh_yr, total_bill, created_at) "
+            f"VALUES ('ACCOUNT 999', 'NEW1', 'TXU', 'BUSMEDLF', 'NORTH', 1200, 14400, 150, {now})"
+        )
+        conn.execute(
+            "INSERT INTO esiids (account_name, esi_id, rep, load_profile, zone, kwh_mo, kwh_yr, total_bill, created_at) "
+            f"VALUES ('ACCOUNT 999', 'NEW2', 'TXU', 'BUSMEDLF', 'NORTH', 1800, 21600, 210, {now})"
+        )
+        conn.execute(f"UPDATE daily_pricing SET daily_rate = daily_rate + 40, updated_at = {now} WHERE id = 12")
+        conn.execute(f"UPDATE daily_pricing SET rep = 'REP 03', updated_at = {now} WHERE id = 300")
+        conn.execute("DELETE FROM daily_pricing WHERE id = 301")
+        conn.execute(f"UPDATE commissions SET k_rep = 'REP 07', updated_at = {now} WHERE id = 9")
+        conn.execute("DELETE FROM commissions WHERE id = 100")
+        conn.commit()
+
+        # Only keys touched by those edits are recomputed
+        engine.connect()
+        try:
+            state = load_state(engine)
+            previous_usage = {tuple(r[:3]): r[3] for r in state['usage_summary']}
+            affected = engine.find_affected_keys('esiids', state['watermarks']['esiids'], previous_usage)
+            assert 0 < len({key[0] for key in affected}) <= 5
+        finally:
+            engine.disconnect()
+
+        incremental = engine.run_incremental_analysis()
+        full = EnergyAnalyticsEngine(db_path, output_file=str(Path(tmp) / "full.json"),
+                                     state_file=str(Path(tmp) / "full_state.json")).run_full_analysis()
+        conn.close()
+
+    for section in ['usage_analysis', 'pricing_analysis', 'commission_analysis']:
+        assert_same_records(pd.DataFrame(full[section]), pd.DataFrame(incremental[section]), section)
+    assert_same_intelligence(full['market_intelligence'], incremental['market_intelligence'])
+    assert full['anomaly_summary'] == incremental['anomaly_summary']
+
+
+def test_usage_forecasts_recover_seasonal_trend():
+    """Holt fits with seasonal indices fitted from usage_history backtest accurately on a noise-free seasonal trend"""
+    from app.services.forecasting import shift_period
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "analytics.db")
+        conn = build_database(db_path, np.random.default_rng(23))
+        conn.execute("""
+            CREATE TABLE usage_history (id INTEGER PRIMARY KEY, account_name TEXT, period INTEGER,
+                total_usage_kwh REAL, esiid_count INTEGER, recorded_at TIMESTAMP,
+                UNIQUE (account_name, period))
+        """)
+        engine = EnergyAnalyticsEngine(db_path, output_file=str(Path(tmp) / "results.json"))
+        engine.connect()
+        usage = engine.analyze_usage_patterns(engine.load_usage_data())
+
+        # 2% monthly growth ending at this month's usage; one month missing (no run)
+        period = int(datetime.now().strftime('%Y%m'))
+        seasonal = engine.SEASONAL_FACTORS
+        history = []
+        for record in usage.itertuples():
+            base = record.total_usage_kwh / seasonal[period % 100]
+            for months_back in range(1, 30):
+                if months_back == 10:
+                    continue
+                past = shift_period(period, -months_back)
+                history.append((record.account_name, past, base * seasonal[past % 100] * 1.02 ** -months_back))
+        engine.conn.executemany(
+            "INSERT INTO usage_history (account_name, period, total_usage_kwh) VALUES (?, ?, ?)", history
+        )
+        engine.conn.commit()
+
+        models, summary = engine.forecast_usage(usage.to_dict('records'))
+        engine.disconnect()
+        conn.close()
+
+    assert len(models) == len(usage)
+    assert summary['history_months'] == 30
+    assert summary['accounts_backtested'] == len(usage)
+    assert summary['backtest_mape'] < 0.02
+    # Two seasons of history: the indices are fitted and recover the seasonal shape
+    assert summary['model'] == 'holt_linear_fitted_seasonal'
+    fitted = summary['seasonal_factors']
+    for month, factor in seasonal.items():
+        assert math.isclose(fitted[str(month)], factor, rel_tol=0.03)
+    for model in models:
+        level = model['level']
+        # Deseasonalized level is this month's usage over its index, growing about 2% a month
+        expected = usage.set_index('account_name').loc[model['account_name'], 'total_usage_kwh'] / \
+            fitted[str(period % 100)]
+        assert math.isclose(level, expected, rel_tol=0.02)
+        assert 0.01 < model['trend'] / level < 0.03
+
+
+def test_seasonal_factors_need_two_seasons_of_observed_history():
+    """Indices are fitted only when every calendar month has an observed ratio"""
+    engine = EnergyAnalyticsEngine(":memory:")
+    seasonal = engine.SEASONAL_FACTORS
+    months = (np.arange(30) + 4) % 12 + 1
+    usage = np.array([[1000 * k * seasonal[m] * 1.01 ** t for t, m in enumerate(months)] for k in (1, 2, 5)])
+    observed = np.ones_like(usage, dtype=bool)
+
+    fitted = engine.fit_seasonal_factors(usage, observed, months)
+    for month, factor in seasonal.items():
+        assert math.isclose(fitted[month], factor, rel_tol=0.01)
+    assert engine.fit_seasonal_factors(usage[:, :23], observed[:, :23], months[:23]) is None
+    # The only centred July was filled in for a missing run
+    observed[:, (months == 7) & (np.arange(30) >= 6) & (np.arange(30) < 24)] = False
+    assert engine.fit_seasonal_factors(usage[:, :24], observed[:, :24], months[:24]) is None
+
+
+def test_esiid_anomalies_flag_outliers_against_peers():
+    """Robust scores flag usage and cost outliers in every peer group, single-meter accounts included"""
+    rng = np.random.default_rng(29)
+    rows = []
+    for zone, profile, meters in [('COAST', 'BUSMEDLF', 60), ('NORTH', 'BUSLOLF', 40), ('NORTH', 'BUSHILF', 3)]:
+        for meter in range(meters):
+            kwh = 2000 * rng.lognormal(0, 0.2)
+            rows.append({'account_name': f"{zone} {meter // 4:02d}", 'esi_id': f"{zone}{profile}{meter:03d}",
+                         'rep': 'TXU', 'load_profile': profile, 'zone': zone, 'kwh_mo': kwh,
+                         'total_bill': kwh * rng.normal(0.1, 0.005)})
+    # A single-meter account using 20x its peers, a meter billed at 4x the going rate,
+    # and a group of identical meters (MAD of 0) with one that is off
+    rows.append({'account_name': 'SOLO', 'esi_id': 'SOLO1', 'rep': 'TXU', 'load_profile': 'BUSMEDLF',
+                 'zone': 'COAST', 'kwh_mo': 40000.0, 'total_bill': 4000.0})
+    rows[10]['total_bill'] = rows[10]['kwh_mo'] * 0.4
+    for meter in range(8):
+        kwh = 3000.0 if meter else 9000.0
+        rows.append({'account_name': 'FLAT', 'esi_id': f"FLAT{meter}", 'rep': 'TXU', 'load_profile': 'BUSMEDLF',
+                     'zone': 'SOUTH', 'kwh_mo': kwh, 'total_bill': kwh * 0.1})
+    usage_df = pd.DataFrame(rows)
+
+    engine = EnergyAnalyticsEngine()
+    anomalies = engine.detect_anomalies(usage_df).set_index('esi_id')
+    flagged = set(anomalies.index[anomalies['severity'].isin(['medium', 'high', 'critical'])])
+
+    assert flagged == {'SOLO1', rows[10]['esi_id'], 'FLAT0'}
+    assert len(anomalies) == len(usage_df)
+    assert anomalies.loc['SOLO1', 'anomaly_type'] == 'usage' and anomalies.loc['SOLO1', 'severity'] == 'critical'
+    assert anomalies.loc[rows[10]['esi_id'], 'anomaly_type'] == 'cost'
+    assert anomalies.loc[rows[10]['esi_id'], 'cost_score'] > 0
+    # Too few BUSHILF meters in NORTH: scored against the zone instead
+    assert set(anomalies.loc[anomalies['load_profile'] == 'BUSHILF', 'peer_group']) == {'zone'}
+    assert set(anomalies.loc[anomalies['zone'] == 'COAST', 'peer_group']) == {'zone_profile'}
+
+    summary = engine.summarize_anomalies(anomalies.reset_index())
+    assert summary['esiids_scored'] == len(usage_df) and summary['flagged'] == 3
+    assert summary['accounts_flagged'] == 3
+
+
+def test_market_cube_rollups_match_market_intelligence():
+    """Rollups of the cube's base cells reproduce the fixed market intelligence slices"""
+    from types import SimpleNamespace
+    from app.services.market_cube import MarketCube
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "analytics.db")
+        conn = build_database(db_path, np.random.default_rng(31))
+        engine = EnergyAnalyticsEngine(db_path, output_file=str(Path(tmp) / "results.json"))
+        results = engine.run_full_analysis()
+        engine.connect()
+        cells = engine.build_market_cube()
+        engine.disconnect()
+        conn.close()
+
+    cube = MarketCube([SimpleNamespace(**row) for row in cells.astype(object).where(cells.notna(), None)
+                       .to_dict('records')])
+    market = results['market_intelligence']
+
+    zones = cube.query(['zone'], ['esiid_count', 'total_kwh', 'avg_kwh', 'total_bill'])
+    assert [cell['zone'] for cell in zones] == sorted(market['zone_analysis'])
+    for cell in zones:
+        expected = market['zone_analysis'][cell['zone']]
+        assert cell['esiid_count'] == expected['esiid_count']
+        for measure in ['total_kwh', 'avg_kwh', 'total_bill']:
+            assert math.isclose(cell[measure], expected[measure], abs_tol=0.01), f"{cell['zone']}.{measure}"
+
+    for cell in cube.query(['rep'], ['avg_rate', 'min_rate', 'max_rate']):
+        expected = market['pricing_competitiveness'][cell['rep']]
+        for measure, key in [('avg_rate', 'avg_rate'), ('min_rate', 'min_rate'), ('max_rate', 'max_rate')]:
+            assert math.isclose(cell[measure], expected[key], abs_tol=0.01), f"{cell['rep']}.{measure}"
+
+    total, = cube.query([], ['esiid_count', 'total_kwh'])
+    assert total['esiid_count'] == market['market_overview']['total_esiids']
+    assert math.isclose(total['total_kwh'] * 12, market['market_overview']['total_annual_consumption_kwh'])
+    coast = cube.query(['rep'], ['total_kwh'], {'zone': ['COAST']})
+    assert math.isclose(sum(cell['total_kwh'] for cell in coast), market['zone_analysis']['COAST']['total_kwh'],
+                        abs_tol=0.01)
+
+
+def test_parallel_pipeline_matches_serial_run():
+    """Stages run in worker processes produce the same results as the in-process pipeline"""
+    import multiprocessing
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "analytics.db")
+        build_database(db_path, np.random.default_rng(37)).close()
+        runs, metrics = {}, {}
+        for workers in (1, 3):
+            engine = EnergyAnalyticsEngine(db_path, output_file=str(Path(tmp) / f"results{workers}.json"),
+                                           state_file=str(Path(tmp) / f"state{workers}.json"), workers=workers)
+            runs[workers] = engine.run_full_analysis()
+            assert runs[workers] is not None, engine.last_error
+            metrics[workers] = {row['stage']: row for row in engine.run_metrics()}
+
+    serial, parallel = runs[1], runs[3]
+    assert serial['pipeline']['mode'] == 'serial'
+    if 'fork' in multiprocessing.get_all_start_methods():
+        assert parallel['pipeline']['mode'] == 'parallel'
+        assert {stage['location'] for stage in parallel['pipeline']['stages'].values()} == {'pool', 'local'}
+    stages = {'usage', 'pricing', 'commission', 'cube', 'forecast', 'market'}
+    assert set(serial['pipeline']['stages']) == set(parallel['pipeline']['stages']) == stages
+    for section in ['usage_analysis', 'pricing_analysis', 'commission_analysis']:
+        assert_same_records(pd.DataFrame(serial[section]), pd.DataFrame(parallel[section]), section)
+    assert_same_intelligence(serial['market_intelligence'], parallel['market_intelligence'])
+    assert serial['anomaly_summary'] == parallel['anomaly_summary']
+    assert serial['usage_forecast_model'] == parallel['usage_forecast_model']
+
+    # Every stage is measured wherever it ran, with the same row counts either way
+    for run in metrics.values():
+        assert set(run) == stages | {'save', 'total'}
+        assert all(row['wall_seconds'] >= 0 and row['cpu_seconds'] >= 0 for row in run.values())
+        assert run['total']['wall_seconds'] >= max(row['wall_seconds'] for row in run.values() if row['stage'] != 'total')
+        assert run['usage']['groups'] == len(serial['usage_analysis'])
+        assert run['usage']['groups_per_second'] > 0
+    for stage in stages | {'save', 'total'}:
+        for field in ['rows_in', 'rows_out', 'groups']:
+            assert metrics[1][stage][field] == metrics[3][stage][field], (stage, field)
+
+
+if __name__ == "__main__":
+    print("🧪 Comparing vectorized analytics engine against legacy loops...")
+    for test in [test_usage_patterns_match_legacy, test_pricing_trends_match_legacy,
+                 test_commission_performance_matches_legacy, test_incremental_run_matches_full_run,
+                 test_usage_forecasts_recover_seasonal_trend, test_seasonal_factors_need_two_seasons_of_observed_history,
+                 test_esiid_anomalies_flag_outliers_against_peers,
+                 test_market_cube_rollups_match_market_intelligence, test_parallel_pipeline_matches_serial_run]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 Vectorized analytics outputs match!")
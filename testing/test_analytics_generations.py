@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the analytics endpoints served from persisted generations.
+
+Generations are written by hand, as the engine would leave them: one
+'active', earlier ones 'retired', and pruned ones deleted outright. These
+cover the per-section ETags, ?since deltas between generations and the
+410 once the requested generation is gone.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from app.models.analytics import AnalyticsGeneration, PricingAnalytics
+
+PRICING = "/api/v1/analytics/pricing-analysis"
+COMMISSION = "/api/v1/analytics/commission-analysis"
+
+
+def generation(db, status, pricing_hash, rows):
+    """A generation of pricing rows, given as (zone, rep, rate, row_hash)"""
+    run = AnalyticsGeneration(status=status, analysis_date=datetime(2025, 1, 15),
+                              content_hashes={"pricing": pricing_hash, "commission": "c0"})
+    db.add(run)
+    db.flush()
+    db.add_all(PricingAnalytics(generation_id=run.id, zone=zone, rep=rep, current_rate=rate, row_hash=row_hash,
+                                market_position="average")
+               for zone, rep, rate, row_hash in rows)
+    db.commit()
+    return run
+
+
+@pytest.fixture
+def generations(db):
+    """A retired generation and the active one after it"""
+    retired = generation(db, "retired", "p1", [
+        ("COAST", "Reliant", 50.0, "h1"),
+        ("COAST", "TXU", 55.0, "h2"),
+        ("NORTH", "TXU", 60.0, "h3"),
+    ])
+    active = generation(db, "active", "p2", [
+        ("COAST", "Reliant", 50.0, "h1"),
+        ("COAST", "TXU", 52.0, "h4"),
+        ("WEST", "TXU", 65.0, "h5"),
+    ])
+    return retired, active
+
+
+def test_no_generation_is_not_found(client, make_user):
+    _, user = make_user("user")
+    assert client.get(PRICING, headers=user).status_code == 404
+
+
+def test_section_etag_and_not_modified(client, make_user, generations):
+    _, user = make_user("user")
+    response = client.get(PRICING, headers=user)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag == '"pricing-p2"'
+    assert response.json()["generation_id"] == generations[1].id
+    assert [row["zone"] for row in response.json()["results"]] == ["COAST", "COAST", "WEST"]
+
+    cached = client.get(PRICING, headers={**user, "If-None-Match": f'W/{etag}'})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    # Each section carries its own tag
+    assert client.get(PRICING, headers={**user, "If-None-Match": '"pricing-p1"'}).status_code == 200
+    assert client.get(COMMISSION, headers={**user, "If-None-Match": etag}).headers["etag"] == '"commission-c0"'
+
+
+def test_since_returns_changed_rows_and_removed_keys(client, make_user, generations):
+    retired, active = generations
+    _, user = make_user("user")
+    body = client.get(PRICING, params={"since": retired.id}, headers=user).json()
+    assert [(row["zone"], row["rep"], row["current_rate"]) for row in body["results"]] == [
+        ("COAST", "TXU", 52.0), ("WEST", "TXU", 65.0)
+    ]
+    assert body["total"] == 2
+    assert body["removed"] == [{"zone": "NORTH", "rep": "TXU"}]
+    assert body["since"] == retired.id
+    assert body["generation_id"] == active.id
+
+    # Filters apply to both generations, so only the NORTH rows are compared
+    body = client.get(PRICING, params={"since": retired.id, "zone": "NORTH"}, headers=user).json()
+    assert body["results"] == [] and body["removed"] == [{"zone": "NORTH", "rep": "TXU"}]
+
+    body = client.get(PRICING, params={"since": active.id}, headers=user).json()
+    assert body["results"] == [] and body["removed"] == []
+
+
+def test_since_a_pruned_generation_is_gone(client, db, make_user, generations):
+    retired, _ = generations
+    _, user = make_user("user")
+    db.query(PricingAnalytics).filter(PricingAnalytics.generation_id == retired.id).delete()
+    db.delete(retired)
+    db.commit()
+
+    response = client.get(PRICING, params={"since": retired.id}, headers=user)
+    assert response.status_code == 410
+    assert client.get(PRICING, params={"since": 9999}, headers=user).status_code == 410
+    # A build that never became active is not a valid base either
+    building = generation(db, "building", "p3", [])
+    assert client.get(PRICING, params={"since": building.id}, headers=user).status_code == 410
+    assert client.get(COMMISSION, params={"since": building.id}, headers=user).status_code == 410
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for analytics refresh jobs and their endpoints.
+
+No engine process is started: the runner's job table is filled by hand, so
+these cover who may start, watch and cancel jobs, and which job a refresh
+request gets back.
+"""
+
+import multiprocessing
+
+import pytest
+
+from app.services.analytics_jobs import AnalyticsJob, AnalyticsJobRunner, job_runner
+
+JOB_ROUTES = [
+    ("post", "/api/v1/analytics/refresh"),
+    ("get", "/api/v1/analytics/jobs/unknown"),
+    ("post", "/api/v1/analytics/jobs/unknown/cancel"),
+]
+
+
+@pytest.fixture
+def runner_job(monkeypatch):
+    """An unfinished job registered with the app's runner"""
+    job = AnalyticsJob(sequence=1, incremental=False, requested_by=None)
+    job_runner._jobs[job.id] = job
+    # Normally created with the worker pool
+    monkeypatch.setattr(job_runner, "_cancelled_through", multiprocessing.Value("q", 0))
+    yield job
+    job_runner._jobs.pop(job.id, None)
+
+
+def test_job_endpoints_require_manager_or_admin(client, make_user):
+    _, user = make_user("user")
+    for method, path in JOB_ROUTES:
+        assert getattr(client, method)(path).status_code == 401
+        assert getattr(client, method)(path, headers=user).status_code == 403
+
+
+def test_managers_can_watch_and_cancel_jobs(client, make_user, runner_job):
+    _, manager = make_user("manager")
+    assert client.get("/api/v1/analytics/jobs/unknown", headers=manager).status_code == 404
+    assert client.get(f"/api/v1/analytics/jobs/{runner_job.id}", headers=manager).json()["status"] == "queued"
+    cancelled = client.post(f"/api/v1/analytics/jobs/{runner_job.id}/cancel", headers=manager)
+    assert cancelled.json()["status"] == "cancelling"
+
+
+def test_refresh_returns_the_job_still_being_cancelled(client, make_user, runner_job):
+    _, admin = make_user("admin")
+    runner_job.status, runner_job.cancel_requested = "running", True
+    response = client.post("/api/v1/analytics/refresh", headers=admin)
+    assert response.status_code == 202
+    body = response.json()
+    assert body["job_id"] == runner_job.id
+    assert body["status"] == "cancelling"
+    assert body["deduplicated"] is True
+
+
+def test_cancelling_job_is_active_until_its_worker_stops(app):
+    runner = AnalyticsJobRunner()
+    job = AnalyticsJob(sequence=1, incremental=True, requested_by=None)
+    runner._jobs[job.id] = job
+    job.status, job.cancel_requested = "running", True
+    assert runner.start() == (job, False)
+
+    job.status = "cancelled"
+    assert runner._active_job() is None
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the lazy, sectioned loader of the analytics results file.
+"""
+
+import json
+import math
+import os
+
+from app.services.analytics_results import AnalyticsResultsStore, ResultTable
+
+RESULTS = {
+    "analysis_timestamp": "2025-01-15T06:00:00",
+    "usage_analysis": [
+        {"account_name": "Acme", "total_usage_kwh": 1200.5, "usage_pattern": "stable", "esiid_count": 3},
+        {"account_name": "Bayou", "total_usage_kwh": float("nan"), "usage_pattern": "stable", "esiid_count": 1},
+        {"account_name": "Cedar \"North\"", "total_usage_kwh": 80.0, "usage_pattern": "stable", "esiid_count": 2},
+        {"account_name": "Delta", "total_usage_kwh": 15.25, "usage_pattern": None, "esiid_count": 7},
+    ],
+    "market_intelligence": {"zones": {"COAST": 1.5}, "notes": "line one\n  \"not_a_section\": 1"},
+    "record_counts": [3, 1, 2],
+    "key with \"quotes\"": True,
+}
+
+
+def write_results(path, results, indent=2):
+    # Written next to the target and moved into place, as the engine does
+    staging = path.with_suffix(".tmp")
+    with open(staging, "w") as f:
+        json.dump(results, f, indent=indent)
+    os.replace(staging, path)
+
+
+def records_equal(left, right):
+    assert len(left) == len(right)
+    for a, b in zip(left, right):
+        assert a.keys() == b.keys()
+        for key in a:
+            if isinstance(a[key], float) and math.isnan(a[key]):
+                assert math.isnan(b[key])
+            else:
+                assert a[key] == b[key], key
+
+
+def test_every_section_round_trips(tmp_path):
+    path = tmp_path / "results.json"
+    write_results(path, RESULTS)
+    store = AnalyticsResultsStore(path)
+
+    usage = store.section("usage_analysis")
+    assert isinstance(usage, ResultTable)
+    records_equal(usage.records(), RESULTS["usage_analysis"])
+    assert store.section("analysis_timestamp") == RESULTS["analysis_timestamp"]
+    assert store.section("market_intelligence") == RESULTS["market_intelligence"]
+    assert store.section("record_counts") == RESULTS["record_counts"]
+    assert store.section('key with "quotes"') is True
+    # Parsed once per file version
+    assert store.section("usage_analysis") is usage
+
+
+def test_file_without_indentation_is_parsed_whole(tmp_path):
+    path = tmp_path / "results.json"
+    write_results(path, RESULTS, indent=None)
+    store = AnalyticsResultsStore(path)
+    records_equal(store.table("usage_analysis").records(), RESULTS["usage_analysis"])
+    assert store.section("market_intelligence") == RESULTS["market_intelligence"]
+
+
+def test_missing_section_and_missing_file(tmp_path):
+    path = tmp_path / "results.json"
+    store = AnalyticsResultsStore(path)
+    assert store.refresh() is False
+    assert store.section("usage_analysis", default=[]) == []
+
+    write_results(path, RESULTS)
+    assert store.refresh() is True
+    assert store.section("pricing_analysis") is None
+    assert store.section("pricing_analysis", default={}) == {}
+    assert len(store.table("pricing_analysis")) == 0
+
+
+def test_replaced_file_is_reloaded(tmp_path):
+    path = tmp_path / "results.json"
+    write_results(path, RESULTS)
+    store = AnalyticsResultsStore(path)
+    before = store.table("usage_analysis")
+    assert len(before) == 4
+
+    write_results(path, {**RESULTS, "usage_analysis": RESULTS["usage_analysis"][:1], "pricing_analysis": []})
+    assert store.refresh() is True
+    after = store.table("usage_analysis")
+    assert after is not before
+    records_equal(after.records(), RESULTS["usage_analysis"][:1])
+    assert store.section("pricing_analysis") == []
+    # The earlier table is untouched, so a request still holding it reads one consistent file
+    assert len(before) == 4
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the robust per-ESIID anomaly scores.
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from app.services.anomaly_detection import MIN_PEERS, robust_z, score_esiids, severity_bounds, severity_of
+
+
+def test_modified_z_against_the_median_absolute_deviation():
+    values = np.array([10.0, 12.0, 14.0, 16.0, 100.0])
+    scores, peers = robust_z(values, np.zeros(5, dtype=np.int64))
+    # median 14, MAD 2
+    assert scores == pytest.approx(0.6745 * (values - 14.0) / 2.0)
+    assert list(peers) == [5] * 5
+
+
+def test_mean_absolute_deviation_stands_in_when_mad_is_zero():
+    values = np.array([1.0] * 6 + [5.0])
+    scores, _ = robust_z(values, np.zeros(7, dtype=np.int64))
+    # MAD is 0; the mean absolute deviation is 4/7
+    assert scores[-1] == pytest.approx(4.0 / ((4.0 / 7) / 0.7979))
+    assert list(scores[:-1]) == [0.0] * 6
+
+
+def test_identical_group_scores_zero_and_nan_values_are_not_peers():
+    values = np.array([3.0, 3.0, 3.0, math.nan])
+    scores, peers = robust_z(values, np.zeros(4, dtype=np.int64))
+    assert list(scores[:3]) == [0.0] * 3
+    assert math.isnan(scores[3])
+    assert list(peers) == [3, 3, 3, 0]
+
+
+def test_small_peer_groups_fall_back_to_zone_then_all_meters():
+    zones = ["COAST"] * 8 + ["NORTH"] * 3
+    profiles = ["A"] * 6 + ["B"] * 2 + ["C"] * 3
+    kwh = [1000, 1100, 900, 1050, 950, 1000, 3000, 5000, 800, 850, 20000]
+    assert MIN_PEERS == 5
+    result = score_esiids(zones, profiles, kwh, [100.0] * 11)
+    assert list(result["peer_group"]) == ["zone_profile"] * 6 + ["zone"] * 2 + ["all"] * 3
+
+    log_kwh = np.log(np.array(kwh, dtype=float))
+    zone_scores, _ = robust_z(log_kwh[:8], np.zeros(8, dtype=np.int64))
+    all_scores, _ = robust_z(log_kwh, np.zeros(11, dtype=np.int64))
+    assert result["usage_score"][6:8] == pytest.approx(zone_scores[6:8])
+    assert result["usage_score"][8:] == pytest.approx(all_scores[8:])
+
+
+def test_anomaly_type_and_severity():
+    kwh = [1000.0] * 9 + [1000.0]
+    bill = [100.0, 101.0, 99.0, 100.0, 102.0, 98.0, 100.0, 101.0, 99.0, 400.0]
+    result = score_esiids(["COAST"] * 10, ["A"] * 10, kwh, bill)
+    assert result["anomaly_type"][-1] == "cost"
+    assert result["severity"][-1] == "critical"
+    assert set(result["severity"][:-1]) == {"normal"}
+
+    assert list(severity_of(np.array([1.0, 2.5, 3.5, 5.0, 8.0]))) == ["normal", "low", "medium", "high", "critical"]
+    assert severity_bounds("high") == (5.0, 8.0)
+    assert severity_bounds("critical") == (8.0, None)
+    with pytest.raises(ValueError):
+        severity_bounds("extreme")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for the async database session and the routes ported to it.
+
+The async session shares the database with the sync one. On a SQLite file
+it reads through query-only connections until it writes (elsewhere it
+always binds to the writer), and its commits invalidate the same caches as
+sync commits.
+"""
+
+import pytest
+from sqlalchemy import select, text
+
+from app import database
+from app.models.analytics import AnalyticsGeneration
+from app.models.esiid import ESIID
+from app.services.analytics_store import get_active_generation, get_retained_generation
+
+ESIIDS = "/api/v1/esiids"
+
+
+def test_async_url_swaps_the_driver():
+    assert database.async_database_url("sqlite:///./kilowatt.db") == "sqlite+aiosqlite:///./kilowatt.db"
+    assert database.async_database_url("postgresql://kw:secret@db/kilowatt") == \
+        "postgresql+asyncpg://kw:secret@db/kilowatt"
+    with pytest.raises(ValueError):
+        database.async_database_url("mysql://db/kilowatt")
+
+
+def read_bind(async_db):
+    """Sync engine the async session would run a read on now"""
+    return async_db.sync_session.get_bind(clause=select(ESIID.id))
+
+
+@pytest.mark.asyncio
+async def test_async_session_reads_on_the_read_engine_until_it_writes(async_db):
+    reader = (database.async_read_engine or database.async_engine).sync_engine
+    assert read_bind(async_db) is reader
+    async_db.add(ESIID(esi_id="1000", account_name="Acme", is_active=True))
+    await async_db.flush()
+    # The transaction stays on the writer, so it sees its own row
+    assert read_bind(async_db) is database.async_engine.sync_engine
+    assert await async_db.scalar(select(ESIID.account_name).where(ESIID.esi_id == "1000")) == "Acme"
+    await async_db.commit()
+    assert read_bind(async_db) is reader
+
+
+@pytest.mark.skipif(database.async_read_engine is None, reason="query-only reads are set up for SQLite files")
+@pytest.mark.asyncio
+async def test_async_read_connections_are_query_only(async_db):
+    assert await async_db.scalar(text("PRAGMA query_only")) == 1
+    async_db.add(ESIID(esi_id="1001", account_name="Acme", is_active=True))
+    await async_db.flush()
+    assert await async_db.scalar(text("PRAGMA query_only")) == 0
+    await async_db.rollback()
+
+
+@pytest.mark.asyncio
+async def test_async_session_sees_sync_commits_and_keeps_objects_loaded(db, async_db):
+    db.add_all([AnalyticsGeneration(status="retired"), AnalyticsGeneration(status="active")])
+    db.commit()
+    active = await get_active_generation(async_db)
+    assert active.status == "active"
+    assert (await get_retained_generation(async_db, active.id - 1)).status == "retired"
+
+    esiid = ESIID(esi_id="1002", account_name="Bayou", is_active=True)
+    async_db.add(esiid)
+    await async_db.commit()
+    # Not expired on commit: reading an attribute needs no lazy load
+    assert esiid.account_name == "Bayou"
+    assert db.query(ESIID).filter(ESIID.esi_id == "1002").count() == 1
+
+
+def test_ported_routes_write_and_invalidate_through_the_async_session(client, make_user):
+    _, admin = make_user("admin")
+    assert client.get(f"{ESIIDS}/stats/overview", headers=admin).json()["total_esiids"] == 0
+
+    created = client.post(f"{ESIIDS}/", json={"esi_id": "2000", "account_name": "Cedar", "kwh_mo": 1200.0},
+                          headers=admin)
+    assert created.status_code == 200
+    esiid_id = created.json()["id"]
+    overview = client.get(f"{ESIIDS}/stats/overview", headers=admin).json()
+    assert overview["total_esiids"] == 1
+    assert overview["usage_statistics"]["total_kwh_mo"] == 1200.0
+
+    updated = client.put(f"{ESIIDS}/{esiid_id}", json={"kwh_mo": 800.0}, headers=admin)
+    assert updated.json()["kwh_mo"] == 800.0
+    assert client.get(f"{ESIIDS}/stats/overview", headers=admin).json()["usage_statistics"]["total_kwh_mo"] == 800.0
+
+    assert client.delete(f"{ESIIDS}/{esiid_id}", headers=admin).status_code == 200
+    assert client.get(f"{ESIIDS}/{esiid_id}", headers=admin).status_code == 404
+    assert client.get(f"{ESIIDS}/stats/overview", headers=admin).json()["total_esiids"] == 0
+
+
+@pytest.fixture
+def test_database(tmp_path, monkeypatch):
+    """Point the test-database dependencies at a fresh SQLite file"""
+    url = f"sqlite:///{tmp_path / 'kilowatt_test.db'}"
+    monkeypatch.setattr(database.settings, "database_test_url", url)
+    database._test_session_factories.cache_clear()
+    sync_db = next(database.get_test_db())
+    database.Base.metadata.create_all(bind=sync_db.get_bind())
+    yield sync_db
+    sync_db.close()
+    database._test_session_factories.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_test_database_dependencies_share_one_database(test_database):
+    test_database.add(ESIID(esi_id="3000", account_name="Delta", is_active=True))
+    test_database.commit()
+
+    sessions = database.get_async_test_db()
+    async_db = await anext(sessions)
+    try:
+        assert str(async_db.bind.url) == database.async_database_url(database.settings.database_test_url)
+        assert await async_db.scalar(select(ESIID.account_name)) == "Delta"
+    finally:
+        await sessions.aclose()
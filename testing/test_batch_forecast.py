@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for the NDJSON batch usage forecast.
+
+The active generation is given fitted models for three accounts, as the
+analytics engine stores them; each streamed line must match what the
+single-account forecast returns for the same account.
+"""
+
+import json
+
+import pytest
+
+from app.models.account import Account
+from app.models.analytics import AnalyticsGeneration, MarketIntelligence, UsageAnalytics
+from app.models.esiid import ESIID
+from app.services import usage_forecasting
+
+BATCH = "/api/v1/analytics/forecast/batch"
+SINGLE = "/api/v1/analytics/forecast"
+
+# account: (zone, manager, level, trend, backtest MAPE)
+ACCOUNTS = {
+    "Acme": ("COAST", "Kim", 1000.0, 20.0, 0.1),
+    "Bayou": ("COAST", "Lee", 500.0, -5.0, None),
+    "Cedar": ("NORTH", "Kim", 2000.0, 0.0, 0.05),
+}
+
+
+def fitted_model(account, level, trend, mape):
+    return {"account_name": account, "level": level, "trend": trend, "alpha": 0.3, "beta": 0.1,
+            "residual_std": 50.0, "fit_points": 23, "history_months": 24, "backtest_mape": mape}
+
+
+@pytest.fixture
+def forecast_models(db, monkeypatch):
+    """An active generation with fitted usage models, and the accounts' zones and managers"""
+    monkeypatch.setattr(usage_forecasting, "_models", {})
+    generation = AnalyticsGeneration(status="active")
+    db.add(generation)
+    db.flush()
+    db.add(MarketIntelligence(generation_id=generation.id, demand_forecast={
+        "last_period": 202412, "confidence": 0.9, "model_accuracy": 0.92,
+        "seasonal_factors": {str(month): 1.0 + (0.2 if month in (7, 8) else 0.0) for month in range(1, 13)},
+        "interval_ratios": [[0.9, 1.1], [0.85, 1.15], [0.8, 1.2]]
+    }))
+    for account, (zone, manager, level, trend, mape) in ACCOUNTS.items():
+        db.add(UsageAnalytics(generation_id=generation.id, account_name=account,
+                              forecast_data=fitted_model(account, level, trend, mape)))
+        db.add(ESIID(esi_id=f"{account}-1", account_name=account, zone=zone, is_active=True))
+        db.add(Account(account_name=account, manager_name=manager))
+    db.commit()
+
+
+def stream(client, headers, **body):
+    response = client.post(BATCH, json=body, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def single(client, headers, account, **body):
+    response = client.post(SINGLE, json={"account_name": account, **body}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_lines_match_the_single_account_forecast(client, make_user, forecast_models):
+    _, user = make_user("user")
+    for options in ({"forecast_horizon": 9}, {"forecast_horizon": 4, "forecast_period": "quarterly"}):
+        lines = stream(client, user, account_names=["Cedar", "Acme", "Cedar"], **options)
+        # Model order, each account once
+        assert [line["account_name"] for line in lines] == ["Acme", "Cedar"]
+        for line in lines:
+            expected = single(client, user, line["account_name"], **options)
+            assert line["forecast"] == expected["forecast_data"]
+            assert line["model_accuracy"] == expected["model_accuracy"]
+
+
+def test_zone_and_manager_filters_combine(client, make_user, forecast_models):
+    _, user = make_user("user")
+    assert [line["account_name"] for line in stream(client, user, zone="COAST")] == ["Acme", "Bayou"]
+    assert [line["account_name"] for line in stream(client, user, manager_name="Kim")] == ["Acme", "Cedar"]
+    lines = stream(client, user, zone="COAST", manager_name="Kim", forecast_horizon=3)
+    assert [line["account_name"] for line in lines] == ["Acme"]
+    assert lines[0]["forecast"] == single(client, user, "Acme", forecast_horizon=3)["forecast_data"]
+    assert stream(client, user, zone="WEST") == []
+
+
+def test_unknown_accounts_are_reported_first(client, make_user, forecast_models):
+    _, user = make_user("user")
+    lines = stream(client, user, account_names=["Bayou", "Nobody", "Acme", "Nobody"], zone="COAST",
+                   forecast_horizon=2, include_total=True)
+    assert lines[0] == {"account_name": "Nobody", "error": "Account not found"}
+    assert [line.get("account_name") for line in lines[1:3]] == ["Acme", "Bayou"]
+
+    total = lines[3]
+    assert total["total"] is True and total["accounts"] == 2
+    assert total["model_accuracy"] == 0.92
+    for period, row in enumerate(total["forecast"]):
+        assert row["forecasted_usage_kwh"] == pytest.approx(
+            sum(line["forecast"][period]["forecasted_usage_kwh"] for line in lines[1:3]), abs=0.02
+        )
+    # The single-account endpoint reports the same accounts as missing
+    assert client.post(SINGLE, json={"account_name": "Nobody"}, headers=user).status_code == 404
+
+
+def test_batch_needs_a_generation_with_forecasts(client, make_user):
+    _, user = make_user("user")
+    assert client.post(BATCH, json={}, headers=user).status_code == 404
+    assert client.post(BATCH, json={}).status_code == 401
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests for the two-tier value cache.
+
+The Redis tier runs against FakeRedis, an in-memory stand-in for the few
+commands RedisTier sends; two Cache objects sharing one FakeRedis play two
+workers.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+import redis
+
+from app.core.cache import Cache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.bump_gate = threading.Event()
+        self.bump_gate.set()
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, px=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def incr(self, key):
+        self.bump_gate.wait()
+        self.data[key] = str(int(self.data.get(key, b"0")) + 1).encode()
+
+    def pipeline(self, transaction=False):
+        return self
+
+    def execute(self):
+        pass
+
+
+class DownRedis(FakeRedis):
+    """Every command times out after delay seconds"""
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+
+    def __getattribute__(self, name):
+        if name in ("mget", "get", "set", "delete", "incr", "execute"):
+            def fail(*args, **kwargs):
+                time.sleep(object.__getattribute__(self, "delay"))
+                raise redis.TimeoutError("Timeout reading from socket")
+            return fail
+        return object.__getattribute__(self, name)
+
+
+def worker(server, version_check_seconds=0.0):
+    cache = Cache(100, 60, redis_url="redis://cache-tests", version_check_seconds=version_check_seconds)
+    cache.remote.client = server
+    return cache
+
+
+def counting(calls, value, delay=0.0):
+    async def compute():
+        calls.append(value)
+        await asyncio.sleep(delay)
+        return {"value": value}
+    return compute
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_compute_once():
+    cache, calls = Cache(100, 60), []
+    results = await asyncio.gather(*(cache.get_or_compute("k", counting(calls, 1, 0.02)) for _ in range(5)))
+    assert results == [{"value": 1}] * 5
+    assert calls == [1]
+    assert cache.stats()["coalesced"] == 4
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_across_workers_compute_once():
+    server, calls = FakeRedis(), []
+    first, second = worker(server), worker(server)
+    results = await asyncio.gather(
+        *(first.get_or_compute("k", counting(calls, 1, 0.05), tags=["t"]) for _ in range(3)),
+        *(second.get_or_compute("k", counting(calls, 2, 0.05), tags=["t"]) for _ in range(3))
+    )
+    assert len(calls) == 1
+    assert all(result == results[0] for result in results)
+
+
+@pytest.mark.asyncio
+async def test_invalidation_retires_only_tagged_values():
+    cache, calls = Cache(100, 60), []
+    await cache.get_or_compute("a", counting(calls, "a"), tags=["accounts"])
+    await cache.get_or_compute("b", counting(calls, "b"), tags=["esiids"])
+    cache.invalidate(["accounts"])
+    await cache.get_or_compute("a", counting(calls, "a"), tags=["accounts"])
+    await cache.get_or_compute("b", counting(calls, "b"), tags=["esiids"])
+    assert calls == ["a", "b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_other_workers():
+    server, calls = FakeRedis(), []
+    first, second = worker(server), worker(server)
+    await first.get_or_compute("k", counting(calls, 1), tags=["t"])
+    assert await second.get_or_compute("k", counting(calls, 2), tags=["t"]) == {"value": 1}
+
+    first.invalidate(["t"])
+    first.flush(timeout=5)
+    assert await second.get_or_compute("k", counting(calls, 3), tags=["t"]) == {"value": 3}
+    assert calls == [1, 3]
+
+
+@pytest.mark.asyncio
+async def test_value_stored_at_other_versions_is_not_served():
+    server, calls = FakeRedis(), []
+    cache = worker(server)
+    cache.remote.set("k", {"value": "stale"}, (7,), 60)
+    assert await cache.get_or_compute("k", counting(calls, "fresh"), tags=["t"]) == {"value": "fresh"}
+    assert calls == ["fresh"]
+
+
+@pytest.mark.asyncio
+async def test_pending_remote_bump_does_not_serve_stale_shared_value():
+    server, calls = FakeRedis(), []
+    first, second = worker(server), worker(server)
+    await second.get_or_compute("k", counting(calls, 1), tags=["t"])
+
+    server.bump_gate.clear()
+    first.invalidate(["t"])
+    # The Redis versions have not moved yet, but this worker's write must be visible to it
+    assert await first.get_or_compute("k", counting(calls, 2), tags=["t"]) == {"value": 2}
+    server.bump_gate.set()
+    first.flush(timeout=5)
+    assert await first.get_or_compute("k", counting(calls, 3), tags=["t"]) == {"value": 3}
+    assert calls == [1, 2, 3]
+
+
+def test_invalidate_does_not_wait_for_redis():
+    cache = worker(DownRedis(delay=0.25))
+    started = time.perf_counter()
+    cache.invalidate(["t"])
+    assert time.perf_counter() - started < 0.1
+    cache.flush(timeout=5)
+    assert cache.stats()["redis_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failing_redis_falls_back_to_local_tier():
+    cache, calls = worker(DownRedis()), []
+    assert await cache.get_or_compute("k", counting(calls, 1), tags=["t"]) == {"value": 1}
+    assert await cache.get_or_compute("k", counting(calls, 2), tags=["t"]) == {"value": 1}
+    cache.invalidate(["t"])
+    assert await cache.get_or_compute("k", counting(calls, 3), tags=["t"]) == {"value": 3}
+
+    stats = cache.stats()
+    assert calls == [1, 3]
+    assert stats["redis"] == "unavailable"
+    assert stats["redis_errors"] == 1
+    assert "Timeout" in stats["last_redis_error"]
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests for the commission forecasting engine and its endpoint.
+
+Received payments are written for two REPs on straight lines, so the Holt
+fit has a known continuation. The fitted state is cached per grouping;
+these also check that a new month advances it rather than refitting.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.models.commission import Commission
+from app.services import commission_forecasting
+from app.services.commission_forecasting import build_series_matrix, forecast_commissions, get_fitted_state
+from app.services.forecasting import fit_holt, shift_period
+
+FORECAST = "/api/v1/commissions/forecast"
+MONTHS = 24
+
+
+def payment(k_rep, period, amount, account="Acme"):
+    year, month = divmod(period, 100)
+    return Commission(k_rep=k_rep, account_name=account, commission_type="received",
+                      actual_payment_amount=amount, actual_payment_date=datetime(year, month, 15))
+
+
+def growing(t):
+    return 100.0 + 10 * t
+
+
+def shrinking(t):
+    return 500.0 - 5 * t
+
+
+def add_month(db, t):
+    period = shift_period(202301, t)
+    db.add_all([payment("TXU", period, growing(t)), payment("Reliant", period, shrinking(t), account="Bayou")])
+
+
+@pytest.fixture
+def empty_forecast_cache(monkeypatch):
+    monkeypatch.setattr(commission_forecasting, "_forecast_cache", {})
+
+
+@pytest.fixture
+def two_years(db, empty_forecast_cache):
+    """24 months of payments for TXU (growing) and Reliant (shrinking), from 2023-01"""
+    for t in range(MONTHS):
+        add_month(db, t)
+    db.commit()
+
+
+def test_linear_series_forecasts_its_continuation():
+    values = np.array([[growing(t) for t in range(MONTHS)],
+                       [np.nan] * 2 + [shrinking(t) for t in range(MONTHS - 2)]])
+    state = fit_holt(values)
+    point, lower, upper = state.forecast(3, confidence=0.9)
+    assert point[0] == pytest.approx([growing(t) for t in range(MONTHS, MONTHS + 3)], abs=0.1)
+    # The second series started two months late, so it is two steps behind on its line
+    assert point[1] == pytest.approx([shrinking(t) for t in range(MONTHS - 2, MONTHS + 1)], abs=0.1)
+    assert (lower < point).all() and (point < upper).all()
+    # Uncertainty grows with the horizon
+    assert (np.diff(upper - lower, axis=1) > 0).all()
+
+
+def test_series_matrix_marks_months_before_the_first_payment(db):
+    db.add_all([
+        payment("TXU", 202401, 100), payment("TXU", 202401, 25, account="Bayou"), payment("TXU", 202403, 80),
+        payment("Reliant", 202402, 60, account="Bayou"),
+        Commission(k_rep="TXU", account_name="Acme", commission_type="scheduled", actual_payment_amount=999,
+                   actual_payment_date=datetime(2024, 2, 1)),
+    ])
+    db.commit()
+
+    keys, first_period, matrix = build_series_matrix(db, "rep")
+    assert keys == [("Reliant",), ("TXU",)] and first_period == 202401
+    assert np.array_equal(matrix, [[np.nan, 60, 0], [125, 0, 80]], equal_nan=True)
+
+    keys, _, matrix = build_series_matrix(db, "account")
+    assert keys == [("Reliant", "Bayou"), ("TXU", "Acme"), ("TXU", "Bayou")]
+    assert np.array_equal(matrix[2], [25, 0, 0])
+
+    keys, first_period, matrix = build_series_matrix(db, "rep", after_period=202401)
+    assert first_period == 202402 and np.array_equal(matrix, [[60, 0], [np.nan, 80]], equal_nan=True)
+
+
+def test_new_month_advances_the_cached_fit(db, two_years, monkeypatch):
+    fitted = get_fitted_state(db)
+    assert fitted["last_period"] == shift_period(202301, MONTHS - 1)
+    assert get_fitted_state(db) is fitted
+
+    calls = []
+    for name in ("_fit", "_advance"):
+        original = getattr(commission_forecasting, name)
+        monkeypatch.setattr(commission_forecasting, name,
+                            lambda *args, _name=name, _original=original: calls.append(_name) or _original(*args))
+
+    add_month(db, MONTHS)
+    db.commit()
+    advanced = get_fitted_state(db)
+    assert calls == ["_advance"]
+    assert advanced["last_period"] == shift_period(202301, MONTHS)
+
+    refit = commission_forecasting._fit(db, "rep")
+    assert refit["keys"] == advanced["keys"]
+    for got, expected in zip(advanced["state"].forecast(3), refit["state"].forecast(3)):
+        assert got == pytest.approx(expected)
+    assert advanced["fingerprint"] == refit["fingerprint"]
+
+
+def test_changed_fitted_month_refits(db, two_years, monkeypatch):
+    get_fitted_state(db)
+    calls = []
+    original = commission_forecasting._fit
+    monkeypatch.setattr(commission_forecasting, "_fit", lambda *args: calls.append("_fit") or original(*args))
+
+    db.add(payment("TXU", 202306, 1000))
+    db.commit()
+    get_fitted_state(db)
+    assert calls == ["_fit"]
+
+
+def test_forecast_filters_by_rep_and_account(db, two_years):
+    assert [f["k_rep"] for f in forecast_commissions(db, k_rep="txu")] == ["TXU"]
+    by_account = forecast_commissions(db, by="account", account_name="bay")
+    assert [(f["k_rep"], f["account_name"]) for f in by_account] == [("Reliant", "Bayou")]
+
+
+def test_forecast_endpoint_returns_intervals_around_the_forecast(client, make_user, two_years):
+    _, user = make_user("user")
+    assert client.get(FORECAST, headers=user).status_code == 403
+
+    _, manager = make_user("manager")
+    response = client.get(FORECAST, params={"horizon": 3, "confidence": 0.8}, headers=manager)
+    assert response.status_code == 200
+    forecasts = {f["k_rep"]: f for f in response.json()}
+    assert set(forecasts) == {"TXU", "Reliant"}
+
+    txu = forecasts["TXU"]
+    assert txu["last_period"] == 202412
+    assert [point["period"] for point in txu["forecast"]] == [202501, 202502, 202503]
+    assert [point["forecast"] for point in txu["forecast"]] == pytest.approx([340, 350, 360], abs=0.1)
+    for forecast in forecasts.values():
+        for point in forecast["forecast"]:
+            assert point["lower"] <= point["forecast"] <= point["upper"]
+            assert point["lower"] < point["upper"]
+
+    paged = client.get(FORECAST, params={"skip": 1, "limit": 1}, headers=manager).json()
+    assert len(paged) == 1
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for the commission reconciliation engine.
+
+reconcile() is checked on hand-built arrays; run_reconciliation against the
+test database, where incremental runs must pick up every month whose stored
+results a write made stale.
+"""
+
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import text
+
+from app.database import engine
+from app.models.commission import Commission, CommissionReconciliation
+from app.services.commission_reconciliation import reconcile, run_reconciliation
+
+
+def arrays(*rows):
+    """Arrays in the load_scheduled/load_received layout from (account, rep, period, amount) rows"""
+    accounts, reps, periods, amounts = zip(*rows) if rows else ((), (), (), ())
+    return {
+        'account_name': np.array(accounts, dtype=object),
+        'k_rep': np.array(reps, dtype=object),
+        'period': np.array(periods, dtype=np.int64),
+        'amount': np.array(amounts, dtype=np.float64)
+    }
+
+
+def statuses(result):
+    return {(a, r, int(p)): s for a, r, p, s in zip(
+        result['account_name'], result['k_rep'], result['period'], result['status']
+    )}
+
+
+def scheduled(account, amounts, rep="TXU"):
+    return Commission(account_name=account, k_rep=rep, commission_type='scheduled', monthly_scheduled=amounts)
+
+
+def received(account, amount, paid_on, rep="TXU"):
+    return Commission(account_name=account, k_rep=rep, commission_type='received',
+                      actual_payment_amount=amount, actual_payment_date=paid_on)
+
+
+def reconciled(db):
+    """Full run after dating every commission well before it, so later runs only see later writes"""
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE commissions SET created_at = '2024-01-01 00:00:00', updated_at = NULL"))
+    return run_reconciliation(db, full=True)
+
+
+def stored(db):
+    db.expire_all()
+    return {(row.account_name, row.period): row.status for row in db.query(CommissionReconciliation)}
+
+
+def test_reconcile_classifies_each_cell():
+    result = reconcile(
+        arrays(("A", "TXU", 202501, 100.0), ("B", "TXU", 202501, 100.0), ("C", "TXU", 202501, 100.0),
+               ("D", "TXU", 202501, 100.0), ("E", "TXU", 202501, 100.0)),
+        arrays(("A", "TXU", 202501, 100.0), ("C", "TXU", 202501, 60.0), ("D", "TXU", 202501, 130.0),
+               ("E", "TXU", 202501, 100.0), ("E", "TXU", 202501, 100.0), ("F", "TXU", 202501, 25.0))
+    )
+    assert statuses(result) == {
+        ("A", "TXU", 202501): "matched",
+        ("B", "TXU", 202501): "missed",
+        ("C", "TXU", 202501): "short",
+        ("D", "TXU", 202501): "over",
+        ("E", "TXU", 202501): "duplicate",
+        ("F", "TXU", 202501): "unscheduled",
+    }
+    e = list(result['account_name']).index("E")
+    assert result['duplicate_count'][e] == 1
+    assert result['variance'][e] == 100.0
+
+
+def test_equal_instalments_that_add_up_to_the_schedule_match():
+    result = reconcile(
+        arrays(("A", "TXU", 202501, 100.0)),
+        arrays(("A", "TXU", 202501, 50.0), ("A", "TXU", 202501, 50.0))
+    )
+    assert list(result['status']) == ["matched"]
+    assert list(result['duplicate_count']) == [1]
+
+
+def test_reconcile_empty_book():
+    result = reconcile(arrays(), arrays())
+    assert len(result['status']) == 0
+
+
+def test_incremental_run_recomputes_the_month_a_payment_moved_out_of(db):
+    payment = received("Acme", 100, datetime(2025, 1, 20))
+    db.add_all([scheduled("Acme", {"Jan 25": 100, "Feb 25": 100}), payment])
+    db.commit()
+    assert reconciled(db)['mode'] == 'full'
+    assert stored(db) == {("Acme", 202501): "matched", ("Acme", 202502): "missed"}
+
+    payment.actual_payment_date = datetime(2025, 2, 3)
+    db.commit()
+    summary = run_reconciliation(db)
+    assert summary['mode'] == 'incremental'
+    assert summary['periods'] == [202501, 202502]
+    assert stored(db) == {("Acme", 202501): "missed", ("Acme", 202502): "matched"}
+
+
+def test_incremental_run_recomputes_the_months_of_a_deleted_commission(db):
+    schedule = scheduled("Acme", {"Jan 25": 100})
+    payment = received("Acme", 100, datetime(2025, 1, 20))
+    db.add_all([schedule, payment, scheduled("Bayou", {"Mar 25": 40})])
+    db.commit()
+    reconciled(db)
+
+    db.delete(schedule)
+    db.commit()
+    assert run_reconciliation(db)['periods'] == [202501]
+    assert stored(db)[("Acme", 202501)] == "unscheduled"
+
+    db.delete(payment)
+    db.commit()
+    assert run_reconciliation(db)['periods'] == [202501]
+    assert stored(db) == {("Bayou", 202503): "missed"}
+
+
+def test_incremental_run_notices_payments_deleted_outside_the_orm(db):
+    db.add_all([scheduled("Acme", {"Jan 25": 100}), received("Acme", 100, datetime(2025, 1, 20))])
+    db.commit()
+    reconciled(db)
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM commissions WHERE commission_type = 'received'"))
+    assert run_reconciliation(db)['periods'] == [202501]
+    assert stored(db) == {("Acme", 202501): "missed"}
+
+
+def test_incremental_run_includes_new_commissions(db):
+    db.add(scheduled("Acme", {"Jan 25": 100}))
+    db.commit()
+    reconciled(db)
+
+    db.add(received("Acme", 100, datetime(2025, 3, 2)))
+    db.commit()
+    assert run_reconciliation(db)['periods'] == [202503]
+    assert stored(db) == {("Acme", 202501): "missed", ("Acme", 202503): "unscheduled"}
+
+
+def test_incremental_run_without_changes_does_nothing(db):
+    db.add_all([scheduled("Acme", {"Jan 25": 100}), received("Acme", 100, datetime(2025, 1, 20))])
+    db.commit()
+    reconciled(db)
+    assert run_reconciliation(db)['periods'] == []
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for the commission payment period columns and the monthly summary.
+
+payment_year/payment_month are kept in step with actual_payment_date by the
+model's insert/update hooks; the monthly summary groups on them.
+"""
+
+from datetime import datetime
+
+from app.models.commission import Commission
+
+
+def payment(amount, paid_on, account="Acme"):
+    return Commission(account_name=account, k_rep="TXU", commission_type="received",
+                      actual_payment_amount=amount, actual_payment_date=paid_on)
+
+
+def test_payment_period_follows_payment_date(db):
+    commission = payment(100, datetime(2025, 3, 14))
+    db.add(commission)
+    db.commit()
+    assert (commission.payment_year, commission.payment_month) == (2025, 3)
+
+    commission.actual_payment_date = datetime(2024, 12, 31)
+    db.commit()
+    assert (commission.payment_year, commission.payment_month) == (2024, 12)
+
+    commission.actual_payment_date = None
+    db.commit()
+    assert (commission.payment_year, commission.payment_month) == (None, None)
+
+
+def test_monthly_summary_route_is_not_shadowed(client, db, make_user):
+    _, headers = make_user("manager")
+    db.add_all([
+        payment(100, datetime(2025, 1, 5)),
+        payment(50, datetime(2025, 1, 20), account="Bayou"),
+        payment(75, datetime(2025, 3, 2)),
+        payment(999, datetime(2024, 3, 2)),
+    ])
+    db.commit()
+
+    response = client.get("/api/v1/commissions/monthly-summary", params={"year": 2025}, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "year": 2025,
+        "monthly_data": {
+            "January": {"total_amount": 150.0, "count": 2},
+            "March": {"total_amount": 75.0, "count": 1},
+        },
+        "total_year_amount": 225.0,
+        "total_year_count": 3,
+    }
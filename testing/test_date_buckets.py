@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for date_part, compiled per dialect and run through a trend endpoint.
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import column
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.date_buckets import date_part
+from app.models.daily_pricing import DailyPricing
+
+
+def compiled(element, dialect):
+    return str(element.compile(dialect=dialect))
+
+
+def test_compiles_to_strftime_on_sqlite_and_extract_on_postgresql():
+    month = date_part("month", column("effective_date"))
+    assert compiled(month, sqlite.dialect()) == "CAST(strftime('%m', effective_date) AS INTEGER)"
+    assert compiled(month, postgresql.dialect()) == "CAST(EXTRACT(MONTH FROM effective_date) AS INTEGER)"
+    assert compiled(date_part("year", column("d")), sqlite.dialect()) == "CAST(strftime('%Y', d) AS INTEGER)"
+    assert compiled(date_part("day", column("d")), postgresql.dialect()) == "CAST(EXTRACT(DAY FROM d) AS INTEGER)"
+
+
+def test_field_is_part_of_the_cache_key():
+    expr = column("effective_date")
+    assert date_part("month", expr)._generate_cache_key() != date_part("year", expr)._generate_cache_key()
+    with pytest.raises(ValueError):
+        date_part("week", expr)
+
+
+def test_monthly_trends_bucket_by_effective_date(client, db, make_user):
+    _, user = make_user("user")
+    for effective_date, rate in [(datetime(2025, 1, 5), 40.0), (datetime(2025, 1, 31, 23, 30), 60.0),
+                                 (datetime(2025, 3, 1), 55.0), (datetime(2024, 12, 31), 99.0)]:
+        db.add(DailyPricing(effective_date=effective_date, zone="COAST", rep="TXU", daily_rate=rate, is_active=True))
+    db.commit()
+
+    body = client.get("/api/v1/pricing/trends/monthly", params={"year": 2025}, headers=user).json()
+    assert body["monthly_trends"] == {
+        "January": {"avg_rate": 50.0, "min_rate": 40.0, "max_rate": 60.0, "record_count": 2},
+        "March": {"avg_rate": 55.0, "min_rate": 55.0, "max_rate": 55.0, "record_count": 1},
+    }
+    december = client.get("/api/v1/pricing/trends/monthly", params={"year": 2024}, headers=user).json()
+    assert list(december["monthly_trends"]) == ["December"]
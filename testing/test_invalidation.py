@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the write-driven invalidation shared by the API's caches.
+"""
+
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, insert
+from sqlalchemy.orm import Session
+
+from app.core.invalidation import watch_writes
+
+
+class Recorder:
+    """A cache that records the tables it is asked to invalidate"""
+
+    def __init__(self):
+        self.calls = []
+
+    def invalidate(self, tables):
+        self.calls.append(set(tables))
+
+
+def watched_engine(*caches):
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    table = Table("readings", metadata, Column("id", Integer, primary_key=True))
+    metadata.create_all(engine)
+    watch_writes(engine, *caches)
+    return engine, table
+
+
+def test_session_commit_invalidates_at_and_after_commit():
+    first, second = Recorder(), Recorder()
+    engine, table = watched_engine(first, second)
+    with Session(engine) as session:
+        session.execute(insert(table).values(id=1))
+        session.commit()
+    assert first.calls == second.calls == [{"readings"}, {"readings"}]
+
+
+def test_rolled_back_and_read_only_transactions_invalidate_nothing():
+    recorder = Recorder()
+    engine, table = watched_engine(recorder)
+    with Session(engine) as session:
+        session.execute(insert(table).values(id=1))
+        session.rollback()
+        session.execute(table.select()).all()
+        session.commit()
+    assert recorder.calls == []
+
+
+def test_engines_invalidate_only_their_own_caches():
+    mine, theirs = Recorder(), Recorder()
+    engine, table = watched_engine(mine)
+    watched_engine(theirs)
+    with Session(engine) as session:
+        session.execute(insert(table).values(id=1))
+        session.commit()
+    assert mine.calls == [{"readings"}, {"readings"}]
+    assert theirs.calls == []
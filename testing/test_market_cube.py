@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests pinning market cube rollups on a small set of base cells.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.market_cube import MarketCube, parse_filters, parse_list
+
+
+def usage_cell(zone, rep, profile, company, count, kwh, bill):
+    return SimpleNamespace(fact="usage", zone=zone, rep=rep, load_profile=profile, management_company=company,
+                           month="2025-01", record_count=count, kwh_sum=kwh, bill_sum=bill,
+                           rate_sum=None, rate_min=None, rate_max=None)
+
+
+def pricing_cell(zone, rep, profile, month, count, rate_sum, rate_min, rate_max):
+    return SimpleNamespace(fact="pricing", zone=zone, rep=rep, load_profile=profile, management_company=None,
+                           month=month, record_count=count, kwh_sum=None, bill_sum=None,
+                           rate_sum=rate_sum, rate_min=rate_min, rate_max=rate_max)
+
+
+CUBE = MarketCube([
+    usage_cell("COAST", "TXU", "LOW", "Alpha", 2, 2000.0, 200.0),
+    usage_cell("COAST", "TXU", "HIGH", "Beta", 1, 3000.0, 240.0),
+    usage_cell("COAST", "Reliant", "LOW", None, 3, 1500.0, None),
+    usage_cell("NORTH", "TXU", "LOW", "Alpha", 4, 8000.0, 800.0),
+    pricing_cell("COAST", "TXU", "LOW", "2025-01", 2, 100.0, 45.0, 55.0),
+    pricing_cell("COAST", "TXU", "LOW", "2025-02", 1, 60.0, 60.0, 60.0),
+    pricing_cell("COAST", "Reliant", "LOW", "2025-01", 3, 150.0, 40.0, 65.0),
+    pricing_cell("NORTH", "TXU", "HIGH", "2025-01", 1, 70.0, 70.0, 70.0),
+])
+
+
+def test_usage_rollup_by_zone():
+    assert CUBE.query(["zone"], ["esiid_count", "total_kwh", "total_bill", "avg_kwh", "cost_per_kwh"]) == [
+        {"zone": "COAST", "esiid_count": 6, "total_kwh": 6500.0, "total_bill": 440.0,
+         "avg_kwh": pytest.approx(6500 / 6), "cost_per_kwh": pytest.approx(440 / 6500)},
+        {"zone": "NORTH", "esiid_count": 4, "total_kwh": 8000.0, "total_bill": 800.0,
+         "avg_kwh": 2000.0, "cost_per_kwh": 0.1},
+    ]
+
+
+def test_missing_dimension_values_sort_first():
+    rows = CUBE.query(["management_company"], ["esiid_count"])
+    assert rows == [
+        {"management_company": None, "esiid_count": 3},
+        {"management_company": "Alpha", "esiid_count": 6},
+        {"management_company": "Beta", "esiid_count": 1},
+    ]
+
+
+def test_pricing_rollup_keeps_extremes_and_filters():
+    rows = CUBE.query(["zone", "rep"], ["rate_count", "avg_rate", "min_rate", "max_rate"],
+                      parse_filters("load_profile:LOW"))
+    assert rows == [
+        {"zone": "COAST", "rep": "Reliant", "rate_count": 3, "avg_rate": 50.0, "min_rate": 40.0, "max_rate": 65.0},
+        {"zone": "COAST", "rep": "TXU", "rate_count": 3, "avg_rate": pytest.approx(160 / 3),
+         "min_rate": 45.0, "max_rate": 60.0},
+    ]
+    assert CUBE.query(["month"], ["rate_count"], {"zone": ["COAST"], "month": ["2025-02"]}) == [
+        {"month": "2025-02", "rate_count": 1}
+    ]
+
+
+def test_facts_join_on_shared_dimensions():
+    rows = CUBE.query(["zone", "load_profile"], ["esiid_count", "avg_rate"])
+    assert rows == [
+        {"zone": "COAST", "load_profile": "HIGH", "esiid_count": 1, "avg_rate": None},
+        {"zone": "COAST", "load_profile": "LOW", "esiid_count": 5, "avg_rate": pytest.approx(310 / 6)},
+        {"zone": "NORTH", "load_profile": "HIGH", "esiid_count": None, "avg_rate": 70.0},
+        {"zone": "NORTH", "load_profile": "LOW", "esiid_count": 4, "avg_rate": None},
+    ]
+
+
+def test_grand_total_and_empty_filter():
+    assert CUBE.query([], ["esiid_count", "rate_count"]) == [{"esiid_count": 10, "rate_count": 7}]
+    assert CUBE.query(["zone"], filters={"zone": ["WEST"]}) == []
+
+
+def test_invalid_queries_are_rejected():
+    with pytest.raises(ValueError):
+        CUBE.query(["region"])
+    with pytest.raises(ValueError):
+        CUBE.query(["zone"], ["margin"])
+    with pytest.raises(ValueError):
+        CUBE.query(["zone", "zone"])
+    with pytest.raises(ValueError):
+        CUBE.query(["management_company"], ["avg_rate"])
+    with pytest.raises(ValueError):
+        parse_filters("zone")
+    assert parse_list(" zone, ,rep ") == ["zone", "rep"]
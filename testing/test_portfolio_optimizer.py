@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests pinning the portfolio optimizer on a small fixed book.
+
+Five units and five offers: eligibility by zone, load profile and MWh
+limits, meter fees, and a REP cap that moves one unit to its second-best
+offer.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.portfolio_optimizer import (
+    SCIPY_AVAILABLE, Offers, Units, candidate_offers, optimize_portfolio
+)
+
+
+def offer(id, zone, load_profile, rep, rate, meter_fee=None, min_mwh=None, max_mwh=None, max_meters=None):
+    return SimpleNamespace(id=id, zone=zone, load_profile=load_profile, rep=rep, term_months=12,
+                           daily_rate=rate, meter_fee=meter_fee, min_mwh=min_mwh, max_mwh=max_mwh,
+                           max_meters=max_meters)
+
+
+UNITS = Units(
+    ["Acme", "Bayou", "Cedar", "Delta", "Elm"],
+    ["COAST", "COAST", "COAST", "NORTH", "WEST"],
+    ["LOW", "LOW", "HIGH", None, "LOW"],
+    meters=[2, 1, 1, 1, 1],
+    annual_mwh=[100.0, 50.0, 500.0, 10.0, 10.0],
+    current_cost=[6000.0, 3000.0, 30000.0, 900.0, 700.0]
+)
+OFFERS = Offers([
+    offer(10, "COAST", "LOW", "A", 50.0),
+    offer(11, "COAST", "LOW", "B", 55.0),
+    offer(12, "COAST", None, "B", 60.0, max_mwh=200),
+    offer(13, "COAST", "HIGH", "C", 45.0, min_mwh=600),
+    offer(14, "NORTH", "LOW", "A", 70.0, meter_fee=5.0),
+])
+
+
+def test_candidates_are_the_cheapest_eligible_offers():
+    candidates, costs = candidate_offers(UNITS, OFFERS, k=3)
+    assert candidates.tolist() == [[0, 1, 2], [0, 1, 2], [-1, -1, -1], [4, -1, -1], [-1, -1, -1]]
+    assert costs[0].tolist() == [5000.0, 5500.0, 6000.0]
+    assert costs[3, 0] == 10 * 70.0 + 12 * 1 * 5.0
+    assert np.isinf(costs[2]).all() and np.isinf(costs[4]).all()
+
+
+def test_uncapped_portfolio_takes_each_units_cheapest_offer():
+    result = optimize_portfolio(UNITS, OFFERS)
+    assert result["offers"].tolist() == [0, 0, -1, 4, -1]
+    assert np.nan_to_num(result["annual_cost"]).tolist() == [5000.0, 2500.0, 0.0, 760.0, 0.0]
+    assert result["eligible_mwh"] == 160.0
+    assert result["summary"]["assigned"] == 3
+    assert result["summary"]["method"] == "greedy"
+
+
+def test_rep_cap_moves_the_lowest_regret_unit():
+    result = optimize_portfolio(UNITS, OFFERS, max_rep_share=0.7, refine=False)
+    # REP A may carry 112 of 160 MWh: Delta and Acme keep A, Bayou moves to B
+    assert result["offers"].tolist() == [0, 1, -1, 4, -1]
+    assert np.nansum(result["annual_cost"]) == 5000.0 + 2750.0 + 760.0
+    assert result["summary"]["lp_status"] is None
+
+
+def test_capped_run_reports_the_lp_status():
+    result = optimize_portfolio(UNITS, OFFERS, max_rep_share=0.7)
+    assert result["offers"].tolist() == [0, 1, -1, 4, -1]
+    assert result["summary"]["lp_status"] == ("solved" if SCIPY_AVAILABLE else "unavailable")
+
+
+@pytest.mark.skipif(not SCIPY_AVAILABLE, reason="scipy is not installed")
+def test_lp_refinement_keeps_the_greedy_optimum():
+    result = optimize_portfolio(UNITS, OFFERS, max_rep_share=0.7)
+    assert result["summary"]["method"] == "greedy"
+    assert np.nansum(result["annual_cost"]) == 8510.0
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for the token and principal caches behind request authentication.
+
+A verified token stays valid until it expires, so what stops a deactivated
+or deleted user is the principal lookup; these check that it follows user
+writes at once and that the auth dependencies act on it.
+"""
+
+import time
+
+import pytest
+
+from app.core import principals as principals_module
+from app.core.principals import PrincipalCache, TokenCache, principals
+from app.core.security import create_access_token
+
+ESIID = "/api/v1/esiids/1"
+
+
+@pytest.fixture
+def verify_calls(monkeypatch):
+    """Tokens decoded by TokenCache, in order"""
+    calls = []
+
+    def verify(token):
+        calls.append(token)
+        return None if token == "bad" else {"sub": token, "exp": time.time() + (-1 if token == "old" else 60)}
+
+    monkeypatch.setattr(principals_module, "verify_token", verify)
+    return calls
+
+
+def test_token_cache_memoizes_until_expiry(verify_calls):
+    cache = TokenCache(max_entries=2)
+    assert cache.verify("1") == cache.verify("1")
+    assert cache.verify("bad") is None and cache.verify("bad") is None
+    # Expired payloads are decoded again rather than served
+    cache.verify("old")
+    cache.verify("old")
+    assert verify_calls == ["1", "bad", "bad", "old", "old"]
+
+
+def test_token_cache_evicts_least_recently_used(verify_calls):
+    cache = TokenCache(max_entries=2)
+    for token in ("1", "2", "1", "3", "1", "2"):
+        cache.verify(token)
+    assert verify_calls == ["1", "2", "3", "2"]
+    cache.clear()
+    cache.verify("1")
+    assert verify_calls[-1] == "1" and len(verify_calls) == 5
+
+
+@pytest.mark.asyncio
+async def test_principal_follows_deactivation_and_deletion(db, make_user):
+    user, _ = make_user("manager")
+    principal = await principals.resolve(user.id)
+    assert (principal.id, principal.role, principal.is_active) == (user.id, "manager", True)
+    assert principals.get(user.id) == (True, principal)
+
+    user.is_active = False
+    db.commit()
+    assert principals.get(user.id) == (False, None)
+    assert (await principals.resolve(user.id)).is_active is False
+
+    db.delete(user)
+    db.commit()
+    assert await principals.resolve(user.id) is None
+    # A missing user is remembered too
+    assert principals.get(user.id) == (True, None)
+
+
+@pytest.mark.asyncio
+async def test_principal_loaded_across_a_write_is_not_kept(db, make_user, monkeypatch):
+    user, _ = make_user("user")
+    cache = PrincipalCache(ttl_seconds=60)
+    load = principals_module._load_principal
+
+    def load_then_write(user_id):
+        principal = load(user_id)
+        cache.invalidate(["users"])
+        return principal
+
+    monkeypatch.setattr(principals_module, "_load_principal", load_then_write)
+    assert (await cache.resolve(user.id)).id == user.id
+    assert cache.get(user.id) == (False, None)
+    monkeypatch.setattr(principals_module, "_load_principal", load)
+    await cache.resolve(user.id)
+    # Writes to other tables keep cached principals
+    cache.invalidate(["esiids"])
+    assert cache.get(user.id)[0] is True
+
+
+def test_principal_cache_expires_entries():
+    cache = PrincipalCache(ttl_seconds=0)
+    cache._entries[1] = (principals_module.Principal(1, "user", True), time.monotonic())
+    assert cache.get(1) == (False, None)
+
+
+def test_deactivated_user_is_refused(client, db, make_user):
+    user, headers = make_user("user")
+    assert client.get(ESIID, headers=headers).status_code == 404
+
+    user.is_active = False
+    db.commit()
+    response = client.get(ESIID, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
+
+
+def test_deleted_user_is_unauthenticated(client, db, make_user):
+    user, headers = make_user("admin")
+    assert client.get(ESIID, headers=headers).status_code == 404
+
+    db.delete(user)
+    db.commit()
+    assert client.get(ESIID, headers=headers).status_code == 401
+    # Role checks resolve the same principal
+    assert client.post("/api/v1/analytics/refresh", headers=headers).status_code == 401
+    never_existed = {"Authorization": "Bearer " + create_access_token({"sub": "9999"})}
+    assert client.get(ESIID, headers=never_existed).status_code == 401
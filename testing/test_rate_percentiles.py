@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for zone rate percentile ranking and the cached live index.
+
+The live index follows commits made through this worker's engines at once
+and other writers at its periodic fingerprint check.
+"""
+
+import math
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, update
+
+from app.core.config import settings
+from app.database import engine
+from app.models.daily_pricing import DailyPricing
+from app.services import rate_percentiles
+from app.services.rate_percentiles import ZoneRateIndex, get_zone_rate_index, market_position
+
+
+def pricing_row(zone, rate):
+    return DailyPricing(effective_date=datetime(2025, 1, 15), zone=zone, load_profile="LOW", rep="TXU",
+                        term_months=12, daily_rate=rate, is_active=True)
+
+
+def test_ties_rank_strictly_below():
+    index = ZoneRateIndex(["COAST"] * 5, [1.0, 2.0, 2.0, 2.0, 3.0])
+    assert index.percentile_of("COAST", 2.0) == 20.0
+    assert index.percentile_of("COAST", 2.5) == 80.0
+    assert index.percentile_of("COAST", 0.5) == 0.0
+    assert index.percentile_of("COAST", 9.0) == 100.0
+
+
+def test_nan_rates_count_but_never_rank_below():
+    index = ZoneRateIndex(["NORTH"] * 4 + ["COAST"], [1.0, math.nan, 2.0, 3.0, 5.0])
+    assert index.counts == {"COAST": 1, "NORTH": 4}
+    assert index.percentile_of("NORTH", 2.5) == 50.0
+    assert index.percentile_of("NORTH", 100.0) == 75.0
+    assert index.percentile_of("NORTH", math.nan) == 0.0
+
+
+def test_unknown_and_missing_zones():
+    index = ZoneRateIndex(["COAST", None, math.nan, "WEST"], [1.0, 2.0, 3.0, 4.0])
+    assert index.zones == ["COAST", "WEST"]
+    assert index.percentile_of("SOUTH", 1.0) is None
+    result = index.percentiles(["COAST", "SOUTH", "WEST"], [2.0, 2.0, 2.0])
+    assert result[0] == 100.0 and math.isnan(result[1]) and result[2] == 0.0
+
+
+def test_market_position_thresholds():
+    assert list(market_position([0, 24.9, 25, 74.9, 75, 100])) == [
+        "competitive", "competitive", "average", "average", "expensive", "expensive"
+    ]
+
+
+@pytest.fixture
+def empty_index_cache(monkeypatch):
+    monkeypatch.setattr(rate_percentiles, "_index_cache", {})
+
+
+def test_live_index_is_rebuilt_when_pricing_changes(db, empty_index_cache):
+    rows = [pricing_row("COAST", rate) for rate in (10.0, 20.0, 30.0)]
+    db.add_all(rows)
+    db.commit()
+    index = get_zone_rate_index(db)
+    assert index.percentile_of("COAST", 25.0) == pytest.approx(200 / 3)
+    # Served without touching the table until this worker writes to it
+    assert get_zone_rate_index(None) is index
+
+    db.add(pricing_row("COAST", 40.0))
+    db.commit()
+    index = get_zone_rate_index(db)
+    assert index.percentile_of("COAST", 25.0) == 50.0
+
+    # Two edits inside one second still move the fingerprint
+    rows[0].daily_rate = 50.0
+    db.commit()
+    assert get_zone_rate_index(db).percentile_of("COAST", 45.0) == 75.0
+    rows[1].daily_rate = 60.0
+    db.commit()
+    index = get_zone_rate_index(db)
+    assert np.array_equal(index.sorted_rates["COAST"], [30.0, 40.0, 50.0, 60.0])
+
+    db.delete(rows[2])
+    db.commit()
+    assert get_zone_rate_index(db).counts == {"COAST": 3}
+
+
+def test_writes_from_other_processes_are_seen_at_the_next_check(db, empty_index_cache, monkeypatch):
+    db.add_all([pricing_row("COAST", rate) for rate in (10.0, 20.0, 30.0)])
+    db.commit()
+    monkeypatch.setattr(settings, "rate_index_check_seconds", 3600)
+    index = get_zone_rate_index(db)
+
+    # An engine the app does not watch, like an import script's
+    outside = create_engine(engine.url)
+    with outside.begin() as conn:
+        conn.execute(update(DailyPricing).where(DailyPricing.daily_rate == 10.0).values(daily_rate=35.0))
+    outside.dispose()
+    assert get_zone_rate_index(db) is index
+
+    monkeypatch.setattr(settings, "rate_index_check_seconds", 0)
+    assert get_zone_rate_index(db).percentile_of("COAST", 32.0) == pytest.approx(200 / 3)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for the response cache of polled read endpoints.
+
+Cached routes must keep enforcing their auth dependencies: a response stored
+for one caller is only replayed to callers the route would have answered.
+"""
+
+from datetime import datetime
+
+from app.core.security import create_access_token
+from app.models.daily_pricing import DailyPricing
+
+CACHED_ROUTES = [
+    "/api/v1/providers/stats/overview",
+    "/api/v1/pricing/stats/overview",
+    "/api/v1/esiids/stats/overview",
+]
+
+
+def pricing_row(**overrides):
+    return DailyPricing(**{
+        "effective_date": datetime(2025, 1, 15), "zone": "COAST", "load_profile": "LOW", "rep": "TXU",
+        "term_months": 12, "daily_rate": 80.0, "is_active": True, **overrides
+    })
+
+
+def test_anonymous_request_is_rejected_after_cache_fill(client, make_user):
+    _, headers = make_user("admin")
+    for path in CACHED_ROUTES:
+        assert client.get(path).status_code == 401
+        filled = client.get(path, headers=headers)
+        assert filled.status_code == 200
+        assert client.get(path, headers=headers).headers["x-cache"] == "hit"
+        assert client.get(path).status_code == 401
+
+
+def test_token_of_missing_user_does_not_fill_cache_for_anonymous_callers(client, make_user):
+    ghost = {"Authorization": "Bearer " + create_access_token({"sub": "999"})}
+    for path in CACHED_ROUTES:
+        client.get(path, headers=ghost)
+        assert client.get(path).status_code == 401
+
+
+def test_inactive_user_is_not_served_from_cache(client, make_user):
+    _, admin = make_user("admin")
+    _, inactive = make_user("admin", is_active=False)
+    path = CACHED_ROUTES[1]
+    assert client.get(path, headers=admin).status_code == 200
+    assert "x-cache" not in client.get(path, headers=inactive).headers
+
+
+def test_conditional_get_and_write_invalidation(client, db, make_user):
+    _, headers = make_user("admin")
+    path = CACHED_ROUTES[1]
+    first = client.get(path, headers=headers)
+    assert first.headers["x-cache"] == "miss"
+    assert client.get(path, headers={**headers, "If-None-Match": first.headers["etag"]}).status_code == 304
+
+    db.add(pricing_row())
+    db.commit()
+    refreshed = client.get(path, headers=headers)
+    assert refreshed.headers["x-cache"] == "miss"
+    assert refreshed.json()["total_pricing_records"] == first.json()["total_pricing_records"] + 1
+
+
+def test_anonymous_route_is_cached_for_anonymous_callers(client):
+    assert client.get("/api/v1/esiids/").headers["x-cache"] == "miss"
+    assert client.get("/api/v1/esiids/").headers["x-cache"] == "hit"
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for read/write routing of the sync session.
+
+On a SQLite file reads go to query-only connections; a transaction moves
+to the write engine at its first flush or DML statement and stays there
+until it ends. Other databases have no read engine, so every statement
+binds to the writer.
+"""
+
+import pytest
+from sqlalchemy import select, text, update
+
+from app.database import engine, read_engine
+from app.models.esiid import ESIID
+
+READER = read_engine if read_engine is not None else engine
+
+sqlite_file_only = pytest.mark.skipif(read_engine is None, reason="query-only reads are set up for SQLite files")
+
+
+def read_bind(db):
+    """Engine the session would run a read on now"""
+    return db.get_bind(clause=select(ESIID.id))
+
+
+def test_reads_use_the_read_engine(db):
+    assert read_bind(db) is READER
+    assert db.scalar(select(ESIID.id)) is None
+    assert read_bind(db) is READER
+
+
+def test_write_after_reads_goes_to_the_writer(db):
+    # A request that started out reading
+    assert db.query(ESIID).count() == 0
+    assert read_bind(db) is READER
+
+    db.add(ESIID(esi_id="1000", account_name="Acme", is_active=True))
+    db.flush()
+    assert read_bind(db) is engine
+    # Later reads in the transaction see its own uncommitted row
+    assert db.query(ESIID).count() == 1
+    db.commit()
+
+    assert read_bind(db) is READER
+    assert db.scalar(select(ESIID.account_name)) == "Acme"
+
+
+def test_dml_statement_goes_to_the_writer_without_a_flush(db):
+    db.add(ESIID(esi_id="1001", account_name="Bayou", is_active=True))
+    db.commit()
+    assert read_bind(db) is READER
+
+    db.execute(update(ESIID).where(ESIID.esi_id == "1001").values(account_name="Bayou North"))
+    assert read_bind(db) is engine
+    assert db.scalar(select(ESIID.account_name)) == "Bayou North"
+    db.rollback()
+
+    # Rolled back on the writer; the next transaction reads again
+    assert read_bind(db) is READER
+    assert db.scalar(select(ESIID.account_name)) == "Bayou"
+
+
+@sqlite_file_only
+def test_read_connections_are_query_only(db):
+    assert db.scalar(text("PRAGMA query_only")) == 1
+    db.add(ESIID(esi_id="1002", account_name="Cedar", is_active=True))
+    db.flush()
+    assert db.scalar(text("PRAGMA query_only")) == 0
+    db.rollback()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for password hashing on the event loop's behalf.
+
+The async helpers run the same bcrypt context on worker threads, so hashes
+written by either path must verify on the other: accounts created by the
+import scripts (sync) log in through the API (async), and back.
+"""
+
+import threading
+
+import pytest
+
+from app.core import security
+from app.core.security import get_password_hash, get_password_hash_async, verify_password, verify_password_async
+from app.models.user import User
+
+
+@pytest.mark.asyncio
+async def test_async_and_sync_hashes_verify_on_either_path():
+    async_hash = await get_password_hash_async("s3cret-pass")
+    sync_hash = get_password_hash("s3cret-pass")
+    assert async_hash.startswith("$2b$") and async_hash != sync_hash
+
+    assert verify_password("s3cret-pass", async_hash)
+    assert await verify_password_async("s3cret-pass", sync_hash)
+    assert not await verify_password_async("wrong-pass", sync_hash)
+
+
+@pytest.mark.asyncio
+async def test_async_hashing_runs_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def record(password):
+        threads.append(threading.current_thread().name)
+        return "hashed:" + password
+
+    monkeypatch.setattr(security, "get_password_hash", record)
+    assert await get_password_hash_async("pw") == "hashed:pw"
+    assert threads[0].startswith("password-hash")
+
+
+def test_login_with_a_sync_hash_and_register_with_an_async_one(client, db):
+    db.add(User(username="imported", email="imported@example.com", hashed_password=get_password_hash("pw-one"),
+                role="user", is_active=True))
+    db.commit()
+    assert client.post("/api/v1/auth/login", json={"username": "imported", "password": "pw-one"}).status_code == 200
+    assert client.post("/api/v1/auth/login", json={"username": "imported", "password": "pw-two"}).status_code == 401
+
+    registered = client.post("/api/v1/auth/register",
+                             json={"username": "new", "email": "new@example.com", "password": "pw-two"})
+    assert registered.status_code == 200
+    stored = db.query(User.hashed_password).filter(User.username == "new").scalar()
+    assert verify_password("pw-two", stored)
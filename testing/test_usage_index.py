@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Tests for the usage analytics indexes behind GET /analytics/usage-analysis.
+"""
+
+import math
+
+from app.services.usage_index import UsageIndex
+
+
+def usage_row(name, usage, pattern="stable"):
+    return {"account_name": name, "total_usage_kwh": usage, "usage_pattern": pattern}
+
+
+def test_empty_index_filters_to_nothing():
+    index = UsageIndex([])
+    assert len(index.filter(min_usage=10)) == 0
+    assert len(index.filter(account_name="acme", usage_pattern="stable", max_usage=5)) == 0
+    assert index.page(index.filter(), 0, 10) == ([], 0)
+
+
+def test_filters_intersect_and_skip_missing_usage():
+    index = UsageIndex([
+        usage_row("Acme Lofts", 100.0),
+        usage_row("Bayou Flats", math.nan),
+        usage_row("Cedar Acme", 250.0, "volatile"),
+        usage_row("Delta Acme", 400.0),
+    ])
+    assert index.filter(min_usage=100, max_usage=250).tolist() == [0, 2]
+    assert index.filter(min_usage=0).tolist() == [0, 2, 3]
+    assert index.filter(account_name="ACME", usage_pattern="stable").tolist() == [0, 3]
+    records, total = index.page(index.filter(account_name="acme", min_usage=200), 0, 1)
+    assert total == 2
+    assert [record["account_name"] for record in records] == ["Cedar Acme"]